@@ -1,7 +1,8 @@
 import os
-from flask import Flask, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask
 from config import config
+from src.database.db_connection import db
+import src.models  # noqa: F401  Registra los modelos del proyecto
 
 # Crear la aplicación Flask
 app = Flask(__name__)
@@ -9,10 +10,17 @@ app = Flask(__name__)
 # Cargar configuración según el entorno
 app.config.from_object(config[os.getenv('FLASK_ENV') or 'default'])
 
-# Inicializar la base de datos
-db = SQLAlchemy()
+# Inicializar la base de datos (instancia compartida con los modelos y servicios)
 db.init_app(app)
 
+# Política de pre-ping y telemetría del pool según el perfil configurado
+from src.database.pool import configurar_pool
+configurar_pool(app)
+
+# Enrutamiento de lecturas a las réplicas configuradas en DB_REPLICAS
+from src.database.replicas import replicas
+replicas.init_app(app)
+
 # Configuración adicional
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
@@ -26,18 +34,70 @@ class Producto(db.Model):
     def __repr__(self):
         return f'<Producto {self.nombre}>'
 
-# Crear tablas en la base de datos
-with app.app_context():
-    db.create_all()
+# Al arrancar solo se consulta la versión del esquema; las migraciones se aplican
+# con 'flask db-upgrade' (o aquí mismo si MIGRAR_AL_INICIAR está activo)
+from src.database.migraciones import comprobar_version
+comprobar_version(app)
+
+# Comandos de base de datos (init-db, seed-db, import-catalog...)
+from src.database import commands
+commands.init_app(app)
+
+# Rutas de salud y disponibilidad
+from src.routes.salud import salud_bp
+app.register_blueprint(salud_bp)
+
+# Instrumentación de consultas SQL y peticiones (/metrics)
+from src.database.metricas import metricas
+from src.routes.metricas import metricas_bp
+metricas.init_app(app)
+app.register_blueprint(metricas_bp)
+
+# Caché y búsqueda del catálogo
+from src.database.cache import cache_catalogo
+from src.services import busqueda
+from src.routes.busqueda import busqueda_bp
+cache_catalogo.init_app(app)
+busqueda.init_app(app)
+app.register_blueprint(busqueda_bp)
+
+# Catálogo (ETag/Last-Modified a partir de las versiones de las tablas)
+from src.database.versiones import versiones_catalogo
+from src.routes.catalogo import catalogo_bp
+versiones_catalogo.init_app(app)
+app.register_blueprint(catalogo_bp)
 
-# Ruta de prueba
+# Imágenes de las gorras (miniaturas en segundo plano y URL inmutables)
+from src.services import imagenes
+from src.routes.imagenes import imagenes_bp
+imagenes.init_app(app)
+app.register_blueprint(imagenes_bp)
+
+# Autenticación (verificación de contraseñas en un pool y tokens firmados)
+from src.services.autenticacion import autenticacion
+from src.routes.autenticacion import autenticacion_bp
+autenticacion.init_app(app)
+app.register_blueprint(autenticacion_bp)
+
+# Carrito de compra (almacén clave-valor hasta el checkout)
+from src.services.carrito import carritos
+from src.routes.carrito import carrito_bp
+carritos.init_app(app)
+app.register_blueprint(carrito_bp)
+
+# Doble escritura de usuarios/ventas en personas/pedidos durante la consolidación
+from src.services import consolidacion
+consolidacion.init_app(app)
+
+# Comprobación completa de la base de datos (antes la ruta /test-db)
 import socket
 import subprocess
 import time
+import click
 
-@app.route('/test-db', methods=['GET'])
-def test_db():
-    """Ruta para probar la conexión a la base de datos."""
+@app.cli.command('check-db')
+def check_db_command():
+    """Comprueba el servicio, el puerto y los permisos de escritura de la base de datos."""
     # 1. Verificar si el servicio de MariaDB está corriendo
     try:
         # Para sistemas Linux/Unix
@@ -47,99 +107,48 @@ def test_db():
             text=True
         )
         if result.returncode != 0:
-            return jsonify({
-                'status': 'error',
-                'message': 'El servicio de MariaDB no está corriendo',
-                'service_status': 'inactive'
-            }), 500
+            raise click.ClickException('El servicio de MariaDB no está corriendo')
+        click.echo('✅ Servicio de MariaDB activo')
+    except click.ClickException:
+        raise
     except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': f'No se pudo verificar el estado del servicio MariaDB: {str(e)}',
-            'service_status': 'unknown'
-        }), 500
+        click.echo(f'⚠️  No se pudo verificar el estado del servicio MariaDB: {str(e)}')
 
-    # 2. Verificar si el puerto 3306 está accesible
+    # 2. Verificar si el puerto está accesible
+    host = app.config.get('DB_HOST', '127.0.0.1')
+    port = app.config.get('DB_PORT', 3306)
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.settimeout(3)  # Timeout de 3 segundos
-        result = sock.connect_ex(('127.0.0.1', 3306))
+        result = sock.connect_ex((host, port))
         sock.close()
-        
-        if result != 0:
-            return jsonify({
-                'status': 'error',
-                'message': 'No se puede conectar al puerto 3306 (MySQL/MariaDB no está escuchando)',
-                'port_status': 'closed'
-            }), 500
     except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': f'Error al verificar el puerto 3306: {str(e)}',
-            'port_status': 'error'
-        }), 500
+        raise click.ClickException(f'Error al verificar el puerto {port}: {str(e)}')
+    if result != 0:
+        raise click.ClickException(f'No se puede conectar al puerto {port} (MySQL/MariaDB no está escuchando)')
+    click.echo(f'✅ Puerto {port} abierto')
 
-    # 3. Intentar autenticación con las credenciales
+    # 3. Verificar la conexión y los permisos de escritura usando el pool de la aplicación
+    from sqlalchemy import text
+    start_time = time.time()
     try:
-        from sqlalchemy import create_engine, text
-        import time
-        
-        db_url = app.config.get('SQLALCHEMY_DATABASE_URI')
-        if not db_url:
-            return jsonify({
-                'status': 'error',
-                'message': 'Configuración de base de datos no encontrada',
-                'config_status': 'missing'
-            }), 500
-            
-        # Crear el motor con un timeout corto
-        engine = create_engine(
-            db_url,
-            connect_args={"connect_timeout": 3}
-        )
-        
-        # Probar la conexión
-        start_time = time.time()
-        with engine.connect() as connection:
-            # Verificar que la base de datos existe
-            result = connection.execute(text("SHOW DATABASES LIKE 'gorras_db'"))
+        with db.engine.connect() as connection:
+            db_name = app.config.get('DB_NAME')
+            result = connection.execute(text("SHOW DATABASES LIKE :nombre"), {'nombre': db_name})
             if not result.first():
-                return jsonify({
-                    'status': 'error',
-                    'message': "La base de datos 'gorras_db' no existe",
-                    'database_status': 'not_found'
-                }), 500
-                
-            # Verificar permisos de escritura
+                raise click.ClickException(f"La base de datos '{db_name}' no existe")
+
             test_table = "test_" + str(int(time.time()))
             try:
                 connection.execute(text(f"CREATE TABLE {test_table} (id INT);"))
                 connection.execute(text(f"INSERT INTO {test_table} (id) VALUES (1);"))
                 connection.execute(text(f"DROP TABLE {test_table};"))
             except Exception as e:
-                return jsonify({
-                    'status': 'error',
-                    'message': f'Error de permisos: {str(e)}',
-                    'database_status': 'permission_denied'
-                }), 500
-            
-            # Si llegamos aquí, todo está bien
-            connection_time = (time.time() - start_time) * 1000  # en milisegundos
-            return jsonify({
-                'status': 'success',
-                'message': 'Conexión exitosa a la base de datos',
-                'database': app.config.get('DB_NAME'),
-                'connection_time_ms': round(connection_time, 2),
-                'service_status': 'active',
-                'port_status': 'open',
-                'database_status': 'ok',
-                'permissions': 'read_write'
-            })
-            
+                raise click.ClickException(f'Error de permisos: {str(e)}')
+    except click.ClickException:
+        raise
     except Exception as e:
-        error_type = type(e).__name__
         error_message = str(e)
-        
         # Detectar errores comunes
         if "Can't connect to MySQL server" in error_message:
             error_detail = 'El servidor MySQL/MariaDB no está aceptando conexiones'
@@ -149,17 +158,10 @@ def test_db():
             error_detail = 'La base de datos especificada no existe'
         else:
             error_detail = 'Error desconocido al conectar a la base de datos'
-        
-        return jsonify({
-            'status': 'error',
-            'message': f'Error de conexión: {error_detail}',
-            'error_type': error_type,
-            'error_details': error_message,
-            'database': app.config.get('DB_NAME', 'No configurada'),
-            'service_status': 'unknown',
-            'port_status': 'unknown',
-            'database_status': 'connection_failed'
-        }), 500
+        raise click.ClickException(f'Error de conexión: {error_detail} ({type(e).__name__}: {error_message})')
+
+    connection_time = (time.time() - start_time) * 1000  # en milisegundos
+    click.echo(f'✅ Conexión y permisos de lectura/escritura correctos ({connection_time:.2f} ms)')
 
 if __name__ == '__main__':
     # Iniciar la aplicación
@@ -9,6 +9,69 @@ env_path = Path(__file__).parent / '.env'
 if env_path.exists():
     load_dotenv(dotenv_path=env_path)
 
+# Perfiles del pool de conexiones. ``pre_ping`` admite:
+#   'siempre'   comprueba la conexión en cada checkout (un viaje extra por checkout)
+#   'inactivas' solo comprueba las que llevan más de POOL_PING_INACTIVIDAD segundos sin usarse
+#   'nunca'     confía en pool_recycle y en la invalidación tras un error de desconexión
+POOL_PERFILES = {
+    'desarrollo': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 10, 'pool_recycle': 280,
+                   'pre_ping': 'siempre'},
+    'produccion': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 5, 'pool_recycle': 280,
+                   'pre_ping': 'inactivas'},
+    'trabajos': {'pool_size': 2, 'max_overflow': 0, 'pool_timeout': 60, 'pool_recycle': 3600,
+                 'pre_ping': 'siempre'},
+    'alta_concurrencia': {'pool_size': 20, 'max_overflow': 30, 'pool_timeout': 2, 'pool_recycle': 280,
+                          'pre_ping': 'nunca'},
+}
+POLITICAS_PRE_PING = ('siempre', 'inactivas', 'nunca')
+
+
+def opciones_engine(perfil):
+    """
+    Traduce un perfil del pool a opciones de ``create_engine``.
+
+    Las variables de entorno POOL_SIZE, POOL_MAX_OVERFLOW, POOL_TIMEOUT,
+    POOL_RECYCLE y POOL_PRE_PING sobrescriben los valores del perfil.
+    """
+    if perfil not in POOL_PERFILES:
+        raise ValueError(f"Perfil de pool desconocido: {perfil}")
+    valores = dict(POOL_PERFILES[perfil])
+    for clave, variable, tipo in (('pool_size', 'POOL_SIZE', int), ('max_overflow', 'POOL_MAX_OVERFLOW', int),
+                                  ('pool_timeout', 'POOL_TIMEOUT', float), ('pool_recycle', 'POOL_RECYCLE', int),
+                                  ('pre_ping', 'POOL_PRE_PING', str)):
+        if os.getenv(variable):
+            valores[clave] = tipo(os.getenv(variable))
+    if valores['pre_ping'] not in POLITICAS_PRE_PING:
+        raise ValueError(f"Política de pre-ping desconocida: {valores['pre_ping']}")
+
+    # 'inactivas' se aplica con un evento de checkout (src.database.pool)
+    pre_ping = valores.pop('pre_ping')
+    valores['pool_pre_ping'] = pre_ping == 'siempre'
+    valores['pool_use_lifo'] = True
+    return valores
+
+
+def politica_pre_ping(perfil):
+    """Política de pre-ping efectiva de un perfil."""
+    return os.getenv('POOL_PRE_PING') or POOL_PERFILES[perfil]['pre_ping']
+
+
+def uri_base_datos(driver, usuario, clave, host, puerto, nombre, transporte='auto', socket=None):
+    """Construye la URI de conexión por TCP o por socket Unix."""
+    if transporte not in ('auto', 'socket', 'tcp'):
+        raise ValueError(f"Transporte de base de datos desconocido: {transporte}")
+    usar_socket = transporte == 'socket' or (
+        transporte == 'auto' and os.name != 'nt' and socket and os.path.exists(socket))
+    if usar_socket:
+        return f"{driver}://{usuario}:{clave}@/{nombre}?unix_socket={socket}"
+    return f"{driver}://{usuario}:{clave}@{host}:{puerto}/{nombre}"
+
+
+def binds_replicas(uris):
+    """Binds de Flask-SQLAlchemy ('replica_1', 'replica_2', ...) para las URIs de las réplicas."""
+    return {f'replica_{i}': uri for i, uri in enumerate(uris, start=1)}
+
+
 class Config:
     """Configuración base compatible con Linux y Windows"""
     
@@ -20,44 +83,127 @@ class Config:
     DEBUG = os.getenv('FLASK_ENV', 'development').lower() in ('1', 'true', 'development')
     
     # Configuración de la base de datos
-    DB_DRIVER = os.getenv('DB_DRIVER', 'mysql+mysqlconnector')
+    # Drivers soportados: mysql+pymysql (por defecto, incluido en requirements.txt),
+    # mysql+mysqlconnector, mysql+mysqldb y mariadb+mariadbconnector
+    DB_DRIVER = os.getenv('DB_DRIVER', 'mysql+pymysql')
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_PORT = int(os.getenv('DB_PORT', '3306'))
     DB_NAME = os.getenv('DB_NAME', 'gorras_db')
     DB_USER = os.getenv('DB_USER', 'cristian')  # Usuario por defecto según tu .env
     DB_PASSWORD = os.getenv('DB_PASSWORD', '12345')  # Contraseña por defecto según tu .env
+    # 'auto' usa el socket Unix si existe, 'socket' lo exige y 'tcp' usa host y puerto
+    DB_TRANSPORTE = os.getenv('DB_TRANSPORTE', 'auto')
+    DB_SOCKET = os.getenv('DB_SOCKET', '/var/run/mysqld/mysqld.sock')  # Ruta típica en Linux
     
     # Configuración de rutas
     UPLOAD_FOLDER = str(BASE_DIR / 'static' / 'uploads')
+
+    # Imágenes direccionadas por hash: anchos de las miniaturas, hilos que las generan,
+    # tamaño máximo de subida y caché de las URL inmutables
+    IMAGENES_TAMANOS = tuple(int(a) for a in os.getenv('IMAGENES_TAMANOS', '160,480,1024').split(','))
+    IMAGENES_TRABAJADORES = int(os.getenv('IMAGENES_TRABAJADORES', '2'))
+    IMAGENES_MAX_BYTES = int(os.getenv('IMAGENES_MAX_BYTES', str(10 * 1024 * 1024)))
+    IMAGENES_CACHE_SEGUNDOS = int(os.getenv('IMAGENES_CACHE_SEGUNDOS', str(365 * 24 * 3600)))
     
     # Configuración de la conexión a la base de datos
-    if os.name == 'nt':  # Windows
-        SQLALCHEMY_DATABASE_URI = f"{DB_DRIVER}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    else:  # Linux/Unix
-        # Intentar con socket si existe, de lo contrario usar TCP/IP
-        DB_SOCKET = '/var/run/mysqld/mysqld.sock'  # Ruta típica en Linux
-        if os.path.exists(DB_SOCKET):
-            SQLALCHEMY_DATABASE_URI = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@/{DB_NAME}?unix_socket={DB_SOCKET}"
-        else:
-            SQLALCHEMY_DATABASE_URI = f"{DB_DRIVER}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or uri_base_datos(
+        DB_DRIVER, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME, DB_TRANSPORTE, DB_SOCKET)
     
+    # Réplicas de lectura: URIs separadas por comas en DB_REPLICAS
+    DB_REPLICAS = [uri.strip() for uri in os.getenv('DB_REPLICAS', '').split(',') if uri.strip()]
+    SQLALCHEMY_BINDS = binds_replicas(DB_REPLICAS)
+    REPLICAS_LECTURA = list(SQLALCHEMY_BINDS)
+    REPLICAS_ACTIVAS = os.getenv('REPLICAS_ACTIVAS', 'true').lower() in ('1', 'true', 'yes')
+    # Tiempo que una réplica que ha fallado queda fuera del reparto de lecturas
+    REPLICAS_EXPULSION_SEGUNDOS = float(os.getenv('REPLICAS_EXPULSION_SEGUNDOS', '30'))
+
     # Configuración de SQLAlchemy
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_recycle': 280,
-        'pool_pre_ping': True
-    }
-    SQLALCHEMY_ECHO = DEBUG
+    POOL_PERFIL = os.getenv('POOL_PERFIL', 'desarrollo')
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_engine(POOL_PERFIL)
+    # Umbral de la política de pre-ping 'inactivas'
+    POOL_PING_INACTIVIDAD = float(os.getenv('POOL_PING_INACTIVIDAD', '30'))
+    # El volcado de cada sentencia es muy costoso; las métricas de /metrics lo sustituyen
+    SQLALCHEMY_ECHO = os.getenv('SQLALCHEMY_ECHO', 'false').lower() in ('1', 'true', 'yes')
+
+    # Aplicar las migraciones pendientes al importar app.py; en producción se usa 'flask db-upgrade'
+    MIGRAR_AL_INICIAR = os.getenv('MIGRAR_AL_INICIAR', 'false').lower() in ('1', 'true', 'yes')
+
+    # Intervalo durante el que /readyz reutiliza el último sondeo
+    READINESS_CACHE_SEGUNDOS = float(os.getenv('READINESS_CACHE_SEGUNDOS', '2'))
+
+    # Caché de lectura del catálogo
+    CACHE_CATALOGO_ACTIVA = os.getenv('CACHE_CATALOGO_ACTIVA', 'true').lower() in ('1', 'true', 'yes')
+    CACHE_CATALOGO_TTL = float(os.getenv('CACHE_CATALOGO_TTL', '60'))
+    CACHE_CATALOGO_MAX_ELEMENTOS = int(os.getenv('CACHE_CATALOGO_MAX_ELEMENTOS', '1024'))
+    # Backend compartido de la caché: vacío (una caché por proceso) o 'sqlite' (archivo común a los workers)
+    CACHE_CATALOGO_BACKEND = os.getenv('CACHE_CATALOGO_BACKEND', '')
+    CACHE_CATALOGO_RUTA = os.getenv('CACHE_CATALOGO_RUTA', str(BASE_DIR / 'instance' / 'cache_catalogo.sqlite3'))
+    # Segundos tras una invalidación en los que la caché se llena desde la primaria (mayor que el retraso de las réplicas)
+    CACHE_CATALOGO_VENTANA_PRIMARIA = float(os.getenv('CACHE_CATALOGO_VENTANA_PRIMARIA', '5'))
+    # Versiones del catálogo (ETag/Last-Modified): vacío (por proceso) o 'sqlite' (común a los workers)
+    VERSIONES_BACKEND = os.getenv('VERSIONES_BACKEND', '')
+    VERSIONES_RUTA = os.getenv('VERSIONES_RUTA', str(BASE_DIR / 'instance' / 'versiones_catalogo.sqlite3'))
+    VERSIONES_EXIGIR_BACKEND = os.getenv('VERSIONES_EXIGIR_BACKEND', 'false').lower() in ('1', 'true', 'yes')
+
+    # Carrito de compra: 'memoria' (un solo proceso) o 'sqlite' (archivo compartido por los workers)
+    CARRITO_BACKEND = os.getenv('CARRITO_BACKEND', 'memoria')
+    CARRITO_RUTA = os.getenv('CARRITO_RUTA', str(BASE_DIR / 'instance' / 'carritos.sqlite3'))
+    CARRITO_TTL_SEGUNDOS = float(os.getenv('CARRITO_TTL_SEGUNDOS', str(7 * 24 * 3600)))
+    CARRITO_MAX_LINEAS = int(os.getenv('CARRITO_MAX_LINEAS', '50'))
+
+    # Autenticación: hashes en un pool acotado y tokens firmados con SECRET_KEY
+    AUTH_METODO_HASH = os.getenv('AUTH_METODO_HASH', 'scrypt')
+    AUTH_TRABAJADORES = int(os.getenv('AUTH_TRABAJADORES', '2'))
+    AUTH_MAX_PENDIENTES = int(os.getenv('AUTH_MAX_PENDIENTES', '16'))
+    AUTH_ESPERA_COLA_SEGUNDOS = float(os.getenv('AUTH_ESPERA_COLA_SEGUNDOS', '1'))
+    AUTH_TOKEN_TTL_SEGUNDOS = int(os.getenv('AUTH_TOKEN_TTL_SEGUNDOS', str(12 * 3600)))
+    # Retraso máximo con el que un worker ve una revocación hecha en otro
+    AUTH_REVOCACION_TTL_SEGUNDOS = float(os.getenv('AUTH_REVOCACION_TTL_SEGUNDOS', '5'))
+    AUTH_COOKIE = os.getenv('AUTH_COOKIE', 'gorras_sesion')
+    # Las revocaciones comparten almacén con los carritos salvo que se indique otro
+    AUTH_BACKEND = os.getenv('AUTH_BACKEND', CARRITO_BACKEND)
+    AUTH_RUTA = os.getenv('AUTH_RUTA', CARRITO_RUTA)
+
+    # Consolidación de usuarios/ventas en personas/pedidos: replicar también las escrituras nuevas
+    CONSOLIDACION_DOBLE_ESCRITURA = os.getenv('CONSOLIDACION_DOBLE_ESCRITURA', 'false').lower() in ('1', 'true', 'yes')
+    # Variante de cada gorra de las ventas: CSV id_gorra,id_variante o, solo si el catálogo
+    # se importó conservando los IDs, la variante con el mismo ID que la gorra
+    CONSOLIDACION_EQUIVALENCIAS = os.getenv('CONSOLIDACION_EQUIVALENCIAS')
+    CONSOLIDACION_MISMO_ID = os.getenv('CONSOLIDACION_MISMO_ID', 'false').lower() in ('1', 'true', 'yes')
+
+    # Archivo de pedidos y ventas cerrados con más antigüedad que esta (flask archive-orders)
+    ARCHIVO_ANTIGUEDAD_DIAS = int(os.getenv('ARCHIVO_ANTIGUEDAD_DIAS', '365'))
+
+    # Instrumentación de consultas y endpoint /metrics
+    METRICAS_ACTIVAS = os.getenv('METRICAS_ACTIVAS', 'true').lower() in ('1', 'true', 'yes')
+    METRICAS_UMBRAL_CONSULTA_LENTA_MS = float(os.getenv('METRICAS_UMBRAL_CONSULTA_LENTA_MS', '200'))
+    METRICAS_TOP_SENTENCIAS = int(os.getenv('METRICAS_TOP_SENTENCIAS', '10'))
 
 # Configuración para desarrollo
 class DevelopmentConfig(Config):
     DEBUG = True
+    MIGRAR_AL_INICIAR = os.getenv('MIGRAR_AL_INICIAR', 'true').lower() in ('1', 'true', 'yes')
     DB_NAME = os.getenv('DB_NAME', 'gorras_dev')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or uri_base_datos(
+        Config.DB_DRIVER, Config.DB_USER, Config.DB_PASSWORD, Config.DB_HOST, Config.DB_PORT, DB_NAME,
+        Config.DB_TRANSPORTE, Config.DB_SOCKET)
 
 # Configuración para producción
 class ProductionConfig(Config):
     DEBUG = False
     DB_NAME = os.getenv('DB_NAME', 'gorras_prod')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or uri_base_datos(
+        Config.DB_DRIVER, Config.DB_USER, Config.DB_PASSWORD, Config.DB_HOST, Config.DB_PORT, DB_NAME,
+        Config.DB_TRANSPORTE, Config.DB_SOCKET)
+    POOL_PERFIL = os.getenv('POOL_PERFIL', 'produccion')
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_engine(POOL_PERFIL)
+    # Con varios workers de gunicorn la caché y el carrito deben ser visibles desde todos ellos
+    CACHE_CATALOGO_BACKEND = os.getenv('CACHE_CATALOGO_BACKEND', 'sqlite')
+    VERSIONES_BACKEND = os.getenv('VERSIONES_BACKEND', 'sqlite')
+    VERSIONES_EXIGIR_BACKEND = True
+    CARRITO_BACKEND = os.getenv('CARRITO_BACKEND', 'sqlite')
+    AUTH_BACKEND = os.getenv('AUTH_BACKEND', CARRITO_BACKEND)
 
 # Seleccionar configuración según el entorno
 config = {
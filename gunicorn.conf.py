@@ -0,0 +1,33 @@
+"""
+Configuración de gunicorn para producción.
+
+Variables de entorno:
+	GUNICORN_BIND       Dirección de escucha (por defecto 0.0.0.0:$PORT o :5000)
+	GUNICORN_WORKERS    Procesos (por defecto 2 x núcleos + 1)
+	GUNICORN_THREADS    Hilos por proceso; con más de uno se usa el worker gthread
+	GUNICORN_TIMEOUT    Segundos antes de reiniciar un worker bloqueado
+	GUNICORN_MAX_REQUESTS  Peticiones antes de reciclar un worker (0 = nunca)
+
+El tamaño del pool de conexiones (POOL_SIZE/POOL_PERFIL) es por proceso: el
+total de conexiones es workers x (pool_size + max_overflow).
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+# Cargar la aplicación una vez en el maestro y compartir su memoria con los workers
+preload_app = True
+
+
+def post_fork(server, worker):
+	# Las conexiones heredadas ya se descartan con os.register_at_fork (src.database.pool);
+	# aquí solo se deja constancia en el log
+	server.log.info(f"Worker {worker.pid} iniciado con pools de conexiones vacíos")
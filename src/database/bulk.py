@@ -0,0 +1,136 @@
+"""
+Utilidades para operaciones masivas sobre la base de datos.
+
+Agrupan filas en lotes y las escriben con sentencias INSERT de varias filas,
+upserts propios de cada dialecto o UPDATE por clave primaria con
+executemany, evitando el coste del ORM por fila.
+"""
+from itertools import groupby, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import bindparam
+
+
+def en_lotes(filas: Iterable[Any], tamano: int) -> Iterator[List[Any]]:
+	"""
+	Agrupa un iterable en listas de como máximo ``tamano`` elementos.
+
+	Args:
+		filas: Iterable de origen (se consume de forma perezosa)
+		tamano: Tamaño máximo de cada lote
+
+	Returns:
+		Iterator[List]: Lotes consecutivos
+	"""
+	if tamano <= 0:
+		raise ValueError("El tamaño de lote debe ser mayor que cero")
+	iterador = iter(filas)
+	while True:
+		lote = list(islice(iterador, tamano))
+		if not lote:
+			return
+		yield lote
+
+
+def insertar_lote(conexion, tabla, filas: Sequence[Dict[str, Any]]) -> int:
+	"""
+	Inserta un lote de filas con un INSERT de varias filas.
+
+	Args:
+		conexion: Conexión de SQLAlchemy dentro de una transacción
+		tabla: Objeto Table de destino
+		filas: Lista de diccionarios columna -> valor
+
+	Returns:
+		int: Número de filas enviadas
+	"""
+	if not filas:
+		return 0
+	conexion.execute(tabla.insert(), list(filas))
+	return len(filas)
+
+
+def upsert_lote(conexion, tabla, filas: Sequence[Dict[str, Any]],
+				columnas_actualizar: Optional[Sequence[str]] = None,
+				columnas_sumar: Sequence[str] = ()) -> int:
+	"""
+	Inserta o actualiza un lote de filas según la clave primaria.
+
+	Usa ``ON DUPLICATE KEY UPDATE`` en MySQL/MariaDB y ``ON CONFLICT`` en
+	SQLite/PostgreSQL.
+
+	Args:
+		conexion: Conexión de SQLAlchemy dentro de una transacción
+		tabla: Objeto Table de destino
+		filas: Lista de diccionarios columna -> valor
+		columnas_actualizar: Columnas a sobrescribir si la fila ya existe;
+			por defecto todas las columnas presentes que no son clave ni se suman
+		columnas_sumar: Columnas cuyo valor se suma al existente si la fila
+			ya existe (contadores), en la misma sentencia
+
+	Returns:
+		int: Número de filas enviadas
+	"""
+	if not filas:
+		return 0
+
+	claves = [c.name for c in tabla.primary_key.columns]
+	if columnas_actualizar is None:
+		columnas_actualizar = [c for c in filas[0] if c not in claves and c not in columnas_sumar]
+
+	dialecto = conexion.dialect.name
+	if dialecto in ('mysql', 'mariadb'):
+		from sqlalchemy.dialects.mysql import insert
+		sentencia = insert(tabla)
+		sentencia = sentencia.on_duplicate_key_update(
+			{**{c: sentencia.inserted[c] for c in columnas_actualizar},
+			 **{c: tabla.c[c] + sentencia.inserted[c] for c in columnas_sumar}}
+		)
+	elif dialecto in ('sqlite', 'postgresql'):
+		if dialecto == 'sqlite':
+			from sqlalchemy.dialects.sqlite import insert
+		else:
+			from sqlalchemy.dialects.postgresql import insert
+		sentencia = insert(tabla)
+		sentencia = sentencia.on_conflict_do_update(
+			index_elements=claves,
+			set_={**{c: sentencia.excluded[c] for c in columnas_actualizar},
+				  **{c: tabla.c[c] + sentencia.excluded[c] for c in columnas_sumar}}
+		)
+	else:
+		raise NotImplementedError(f"Upsert no soportado para el dialecto {dialecto}")
+
+	conexion.execute(sentencia, list(filas))
+	return len(filas)
+
+
+def actualizar_lote(conexion, tabla, filas: Sequence[Dict[str, Any]]) -> int:
+	"""
+	Actualiza un lote de filas existentes por clave primaria.
+
+	Las filas que modifican las mismas columnas se envían juntas en un único
+	UPDATE con executemany; el resto de columnas no se toca.
+
+	Args:
+		conexion: Conexión de SQLAlchemy dentro de una transacción
+		tabla: Objeto Table de destino
+		filas: Diccionarios con la clave primaria y las columnas a cambiar
+
+	Returns:
+		int: Número de filas enviadas
+	"""
+	if not filas:
+		return 0
+
+	claves = [c.name for c in tabla.primary_key.columns]
+
+	def columnas(fila):
+		return tuple(sorted(c for c in fila if c not in claves))
+
+	for grupo, filas_grupo in groupby(sorted(filas, key=columnas), key=columnas):
+		# Los parámetros llevan prefijo para no chocar con los nombres de columna
+		sentencia = tabla.update().where(
+			*[tabla.c[c] == bindparam(f'b_{c}') for c in claves]
+		).values({c: bindparam(f'b_{c}') for c in grupo})
+		conexion.execute(sentencia, [{f'b_{c}': v for c, v in fila.items()} for fila in filas_grupo])
+	return len(filas)
@@ -0,0 +1,409 @@
+"""
+Módulo de caché de lectura para el catálogo.
+
+Ofrece una caché en proceso con expiración (TTL) y desalojo LRU, y permite
+añadir un backend compartido opcional (por ejemplo Redis) que se consulta
+cuando la entrada no está en la caché local. Los backends de este módulo
+(en memoria y sobre un archivo SQLite) implementan esa misma interfaz
+get/set/delete/incr y también los usa el carrito de compra.
+
+Sin backend compartido cada proceso tiene su propia caché: con varios
+workers, una gorra modificada en uno se sigue sirviendo en los demás hasta
+que caduca su entrada (``CACHE_CATALOGO_TTL``). Con ``CACHE_CATALOGO_BACKEND``
+las entradas locales dependen de la versión compartida del catálogo y un
+cambio confirmado en cualquier worker las deja obsoletas en todos.
+
+Con réplicas de lectura, durante ``CACHE_CATALOGO_VENTANA_PRIMARIA``
+segundos después de una invalidación las entradas se cargan desde la
+primaria: una réplica con retraso devolvería la fila anterior y la caché la
+guardaría durante todo el TTL.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.database.replicas import primaria, replicas
+
+logger = logging.getLogger(__name__)
+
+# Valor centinela para distinguir "no está en caché" de un None almacenado
+_AUSENTE = object()
+
+
+class CacheLRU:
+	"""Caché en memoria con TTL y desalojo del elemento menos usado."""
+
+	def __init__(self, max_elementos: int = 1024, ttl: float = 60.0):
+		self.max_elementos = max_elementos
+		self.ttl = ttl
+		self._datos = OrderedDict()
+		self._lock = threading.Lock()
+		self.aciertos = 0
+		self.fallos = 0
+		self.desalojos = 0
+
+	def obtener(self, clave: str) -> Any:
+		"""
+		Obtiene un valor de la caché.
+
+		Args:
+			clave: Clave a buscar
+
+		Returns:
+			El valor almacenado o _AUSENTE si no existe o ha expirado
+		"""
+		with self._lock:
+			entrada = self._datos.get(clave)
+			if entrada is None:
+				self.fallos += 1
+				return _AUSENTE
+			expira, valor = entrada
+			if expira < time.monotonic():
+				del self._datos[clave]
+				self.fallos += 1
+				return _AUSENTE
+			self._datos.move_to_end(clave)
+			self.aciertos += 1
+			return valor
+
+	def guardar(self, clave: str, valor: Any, ttl: Optional[float] = None):
+		"""Guarda un valor, desalojando el menos usado si se supera el máximo."""
+		expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+		with self._lock:
+			self._datos[clave] = (expira, valor)
+			self._datos.move_to_end(clave)
+			while len(self._datos) > self.max_elementos:
+				self._datos.popitem(last=False)
+				self.desalojos += 1
+
+	def eliminar(self, clave: str):
+		"""Elimina una clave de la caché si existe."""
+		with self._lock:
+			self._datos.pop(clave, None)
+
+	def limpiar(self):
+		"""Vacía la caché sin reiniciar los contadores."""
+		with self._lock:
+			self._datos.clear()
+
+	def __len__(self):
+		return len(self._datos)
+
+
+class BackendMemoriaCompartida:
+	"""
+	Backend compartido de ejemplo que vive en memoria.
+
+	Implementa la misma interfaz mínima que se espera de un backend real
+	(get/set/delete/incr), por lo que sirve como sustituto en pruebas.
+	"""
+
+	def __init__(self):
+		self._datos: Dict[str, Any] = {}
+		self._lock = threading.Lock()
+
+	def get(self, clave: str) -> Any:
+		with self._lock:
+			entrada = self._datos.get(clave)
+			if entrada is None:
+				return None
+			expira, valor = entrada
+			if expira is not None and expira < time.monotonic():
+				del self._datos[clave]
+				return None
+			return valor
+
+	def set(self, clave: str, valor: Any, ttl: Optional[float] = None):
+		with self._lock:
+			expira = time.monotonic() + ttl if ttl else None
+			self._datos[clave] = (expira, valor)
+
+	def delete(self, clave: str):
+		with self._lock:
+			self._datos.pop(clave, None)
+
+	def incr(self, clave: str) -> int:
+		with self._lock:
+			_, valor = self._datos.get(clave, (None, 0))
+			valor += 1
+			self._datos[clave] = (None, valor)
+			return valor
+
+
+class BackendSQLite:
+	"""
+	Backend compartido sobre un archivo SQLite local.
+
+	Sustituye a un almacén clave-valor externo cuando todos los procesos
+	(por ejemplo los workers de gunicorn) corren en la misma máquina. Los
+	valores se guardan como JSON; las entradas caducadas se ignoran al leer y
+	se borran cada ``purgar_cada`` escrituras.
+	"""
+
+	def __init__(self, ruta: str, purgar_cada: int = 500):
+		self.ruta = ruta
+		self.purgar_cada = purgar_cada
+		self._local = threading.local()
+		self._escrituras = 0
+		if os.path.dirname(ruta):
+			os.makedirs(os.path.dirname(ruta), exist_ok=True)
+		self._conexion().execute(
+			'CREATE TABLE IF NOT EXISTS kv (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL)')
+
+	def _conexion(self) -> sqlite3.Connection:
+		# Una conexión por hilo y por proceso: no se heredan tras un fork
+		conexion = getattr(self._local, 'conexion', None)
+		if conexion is None or self._local.pid != os.getpid():
+			conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+			conexion.execute('PRAGMA journal_mode=WAL')
+			conexion.execute('PRAGMA synchronous=NORMAL')
+			self._local.conexion, self._local.pid = conexion, os.getpid()
+		return conexion
+
+	def get(self, clave: str) -> Any:
+		fila = self._conexion().execute(
+			'SELECT valor FROM kv WHERE clave = ? AND (expira IS NULL OR expira >= ?)', (clave, time.time())
+		).fetchone()
+		return None if fila is None else json.loads(fila[0])
+
+	def set(self, clave: str, valor: Any, ttl: Optional[float] = None):
+		expira = time.time() + ttl if ttl else None
+		conexion = self._conexion()
+		conexion.execute('INSERT OR REPLACE INTO kv (clave, valor, expira) VALUES (?, ?, ?)',
+						 (clave, json.dumps(valor), expira))
+		self._escrituras += 1
+		if self._escrituras % self.purgar_cada == 0:
+			conexion.execute('DELETE FROM kv WHERE expira < ?', (time.time(),))
+
+	def delete(self, clave: str):
+		self._conexion().execute('DELETE FROM kv WHERE clave = ?', (clave,))
+
+	def incr(self, clave: str) -> int:
+		conexion = self._conexion()
+		conexion.execute('BEGIN IMMEDIATE')
+		try:
+			fila = conexion.execute('SELECT valor FROM kv WHERE clave = ?', (clave,)).fetchone()
+			valor = (json.loads(fila[0]) if fila else 0) + 1
+			conexion.execute('INSERT OR REPLACE INTO kv (clave, valor, expira) VALUES (?, ?, NULL)',
+							 (clave, json.dumps(valor)))
+			conexion.execute('COMMIT')
+		except Exception:
+			conexion.execute('ROLLBACK')
+			raise
+		return valor
+
+
+def crear_backend(tipo: str, ruta: Optional[str] = None):
+	"""
+	Crea un backend compartido a partir de su nombre en la configuración.
+
+	Args:
+		tipo: 'memoria' (solo un proceso) o 'sqlite'
+		ruta: Archivo del backend 'sqlite'
+
+	Raises:
+		ValueError: Si el tipo no es válido o falta la ruta
+	"""
+	if tipo == 'memoria':
+		return BackendMemoriaCompartida()
+	if tipo == 'sqlite':
+		if not ruta:
+			raise ValueError("El backend 'sqlite' necesita una ruta")
+		return BackendSQLite(ruta)
+	raise ValueError(f"Backend desconocido: {tipo}")
+
+
+class CacheCatalogo:
+	"""
+	Caché de lectura del catálogo de gorras.
+
+	Las consultas individuales se guardan con la clave ``gorra:<id>`` y los
+	listados incluyen una versión en la clave; invalidar los listados solo
+	requiere incrementar esa versión.
+	"""
+
+	PREFIJO = 'catalogo'
+
+	def __init__(self, max_elementos: int = 1024, ttl: float = 60.0, backend=None, ventana_primaria: float = 5.0):
+		self.local = CacheLRU(max_elementos=max_elementos, ttl=ttl)
+		self.backend = backend
+		self.activa = True
+		self.ventana_primaria = ventana_primaria
+		self._version_listados = 0
+		self._ultimo_cambio = float('-inf')
+
+	def init_app(self, app, backend=None):
+		"""
+		Configura la caché a partir de la configuración de la aplicación.
+
+		Args:
+			app: Instancia de la aplicación Flask
+			backend: Backend compartido opcional; por defecto el de
+				``CACHE_CATALOGO_BACKEND`` ('sqlite' con ``CACHE_CATALOGO_RUTA``), si lo hay
+		"""
+		if backend is None and app.config.get('CACHE_CATALOGO_BACKEND'):
+			backend = crear_backend(app.config['CACHE_CATALOGO_BACKEND'], app.config.get('CACHE_CATALOGO_RUTA'))
+		self.activa = app.config.get('CACHE_CATALOGO_ACTIVA', True)
+		self.local = CacheLRU(
+			max_elementos=app.config.get('CACHE_CATALOGO_MAX_ELEMENTOS', 1024),
+			ttl=app.config.get('CACHE_CATALOGO_TTL', 60.0)
+		)
+		self.ventana_primaria = app.config.get('CACHE_CATALOGO_VENTANA_PRIMARIA', 5.0)
+		self.backend = backend
+		app.extensions['cache_catalogo'] = self
+
+	# Claves
+	def _clave(self, *partes) -> str:
+		return ':'.join([self.PREFIJO] + [str(p) for p in partes])
+
+	def _clave_listado(self, *partes) -> str:
+		return self._clave('listado', self._version_actual(), *partes)
+
+	def _version_actual(self) -> int:
+		if self.backend is not None:
+			try:
+				return int(self.backend.get(self._clave('version')) or 0)
+			except Exception as e:
+				logger.warning(f"No se pudo leer la versión del catálogo en el backend: {e}")
+		return self._version_listados
+
+	# Lectura
+	def obtener_o_cargar(self, clave: str, cargar: Callable[[], Any], clave_local: Optional[str] = None) -> Any:
+		"""
+		Devuelve el valor en caché o lo carga con ``cargar`` y lo guarda.
+
+		Args:
+			clave: Clave completa de la entrada
+			cargar: Función que obtiene el valor si no está en caché
+			clave_local: Clave en la caché local, si es distinta de ``clave``
+
+		Returns:
+			El valor en caché o el recién cargado
+		"""
+		if not self.activa:
+			return cargar()
+
+		clave_local = clave_local or clave
+		valor = self.local.obtener(clave_local)
+		if valor is not _AUSENTE:
+			return valor
+
+		if self.backend is not None:
+			try:
+				valor = self.backend.get(clave)
+			except Exception as e:
+				logger.warning(f"Error al leer del backend de caché: {e}")
+				valor = None
+			if valor is not None:
+				self.local.guardar(clave_local, valor)
+				return valor
+
+		if replicas.activo and self._cambio_reciente():
+			with primaria():
+				valor = cargar()
+		else:
+			valor = cargar()
+		self.local.guardar(clave_local, valor)
+		if self.backend is not None and valor is not None:
+			try:
+				self.backend.set(clave, valor, self.local.ttl)
+			except Exception as e:
+				logger.warning(f"Error al escribir en el backend de caché: {e}")
+		return valor
+
+	def gorra(self, id_gorra: int, cargar: Callable[[], Any]) -> Any:
+		"""
+		Obtiene los datos de una gorra por ID a través de la caché.
+
+		Con backend compartido la copia local se guarda con la versión del
+		catálogo en la clave, igual que los listados: la invalidación hecha
+		por otro proceso la deja obsoleta sin esperar al TTL.
+		"""
+		clave = self._clave('gorra', id_gorra)
+		clave_local = None if self.backend is None else self._clave('gorra', self._version_actual(), id_gorra)
+		return self.obtener_o_cargar(clave, cargar, clave_local)
+
+	def listado(self, partes: tuple, cargar: Callable[[], Any]) -> Any:
+		"""Obtiene una página o listado del catálogo a través de la caché."""
+		return self.obtener_o_cargar(self._clave_listado(*partes), cargar)
+
+	def _cambio_reciente(self) -> bool:
+		"""Indica si el catálogo se invalidó (en cualquier proceso, con backend) hace menos de ``ventana_primaria``."""
+		if self.backend is not None:
+			try:
+				return self.backend.get(self._clave('cambio_reciente')) is not None
+			except Exception as e:
+				logger.warning(f"No se pudo leer el último cambio del catálogo en el backend: {e}")
+		return time.monotonic() - self._ultimo_cambio < self.ventana_primaria
+
+	# Invalidación
+	def invalidar(self, id_gorra: Optional[int] = None):
+		"""
+		Invalida la entrada de una gorra y todos los listados.
+
+		Args:
+			id_gorra: ID de la gorra modificada, si se conoce
+		"""
+		self.invalidar_gorras(() if id_gorra is None else (id_gorra,))
+
+	def invalidar_gorras(self, ids: Iterable[int]):
+		"""
+		Invalida las entradas de varias gorras y todos los listados con un
+		solo incremento de versión.
+
+		Args:
+			ids: IDs de las gorras modificadas
+		"""
+		# Antes de borrar, para que ninguna carga posterior lea de una réplica
+		self._ultimo_cambio = time.monotonic()
+		if self.backend is not None:
+			try:
+				self.backend.set(self._clave('cambio_reciente'), time.time(), self.ventana_primaria)
+			except Exception as e:
+				logger.warning(f"Error al registrar el cambio en el backend de caché: {e}")
+
+		for id_gorra in ids:
+			clave = self._clave('gorra', id_gorra)
+			self.local.eliminar(clave)
+			if self.backend is not None:
+				try:
+					self.backend.delete(clave)
+				except Exception as e:
+					logger.warning(f"Error al invalidar en el backend de caché: {e}")
+
+		# Los listados antiguos quedan huérfanos y los desaloja el LRU/TTL
+		self._version_listados += 1
+		if self.backend is not None:
+			try:
+				self._version_listados = self.backend.incr(self._clave('version'))
+			except Exception as e:
+				logger.warning(f"Error al invalidar listados en el backend de caché: {e}")
+
+	def limpiar(self):
+		"""Vacía la caché local e invalida los listados."""
+		self.local.limpiar()
+		self.invalidar()
+
+	def estadisticas(self) -> Dict[str, int]:
+		"""
+		Devuelve los contadores de la caché local.
+
+		Returns:
+			dict: Aciertos, fallos, desalojos y número de elementos
+		"""
+		return {
+			'aciertos': self.local.aciertos,
+			'fallos': self.local.fallos,
+			'desalojos': self.local.desalojos,
+			'elementos': len(self.local),
+			'max_elementos': self.local.max_elementos
+		}
+
+
+# Instancia global, análoga a ``db`` en db_connection
+cache_catalogo = CacheCatalogo()
@@ -11,31 +11,394 @@ from ..db_connection import db
 def init_app(app):
     """Registra los comandos de la base de datos en la aplicación."""
     app.cli.add_command(init_db_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_status_command)
     app.cli.add_command(seed_db_command)
     app.cli.add_command(drop_db_command)
+    app.cli.add_command(import_catalog_command)
+    app.cli.add_command(refresh_rollups_command)
+    app.cli.add_command(export_catalog_command)
+    app.cli.add_command(bench_pool_command)
+    app.cli.add_command(reconcile_stock_command)
+    app.cli.add_command(set_password_command)
+    app.cli.add_command(consolidate_ventas_command)
+    app.cli.add_command(archive_orders_command)
+    app.cli.add_command(refresh_recommendations_command)
 
 @click.command('init-db')
 @with_appcontext
 def init_db_command():
-    """Crear tablas de la base de datos."""
+    """Crear tablas de la base de datos (aplica todas las migraciones)."""
+    from src.database.migraciones import actualizar
     try:
-        db.create_all()
+        actualizar(db.engine)
         click.echo('Base de datos inicializada.')
     except Exception as e:
         logging.error(f"Error al inicializar la base de datos: {e}")
         click.echo(f'Error al inicializar la base de datos: {e}')
 
+@click.command('db-upgrade')
+@click.option('--hasta', type=click.IntRange(min=1), default=None,
+              help='Última versión a aplicar; por defecto todas las pendientes.')
+@with_appcontext
+def db_upgrade_command(hasta):
+    """Aplicar las migraciones pendientes del esquema."""
+    import time
+    from src.database.migraciones import actualizar
+
+    inicios = {}
+
+    def progreso(migracion, fase):
+        if fase == 'inicio':
+            inicios[migracion.version] = time.perf_counter()
+            click.echo(f'  {migracion.version:04d} {migracion.nombre}: {migracion.descripcion}')
+        else:
+            click.echo(f'        aplicada en {time.perf_counter() - inicios[migracion.version]:.2f} s')
+
+    try:
+        ejecutadas = actualizar(db.engine, hasta=hasta, progreso=progreso)
+    except Exception as e:
+        logging.error(f"Error al aplicar las migraciones: {e}")
+        raise click.ClickException(f'Error al aplicar las migraciones: {e}')
+    click.echo(f'{len(ejecutadas)} migraciones aplicadas.' if ejecutadas else 'El esquema ya está al día.')
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """Mostrar la versión del esquema y las migraciones pendientes."""
+    from src.database.migraciones import aplicadas, migraciones
+
+    hechas = aplicadas(db.engine)
+    for migracion in migraciones():
+        aplicada = hechas.get(migracion.version)
+        estado = f"aplicada {aplicada['fecha_aplicacion']:%Y-%m-%d %H:%M}" if aplicada else 'pendiente'
+        click.echo(f'  {migracion.version:04d} {migracion.nombre:<24} {estado}')
+    click.echo(f'Versión actual: {max(hechas, default=0)}')
+
 @click.command('seed-db')
+@click.option('--scale', 'escala', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Escala del conjunto de datos (1 = 1.000 pedidos); 0 solo inserta datos de referencia.')
+@click.option('--seed', 'semilla', type=int, default=42, show_default=True, help='Semilla del generador.')
+@click.option('--sesgo-variantes', type=float, default=1.1, show_default=True,
+              help='Exponente Zipf de popularidad de las variantes (mayor = más concentrado).')
+@click.option('--sesgo-clientes', type=float, default=0.8, show_default=True,
+              help='Exponente Zipf de la frecuencia de compra de los clientes.')
+@click.option('--dias', type=click.IntRange(min=1), default=365, show_default=True,
+              help='Días hacia atrás en los que se reparten los pedidos.')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Fecha final de los pedidos (por defecto, hoy); fijarla hace el resultado reproducible.')
+@click.option('--lote', 'tamano_lote', type=click.IntRange(min=1), default=5000, show_default=True,
+              help='Filas por INSERT de varias filas.')
 @with_appcontext
-def seed_db_command():
-    """Insertar datos iniciales en la base de datos."""
+def seed_db_command(escala, semilla, sesgo_variantes, sesgo_clientes, dias, hasta, tamano_lote):
+    """Insertar datos iniciales o un conjunto de datos sintético a escala."""
+    import time
+    from src.database.cache import cache_catalogo
+    from src.database.seed import ParametrosGeneracion, generar_datos
+    from src.database.versiones import TABLAS_CATALOGO, versiones_catalogo
+    from src.services.busqueda import indice_catalogo
+
+    parametros = ParametrosGeneracion(
+        escala=escala, semilla=semilla, sesgo_variantes=sesgo_variantes, sesgo_clientes=sesgo_clientes,
+        dias=dias, hasta=hasta, tamano_lote=tamano_lote
+    )
+
+    def progreso(tabla, filas):
+        click.echo(f'  {tabla}: {filas} filas')
+
     try:
-        # Aquí iría el código para insertar datos iniciales
+        inicio = time.perf_counter()
+        insertadas = generar_datos(parametros, progreso=progreso if escala else None)
+        cache_catalogo.limpiar()
+        indice_catalogo.invalidar()
+        versiones_catalogo.incrementar(*TABLAS_CATALOGO)
         click.echo('Datos iniciales insertados.')
+        for tabla, filas in insertadas.items():
+            click.echo(f'  {tabla}: {filas}')
+        click.echo(f'Tiempo: {time.perf_counter() - inicio:.1f} s')
     except Exception as e:
         logging.error(f"Error al insertar datos iniciales: {e}")
         click.echo(f'Error al insertar datos iniciales: {e}')
 
+@click.command('import-catalog')
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Formato del archivo; por defecto se deduce de la extensión.')
+@click.option('--lote', 'tamano_lote', type=click.IntRange(min=1), default=1000, show_default=True,
+              help='Número de filas por lote/transacción.')
+@click.option('--mostrar-rechazos', type=click.IntRange(min=0), default=20, show_default=True,
+              help='Número máximo de filas rechazadas a listar.')
+@with_appcontext
+def import_catalog_command(ruta, formato, tamano_lote, mostrar_rechazos):
+    """Importar un catálogo de gorras desde un archivo CSV o JSONL."""
+    from src.services.importacion import importar_catalogo
+
+    def progreso(resultado):
+        click.echo(f'  {resultado.procesadas} filas procesadas '
+                   f'({resultado.filas_por_segundo:.0f} filas/s)')
+
+    try:
+        resultado = importar_catalogo(ruta, formato=formato, tamano_lote=tamano_lote, progreso=progreso)
+    except Exception as e:
+        logging.error(f"Error al importar el catálogo: {e}")
+        click.echo(f'Error al importar el catálogo: {e}')
+        return
+
+    click.echo(f'Filas importadas: {resultado.importadas}')
+    click.echo(f'Filas rechazadas: {len(resultado.rechazadas)}')
+    click.echo(f'Tiempo: {resultado.segundos:.2f} s ({resultado.filas_por_segundo:.0f} filas/s)')
+    for linea, motivo in resultado.rechazadas[:mostrar_rechazos]:
+        click.echo(f'  Línea {linea}: {motivo}')
+
+@click.command('refresh-rollups')
+@click.option('--ventana-horas', type=click.IntRange(min=0), default=48, show_default=True,
+              help='Horas hacia atrás que se recalculan para recoger cambios tardíos.')
+@click.option('--completo', is_flag=True, help='Reconstruir todos los resúmenes desde cero.')
+@with_appcontext
+def refresh_rollups_command(ventana_horas, completo):
+    """Actualizar los resúmenes de ventas por hora y por día."""
+    from datetime import timedelta
+    from src.services.reportes import refrescar_resumenes
+    try:
+        resultado = refrescar_resumenes(ventana_tardia=timedelta(hours=ventana_horas), completo=completo)
+        click.echo(f"Resúmenes actualizados desde {resultado['desde'] or 'el inicio'} "
+                   f"hasta {resultado['hasta']} ({resultado['dias']} días, "
+                   f"{resultado['horas_tardias']} horas con cambios tardíos).")
+    except Exception as e:
+        logging.error(f"Error al actualizar los resúmenes: {e}")
+        click.echo(f'Error al actualizar los resúmenes: {e}')
+
+@click.command('reconcile-stock')
+@click.option('--solo-comprobar', is_flag=True, help='Informar de las desviaciones sin corregirlas.')
+@click.option('--lote', 'tamano_lote', type=click.IntRange(min=1), default=500, show_default=True,
+              help='Tipos de gorra revisados por transacción.')
+@click.option('--mostrar', type=click.IntRange(min=0), default=20, show_default=True,
+              help='Número máximo de desviaciones a listar.')
+@with_appcontext
+def reconcile_stock_command(solo_comprobar, tamano_lote, mostrar):
+    """Comparar los contadores de stock por tipo con las variantes y corregirlos."""
+    from src.services.disponibilidad import reconciliar
+    try:
+        desviaciones = reconciliar(reparar=not solo_comprobar, tamano_lote=tamano_lote)
+    except Exception as e:
+        logging.error(f"Error al reconciliar los contadores de stock: {e}")
+        raise click.ClickException(f'Error al reconciliar los contadores de stock: {e}')
+
+    if not desviaciones:
+        click.echo('Los contadores de stock coinciden con las variantes.')
+        return
+    accion = 'encontradas' if solo_comprobar else 'corregidas'
+    click.echo(f'Desviaciones {accion}: {len(desviaciones)}')
+    for d in desviaciones[:mostrar]:
+        click.echo(f"  tipo {d['id_tipo_gorra']} {d['color']}/{d['talla']}: "
+                   f"stock {d['stock_guardado']} -> {d['stock_esperado']}, "
+                   f"activas {d['activas_guardadas']} -> {d['activas_esperadas']}")
+    if solo_comprobar:
+        raise SystemExit(1)
+
+@click.command('consolidate-ventas')
+@click.option('--lote', 'tamano_lote', type=click.IntRange(min=1), default=500, show_default=True,
+              help='Filas de origen copiadas por transacción.')
+@click.option('--pausa', type=click.FloatRange(min=0), default=0.05, show_default=True,
+              help='Segundos de espera entre lotes para no frenar los pedidos.')
+@click.option('--max-filas-segundo', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Ritmo máximo de filas de origen por segundo.')
+@click.option('--reiniciar', is_flag=True, help='Recorrer las tablas desde el principio (no duplica filas).')
+@click.option('--equivalencias', 'ruta_equivalencias', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='CSV id_gorra,id_variante con la variante de cada gorra '
+                   '(por defecto CONSOLIDACION_EQUIVALENCIAS).')
+@click.option('--mismo-id', is_flag=True,
+              help='Copiar cada línea a la variante con el mismo ID que su gorra; solo si el catálogo '
+                   'se importó conservando los IDs (por defecto CONSOLIDACION_MISMO_ID).')
+@click.option('--solo-verificar', is_flag=True, help='Solo comparar los datos de origen con los consolidados.')
+@click.option('--mostrar', type=click.IntRange(min=0), default=20, show_default=True,
+              help='Número máximo de filas omitidas o pendientes a listar.')
+@with_appcontext
+def consolidate_ventas_command(tamano_lote, pausa, max_filas_segundo, reiniciar, ruta_equivalencias, mismo_id,
+                               solo_verificar, mostrar):
+    """Copiar usuarios y ventas en personas y pedidos por lotes reanudables y verificar el resultado."""
+    from src.services.consolidacion import (EquivalenciasVariante, consolidar, equivalencias_config,
+                                            leer_equivalencias, verificar)
+
+    try:
+        if ruta_equivalencias or mismo_id:
+            equivalencias = EquivalenciasVariante.crear(
+                leer_equivalencias(ruta_equivalencias) if ruta_equivalencias else None, mismo_id=mismo_id)
+        else:
+            equivalencias = equivalencias_config(current_app.config)
+    except (OSError, KeyError, ValueError) as e:
+        raise click.ClickException(f'Equivalencias gorra -> variante no válidas: {e}')
+
+    if not solo_verificar:
+        if equivalencias is None:
+            raise click.ClickException('Indica la variante de cada gorra con --equivalencias o --mismo-id '
+                                       '(o CONSOLIDACION_EQUIVALENCIAS / CONSOLIDACION_MISMO_ID).')
+
+        def progreso(fase, resultado):
+            click.echo(f'  {fase}: {resultado.procesadas} filas leídas, {resultado.personas} personas, '
+                       f'{resultado.pedidos} pedidos ({resultado.filas_por_segundo:.0f} filas/s)')
+
+        try:
+            resultado = consolidar(equivalencias, tamano_lote=tamano_lote, pausa=pausa,
+                                   max_filas_segundo=max_filas_segundo, reiniciar=reiniciar, progreso=progreso)
+        except Exception as e:
+            logging.error(f"Error al consolidar usuarios y ventas: {e}")
+            raise click.ClickException(f'Error al consolidar usuarios y ventas (se reanudará desde el último lote): {e}')
+        click.echo(f'Personas: {resultado.personas}, pedidos: {resultado.pedidos}, detalles: {resultado.detalles}')
+        click.echo(f'Tiempo: {resultado.segundos:.2f} s ({resultado.filas_por_segundo:.0f} filas/s)')
+        for tabla, id_fila, motivo in resultado.omitidas[:mostrar]:
+            click.echo(f'  Omitida {tabla} {id_fila}: {motivo}')
+
+    verificacion = verificar(muestra=mostrar, equivalencias=equivalencias)
+    for nombre, (origen, copia) in verificacion['comparacion'].items():
+        click.echo(f"{'OK ' if origen == copia else 'ERR'} {nombre}: {origen} / {copia}")
+    if verificacion['ventas_distintas']:
+        click.echo(f"Ventas con otro total o estado en su pedido: {verificacion['ventas_distintas']} "
+                   f"{verificacion['muestra_distintas']}")
+    if verificacion['lineas_distintas']:
+        click.echo(f"Ventas con líneas en otra variante o de otro color: {verificacion['lineas_distintas']} "
+                   f"{verificacion['muestra_lineas_distintas']}")
+    if verificacion['usuarios_pendientes']:
+        click.echo(f"Usuarios sin copiar: {verificacion['usuarios_pendientes']}")
+    if verificacion['ventas_pendientes']:
+        click.echo(f"Ventas sin copiar: {verificacion['ventas_pendientes']}")
+    if not verificacion['coincide']:
+        raise SystemExit(1)
+
+@click.command('archive-orders')
+@click.option('--dias', type=click.IntRange(min=0), default=None,
+              help='Antigüedad mínima en días (por defecto ARCHIVO_ANTIGUEDAD_DIAS).')
+@click.option('--lote', 'tamano_lote', type=click.IntRange(min=1), default=500, show_default=True,
+              help='Pedidos o ventas movidos por transacción.')
+@click.option('--pausa', type=click.FloatRange(min=0), default=0.05, show_default=True,
+              help='Segundos de espera entre lotes para no frenar los pedidos.')
+@with_appcontext
+def archive_orders_command(dias, tamano_lote, pausa):
+    """Mover los pedidos y ventas antiguos entregados o cancelados a las tablas de archivo."""
+    from src.services.archivo import archivar
+
+    if dias is None:
+        dias = current_app.config.get('ARCHIVO_ANTIGUEDAD_DIAS', 365)
+
+    def progreso(tabla, resultado):
+        movidas = resultado.pedidos if tabla == 'pedidos' else resultado.ventas
+        click.echo(f'  {tabla}: {movidas} archivados ({resultado.filas_por_segundo:.0f} filas/s)')
+
+    try:
+        resultado = archivar(antiguedad_dias=dias, tamano_lote=tamano_lote, pausa=pausa, progreso=progreso)
+    except Exception as e:
+        logging.error(f"Error al archivar pedidos: {e}")
+        raise click.ClickException(f'Error al archivar pedidos (se reanudará desde el último lote): {e}')
+    click.echo(f'Anteriores a {resultado.corte:%Y-%m-%d %H:%M}: {resultado.pedidos} pedidos '
+               f'({resultado.detalles_pedido} líneas) y {resultado.ventas} ventas '
+               f'({resultado.detalles_venta} líneas) archivados en {resultado.segundos:.2f} s.')
+
+@click.command('refresh-recommendations')
+@click.option('--completo', is_flag=True, help='Reconstruir desde cero con todos los pedidos, incluidos los archivados.')
+@click.option('--top-k', type=click.IntRange(min=1), default=None,
+              help='Recomendaciones guardadas por variante (por defecto 20).')
+@click.option('--lote', 'tamano_lote', type=click.IntRange(min=1), default=None,
+              help='Pedidos leídos por tramo (por defecto 50000).')
+@with_appcontext
+def refresh_recommendations_command(completo, top_k, tamano_lote):
+    """Actualizar las recomendaciones "comprados juntos" con los pedidos nuevos."""
+    from src.services.recomendaciones import TAMANO_LOTE, TOP_K, actualizar
+
+    def progreso(resultado):
+        click.echo(f'  {resultado.pedidos} pedidos leídos ({resultado.pedidos_por_segundo:.0f} pedidos/s)')
+
+    try:
+        resultado = actualizar(completo=completo, top_k=top_k or TOP_K, tamano_lote=tamano_lote or TAMANO_LOTE,
+                               progreso=progreso)
+    except Exception as e:
+        logging.error(f"Error al actualizar las recomendaciones: {e}")
+        raise click.ClickException(f'Error al actualizar las recomendaciones: {e}')
+    click.echo(f"Recomendaciones {'reconstruidas' if resultado.completo else 'actualizadas'}: "
+               f'{resultado.pedidos} pedidos ({resultado.lineas} líneas), {resultado.pares} pares y '
+               f'{resultado.variantes} variantes en {resultado.segundos:.2f} s '
+               f'(cálculo {resultado.segundos_calculo:.2f} s).')
+
+@click.command('set-password')
+@click.argument('correo')
+@click.password_option('--password', prompt='Nueva contraseña', help='Contraseña nueva (se pide si no se indica).')
+@with_appcontext
+def set_password_command(correo, password):
+    """Establecer la contraseña de una persona y cerrar sus sesiones abiertas."""
+    from src.models import Persona
+    from src.services.autenticacion import autenticacion
+
+    persona = Persona.query.filter_by(correo=correo).first()
+    if persona is None:
+        raise click.ClickException(f'No existe ninguna persona con el correo {correo}')
+    try:
+        autenticacion.establecer_password(persona.id_usuario, password)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Contraseña actualizada para {correo}.')
+
+@click.command('export-catalog')
+@click.argument('salida', type=click.Path(dir_okay=False, writable=True, allow_dash=True))
+@click.option('--tabla', type=click.Choice(['gorras', 'variantes']), default='gorras', show_default=True)
+@click.option('--formato', type=click.Choice(['ndjson', 'csv']), default='ndjson', show_default=True)
+@click.option('--gzip', 'comprimir', is_flag=True, help='Comprimir la salida con gzip.')
+@click.option('--bloque', 'tamano_bloque', type=click.IntRange(min=1), default=2000, show_default=True,
+              help='Filas leídas y serializadas por bloque.')
+@with_appcontext
+def export_catalog_command(salida, tabla, formato, comprimir, tamano_bloque):
+    """Exportar el catálogo en streaming a un archivo (o '-' para la salida estándar)."""
+    from src.services.exportacion import exportar
+    try:
+        total = 0
+        with click.open_file(salida, 'wb') as archivo:
+            for fragmento in exportar(tabla, formato, gzip=comprimir, tamano_bloque=tamano_bloque):
+                archivo.write(fragmento)
+                total += len(fragmento)
+        if salida != '-':
+            click.echo(f'Exportación completada: {total} bytes escritos en {salida}')
+    except Exception as e:
+        logging.error(f"Error al exportar el catálogo: {e}")
+        click.echo(f'Error al exportar el catálogo: {e}')
+
+@click.command('bench-pool')
+@click.option('--perfil', 'perfiles', multiple=True,
+              help='Perfil a comparar (repetible); por defecto todos los de POOL_PERFILES.')
+@click.option('--uri', 'uris', multiple=True,
+              help='URI de la base de datos (repetible, p. ej. TCP y socket Unix); '
+                   'por defecto una base SQLite temporal.')
+@click.option('--hilos', type=click.IntRange(min=1), default=8, show_default=True, help='Hilos concurrentes.')
+@click.option('--consultas', type=click.IntRange(min=1), default=2000, show_default=True,
+              help='Consultas totales por perfil.')
+def bench_pool_command(perfiles, uris, hilos, consultas):
+    """Comparar la latencia de checkout y el rendimiento de los perfiles del pool."""
+    import os
+    import tempfile
+    from config import POOL_PERFILES
+    from src.database.pool import comparar_perfiles
+
+    directorio = None
+    try:
+        if not uris:
+            directorio = tempfile.TemporaryDirectory()
+            uris = [f"sqlite:///{os.path.join(directorio.name, 'bench_pool.db')}"]
+        resultados = comparar_perfiles(list(uris), list(perfiles) or list(POOL_PERFILES), hilos, consultas)
+    except Exception as e:
+        logging.error(f"Error al comparar los perfiles del pool: {e}")
+        click.echo(f'Error al comparar los perfiles del pool: {e}')
+        return
+    finally:
+        if directorio:
+            directorio.cleanup()
+
+    for r in resultados:
+        click.echo(
+            f"{r['perfil']:<18} {r['pre_ping']:<9} checkout p50 {r['checkout_p50_ms']:.3f} ms "
+            f"p95 {r['checkout_p95_ms']:.3f} ms p99 {r['checkout_p99_ms']:.3f} ms  "
+            f"{r['consultas_s']:.0f} consultas/s  {r['uri']}"
+        )
+        if r['errores']:
+            click.echo(f"  errores: {r['errores']}")
+        click.echo(f"  pool: {r['telemetria']}")
+
 @click.command('drop-db')
 @with_appcontext
 def drop_db_command():
@@ -6,8 +6,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask import current_app
 import logging
 
-# Crear una instancia de SQLAlchemy
-db = SQLAlchemy()
+from src.database.replicas import SesionEnrutada
+
+# Crear una instancia de SQLAlchemy; la sesión enruta las lecturas marcadas a las réplicas
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
 
 
 def init_db(app):
@@ -21,10 +23,10 @@ def init_db(app):
         # Configurar la conexión a la base de datos
         db.init_app(app)
         
-        with app.app_context():
-            # Crear todas las tablas definidas en los modelos
-            db.create_all()
-            logging.info("Base de datos inicializada correctamente")
+        # Solo se comprueba la versión del esquema; las tablas las crean las migraciones
+        from src.database.migraciones import comprobar_version
+        comprobar_version(app)
+        logging.info("Base de datos inicializada correctamente")
             
     except Exception as e:
         logging.error(f"Error al inicializar la base de datos: {e}")
@@ -69,3 +71,33 @@ def init_app(app):
 	# Si tienes comandos personalizados, descomenta la siguiente línea y asegúrate de que el módulo exista
 	# from . import commands
 	# commands.init_app(app)
+
+
+def estadisticas_pool(engine):
+	"""
+	Obtiene las estadísticas del pool de conexiones de un engine.
+
+	Args:
+		engine: Engine de SQLAlchemy
+
+	Returns:
+		dict: Conexiones disponibles, en uso, tamaño y desbordamiento; los
+		pools que no llevan la cuenta (p. ej. SQLite en memoria) devuelven None.
+		Si el engine está instrumentado incluye también los contadores de eventos
+	"""
+	from src.database.pool import telemetria_pool
+
+	pool = engine.pool
+
+	def _valor(nombre):
+		metodo = getattr(pool, nombre, None)
+		return metodo() if callable(metodo) else None
+
+	return {
+		'clase': type(pool).__name__,
+		'disponibles': _valor('checkedin'),
+		'en_uso': _valor('checkedout'),
+		'tamano': _valor('size'),
+		'desbordamiento': _valor('overflow'),
+		'eventos': telemetria_pool(engine)
+	}
@@ -0,0 +1,337 @@
+"""
+Instrumentación de la base de datos y de las peticiones HTTP.
+
+Usa los eventos del engine de SQLAlchemy y los hooks de Flask para registrar,
+por petición, el número de consultas, el tiempo total en la base de datos y
+las sentencias más lentas (normalizadas, sin literales). Las consultas que
+superan un umbral se registran en el log. Los agregados se exponen en formato
+de texto de Prometheus desde ``/metrics`` sin depender de bibliotecas
+externas.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+import heapq
+import logging
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+
+logger = logging.getLogger(__name__)
+
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+LIMITES_ESPERA_POOL = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# Número máximo de sentencias normalizadas distintas que se agregan
+MAX_SENTENCIAS = 500
+
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_LISTA = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)')
+_RE_POSCOMPILADO = re.compile(r'\(?__\[POSTCOMPILE_\w+\]\)?')
+_RE_FILAS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+def normalizar_sentencia(sentencia: str) -> str:
+	"""
+	Normaliza una sentencia SQL para agrupar las que solo difieren en los
+	valores: sustituye literales por ``?`` y colapsa las listas de ``IN``, las
+	filas de los INSERT de varias filas y los espacios.
+
+	Args:
+		sentencia: Texto SQL tal como se envía al driver
+
+	Returns:
+		str: Sentencia normalizada
+	"""
+	sentencia = _RE_CADENA.sub('?', sentencia)
+	sentencia = _RE_NUMERO.sub('?', sentencia)
+	sentencia = _RE_POSCOMPILADO.sub('(...)', sentencia)
+	sentencia = _RE_LISTA.sub('(...)', sentencia)
+	sentencia = _RE_FILAS.sub('(...)', sentencia)
+	return _RE_ESPACIOS.sub(' ', sentencia).strip()
+
+
+def _escapar_etiqueta(valor) -> str:
+	return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _etiquetas(pares: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+	pares = pares + ((extra,) if extra else ())
+	if not pares:
+		return ''
+	return '{' + ','.join(f'{nombre}="{_escapar_etiqueta(valor)}"' for nombre, valor in pares) + '}'
+
+
+def _numero(valor: float) -> str:
+	return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class Histograma:
+	"""Histograma acumulativo con límites fijos, compatible con Prometheus."""
+
+	def __init__(self, limites):
+		self.limites = tuple(limites)
+		self.cubetas = [0] * (len(self.limites) + 1)
+		self.suma = 0.0
+		self.cuenta = 0
+
+	def observar(self, valor: float):
+		self.cubetas[bisect_left(self.limites, valor)] += 1
+		self.suma += valor
+		self.cuenta += 1
+
+	def lineas(self, nombre: str, etiquetas: Tuple[Tuple[str, str], ...] = ()) -> List[str]:
+		lineas, acumulado = [], 0
+		for limite, cantidad in zip(self.limites + (float('inf'),), self.cubetas):
+			acumulado += cantidad
+			le = '+Inf' if limite == float('inf') else _numero(limite)
+			lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, ("le", le))} {acumulado}')
+		lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {self.suma:.6f}')
+		lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {self.cuenta}')
+		return lineas
+
+
+class EstadoSolicitud:
+	"""Consultas ejecutadas durante una petición."""
+
+	__slots__ = ('inicio', 'consultas', 'segundos_bd', 'lentas')
+
+	def __init__(self):
+		self.inicio = time.perf_counter()
+		self.consultas = 0
+		self.segundos_bd = 0.0
+		self.lentas: List[Tuple[float, str]] = []
+
+	def registrar(self, segundos: float, sentencia: str, top: int):
+		self.consultas += 1
+		self.segundos_bd += segundos
+		if len(self.lentas) < top:
+			heapq.heappush(self.lentas, (segundos, sentencia))
+		elif top and segundos > self.lentas[0][0]:
+			heapq.heapreplace(self.lentas, (segundos, sentencia))
+
+	def mas_lentas(self) -> List[Tuple[float, str]]:
+		return sorted(self.lentas, reverse=True)
+
+
+class MetricasAplicacion:
+	"""Registro de métricas de las peticiones, las consultas y el pool."""
+
+	def __init__(self):
+		self.activa = True
+		self.umbral_lenta = 0.2
+		self.top = 10
+		self._lock = threading.Lock()
+		self._engines = []
+		self.reiniciar()
+
+	def reiniciar(self):
+		"""Vacía todos los contadores."""
+		with self._lock:
+			self.peticiones: Dict[Tuple[str, str, str], int] = {}
+			self.latencia: Dict[Tuple[str, str], Histograma] = {}
+			self.consultas_peticion = Histograma(LIMITES_CONSULTAS)
+			self.segundos_bd_peticion = Histograma(LIMITES_LATENCIA)
+			self.espera_pool = Histograma(LIMITES_ESPERA_POOL)
+			self.timeouts_pool = 0
+			self.consultas_total = 0
+			self.consultas_lentas = 0
+			# sentencia normalizada -> [ejecuciones, segundos totales, segundos máximos]
+			self.sentencias: Dict[str, List[float]] = {}
+
+	def init_app(self, app):
+		"""
+		Configura la instrumentación a partir de la configuración de la
+		aplicación e instala los eventos en sus engines.
+
+		Args:
+			app: Instancia de la aplicación Flask
+		"""
+		self.activa = app.config.get('METRICAS_ACTIVAS', True)
+		self.umbral_lenta = app.config.get('METRICAS_UMBRAL_CONSULTA_LENTA_MS', 200) / 1000
+		self.top = app.config.get('METRICAS_TOP_SENTENCIAS', 10)
+		app.extensions['metricas'] = self
+		if not self.activa:
+			return
+
+		with app.app_context():
+			for engine in app.extensions['sqlalchemy'].engines.values():
+				self.instrumentar_engine(engine)
+		app.before_request(self._antes_de_peticion)
+		app.after_request(self._despues_de_peticion)
+
+	# Engine
+	def instrumentar_engine(self, engine):
+		"""Instala los eventos de consulta y mide la espera de checkout del pool."""
+		if engine in self._engines:
+			return
+		self._engines.append(engine)
+		event.listen(engine, 'before_cursor_execute', self._antes_de_consulta)
+		event.listen(engine, 'after_cursor_execute', self._despues_de_consulta)
+		event.listen(engine, 'engine_disposed', lambda e: self._instrumentar_pool(e.pool))
+		self._instrumentar_pool(engine.pool)
+
+	def _instrumentar_pool(self, pool):
+		"""
+		Envuelve la obtención de conexiones del pool para medir la espera.
+		El pool no emite ningún evento al empezar a esperar, y ``dispose()``
+		lo sustituye por uno nuevo, de ahí que se vuelva a envolver.
+		"""
+		if getattr(pool, '_metricas_instrumentado', False):
+			return
+		obtener = pool._do_get
+
+		def _do_get():
+			inicio = time.perf_counter()
+			try:
+				return obtener()
+			except TimeoutPool:
+				with self._lock:
+					self.timeouts_pool += 1
+				raise
+			finally:
+				with self._lock:
+					self.espera_pool.observar(time.perf_counter() - inicio)
+
+		pool._do_get = _do_get
+		pool._metricas_instrumentado = True
+
+	def _antes_de_consulta(self, conn, cursor, statement, parameters, context, executemany):
+		if context is not None:
+			context._metricas_inicio = time.perf_counter()
+
+	def _despues_de_consulta(self, conn, cursor, statement, parameters, context, executemany):
+		inicio = getattr(context, '_metricas_inicio', None)
+		if inicio is None:
+			return
+		segundos = time.perf_counter() - inicio
+		sentencia = normalizar_sentencia(statement)
+
+		with self._lock:
+			self.consultas_total += 1
+			agregado = self.sentencias.get(sentencia)
+			if agregado is None and len(self.sentencias) >= MAX_SENTENCIAS:
+				agregado = self.sentencias.setdefault('(otras)', [0, 0.0, 0.0])
+			elif agregado is None:
+				agregado = self.sentencias[sentencia] = [0, 0.0, 0.0]
+			agregado[0] += 1
+			agregado[1] += segundos
+			agregado[2] = max(agregado[2], segundos)
+			if segundos >= self.umbral_lenta:
+				self.consultas_lentas += 1
+
+		estado = g.get('metricas_sql') if has_request_context() else None
+		if estado is not None:
+			estado.registrar(segundos, sentencia, self.top)
+		if segundos >= self.umbral_lenta:
+			ruta = f" en {request.method} {request.path}" if has_request_context() else ''
+			logger.warning(f"Consulta lenta ({segundos * 1000:.1f} ms){ruta}: {sentencia}")
+
+	# Peticiones
+	def _antes_de_peticion(self):
+		g.metricas_sql = EstadoSolicitud()
+
+	def _despues_de_peticion(self, respuesta):
+		estado = g.pop('metricas_sql', None)
+		if estado is None:
+			return respuesta
+		segundos = time.perf_counter() - estado.inicio
+		ruta = request.url_rule.rule if request.url_rule else '(sin ruta)'
+
+		with self._lock:
+			clave = (ruta, request.method, str(respuesta.status_code))
+			self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+			histograma = self.latencia.get((ruta, request.method))
+			if histograma is None:
+				histograma = self.latencia[(ruta, request.method)] = Histograma(LIMITES_LATENCIA)
+			histograma.observar(segundos)
+			self.consultas_peticion.observar(estado.consultas)
+			self.segundos_bd_peticion.observar(estado.segundos_bd)
+
+		respuesta.headers['Server-Timing'] = (
+			f'db;dur={estado.segundos_bd * 1000:.2f};desc="{estado.consultas} consultas", '
+			f'total;dur={segundos * 1000:.2f}'
+		)
+		if estado.lentas and logger.isEnabledFor(logging.DEBUG):
+			detalle = '; '.join(f'{s * 1000:.1f} ms {sql}' for s, sql in estado.mas_lentas())
+			logger.debug(f"{request.method} {ruta}: {estado.consultas} consultas, "
+						 f"{estado.segundos_bd * 1000:.1f} ms en BD. Más lentas: {detalle}")
+		return respuesta
+
+	# Exposición
+	def exportar_prometheus(self) -> str:
+		"""
+		Genera el texto de las métricas en el formato de exposición de
+		Prometheus (versión 0.0.4).
+
+		Returns:
+			str: Métricas listas para servir en ``/metrics``
+		"""
+		from src.database.db_connection import estadisticas_pool
+
+		lineas = []
+
+		def cabecera(nombre, tipo, ayuda):
+			lineas.append(f'# HELP {nombre} {ayuda}')
+			lineas.append(f'# TYPE {nombre} {tipo}')
+
+		with self._lock:
+			cabecera('http_peticiones_total', 'counter', 'Peticiones atendidas por ruta, método y estado')
+			for (ruta, metodo, estado), total in sorted(self.peticiones.items()):
+				lineas.append(f'http_peticiones_total'
+							  f'{_etiquetas((("ruta", ruta), ("metodo", metodo), ("estado", estado)))} {total}')
+
+			cabecera('http_peticion_duracion_segundos', 'histogram', 'Latencia de las peticiones por ruta')
+			for (ruta, metodo), histograma in sorted(self.latencia.items()):
+				lineas.extend(histograma.lineas('http_peticion_duracion_segundos',
+												(('ruta', ruta), ('metodo', metodo))))
+
+			cabecera('bd_consultas_por_peticion', 'histogram', 'Consultas SQL ejecutadas por petición')
+			lineas.extend(self.consultas_peticion.lineas('bd_consultas_por_peticion'))
+			cabecera('bd_segundos_por_peticion', 'histogram', 'Tiempo en la base de datos por petición')
+			lineas.extend(self.segundos_bd_peticion.lineas('bd_segundos_por_peticion'))
+
+			cabecera('bd_consultas_total', 'counter', 'Consultas SQL ejecutadas')
+			lineas.append(f'bd_consultas_total {self.consultas_total}')
+			cabecera('bd_consultas_lentas_total', 'counter',
+					 f'Consultas que superan el umbral de {self.umbral_lenta * 1000:.0f} ms')
+			lineas.append(f'bd_consultas_lentas_total {self.consultas_lentas}')
+
+			mas_lentas = heapq.nlargest(self.top, self.sentencias.items(), key=lambda item: item[1][1])
+			cabecera('bd_sentencia_segundos_total', 'counter', 'Tiempo acumulado de las sentencias más costosas')
+			for sentencia, (_, total, _) in mas_lentas:
+				lineas.append(f'bd_sentencia_segundos_total{_etiquetas((("sentencia", sentencia),))} {total:.6f}')
+			cabecera('bd_sentencia_ejecuciones_total', 'counter', 'Ejecuciones de las sentencias más costosas')
+			for sentencia, (ejecuciones, _, _) in mas_lentas:
+				lineas.append(f'bd_sentencia_ejecuciones_total{_etiquetas((("sentencia", sentencia),))} {ejecuciones}')
+			cabecera('bd_sentencia_segundos_max', 'gauge', 'Duración máxima de las sentencias más costosas')
+			for sentencia, (_, _, maximo) in mas_lentas:
+				lineas.append(f'bd_sentencia_segundos_max{_etiquetas((("sentencia", sentencia),))} {maximo:.6f}')
+
+			cabecera('bd_pool_espera_segundos', 'histogram', 'Espera para obtener una conexión del pool')
+			lineas.extend(self.espera_pool.lineas('bd_pool_espera_segundos'))
+			cabecera('bd_pool_timeouts_total', 'counter', 'Esperas del pool que agotaron el tiempo')
+			lineas.append(f'bd_pool_timeouts_total {self.timeouts_pool}')
+
+		estadisticas = [(engine.url.render_as_string(hide_password=True), estadisticas_pool(engine))
+						for engine in self._engines]
+		cabecera('bd_pool_conexiones', 'gauge', 'Estado actual del pool de conexiones')
+		for url, datos in estadisticas:
+			for campo in ('disponibles', 'en_uso', 'tamano', 'desbordamiento'):
+				if datos[campo] is not None:
+					lineas.append(f'bd_pool_conexiones{_etiquetas((("engine", url), ("estado", campo)))} {datos[campo]}')
+		cabecera('bd_pool_eventos_total', 'counter', 'Eventos del pool: conexiones, checkouts, pings e invalidaciones')
+		for url, datos in estadisticas:
+			for evento, total in datos['eventos'].items():
+				lineas.append(f'bd_pool_eventos_total{_etiquetas((("engine", url), ("evento", evento)))} {total}')
+
+		return '\n'.join(lineas) + '\n'
+
+
+# Instancia global de la aplicación
+metricas = MetricasAplicacion()
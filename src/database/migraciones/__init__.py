@@ -0,0 +1,258 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración es un módulo ``vNNNN_descripcion.py`` de este paquete con una
+función ``aplicar(engine)``; su docstring describe el cambio. La versión
+aplicada se registra en la tabla ``version_esquema``, de modo que al arrancar
+basta con una consulta para saber si faltan migraciones.
+
+Como ``v0001`` crea las tablas que falten a partir de los modelos actuales,
+las migraciones posteriores deben ser idempotentes: comprueban si la columna
+o el índice ya existen (``agregar_columna``, ``crear_indices``) antes de
+crearlos. Los rellenos de tablas grandes se hacen por lotes cortos con
+``rellenar_por_lotes`` para no bloquear la tabla; si se interrumpen, al
+repetir la migración continúan donde se quedaron.
+"""
+from datetime import datetime
+from importlib import import_module
+from typing import Callable, Dict, List, Optional
+import logging
+import pkgutil
+import re
+import time
+
+from sqlalchemy import (Column, DateTime, Float, Integer, MetaData, String, Table, exc, func, inspect,
+						insert, select, update)
+
+logger = logging.getLogger(__name__)
+
+_RE_MODULO = re.compile(r'^v(\d{4})_(\w+)$')
+
+metadata_versiones = MetaData()
+version_esquema = Table(
+	'version_esquema', metadata_versiones,
+	Column('version', Integer, primary_key=True),
+	Column('nombre', String(100), nullable=False),
+	Column('fecha_aplicacion', DateTime, nullable=False, default=datetime.utcnow),
+	Column('segundos', Float, nullable=False, default=0)
+)
+
+
+class Migracion:
+	"""Migración descubierta en el paquete."""
+
+	def __init__(self, version: int, nombre: str, aplicar: Callable, descripcion: str = ''):
+		self.version = version
+		self.nombre = nombre
+		self.aplicar = aplicar
+		self.descripcion = descripcion
+
+	def __repr__(self):
+		return f"<Migracion {self.version:04d} {self.nombre}>"
+
+
+def migraciones() -> List[Migracion]:
+	"""Migraciones del paquete ordenadas por versión."""
+	encontradas = []
+	for modulo in pkgutil.iter_modules(__path__):
+		coincidencia = _RE_MODULO.match(modulo.name)
+		if coincidencia is None:
+			continue
+		cargado = import_module(f'{__name__}.{modulo.name}')
+		descripcion = (cargado.__doc__ or '').strip().splitlines()
+		encontradas.append(Migracion(int(coincidencia.group(1)), coincidencia.group(2), cargado.aplicar,
+									 descripcion[0] if descripcion else ''))
+	encontradas.sort(key=lambda m: m.version)
+	versiones = [m.version for m in encontradas]
+	if len(set(versiones)) != len(versiones):
+		raise RuntimeError(f"Versiones de migración duplicadas: {versiones}")
+	return encontradas
+
+
+def ultima_version() -> int:
+	"""Versión de la última migración disponible (0 si no hay ninguna)."""
+	disponibles = [int(m.group(1)) for m in (_RE_MODULO.match(n.name) for n in pkgutil.iter_modules(__path__)) if m]
+	return max(disponibles, default=0)
+
+
+def version_actual(engine) -> Optional[int]:
+	"""
+	Versión aplicada en la base de datos con una única consulta.
+
+	Returns:
+		Optional[int]: Versión aplicada, 0 si la tabla está vacía o None si
+		la tabla de versiones no existe
+	"""
+	try:
+		with engine.connect() as conexion:
+			return conexion.execute(select(func.max(version_esquema.c.version))).scalar() or 0
+	except (exc.OperationalError, exc.ProgrammingError):
+		return None
+
+
+def aplicadas(engine) -> Dict[int, dict]:
+	"""Migraciones registradas en ``version_esquema``."""
+	with engine.connect() as conexion:
+		if not inspect(conexion).has_table(version_esquema.name):
+			return {}
+		return {fila.version: dict(fila._mapping) for fila in conexion.execute(select(version_esquema))}
+
+
+def actualizar(engine, hasta: Optional[int] = None,
+			   progreso: Optional[Callable[[Migracion, str], None]] = None) -> List[Migracion]:
+	"""
+	Aplica en orden las migraciones pendientes.
+
+	Args:
+		engine: Engine de SQLAlchemy
+		hasta: Última versión a aplicar (por defecto todas)
+		progreso: Función llamada con la migración y 'inicio' o 'fin'
+
+	Returns:
+		List[Migracion]: Migraciones aplicadas
+	"""
+	metadata_versiones.create_all(engine)
+	hechas = aplicadas(engine)
+	ejecutadas = []
+	for migracion in migraciones():
+		if migracion.version in hechas or (hasta is not None and migracion.version > hasta):
+			continue
+		if progreso:
+			progreso(migracion, 'inicio')
+		inicio = time.perf_counter()
+		migracion.aplicar(engine)
+		segundos = time.perf_counter() - inicio
+		with engine.begin() as conexion:
+			conexion.execute(insert(version_esquema).values(
+				version=migracion.version, nombre=migracion.nombre, segundos=round(segundos, 3)))
+		logger.info(f"Migración {migracion.version:04d} {migracion.nombre} aplicada en {segundos:.2f} s")
+		ejecutadas.append(migracion)
+		if progreso:
+			progreso(migracion, 'fin')
+	return ejecutadas
+
+
+def comprobar_version(app) -> Dict[str, Optional[int]]:
+	"""
+	Comprueba al arrancar si el esquema está al día (una sola consulta).
+
+	Con ``MIGRAR_AL_INICIAR`` aplica las migraciones pendientes; si no, solo
+	avisa en el log. El resultado queda en ``app.extensions['esquema']``.
+
+	Args:
+		app: Instancia de la aplicación Flask
+	"""
+	with app.app_context():
+		engine = app.extensions['sqlalchemy'].engine
+		actual, esperada = version_actual(engine), ultima_version()
+		if (actual or 0) < esperada:
+			if app.config.get('MIGRAR_AL_INICIAR'):
+				actualizar(engine)
+				actual = esperada
+			else:
+				logger.warning(f"El esquema está en la versión {actual or 0} y la última es {esperada}; "
+							   f"ejecuta 'flask db-upgrade'")
+	estado = {'version': actual, 'esperada': esperada}
+	app.extensions['esquema'] = estado
+	return estado
+
+
+# Utilidades para las migraciones
+def agregar_columna(engine, tabla: str, columna: Column) -> bool:
+	"""
+	Añade una columna si la tabla no la tiene.
+
+	Returns:
+		bool: True si se ha añadido
+	"""
+	with engine.begin() as conexion:
+		if columna.name in {c['name'] for c in inspect(conexion).get_columns(tabla)}:
+			return False
+		tipo = columna.type.compile(dialect=conexion.dialect)
+		nulo = '' if columna.nullable else ' NOT NULL'
+		preparador = conexion.dialect.identifier_preparer
+		conexion.exec_driver_sql(
+			f"ALTER TABLE {preparador.quote(tabla)} ADD COLUMN {preparador.quote(columna.name)} {tipo}{nulo}")
+	return True
+
+
+def cambiar_tipo_columna(engine, tabla: str, columna: Column) -> bool:
+	"""
+	Cambia el tipo de una columna existente al declarado en el modelo.
+
+	En SQLite no hace nada: no impone la longitud de VARCHAR.
+
+	Returns:
+		bool: True si se ha emitido el ALTER TABLE
+	"""
+	with engine.begin() as conexion:
+		dialecto = conexion.dialect.name
+		if dialecto == 'sqlite':
+			return False
+		tipo = columna.type.compile(dialect=conexion.dialect)
+		preparador = conexion.dialect.identifier_preparer
+		nombre_tabla, nombre_columna = preparador.quote(tabla), preparador.quote(columna.name)
+		if dialecto in ('mysql', 'mariadb'):
+			nulo = '' if columna.nullable else ' NOT NULL'
+			conexion.exec_driver_sql(f"ALTER TABLE {nombre_tabla} MODIFY {nombre_columna} {tipo}{nulo}")
+		else:
+			conexion.exec_driver_sql(f"ALTER TABLE {nombre_tabla} ALTER COLUMN {nombre_columna} TYPE {tipo}")
+	return True
+
+
+def crear_indices(engine, tabla: Table) -> List[str]:
+	"""
+	Crea los índices declarados en el modelo que falten en la base de datos.
+
+	Returns:
+		List[str]: Nombres de los índices creados
+	"""
+	creados = []
+	with engine.begin() as conexion:
+		existentes = {i['name'] for i in inspect(conexion).get_indexes(tabla.name)}
+		for indice in tabla.indexes:
+			if indice.name not in existentes:
+				indice.create(conexion)
+				creados.append(indice.name)
+	return creados
+
+
+def rellenar_por_lotes(engine, tabla: Table, valores: dict, condicion, lote: int = 1000, pausa: float = 0.0,
+					   progreso: Optional[Callable[[int], None]] = None) -> int:
+	"""
+	Actualiza las filas que cumplen ``condicion`` en transacciones cortas,
+	recorriendo la clave primaria por tramos.
+
+	La condición debe dejar de cumplirse al actualizar la fila (por ejemplo
+	``columna IS NULL``) para que un relleno interrumpido pueda reanudarse.
+
+	Args:
+		engine: Engine de SQLAlchemy
+		tabla: Tabla a rellenar (con clave primaria simple)
+		valores: Valores o expresiones del UPDATE
+		condicion: Filas pendientes de rellenar
+		lote: Filas por transacción
+		pausa: Segundos de espera entre lotes para ceder la base de datos
+		progreso: Función llamada con el total de filas actualizadas
+
+	Returns:
+		int: Filas actualizadas
+	"""
+	clave = list(tabla.primary_key.columns)[0]
+	ultimo, total = None, 0
+	while True:
+		with engine.begin() as conexion:
+			consulta = select(clave).where(condicion).order_by(clave).limit(lote)
+			if ultimo is not None:
+				consulta = consulta.where(clave > ultimo)
+			ids = conexion.execute(consulta).scalars().all()
+			if not ids:
+				break
+			conexion.execute(update(tabla).where(clave.in_(ids)).values(**valores))
+		total += len(ids)
+		ultimo = ids[-1]
+		if progreso:
+			progreso(total)
+		if pausa:
+			time.sleep(pausa)
+	return total
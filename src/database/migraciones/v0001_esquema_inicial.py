@@ -0,0 +1,12 @@
+"""
+Crea las tablas de los modelos que todavía no existen.
+
+Las bases creadas antes con ``create_all`` conservan sus tablas; las
+migraciones siguientes completan las columnas e índices que les falten.
+"""
+from src.database.db_connection import db
+
+
+def aplicar(engine):
+	import src.models  # noqa: F401  Registra todos los modelos
+	db.metadata.create_all(engine, checkfirst=True)
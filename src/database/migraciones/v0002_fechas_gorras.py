@@ -0,0 +1,16 @@
+"""
+Añade fecha_creacion y fecha_actualizacion a gorras y las rellena por lotes.
+"""
+from sqlalchemy import func
+
+from src.database.migraciones import agregar_columna, rellenar_por_lotes
+from src.models.gorra import Gorra
+
+
+def aplicar(engine):
+	tabla = Gorra.__table__
+	for nombre in ('fecha_creacion', 'fecha_actualizacion'):
+		agregar_columna(engine, tabla.name, tabla.c[nombre])
+	ahora = func.current_timestamp()
+	rellenar_por_lotes(engine, tabla, {'fecha_creacion': ahora}, tabla.c.fecha_creacion.is_(None))
+	rellenar_por_lotes(engine, tabla, {'fecha_actualizacion': ahora}, tabla.c.fecha_actualizacion.is_(None))
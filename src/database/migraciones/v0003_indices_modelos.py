@@ -0,0 +1,16 @@
+"""
+Crea los índices declarados en los modelos que falten en tablas ya existentes.
+"""
+from sqlalchemy import inspect
+
+from src.database.db_connection import db
+from src.database.migraciones import crear_indices
+
+
+def aplicar(engine):
+	import src.models  # noqa: F401  Registra todos los modelos
+	existentes = set(inspect(engine).get_table_names())
+	for tabla in db.metadata.sorted_tables:
+		# Las tablas de modelos posteriores las crea (con sus índices) su propia migración
+		if tabla.indexes and tabla.name in existentes:
+			crear_indices(engine, tabla)
@@ -0,0 +1,23 @@
+"""
+Crea los contadores de disponibilidad por tipo de gorra y los calcula.
+
+El cálculo se hace por tramos de tipos, cada uno en su transacción. Las
+escrituras de procesos que aún ejecutan la versión anterior no actualizan los
+contadores: tras desplegar, ``flask reconcile-stock`` corrige las diferencias.
+"""
+from sqlalchemy import select
+
+from src.database.bulk import en_lotes
+from src.models.stock_tipo_gorra import StockTipoGorra, recalcular
+from src.models.variante_gorra import VarianteGorra
+
+
+def aplicar(engine):
+	StockTipoGorra.__table__.create(engine, checkfirst=True)
+	variantes = VarianteGorra.__table__
+	with engine.connect() as conexion:
+		ids_tipo = conexion.execute(
+			select(variantes.c.id_tipo_gorra).distinct().order_by(variantes.c.id_tipo_gorra)).scalars().all()
+	for tramo in en_lotes(ids_tipo, 200):
+		with engine.begin() as conexion:
+			recalcular(conexion, tramo)
@@ -0,0 +1,12 @@
+"""
+Amplía password_hash de personas y usuarios a 255 caracteres para los hashes scrypt.
+"""
+from src.database.migraciones import cambiar_tipo_columna
+from src.models.persona import Persona
+from src.models.usuario import Usuario
+
+
+def aplicar(engine):
+	for modelo in (Persona, Usuario):
+		tabla = modelo.__table__
+		cambiar_tipo_columna(engine, tabla.name, tabla.c.password_hash)
@@ -0,0 +1,37 @@
+"""
+Prepara personas y pedidos para recibir los usuarios y ventas consolidados.
+
+Añade las columnas de origen (con índice único), el método de pago y el
+comprobante de los pedidos, y amplía documento, teléfono y dirección de
+personas a las longitudes de usuarios. Los datos no se copian aquí: lo hace
+``flask consolidate-ventas`` por tramos reanudables.
+"""
+from sqlalchemy import Column, Index, Integer, MetaData, Table, inspect
+
+from src.database.migraciones import agregar_columna, cambiar_tipo_columna
+from src.models.pedido import Pedido
+from src.models.persona import Persona
+
+
+def _crear_indice_unico(engine, tabla: str, columna: str):
+	"""Crea el índice único de la columna si no lo cubre ya un índice o una restricción."""
+	with engine.begin() as conexion:
+		inspector = inspect(conexion)
+		existentes = ([i['column_names'] for i in inspector.get_indexes(tabla) if i.get('unique')]
+					  + [u['column_names'] for u in inspector.get_unique_constraints(tabla)])
+		if [columna] in existentes:
+			return
+		# Tabla auxiliar para no añadir el índice a los metadatos de los modelos
+		auxiliar = Table(tabla, MetaData(), Column(columna, Integer))
+		Index(f'ux_{tabla}_{columna}', auxiliar.c[columna], unique=True).create(conexion)
+
+
+def aplicar(engine):
+	personas, pedidos = Persona.__table__, Pedido.__table__
+	agregar_columna(engine, personas.name, personas.c.id_usuario_origen)
+	for nombre in ('metodo_pago', 'comprobante_url', 'id_venta_origen'):
+		agregar_columna(engine, pedidos.name, pedidos.c[nombre])
+	for nombre in ('documento', 'telefono', 'direccion'):
+		cambiar_tipo_columna(engine, personas.name, personas.c[nombre])
+	_crear_indice_unico(engine, personas.name, 'id_usuario_origen')
+	_crear_indice_unico(engine, pedidos.name, 'id_venta_origen')
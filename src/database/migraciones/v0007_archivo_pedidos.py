@@ -0,0 +1,11 @@
+"""
+Crea las tablas de archivo de pedidos y ventas.
+
+Las filas se mueven después con ``flask archive-orders``.
+"""
+from src.models.archivo import DetallePedidoArchivado, DetalleVentaArchivada, PedidoArchivado, VentaArchivada
+
+
+def aplicar(engine):
+	for modelo in (PedidoArchivado, DetallePedidoArchivado, VentaArchivada, DetalleVentaArchivada):
+		modelo.__table__.create(engine, checkfirst=True)
@@ -0,0 +1,11 @@
+"""
+Crea las tablas de co-ocurrencias y recomendaciones de variantes.
+
+Se llenan después con ``flask refresh-recommendations --completo``.
+"""
+from src.models.recomendacion import CoocurrenciaVariante, RecomendacionVariante
+
+
+def aplicar(engine):
+	for modelo in (CoocurrenciaVariante, RecomendacionVariante):
+		modelo.__table__.create(engine, checkfirst=True)
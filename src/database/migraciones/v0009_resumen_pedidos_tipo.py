@@ -0,0 +1,11 @@
+"""
+Crea las tablas de pedidos distintos por tipo de gorra y en total.
+
+Se llenan después con ``flask refresh-rollups --completo``.
+"""
+from src.models.resumen_venta import ResumenPedidoTipoDia, ResumenPedidoTipoHora
+
+
+def aplicar(engine):
+	for modelo in (ResumenPedidoTipoHora, ResumenPedidoTipoDia):
+		modelo.__table__.create(engine, checkfirst=True)
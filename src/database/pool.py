@@ -0,0 +1,203 @@
+"""
+Políticas y telemetría del pool de conexiones.
+
+Aplica la política de pre-ping del perfil configurado (ver ``POOL_PERFILES``
+en ``config.py``), cuenta los eventos del pool de cada engine y permite
+comparar perfiles midiendo la latencia de checkout y el rendimiento de
+consultas contra una base de datos local.
+"""
+from collections import Counter
+from typing import Dict, List, Optional
+import os
+import threading
+import time
+import weakref
+
+from sqlalchemy import create_engine, event, exc, text
+
+# engine -> contadores de eventos del pool
+_telemetria: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _contar(engine, evento: str):
+	with _lock:
+		_telemetria[engine][evento] += 1
+
+
+def instrumentar_pool(engine, politica: str = 'siempre', inactividad: float = 30.0):
+	"""
+	Registra los eventos del pool de un engine y aplica la política de pre-ping.
+
+	Con la política 'inactivas' solo se comprueba con un ``SELECT 1`` la
+	conexión que lleva más de ``inactividad`` segundos devuelta al pool; si
+	falla, el pool la descarta y entrega otra. Las conexiones que se usan de
+	forma continua no pagan el viaje extra de ``pool_pre_ping``.
+
+	Args:
+		engine: Engine de SQLAlchemy
+		politica: 'siempre', 'inactivas' o 'nunca'
+		inactividad: Segundos sin uso a partir de los que se comprueba la conexión
+	"""
+	with _lock:
+		if engine in _telemetria:
+			return
+		_telemetria[engine] = Counter()
+
+	# Los eventos registrados en el engine se aplican también al pool nuevo tras dispose()
+	@event.listens_for(engine, 'connect')
+	def _al_conectar(dbapi_conexion, registro):
+		_contar(engine, 'conexiones')
+
+	@event.listens_for(engine, 'checkout')
+	def _al_obtener(dbapi_conexion, registro, proxy):
+		_contar(engine, 'checkouts')
+		ultimo_uso = registro.info.get('ultimo_uso')
+		if politica != 'inactivas' or ultimo_uso is None or time.monotonic() - ultimo_uso < inactividad:
+			return
+		_contar(engine, 'pings')
+		cursor = dbapi_conexion.cursor()
+		try:
+			cursor.execute('SELECT 1')
+		except Exception:
+			_contar(engine, 'pings_fallidos')
+			# El pool cierra esta conexión y reintenta con otra
+			raise exc.DisconnectionError()
+		finally:
+			try:
+				cursor.close()
+			except Exception:
+				pass
+
+	@event.listens_for(engine, 'checkin')
+	def _al_devolver(dbapi_conexion, registro):
+		registro.info['ultimo_uso'] = time.monotonic()
+
+	@event.listens_for(engine, 'invalidate')
+	def _al_invalidar(dbapi_conexion, registro, excepcion):
+		_contar(engine, 'invalidaciones')
+
+
+def telemetria_pool(engine) -> Dict[str, int]:
+	"""Contadores de eventos del pool de un engine instrumentado."""
+	with _lock:
+		contadores = _telemetria.get(engine)
+		if contadores is None:
+			return {}
+		return {evento: contadores[evento] for evento in
+				('conexiones', 'checkouts', 'pings', 'pings_fallidos', 'invalidaciones')}
+
+
+def liberar_pools_tras_fork():
+	"""
+	Descarta en el proceso hijo las conexiones heredadas del padre.
+
+	Con ``close=False`` el hijo no cierra los sockets del padre (que siguen
+	siendo suyos); solo deja de usarlos y abre conexiones propias.
+	"""
+	with _lock:
+		engines = list(_telemetria.keys())
+	for engine in engines:
+		engine.dispose(close=False)
+
+
+# Cualquier servidor que haga fork tras cargar la aplicación (gunicorn con
+# preload_app, multiprocessing...) obtiene pools vacíos en cada proceso
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=liberar_pools_tras_fork)
+
+
+def configurar_pool(app):
+	"""
+	Instrumenta los engines de la aplicación con la política de pre-ping de
+	su perfil de pool.
+
+	Args:
+		app: Instancia de la aplicación Flask
+	"""
+	from config import politica_pre_ping
+
+	perfil = app.config.get('POOL_PERFIL')
+	politica = politica_pre_ping(perfil) if perfil else 'siempre'
+	inactividad = app.config.get('POOL_PING_INACTIVIDAD', 30.0)
+	with app.app_context():
+		for engine in app.extensions['sqlalchemy'].engines.values():
+			instrumentar_pool(engine, politica, inactividad)
+
+
+def _percentil(valores: List[float], p: float) -> float:
+	ordenados = sorted(valores)
+	if not ordenados:
+		return 0.0
+	return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir_perfil(uri: str, perfil: str, hilos: int = 8, consultas: int = 2000,
+				 inactividad: Optional[float] = None) -> Dict[str, object]:
+	"""
+	Mide un perfil del pool: varios hilos obtienen una conexión, ejecutan una
+	consulta y la devuelven.
+
+	Args:
+		uri: URI de la base de datos
+		perfil: Nombre del perfil en ``POOL_PERFILES``
+		hilos: Hilos concurrentes
+		consultas: Consultas totales repartidas entre los hilos
+		inactividad: Umbral de la política 'inactivas' (por defecto el de la configuración)
+
+	Returns:
+		dict: Latencia de checkout (p50/p95/p99 en ms), consultas por segundo,
+		errores y telemetría del pool
+	"""
+	from config import Config, opciones_engine, politica_pre_ping
+
+	engine = create_engine(uri, **opciones_engine(perfil))
+	instrumentar_pool(engine, politica_pre_ping(perfil),
+					  Config.POOL_PING_INACTIVIDAD if inactividad is None else inactividad)
+	esperas: List[float] = []
+	errores = Counter()
+	por_hilo = max(1, consultas // hilos)
+
+	def trabajador():
+		locales = []
+		for _ in range(por_hilo):
+			inicio = time.perf_counter()
+			try:
+				with engine.connect() as conexion:
+					locales.append((time.perf_counter() - inicio) * 1000)
+					conexion.execute(text('SELECT 1')).scalar()
+			except Exception as e:
+				errores[type(e).__name__] += 1
+		with _lock:
+			esperas.extend(locales)
+
+	try:
+		# Calentar el pool para no medir la apertura de las conexiones
+		with engine.connect() as conexion:
+			conexion.execute(text('SELECT 1'))
+		hebras = [threading.Thread(target=trabajador) for _ in range(hilos)]
+		inicio = time.perf_counter()
+		for hebra in hebras:
+			hebra.start()
+		for hebra in hebras:
+			hebra.join()
+		segundos = time.perf_counter() - inicio
+		return {
+			'perfil': perfil,
+			'uri': engine.url.render_as_string(hide_password=True),
+			'pre_ping': politica_pre_ping(perfil),
+			'checkout_p50_ms': round(_percentil(esperas, 50), 3),
+			'checkout_p95_ms': round(_percentil(esperas, 95), 3),
+			'checkout_p99_ms': round(_percentil(esperas, 99), 3),
+			'consultas_s': round(len(esperas) / segundos, 1) if segundos else 0.0,
+			'errores': dict(errores),
+			'telemetria': telemetria_pool(engine)
+		}
+	finally:
+		engine.dispose()
+
+
+def comparar_perfiles(uris: List[str], perfiles: List[str], hilos: int = 8,
+					  consultas: int = 2000) -> List[Dict[str, object]]:
+	"""Mide cada combinación de URI y perfil."""
+	return [medir_perfil(uri, perfil, hilos, consultas) for uri in uris for perfil in perfiles]
@@ -0,0 +1,206 @@
+"""
+Enrutamiento de lecturas a réplicas.
+
+Las réplicas se declaran como binds de Flask-SQLAlchemy (``SQLALCHEMY_BINDS``,
+ver ``binds_replicas`` en ``config.py``). ``SesionEnrutada`` envía a una
+réplica, por turnos, los SELECT ejecutados dentro de una función marcada con
+``solo_lectura``; el resto de sentencias, los ``SELECT ... FOR UPDATE`` y
+cualquier lectura posterior a una escritura de la misma sesión (leer lo que
+uno acaba de escribir) van a la primaria. Una réplica que falla queda
+expulsada durante ``REPLICAS_EXPULSION_SEGUNDOS`` y la lectura se repite en
+la primaria. ``primaria()`` fuerza la primaria de forma explícita.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+import logging
+import threading
+import time
+import weakref
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+# Modo de enrutamiento del contexto actual: None, 'lectura' o 'primaria'
+_modo: ContextVar[Optional[str]] = ContextVar('modo_replicas', default=None)
+# Réplicas usadas por la función solo_lectura en curso
+_replica_usada: ContextVar[Optional[list]] = ContextVar('replica_usada', default=None)
+# Engines de réplica que ya tienen registrado el evento de expulsión
+_vigilados: 'weakref.WeakSet' = weakref.WeakSet()
+
+
+class EnrutadorReplicas:
+	"""Reparte las lecturas entre las réplicas sanas y lleva sus contadores."""
+
+	def __init__(self):
+		self.activo = False
+		self.nombres: List[str] = []
+		self.expulsion = 30.0
+		self._expulsadas: Dict[str, float] = {}
+		self._turno = 0
+		self._lock = threading.Lock()
+		self.lecturas_replica = 0
+		self.lecturas_primaria = 0
+		self.expulsiones = 0
+		self.reintentos = 0
+
+	def init_app(self, app):
+		"""
+		Configura las réplicas a partir de la configuración de la aplicación.
+
+		Args:
+			app: Instancia de la aplicación Flask
+		"""
+		binds = app.config.get('SQLALCHEMY_BINDS') or {}
+		self.nombres = [n for n in app.config.get('REPLICAS_LECTURA', list(binds)) if n in binds]
+		self.activo = bool(self.nombres) and app.config.get('REPLICAS_ACTIVAS', True)
+		self.expulsion = app.config.get('REPLICAS_EXPULSION_SEGUNDOS', 30.0)
+		self._expulsadas.clear()
+		with app.app_context():
+			engines = app.extensions['sqlalchemy'].engines
+			for nombre in self.nombres:
+				self._vigilar(engines[nombre], nombre)
+		app.extensions['replicas'] = self
+
+	def _vigilar(self, engine, nombre: str):
+		"""Expulsa la réplica cuando una conexión o consulta falla en ella."""
+		if engine in _vigilados:
+			return
+		_vigilados.add(engine)
+
+		@event.listens_for(engine, 'handle_error')
+		def _al_fallar(contexto):
+			if contexto.is_disconnect or isinstance(contexto.sqlalchemy_exception, exc.OperationalError):
+				self.expulsar(nombre, contexto.original_exception)
+
+	def expulsar(self, nombre: str, motivo=None):
+		"""Retira una réplica del reparto durante el periodo de expulsión."""
+		with self._lock:
+			self._expulsadas[nombre] = time.monotonic() + self.expulsion
+			self.expulsiones += 1
+		logger.warning(f"Réplica {nombre} expulsada durante {self.expulsion:.0f} s: {motivo}")
+
+	def sanas(self) -> List[str]:
+		"""Réplicas que no están expulsadas."""
+		ahora = time.monotonic()
+		with self._lock:
+			return [n for n in self.nombres if self._expulsadas.get(n, 0) <= ahora]
+
+	def siguiente(self) -> Optional[str]:
+		"""Siguiente réplica sana por turnos, o None si no hay ninguna."""
+		sanas = self.sanas()
+		if not sanas:
+			return None
+		with self._lock:
+			self._turno += 1
+			return sanas[self._turno % len(sanas)]
+
+	def elegir(self, sesion, clause) -> Optional[str]:
+		"""
+		Decide si una sentencia puede ir a una réplica.
+
+		Returns:
+			Optional[str]: Nombre del bind de la réplica o None para la primaria
+		"""
+		if not self.activo or _modo.get() != 'lectura':
+			return None
+		if not isinstance(clause, Select) or clause._for_update_arg is not None:
+			return None
+		if sesion.info.get('escrituras') or sesion.new or sesion.dirty or sesion.deleted:
+			with self._lock:
+				self.lecturas_primaria += 1
+			return None
+		nombre = self.siguiente()
+		with self._lock:
+			if nombre is None:
+				self.lecturas_primaria += 1
+			else:
+				self.lecturas_replica += 1
+		usada = _replica_usada.get()
+		if usada is not None and nombre is not None:
+			usada.append(nombre)
+		return nombre
+
+	def estadisticas(self) -> Dict[str, object]:
+		"""
+		Devuelve el estado de las réplicas.
+
+		Returns:
+			dict: Réplicas configuradas y sanas, lecturas por destino,
+			expulsiones y reintentos en la primaria
+		"""
+		return {
+			'activo': self.activo,
+			'replicas': list(self.nombres),
+			'sanas': self.sanas(),
+			'lecturas_replica': self.lecturas_replica,
+			'lecturas_primaria': self.lecturas_primaria,
+			'expulsiones': self.expulsiones,
+			'reintentos': self.reintentos
+		}
+
+
+# Instancia global, análoga a ``db`` en db_connection
+replicas = EnrutadorReplicas()
+
+
+class SesionEnrutada(Session):
+	"""Sesión de Flask-SQLAlchemy que envía las lecturas marcadas a las réplicas."""
+
+	def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+		engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+		engines = self._db.engines
+		if bind is not None or engine is not engines.get(None):
+			return engine
+		nombre = replicas.elegir(self, clause)
+		return engines[nombre] if nombre is not None else engine
+
+
+@event.listens_for(SesionEnrutada, 'after_flush')
+def _al_escribir(sesion, contexto):
+	# Las lecturas siguientes de esta sesión deben ver lo escrito
+	sesion.info['escrituras'] = True
+
+
+def solo_lectura(funcion):
+	"""
+	Marca una función cuyas consultas pueden servirse desde una réplica.
+
+	Si una réplica falla durante la llamada se expulsa y la función se repite
+	una vez contra la primaria.
+	"""
+	@wraps(funcion)
+	def envoltura(*args, **kwargs):
+		if _modo.get() == 'primaria':
+			return funcion(*args, **kwargs)
+		usadas: list = []
+		modo, usada = _modo.set('lectura'), _replica_usada.set(usadas)
+		try:
+			return funcion(*args, **kwargs)
+		except exc.DBAPIError:
+			if not usadas:
+				raise
+			from src.database.db_connection import db
+			db.session.rollback()
+			with replicas._lock:
+				replicas.reintentos += 1
+		finally:
+			_modo.reset(modo)
+			_replica_usada.reset(usada)
+		with primaria():
+			return funcion(*args, **kwargs)
+	return envoltura
+
+
+@contextmanager
+def primaria():
+	"""Fuerza que las consultas del bloque, incluidas las de solo_lectura, usen la primaria."""
+	token = _modo.set('primaria')
+	try:
+		yield
+	finally:
+		_modo.reset(token)
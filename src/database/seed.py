@@ -0,0 +1,245 @@
+"""
+Generador de datos sintéticos para poblar la base de datos.
+
+Genera un conjunto de datos coherente (todas las claves foráneas apuntan a
+filas existentes) y determinista para una semilla dada, a la escala
+indicada, insertándolo con INSERT de varias filas por lotes. Sirve para
+reproducir en local tablas de tamaño similar al de producción.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import logging
+import random
+
+from sqlalchemy import func, select
+
+from src.database.db_connection import db
+from src.database.bulk import en_lotes, insertar_lote
+from src.models.rol import Rol
+from src.models.tipo_documento import TipoDocumento
+from src.models.persona import Persona
+from src.models.tipo_gorra import TipoGorra
+from src.models.variante_gorra import VarianteGorra
+from src.models.stock_tipo_gorra import recalcular
+from src.models.gorra import Gorra
+from src.models.pedido import Pedido
+from src.models.detalle_pedido import DetallePedido
+from src.models.archivo import DetallePedidoArchivado, PedidoArchivado
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('administrador', 'vendedor', 'cliente')
+TIPOS_DOCUMENTO = ('Cédula de ciudadanía', 'Tarjeta de identidad', 'Cédula de extranjería', 'Pasaporte')
+NOMBRES_TIPO = ('Snapback', 'Trucker', 'Dad hat', 'Bucket', 'Beanie', 'Visera', 'Fitted', 'Five panel',
+				'Béisbol', 'Plana', 'Pescador', 'Boina')
+COLORES = ('negro', 'blanco', 'rojo', 'azul', 'verde', 'gris', 'beige', 'morado', 'naranja', 'amarillo')
+TALLAS = ('S', 'M', 'L', 'XL', 'Única')
+NOMBRES = ('Ana', 'Luis', 'María', 'Carlos', 'Laura', 'Andrés', 'Sofía', 'Juan', 'Valentina', 'Diego')
+APELLIDOS = ('Gómez', 'Rodríguez', 'López', 'Martínez', 'García', 'Pérez', 'Sánchez', 'Ramírez', 'Torres')
+# Distribución de estados de los pedidos (estado, probabilidad acumulada)
+ESTADOS = (('entregado', 0.70), ('enviado', 0.80), ('pendiente', 0.90), ('cancelado', 1.0))
+
+
+class ParametrosGeneracion:
+	"""Tamaños y distribuciones del conjunto de datos para una escala dada."""
+
+	def __init__(self, escala: int = 1, semilla: int = 42, sesgo_variantes: float = 1.1,
+				 sesgo_clientes: float = 0.8, dias: int = 365, hasta: Optional[datetime] = None,
+				 tamano_lote: int = 5000):
+		self.escala = escala
+		self.semilla = semilla
+		self.sesgo_variantes = sesgo_variantes
+		self.sesgo_clientes = sesgo_clientes
+		self.dias = dias
+		self.hasta = hasta or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+		self.tamano_lote = tamano_lote
+
+		self.tipos_gorra = min(len(NOMBRES_TIPO) * max(1, escala // 10 + 1), 500) if escala else 0
+		self.variantes = 200 * escala
+		self.gorras = 50 * escala
+		self.personas = 100 * escala
+		self.pedidos = 1000 * escala
+
+
+def _pesos_zipf(cantidad: int, sesgo: float, aleatorio: random.Random) -> List[float]:
+	"""
+	Pesos acumulados tipo Zipf en orden aleatorio: unos pocos elementos
+	("los más vendidos") concentran la mayoría de las apariciones.
+	"""
+	pesos = [1.0 / (rango ** sesgo) for rango in range(1, cantidad + 1)]
+	aleatorio.shuffle(pesos)
+	return list(accumulate(pesos))
+
+
+def _siguiente_id(conexion, *columnas) -> int:
+	"""Siguiente ID libre en todas las columnas (p. ej. una tabla y su archivo)."""
+	return max(conexion.execute(select(func.max(columna))).scalar() or 0 for columna in columnas) + 1
+
+
+def _asegurar_catalogo_por_nombre(conexion, tabla, columna_id, nombres) -> Dict[str, int]:
+	"""Inserta los nombres que falten y devuelve el mapa nombre -> id."""
+	existentes = dict(conexion.execute(select(tabla.c.nombre, columna_id)).all())
+	faltantes = [{'nombre': n} for n in nombres if n not in existentes]
+	insertar_lote(conexion, tabla, faltantes)
+	if faltantes:
+		existentes = dict(conexion.execute(select(tabla.c.nombre, columna_id)).all())
+	return existentes
+
+
+def _insertar(tabla, filas: Iterator[Dict[str, Any]], tamano_lote: int,
+			  progreso: Optional[Callable[[str, int], None]]) -> int:
+	"""Inserta un flujo de filas en lotes, con una transacción por lote."""
+	total = 0
+	for lote in en_lotes(filas, tamano_lote):
+		with db.engine.begin() as conexion:
+			insertar_lote(conexion, tabla, lote)
+		total += len(lote)
+		if progreso:
+			progreso(tabla.name, total)
+	return total
+
+
+def generar_datos(parametros: ParametrosGeneracion,
+				  progreso: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+	"""
+	Genera e inserta el conjunto de datos sintético.
+
+	Con escala 0 solo se insertan los datos de referencia (roles y tipos de
+	documento). Los IDs continúan a partir de los existentes, por lo que se
+	puede ejecutar sobre una base con datos.
+
+	Args:
+		parametros: Tamaños, semilla y distribuciones
+		progreso: Función opcional llamada con (tabla, filas insertadas)
+
+	Returns:
+		dict: Filas insertadas por tabla
+	"""
+	aleatorio = random.Random(parametros.semilla)
+	lote = parametros.tamano_lote
+	insertadas: Dict[str, int] = {}
+
+	with db.engine.begin() as conexion:
+		roles = _asegurar_catalogo_por_nombre(conexion, Rol.__table__, Rol.__table__.c.id_rol, ROLES)
+		tipos_doc = _asegurar_catalogo_por_nombre(
+			conexion, TipoDocumento.__table__, TipoDocumento.__table__.c.id_tipo_documento, TIPOS_DOCUMENTO)
+		inicio_tipo = _siguiente_id(conexion, TipoGorra.__table__.c.id_tipo_gorra)
+		inicio_variante = _siguiente_id(conexion, VarianteGorra.__table__.c.id_gorra)
+		inicio_gorra = _siguiente_id(conexion, Gorra.__table__.c.id_gorra)
+		inicio_persona = _siguiente_id(conexion, Persona.__table__.c.id_usuario)
+		inicio_pedido = _siguiente_id(conexion, Pedido.__table__.c.id_pedido, PedidoArchivado.__table__.c.id_pedido)
+		inicio_detalle = _siguiente_id(conexion, DetallePedido.__table__.c.id_detalle,
+									  DetallePedidoArchivado.__table__.c.id_detalle)
+	insertadas['roles'] = len(roles)
+	insertadas['tipos_documento'] = len(tipos_doc)
+	if not parametros.escala:
+		return insertadas
+
+	# Catálogo
+	ids_tipo = list(range(inicio_tipo, inicio_tipo + parametros.tipos_gorra))
+	insertadas['tipos_gorra'] = _insertar(TipoGorra.__table__, ({
+		'id_tipo_gorra': id_tipo,
+		'nombre': f"{NOMBRES_TIPO[i % len(NOMBRES_TIPO)]} {i // len(NOMBRES_TIPO) + 1}",
+		'descripcion': f"Línea {NOMBRES_TIPO[i % len(NOMBRES_TIPO)].lower()} generada"
+	} for i, id_tipo in enumerate(ids_tipo)), lote, progreso)
+
+	precios: Dict[int, Decimal] = {}
+
+	def variantes():
+		for id_gorra in range(inicio_variante, inicio_variante + parametros.variantes):
+			precio = Decimal(aleatorio.randint(20, 150) * 1000)
+			precios[id_gorra] = precio
+			yield {
+				'id_gorra': id_gorra,
+				'id_tipo_gorra': aleatorio.choice(ids_tipo),
+				'color': aleatorio.choice(COLORES),
+				'talla': aleatorio.choice(TALLAS),
+				'precio': precio,
+				'stock': aleatorio.randint(0, 500),
+				'activo': aleatorio.random() > 0.05
+			}
+	insertadas['variantes_gorra'] = _insertar(VarianteGorra.__table__, variantes(), lote, progreso)
+	# Las variantes solo usan tipos nuevos: basta con calcular sus contadores
+	with db.engine.begin() as conexion:
+		insertadas['stock_tipos_gorra'] = recalcular(conexion, ids_tipo)
+
+	insertadas['gorras'] = _insertar(Gorra.__table__, ({
+		'id_gorra': id_gorra,
+		'nombre': f"Gorra {aleatorio.choice(NOMBRES_TIPO)} {id_gorra}",
+		'descripcion': 'Gorra generada para pruebas de rendimiento',
+		'color': aleatorio.choice(COLORES),
+		'precio': float(aleatorio.randint(20, 150) * 1000),
+		'stock': aleatorio.randint(0, 500),
+		'imagen_url': None,
+		'activo': aleatorio.random() > 0.05
+	} for id_gorra in range(inicio_gorra, inicio_gorra + parametros.gorras)), lote, progreso)
+
+	# Clientes
+	id_cliente = roles['cliente']
+	id_tipos_doc = list(tipos_doc.values())
+	ids_persona = list(range(inicio_persona, inicio_persona + parametros.personas))
+	insertadas['personas'] = _insertar(Persona.__table__, ({
+		'id_usuario': id_persona,
+		'primer_nombre': aleatorio.choice(NOMBRES),
+		'segundo_nombre': None,
+		'primer_apellido': aleatorio.choice(APELLIDOS),
+		'segundo_apellido': aleatorio.choice(APELLIDOS),
+		'id_tipo_documento': aleatorio.choice(id_tipos_doc),
+		'documento': str(id_persona).zfill(10),
+		'telefono': '3' + str(aleatorio.randint(0, 999999999)).zfill(9),
+		'correo': f"cliente{id_persona}@ejemplo.com",
+		'direccion': f"Calle {aleatorio.randint(1, 200)} # {aleatorio.randint(1, 99)}-{aleatorio.randint(1, 99)}",
+		'password_hash': 'sin-clave',
+		'activo': True,
+		'fecha_registro': parametros.hasta - timedelta(days=aleatorio.randint(parametros.dias, parametros.dias * 2)),
+		'id_rol': id_cliente
+	} for id_persona in ids_persona), lote, progreso)
+
+	# Pedidos y detalles: las variantes y los clientes siguen distribuciones sesgadas
+	ids_variante = list(precios)
+	pesos_variantes = _pesos_zipf(len(ids_variante), parametros.sesgo_variantes, aleatorio)
+	pesos_clientes = _pesos_zipf(len(ids_persona), parametros.sesgo_clientes, aleatorio)
+	segundos_rango = parametros.dias * 86400
+	id_detalle = inicio_detalle
+	total_pedidos = total_detalles = 0
+
+	for bloque in en_lotes(range(inicio_pedido, inicio_pedido + parametros.pedidos), lote):
+		clientes = aleatorio.choices(ids_persona, cum_weights=pesos_clientes, k=len(bloque))
+		pedidos, detalles = [], []
+		for id_pedido, id_usuario in zip(bloque, clientes):
+			lineas = set(aleatorio.choices(ids_variante, cum_weights=pesos_variantes, k=aleatorio.randint(1, 4)))
+			total = Decimal('0')
+			for id_gorra in sorted(lineas):
+				cantidad = aleatorio.randint(1, 3)
+				total += precios[id_gorra] * cantidad
+				detalles.append({
+					'id_detalle': id_detalle,
+					'id_pedido': id_pedido,
+					'id_gorra': id_gorra,
+					'cantidad': cantidad,
+					'precio_unitario': precios[id_gorra]
+				})
+				id_detalle += 1
+			sorteo = aleatorio.random()
+			pedidos.append({
+				'id_pedido': id_pedido,
+				'id_usuario': id_usuario,
+				'fecha_pedido': parametros.hasta - timedelta(seconds=aleatorio.randint(1, segundos_rango)),
+				'estado': next(estado for estado, limite in ESTADOS if sorteo < limite),
+				'total': total
+			})
+		with db.engine.begin() as conexion:
+			insertar_lote(conexion, Pedido.__table__, pedidos)
+			for sublote in en_lotes(detalles, lote):
+				insertar_lote(conexion, DetallePedido.__table__, sublote)
+		total_pedidos += len(pedidos)
+		total_detalles += len(detalles)
+		if progreso:
+			progreso(Pedido.__tablename__, total_pedidos)
+
+	insertadas['pedidos'] = total_pedidos
+	insertadas['detalle_pedido'] = total_detalles
+	logger.info(f"Datos sintéticos generados (escala {parametros.escala}): {insertadas}")
+	return insertadas
@@ -0,0 +1,187 @@
+"""
+Versiones del catálogo para las peticiones condicionales.
+
+Cada tabla del catálogo (``gorras``, ``variantes_gorra`` y ``tipos_gorra``)
+tiene un contador que se incrementa cuando se confirma una transacción que
+la modifica a través del ORM; las escrituras con sentencias Core (reserva de stock,
+importaciones) lo incrementan de forma explícita. Con el contador y el
+instante del último cambio las rutas calculan el ETag y Last-Modified sin
+consultar las filas. Si se configura un backend compartido (la misma
+interfaz get/set/incr que usa la caché del catálogo) los contadores son
+comunes a todos los procesos; si no, el ETag incluye una marca del proceso
+para que dos procesos nunca compartan un ETag con contenidos distintos. La
+marca y los contadores locales se renuevan en cada proceso hijo tras un fork
+(gunicorn con ``preload_app``). Aun así, sin backend el Last-Modified de cada
+proceso solo refleja sus propios cambios, por lo que con varios workers hay
+que configurar ``VERSIONES_BACKEND`` (obligatorio en producción).
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Tuple
+import logging
+import os
+import secrets
+import threading
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.database.cache import crear_backend
+
+logger = logging.getLogger(__name__)
+
+TABLAS_CATALOGO = ('gorras', 'variantes_gorra', 'tipos_gorra')
+# Instancias cuya marca y contadores locales se renuevan tras un fork
+_instancias: 'weakref.WeakSet' = weakref.WeakSet()
+
+
+class VersionesCatalogo:
+	"""Contadores de cambios por tabla del catálogo."""
+
+	PREFIJO = 'catalogo:version_tabla'
+
+	def __init__(self, backend=None):
+		self.backend = backend
+		self._reiniciar()
+		_instancias.add(self)
+
+	def _reiniciar(self):
+		self._epoca = secrets.token_hex(4)
+		self._locales: Dict[str, Tuple[int, datetime]] = {}
+		self._lock = threading.Lock()
+
+	def init_app(self, app, backend=None):
+		"""
+		Configura las versiones y registra los eventos del ORM.
+
+		Args:
+			app: Instancia de la aplicación Flask
+			backend: Backend compartido opcional; por defecto el de
+				``VERSIONES_BACKEND`` ('sqlite' con ``VERSIONES_RUTA``), si lo hay
+
+		Raises:
+			RuntimeError: Si ``VERSIONES_EXIGIR_BACKEND`` está activo y no hay backend compartido
+		"""
+		if backend is None and app.config.get('VERSIONES_BACKEND'):
+			backend = crear_backend(app.config['VERSIONES_BACKEND'], app.config.get('VERSIONES_RUTA'))
+		if backend is None and app.config.get('VERSIONES_EXIGIR_BACKEND'):
+			raise RuntimeError("Las versiones del catálogo necesitan un backend compartido (VERSIONES_BACKEND) "
+							   "para que todos los workers respondan con el mismo ETag y Last-Modified")
+		self.backend = backend
+		registrar_eventos()
+		app.extensions['versiones_catalogo'] = self
+
+	def version(self, tabla: str) -> Tuple[str, datetime]:
+		"""
+		Devuelve la versión actual de una tabla.
+
+		Returns:
+			tuple: Identificador de versión (apto para un ETag) e instante UTC
+			del último cambio, sin microsegundos
+		"""
+		if self.backend is not None:
+			try:
+				numero = int(self.backend.get(f'{self.PREFIJO}:{tabla}') or 0)
+				instante = self.backend.get(f'{self.PREFIJO}:{tabla}:instante')
+				if instante is None:
+					# Se publica para que todos los procesos usen el mismo Last-Modified
+					instante = self._inicio_local(tabla)
+					self.backend.set(f'{self.PREFIJO}:{tabla}:instante', instante)
+				return f'{tabla}.{numero}', datetime.fromtimestamp(float(instante), timezone.utc)
+			except Exception as e:
+				logger.warning(f"No se pudo leer la versión de {tabla} en el backend: {e}")
+		with self._lock:
+			numero, instante = self._locales.setdefault(tabla, (0, _ahora()))
+		return f'{tabla}.{self._epoca}.{numero}', instante
+
+	def _inicio_local(self, tabla: str) -> float:
+		with self._lock:
+			return self._locales.setdefault(tabla, (0, _ahora()))[1].timestamp()
+
+	def incrementar(self, *tablas: str):
+		"""Registra un cambio confirmado en las tablas indicadas."""
+		instante = _ahora()
+		for tabla in tablas:
+			with self._lock:
+				numero, _ = self._locales.get(tabla, (0, instante))
+				self._locales[tabla] = (numero + 1, instante)
+			if self.backend is not None:
+				try:
+					self.backend.incr(f'{self.PREFIJO}:{tabla}')
+					self.backend.set(f'{self.PREFIJO}:{tabla}:instante', instante.timestamp())
+				except Exception as e:
+					logger.warning(f"No se pudo incrementar la versión de {tabla} en el backend: {e}")
+
+	def contadores(self, tablas: Iterable[str] = TABLAS_CATALOGO) -> Dict[str, Tuple[int, int]]:
+		"""
+		Cambios contados de cada tabla (por defecto las del catálogo) en el
+		backend compartido y en este proceso (sin backend, ambos son el
+		local). Si entre dos lecturas avanzan lo mismo, todos los cambios
+		intermedios se confirmaron en este proceso.
+		"""
+		contadores = {}
+		for tabla in tablas:
+			with self._lock:
+				local = self._locales.get(tabla, (0, None))[0]
+			compartido = local
+			if self.backend is not None:
+				try:
+					compartido = int(self.backend.get(f'{self.PREFIJO}:{tabla}') or 0)
+				except Exception as e:
+					logger.warning(f"No se pudo leer la versión de {tabla} en el backend: {e}")
+			contadores[tabla] = (compartido, local)
+		return contadores
+
+	def estadisticas(self) -> Dict[str, str]:
+		"""Versión actual de cada tabla del catálogo."""
+		return {tabla: self.version(tabla)[0] for tabla in TABLAS_CATALOGO}
+
+
+def _ahora() -> datetime:
+	# Last-Modified tiene resolución de segundos
+	return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+# Instancia global, análoga a ``cache_catalogo``
+versiones_catalogo = VersionesCatalogo()
+
+
+# Las tablas modificadas se acumulan durante el flush y se incrementan solo
+# cuando la transacción se confirma
+def _al_flush(session, contexto, instancias):
+	tablas = session.info.setdefault('versiones_pendientes', set())
+	for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+		tabla = getattr(objeto, '__tablename__', None)
+		if tabla in TABLAS_CATALOGO and (objeto not in session.dirty or session.is_modified(objeto)):
+			tablas.add(tabla)
+
+
+def _aplicar_pendientes(session):
+	tablas = session.info.pop('versiones_pendientes', None)
+	if tablas:
+		versiones_catalogo.incrementar(*sorted(tablas))
+
+
+def _descartar_pendientes(session, transaccion_anterior):
+	# Si solo se deshace un savepoint se mantienen: incrementar de más solo cuesta una revalidación
+	if not transaccion_anterior.nested:
+		session.info.pop('versiones_pendientes', None)
+
+
+def _reiniciar_tras_fork():
+	# El hijo no debe repetir la marca ni los contadores heredados del proceso padre
+	for versiones in list(_instancias):
+		versiones._reiniciar()
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def registrar_eventos():
+	"""Registra los eventos del ORM que incrementan las versiones (idempotente)."""
+	if not event.contains(Session, 'before_flush', _al_flush):
+		event.listen(Session, 'before_flush', _al_flush)
+		event.listen(Session, 'after_commit', _aplicar_pendientes)
+		event.listen(Session, 'after_soft_rollback', _descartar_pendientes)
+
@@ -6,3 +6,19 @@ permitiendo la importación de modelos de manera más limpia.
 """
 # Importar los modelos aquí para que estén disponibles al importar el paquete
 from .gorra import Gorra  # noqa: F401
+from .tipo_gorra import TipoGorra  # noqa: F401
+from .variante_gorra import VarianteGorra  # noqa: F401
+from .stock_tipo_gorra import StockTipoGorra  # noqa: F401
+from .rol import Rol  # noqa: F401
+from .tipo_documento import TipoDocumento  # noqa: F401
+from .persona import Persona  # noqa: F401
+from .pedido import Pedido  # noqa: F401
+from .detalle_pedido import DetallePedido  # noqa: F401
+from .usuario import Usuario  # noqa: F401
+from .venta import Venta  # noqa: F401
+from .detalle_venta import DetalleVenta  # noqa: F401
+from .marca_agua import MarcaAgua  # noqa: F401
+from .archivo import PedidoArchivado, DetallePedidoArchivado, VentaArchivada, DetalleVentaArchivada  # noqa: F401
+from .recomendacion import CoocurrenciaVariante, RecomendacionVariante  # noqa: F401
+from .resumen_venta import ResumenVentaHora, ResumenVentaDia, ResumenPedidoTipoHora, ResumenPedidoTipoDia, ResumenVentaPendiente  # noqa: F401
+from .imagen import Imagen  # noqa: F401
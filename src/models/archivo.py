@@ -0,0 +1,96 @@
+"""
+Tablas de archivo de pedidos y ventas.
+
+Guardan con las mismas columnas (y los mismos IDs) los pedidos y ventas
+antiguos ya cerrados que ``src.services.archivo`` saca de las tablas de uso
+diario. No tienen claves foráneas para poder moverse por lotes sin bloquear
+las tablas de catálogo ni de personas.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.models.marca_agua import MarcaAgua
+
+# Marca de agua con el límite de archivo: todo lo archivado es anterior a su fecha
+MARCA_ARCHIVO = 'archivo_pedidos'
+
+
+class PedidoArchivado(db.Model):
+	__tablename__ = 'pedidos_archivados'
+	__table_args__ = (
+		db.Index('ix_pedidos_archivados_usuario_fecha', 'id_usuario', 'fecha_pedido'),
+		db.Index('ix_pedidos_archivados_fecha', 'fecha_pedido'),
+	)
+
+	id_pedido = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	id_usuario = db.Column(db.Integer, nullable=False)
+	fecha_pedido = db.Column(db.DateTime)
+	estado = db.Column(db.Enum('pendiente', 'enviado', 'entregado', 'cancelado'))
+	total = db.Column(db.Numeric(10,2), nullable=False)
+	metodo_pago = db.Column(db.String(50))
+	comprobante_url = db.Column(db.String(255))
+	id_venta_origen = db.Column(db.Integer, index=True)
+	fecha_archivo = db.Column(db.DateTime, default=datetime.utcnow)
+
+	detalles = db.relationship('DetallePedidoArchivado', lazy=True, order_by='DetallePedidoArchivado.id_detalle',
+							   primaryjoin='PedidoArchivado.id_pedido == foreign(DetallePedidoArchivado.id_pedido)')
+
+
+class DetallePedidoArchivado(db.Model):
+	__tablename__ = 'detalle_pedido_archivado'
+
+	id_detalle = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	id_pedido = db.Column(db.Integer, nullable=False, index=True)
+	id_gorra = db.Column(db.Integer, nullable=False)
+	cantidad = db.Column(db.Integer, nullable=False)
+	precio_unitario = db.Column(db.Numeric(10,2), nullable=False)
+
+	variante_gorra = db.relationship('VarianteGorra', lazy=True, viewonly=True,
+									 primaryjoin='foreign(DetallePedidoArchivado.id_gorra) == VarianteGorra.id_gorra')
+
+
+class VentaArchivada(db.Model):
+	__tablename__ = 'ventas_archivadas'
+	__table_args__ = (
+		db.Index('ix_ventas_archivadas_usuario_fecha', 'id_usuario', 'fecha_venta'),
+		db.Index('ix_ventas_archivadas_fecha', 'fecha_venta'),
+	)
+
+	id_venta = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	id_usuario = db.Column(db.Integer, nullable=False)
+	fecha_venta = db.Column(db.DateTime)
+	total = db.Column(db.Float, nullable=False)
+	metodo_pago = db.Column(db.String(50), nullable=False)
+	comprobante_url = db.Column(db.String(255))
+	estado = db.Column(db.String(20))
+	fecha_archivo = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class DetalleVentaArchivada(db.Model):
+	__tablename__ = 'detalle_venta_archivada'
+
+	id_detalle = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	id_venta = db.Column(db.Integer, nullable=False, index=True)
+	id_gorra = db.Column(db.Integer, nullable=False)
+	cantidad = db.Column(db.Integer, nullable=False)
+	precio_unitario = db.Column(db.Float, nullable=False)
+
+
+def limite_archivo(conexion) -> Optional[datetime]:
+	"""
+	Fecha antes de la cual puede haber pedidos o ventas archivados.
+
+	Returns:
+		Optional[datetime]: None si nunca se ha archivado nada
+	"""
+	marcas = MarcaAgua.__table__
+	return conexion.execute(select(marcas.c.valor).where(marcas.c.nombre == MARCA_ARCHIVO)).scalar()
+
+
+def incluye_archivo(conexion, desde: Optional[datetime]) -> bool:
+	"""Indica si un rango que empieza en ``desde`` (None: sin límite) alcanza el archivo."""
+	limite = limite_archivo(conexion)
+	return limite is not None and (desde is None or desde < limite)
@@ -0,0 +1,10 @@
+from src.database.db_connection import db
+
+class DetalleVenta(db.Model):
+	__tablename__ = 'detalle_venta'
+
+	id_detalle = db.Column(db.Integer, primary_key=True)
+	id_venta = db.Column(db.Integer, db.ForeignKey('ventas.id_venta'), nullable=False)
+	id_gorra = db.Column(db.Integer, db.ForeignKey('gorras.id_gorra'), nullable=False)
+	cantidad = db.Column(db.Integer, nullable=False)
+	precio_unitario = db.Column(db.Float, nullable=False)
@@ -1,21 +1,44 @@
 """
 Módulo que define el modelo Gorra y sus operaciones CRUD.
 """
-from typing import List, Optional, Dict, Any
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean
-from sqlalchemy.orm import validates
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, and_, or_
+from sqlalchemy.orm import validates, make_transient_to_detached
+import base64
+import json
 import logging
 import os
-from werkzeug.utils import secure_filename
 from datetime import datetime
 
 from src.database.db_connection import db
+from src.database.cache import cache_catalogo
+from src.database.replicas import solo_lectura
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
 
+
+# Reglas de validación compartidas con las cargas masivas
+def validar_precio(precio):
+	"""Valida que el precio sea mayor que cero."""
+	if precio <= 0:
+		raise ValueError("El precio debe ser mayor que cero")
+	return precio
+
+
+def validar_stock(stock):
+	"""Valida que el stock no sea negativo."""
+	if stock < 0:
+		raise ValueError("El stock no puede ser negativo")
+	return stock
+
+
 class Gorra(db.Model):
 	__tablename__ = 'gorras'
+	__table_args__ = (
+		# Índice para la paginación por cursor del catálogo (ver obtener_pagina)
+		db.Index('ix_gorras_activo_nombre_id', 'activo', 'nombre', 'id_gorra'),
+	)
 
 	id_gorra = db.Column(db.Integer, primary_key=True)
 	nombre = db.Column(db.String(100), nullable=False)
@@ -25,21 +48,19 @@ class Gorra(db.Model):
 	stock = db.Column(db.Integer, nullable=False)
 	imagen_url = db.Column(db.String(255))
 	activo = db.Column(db.Boolean, default=True)
+	fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+	fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 	detalles_venta = db.relationship('DetalleVenta', backref='gorra', lazy=True)
 
 	# Validaciones
 	@validates('precio')
 	def validate_precio(self, key, precio):
-		if precio <= 0:
-			raise ValueError("El precio debe ser mayor que cero")
-		return precio
+		return validar_precio(precio)
 
 	@validates('stock')
 	def validate_stock(self, key, stock):
-		if stock < 0:
-			raise ValueError("El stock no puede ser negativo")
-		return stock
+		return validar_stock(stock)
 
 	# Métodos CRUD
 	@classmethod
@@ -62,6 +83,7 @@ class Gorra(db.Model):
 			gorra = cls(**datos)
 			db.session.add(gorra)
 			db.session.commit()
+			cache_catalogo.invalidar(gorra.id_gorra)
 			logger.info(f"Gorra creada exitosamente: {gorra.nombre}")
 			return gorra
 		except Exception as e:
@@ -80,7 +102,14 @@ class Gorra(db.Model):
 		Returns:
 			Optional[Gorra]: La gorra encontrada o None si no existe
 		"""
-		return cls.query.get(id_gorra)
+		datos = cache_catalogo.gorra(id_gorra, lambda: cls._consultar_por_id(id_gorra))
+		return cls._desde_cache(datos) if datos is not None else None
+
+	@classmethod
+	@solo_lectura
+	def _consultar_por_id(cls, id_gorra: int) -> Optional[Dict[str, Any]]:
+		gorra = cls.query.get(id_gorra)
+		return gorra._a_cache() if gorra is not None else None
 
 	@classmethod
 	def obtener_todas(cls, activas: bool = True) -> List['Gorra']:
@@ -93,10 +122,90 @@ class Gorra(db.Model):
 		Returns:
 			List[Gorra]: Lista de gorras
 		"""
+		datos = cache_catalogo.listado(('todas', activas), lambda: cls._consultar_todas(activas))
+		return [cls._desde_cache(d) for d in datos]
+
+	@classmethod
+	@solo_lectura
+	def _consultar_todas(cls, activas: bool) -> List[Dict[str, Any]]:
 		query = cls.query
 		if activas:
 			query = query.filter_by(activo=True)
-		return query.order_by(cls.nombre).all()
+		return [g._a_cache() for g in query.order_by(cls.nombre).all()]
+
+	@classmethod
+	def obtener_pagina(cls, limite: int = 50, cursor: Optional[str] = None,
+					   activas: Optional[bool] = True,
+					   color: Optional[str] = None) -> Tuple[List['Gorra'], Optional[str]]:
+		"""
+		Obtiene una página del catálogo usando paginación por cursor sobre
+		(nombre, id_gorra), de modo que una página profunda cuesta lo mismo
+		que la primera.
+
+		Args:
+			limite: Número máximo de gorras por página
+			cursor: Token de continuación devuelto por la página anterior
+			activas: Filtra por el campo activo; None no aplica filtro
+			color: Filtra por color si se proporciona
+
+		Returns:
+			Tuple[List[Gorra], Optional[str]]: Gorras de la página y token
+			de continuación, o None si no hay más resultados
+
+		Raises:
+			ValueError: Si el límite o el cursor no son válidos
+		"""
+		if limite <= 0:
+			raise ValueError("El límite debe ser mayor que cero")
+
+		datos, siguiente = cache_catalogo.listado(
+			('pagina', limite, cursor, activas, color),
+			lambda: cls._consultar_pagina(limite, cursor, activas, color)
+		)
+		return [cls._desde_cache(d) for d in datos], siguiente
+
+	@classmethod
+	@solo_lectura
+	def _consultar_pagina(cls, limite: int, cursor: Optional[str], activas: Optional[bool],
+						  color: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+		query = cls.query
+		if activas is not None:
+			query = query.filter(cls.activo == activas)
+		if color:
+			query = query.filter(cls.color == color)
+		if cursor:
+			nombre, id_gorra = cls._decodificar_cursor(cursor)
+			query = query.filter(or_(
+				cls.nombre > nombre,
+				and_(cls.nombre == nombre, cls.id_gorra > id_gorra)
+			))
+
+		# Se pide una fila extra para saber si existe una página siguiente
+		gorras = query.order_by(cls.nombre, cls.id_gorra).limit(limite + 1).all()
+		siguiente = None
+		if len(gorras) > limite:
+			gorras = gorras[:limite]
+			ultima = gorras[-1]
+			siguiente = cls._codificar_cursor(ultima.nombre, ultima.id_gorra)
+		return [g._a_cache() for g in gorras], siguiente
+
+	@staticmethod
+	def _codificar_cursor(nombre: str, id_gorra: int) -> str:
+		"""Codifica la posición (nombre, id_gorra) como token opaco."""
+		datos = json.dumps([nombre, id_gorra], separators=(',', ':')).encode('utf-8')
+		return base64.urlsafe_b64encode(datos).decode('ascii').rstrip('=')
+
+	@staticmethod
+	def _decodificar_cursor(cursor: str) -> Tuple[str, int]:
+		"""Decodifica un token generado por _codificar_cursor."""
+		try:
+			relleno = '=' * (-len(cursor) % 4)
+			nombre, id_gorra = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+			if not isinstance(nombre, str) or not isinstance(id_gorra, int):
+				raise TypeError
+			return nombre, id_gorra
+		except (ValueError, TypeError):
+			raise ValueError("Cursor de paginación inválido")
 
 	def actualizar(self, datos: Dict[str, Any]) -> 'Gorra':
 		"""
@@ -109,6 +218,12 @@ class Gorra(db.Model):
 			Gorra: La gorra actualizada
 		"""
 		try:
+			# Sustituir la imagen liberando la referencia a la anterior
+			if datos.get('imagen'):
+				imagen_url = self._guardar_imagen(datos.pop('imagen'))
+				self._eliminar_imagen()
+				datos['imagen_url'] = imagen_url
+
 			# Actualizar campos
 			for campo, valor in datos.items():
 				if hasattr(self, campo) and campo != 'id_gorra':
@@ -118,6 +233,7 @@ class Gorra(db.Model):
 			self.fecha_actualizacion = datetime.utcnow()
 
 			db.session.commit()
+			cache_catalogo.invalidar(self.id_gorra)
 			logger.info(f"Gorra actualizada: {self.id_gorra}")
 			return self
 		except Exception as e:
@@ -136,6 +252,7 @@ class Gorra(db.Model):
 
 			db.session.delete(self)
 			db.session.commit()
+			cache_catalogo.invalidar(self.id_gorra)
 			logger.info(f"Gorra eliminada: {self.id_gorra}")
 		except Exception as e:
 			db.session.rollback()
@@ -149,41 +266,59 @@ class Gorra(db.Model):
 		self.activo = False
 		self.fecha_actualizacion = datetime.utcnow()
 		db.session.commit()
+		cache_catalogo.invalidar(self.id_gorra)
 		logger.info(f"Gorra desactivada: {self.id_gorra}")
 
+	# Métodos de utilidad para la caché del catálogo
+	def _a_cache(self) -> Dict[str, Any]:
+		"""
+		Extrae las columnas mapeadas en un diccionario apto para la caché; las
+		fechas se guardan en ISO 8601 para que el backend pueda serializarlo a JSON.
+		"""
+		datos = {}
+		for attr in self.__mapper__.column_attrs:
+			valor = getattr(self, attr.key)
+			datos[attr.key] = valor.isoformat() if isinstance(valor, datetime) else valor
+		return datos
+
+	@classmethod
+	def _desde_cache(cls, datos: Dict[str, Any]) -> 'Gorra':
+		"""
+		Reconstruye una gorra a partir de datos en caché y la asocia a la
+		sesión actual sin consultar la base de datos.
+		"""
+		datos = dict(datos)
+		for campo in ('fecha_creacion', 'fecha_actualizacion'):
+			if isinstance(datos.get(campo), str):
+				datos[campo] = datetime.fromisoformat(datos[campo])
+		gorra = cls(**datos)
+		make_transient_to_detached(gorra)
+		return db.session.merge(gorra, load=False)
+
 	# Métodos de utilidad para manejo de imágenes
 	@staticmethod
 	def _guardar_imagen(imagen) -> str:
 		"""
-		Guarda la imagen en el sistema de archivos y devuelve la ruta relativa.
+		Guarda la imagen direccionada por su contenido y suma una referencia.
 
 		Args:
 			imagen: Objeto FileStorage de Flask
 
 		Returns:
-			str: Ruta relativa de la imagen guardada
+			str: URL inmutable de la imagen guardada
 		"""
-		from flask import current_app
-
-		# Crear nombre de archivo seguro
-		filename = secure_filename(imagen.filename)
-		# Añadir timestamp para evitar colisiones
-		unique_filename = f"{datetime.now().timestamp()}_{filename}"
-
-		# Crear directorio de subidas si no existe
-		upload_folder = os.path.join(current_app.root_path, '..', 'static', 'uploads')
-		os.makedirs(upload_folder, exist_ok=True)
-
-		# Guardar la imagen
-		filepath = os.path.join(upload_folder, unique_filename)
-		imagen.save(filepath)
-
-		# Devolver ruta relativa para almacenar en la base de datos
-		return os.path.join('static', 'uploads', unique_filename)
+		from src.services.imagenes import guardar_imagen
+		return guardar_imagen(imagen)
 
 	def _eliminar_imagen(self):
-		"""Elimina la imagen asociada a la gorra del sistema de archivos."""
-		if self.imagen_url:
+		"""
+		Libera la referencia de la gorra a su imagen; los archivos se borran
+		al confirmar la transacción si ninguna otra gorra la usa.
+		"""
+		from src.services.imagenes import liberar_imagen
+
+		if self.imagen_url and not liberar_imagen(self.imagen_url):
+			# Imágenes antiguas guardadas por nombre en static/uploads
 			try:
 				filepath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), self.imagen_url)
 				if os.path.exists(filepath):
@@ -204,6 +339,8 @@ class Gorra(db.Model):
 		Returns:
 			dict: Diccionario con los datos de la gorra
 		"""
+		from src.services.imagenes import urls_imagen
+
 		return {
 			'id_gorra': self.id_gorra,
 			'nombre': self.nombre,
@@ -212,7 +349,8 @@ class Gorra(db.Model):
 			'color': self.color,
 			'stock': self.stock,
 			'imagen_url': self.imagen_url,
-			'fecha_creacion': self.fecha_creacion.isoformat(),
-			'fecha_actualizacion': self.fecha_actualizacion.isoformat(),
+			'imagenes': urls_imagen(self.imagen_url),
+			'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+			'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
 			'activo': self.activo
 		}
@@ -0,0 +1,12 @@
+from src.database.db_connection import db
+from datetime import datetime
+
+class Imagen(db.Model):
+	"""Imagen subida, direccionada por el SHA-256 de su contenido y con contador de referencias."""
+	__tablename__ = 'imagenes'
+
+	hash_sha256 = db.Column(db.String(64), primary_key=True)
+	extension = db.Column(db.String(10), nullable=False)
+	tamano = db.Column(db.Integer, nullable=False)
+	referencias = db.Column(db.Integer, nullable=False, default=0)
+	fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,20 @@
+from src.database.db_connection import db
+from datetime import datetime
+
+class MarcaAgua(db.Model):
+	"""Punto de avance de un proceso incremental (fecha y/o último ID procesado)."""
+	__tablename__ = 'marcas_agua'
+
+	nombre = db.Column(db.String(50), primary_key=True)
+	valor = db.Column(db.DateTime)
+	ultimo_id = db.Column(db.Integer)
+	fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+	@classmethod
+	def obtener(cls, nombre: str) -> 'MarcaAgua':
+		"""Devuelve la marca con ese nombre, creándola vacía si no existe."""
+		marca = db.session.get(cls, nombre)
+		if marca is None:
+			marca = cls(nombre=nombre)
+			db.session.add(marca)
+		return marca
@@ -9,5 +9,9 @@ class Pedido(db.Model):
 	fecha_pedido = db.Column(db.DateTime, default=datetime.utcnow)
 	estado = db.Column(db.Enum('pendiente', 'enviado', 'entregado', 'cancelado'), default='pendiente')
 	total = db.Column(db.Numeric(10,2), nullable=False)
+	metodo_pago = db.Column(db.String(50))
+	comprobante_url = db.Column(db.String(255))
+	# Venta de la que procede el pedido al consolidar usuarios/ventas en personas/pedidos
+	id_venta_origen = db.Column(db.Integer, unique=True)
 
 	detalles = db.relationship('DetallePedido', backref='pedido', lazy=True) 
\ No newline at end of file
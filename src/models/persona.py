@@ -10,13 +10,15 @@ class Persona(db.Model):
 	primer_apellido = db.Column(db.String(50), nullable=False)
 	segundo_apellido = db.Column(db.String(50))
 	id_tipo_documento = db.Column(db.Integer, db.ForeignKey('tipos_documento.id_tipo_documento'), nullable=False)
-	documento = db.Column(db.String(10), nullable=False)
-	telefono = db.Column(db.String(10), nullable=False)
+	documento = db.Column(db.String(20), nullable=False)
+	telefono = db.Column(db.String(20), nullable=False)
 	correo = db.Column(db.String(100), unique=True, nullable=False)
-	direccion = db.Column(db.String(50), nullable=False)
-	password_hash = db.Column(db.String(50), nullable=False)
+	direccion = db.Column(db.String(200), nullable=False)
+	password_hash = db.Column(db.String(255), nullable=False)
 	activo = db.Column(db.Boolean, default=True)
 	fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
 	id_rol = db.Column(db.Integer, db.ForeignKey('roles.id_rol'), nullable=False)
+	# Usuario del que procede la persona al consolidar usuarios/ventas en personas/pedidos
+	id_usuario_origen = db.Column(db.Integer, unique=True)
 
 	pedidos = db.relationship('Pedido', backref='persona', lazy=True) 
\ No newline at end of file
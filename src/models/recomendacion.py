@@ -0,0 +1,30 @@
+"""
+Recomendaciones "comprados juntos" por variante de gorra.
+
+``coocurrencias_variante`` guarda en cuántos pedidos aparecen juntas dos
+variantes, solo una vez por par (``id_gorra <= id_relacionada``); la
+diagonal (``id_gorra == id_relacionada``) es el número de pedidos de la
+variante. ``recomendaciones_variante`` guarda las K variantes más compradas
+junto a cada una, de modo que la consulta de una página es una sola lectura
+por clave primaria. Ambas las mantiene ``src.services.recomendaciones``.
+"""
+from src.database.db_connection import db
+
+
+class CoocurrenciaVariante(db.Model):
+	__tablename__ = 'coocurrencias_variante'
+
+	id_gorra = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	id_relacionada = db.Column(db.Integer, primary_key=True, index=True)
+	pedidos = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RecomendacionVariante(db.Model):
+	__tablename__ = 'recomendaciones_variante'
+
+	id_gorra = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	posicion = db.Column(db.Integer, primary_key=True, autoincrement=False)
+	id_relacionada = db.Column(db.Integer, nullable=False)
+	pedidos = db.Column(db.Integer, nullable=False)
+	# Fracción de los pedidos de la variante que incluyen también la relacionada
+	confianza = db.Column(db.Float, nullable=False)
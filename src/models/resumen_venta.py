@@ -0,0 +1,85 @@
+"""
+Tablas de resumen (rollups) de ventas por hora y por día.
+
+Las filas de origen 'pedido' se agrupan por variante y tipo de gorra; las de
+origen 'venta' (modelo Venta) usan 0 como variante y tipo. Como un pedido
+puede incluir varias variantes, sus filas no se pueden sumar para contar
+pedidos por tipo o en total: esos recuentos se guardan aparte en
+``resumen_pedidos_tipo_hora`` y ``resumen_pedidos_tipo_dia``.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
+
+from src.database.db_connection import db
+from .pedido import Pedido
+from .venta import Venta
+
+
+class ResumenVentaHora(db.Model):
+	__tablename__ = 'resumen_ventas_hora'
+
+	periodo = db.Column(db.DateTime, primary_key=True)
+	origen = db.Column(db.String(10), primary_key=True)
+	id_gorra = db.Column(db.Integer, primary_key=True)
+	id_tipo_gorra = db.Column(db.Integer, nullable=False, index=True)
+	num_pedidos = db.Column(db.Integer, nullable=False, default=0)
+	num_cancelados = db.Column(db.Integer, nullable=False, default=0)
+	unidades = db.Column(db.Integer, nullable=False, default=0)
+	ingresos = db.Column(db.Numeric(12,2), nullable=False, default=0)
+
+
+class ResumenVentaDia(db.Model):
+	__tablename__ = 'resumen_ventas_dia'
+
+	periodo = db.Column(db.Date, primary_key=True)
+	origen = db.Column(db.String(10), primary_key=True)
+	id_gorra = db.Column(db.Integer, primary_key=True)
+	id_tipo_gorra = db.Column(db.Integer, nullable=False, index=True)
+	num_pedidos = db.Column(db.Integer, nullable=False, default=0)
+	num_cancelados = db.Column(db.Integer, nullable=False, default=0)
+	unidades = db.Column(db.Integer, nullable=False, default=0)
+	ingresos = db.Column(db.Numeric(12,2), nullable=False, default=0)
+
+
+class ResumenPedidoTipoHora(db.Model):
+	"""Pedidos distintos por hora y tipo de gorra (tipo 0: todos los tipos)."""
+	__tablename__ = 'resumen_pedidos_tipo_hora'
+
+	periodo = db.Column(db.DateTime, primary_key=True)
+	id_tipo_gorra = db.Column(db.Integer, primary_key=True)
+	num_pedidos = db.Column(db.Integer, nullable=False, default=0)
+	num_cancelados = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ResumenPedidoTipoDia(db.Model):
+	"""Pedidos distintos por día y tipo de gorra (tipo 0: todos los tipos)."""
+	__tablename__ = 'resumen_pedidos_tipo_dia'
+
+	periodo = db.Column(db.Date, primary_key=True)
+	id_tipo_gorra = db.Column(db.Integer, primary_key=True)
+	num_pedidos = db.Column(db.Integer, nullable=False, default=0)
+	num_cancelados = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ResumenVentaPendiente(db.Model):
+	"""Horas cuyo resumen debe recalcularse por un cambio tardío de estado."""
+	__tablename__ = 'resumen_ventas_pendientes'
+
+	id = db.Column(db.Integer, primary_key=True)
+	periodo = db.Column(db.DateTime, nullable=False)
+
+
+def _registrar_cambio_estado(campo_fecha):
+	def _despues_de_actualizar(mapper, connection, target):
+		fecha = getattr(target, campo_fecha)
+		if fecha is not None and attributes.get_history(target, 'estado').has_changes():
+			connection.execute(
+				ResumenVentaPendiente.__table__.insert(),
+				{'periodo': fecha.replace(minute=0, second=0, microsecond=0)}
+			)
+	return _despues_de_actualizar
+
+
+# Un cambio de estado (p. ej. una cancelación) invalida la hora del pedido/venta
+event.listen(Pedido, 'after_update', _registrar_cambio_estado('fecha_pedido'))
+event.listen(Venta, 'after_update', _registrar_cambio_estado('fecha_venta'))
@@ -0,0 +1,192 @@
+"""
+Contadores de disponibilidad por tipo de gorra, color y talla.
+
+Cada fila guarda el stock de las variantes activas y cuántas variantes
+activas hay para una combinación (tipo, color, talla). Se mantienen de forma
+incremental en la misma transacción que el cambio de stock o de ``activo``:
+los eventos del ORM de este módulo cubren las escrituras con objetos, y las
+escrituras con sentencias Core (reserva de stock, actualización masiva,
+importación) llaman a ``aplicar_deltas`` o ``recalcular`` de forma explícita.
+Una variante con ``activo`` nulo cuenta como activa, igual que en la reserva
+de stock.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, case, delete, event, func, insert, select, tuple_, update
+from sqlalchemy.orm import attributes
+
+from src.database.bulk import upsert_lote
+from src.database.db_connection import db
+from .variante_gorra import VarianteGorra
+
+Clave = Tuple[int, str, str]
+
+CAMPOS_VARIANTE = ('id_tipo_gorra', 'color', 'talla', 'stock', 'activo')
+
+
+class StockTipoGorra(db.Model):
+	__tablename__ = 'stock_tipos_gorra'
+
+	id_tipo_gorra = db.Column(db.Integer, primary_key=True)
+	color = db.Column(db.String(50), primary_key=True)
+	talla = db.Column(db.String(10), primary_key=True)
+	stock = db.Column(db.Integer, nullable=False, default=0)
+	variantes_activas = db.Column(db.Integer, nullable=False, default=0)
+
+
+def contribucion(stock: Optional[int], activo: Optional[bool]) -> Tuple[int, int]:
+	"""Aporte de una variante a su contador: (stock, variantes activas)."""
+	if activo is False:
+		return 0, 0
+	return stock or 0, 1
+
+
+def acumular(deltas: Dict[Clave, Tuple[int, int]], clave: Clave, stock: Optional[int],
+			 activo: Optional[bool], signo: int = 1):
+	"""Suma (o resta con ``signo=-1``) el aporte de una variante a ``deltas``."""
+	d_stock, d_activas = contribucion(stock, activo)
+	actual = deltas.get(clave, (0, 0))
+	deltas[clave] = (actual[0] + signo * d_stock, actual[1] + signo * d_activas)
+
+
+def _sumar_deltas():
+	"""UPDATE que suma un delta a una fila; se envía con executemany."""
+	tabla = StockTipoGorra.__table__
+	return update(tabla).where(
+		tabla.c.id_tipo_gorra == bindparam('b_id_tipo_gorra'),
+		tabla.c.color == bindparam('b_color'),
+		tabla.c.talla == bindparam('b_talla')
+	).values(
+		stock=tabla.c.stock + bindparam('b_stock'),
+		variantes_activas=tabla.c.variantes_activas + bindparam('b_variantes_activas')
+	)
+
+
+_SUMAR_DELTAS = _sumar_deltas()
+
+
+def aplicar_deltas(conexion, deltas: Dict[Clave, Tuple[int, int]]):
+	"""
+	Aplica incrementos a los contadores dentro de la transacción en curso.
+
+	Todas las claves van en un único UPDATE con executemany, recorridas en
+	orden para que dos transacciones bloqueen las filas siempre en el mismo
+	orden. Si a alguna combinación aún le falta la fila (primera variante),
+	se crea después con un upsert.
+
+	Args:
+		conexion: Conexión dentro de la transacción que modifica las variantes
+		deltas: (id_tipo_gorra, color, talla) -> (delta de stock, delta de activas)
+	"""
+	filas = [
+		{'b_id_tipo_gorra': id_tipo, 'b_color': color, 'b_talla': talla, 'b_stock': d_stock,
+		 'b_variantes_activas': d_activas}
+		for (id_tipo, color, talla), (d_stock, d_activas) in sorted(deltas.items())
+		if d_stock or d_activas
+	]
+	if not filas or conexion.execute(_SUMAR_DELTAS, filas).rowcount == len(filas):
+		return
+
+	# El UPDATE ya ha sumado en las filas existentes; las que faltan se crean y,
+	# si otra transacción las ha creado a la vez, el upsert suma sobre ellas
+	tabla = StockTipoGorra.__table__
+	existentes = set(conexion.execute(
+		select(tabla.c.id_tipo_gorra, tabla.c.color, tabla.c.talla).where(
+			tuple_(tabla.c.id_tipo_gorra, tabla.c.color, tabla.c.talla).in_(
+				[(f['b_id_tipo_gorra'], f['b_color'], f['b_talla']) for f in filas]))
+	).all())
+	upsert_lote(conexion, tabla, [
+		{c[2:]: v for c, v in fila.items()} for fila in filas
+		if (fila['b_id_tipo_gorra'], fila['b_color'], fila['b_talla']) not in existentes
+	], columnas_actualizar=(), columnas_sumar=('stock', 'variantes_activas'))
+
+
+def agregado_variantes(ids_tipo: Optional[Iterable[int]] = None):
+	"""Consulta que calcula los contadores a partir de ``variantes_gorra``."""
+	variantes = VarianteGorra.__table__
+	activa = variantes.c.activo.is_not(False)
+	consulta = select(
+		variantes.c.id_tipo_gorra, variantes.c.color, variantes.c.talla,
+		func.coalesce(func.sum(case((activa, variantes.c.stock), else_=0)), 0).label('stock'),
+		func.coalesce(func.sum(case((activa, 1), else_=0)), 0).label('variantes_activas')
+	).group_by(variantes.c.id_tipo_gorra, variantes.c.color, variantes.c.talla)
+	if ids_tipo is not None:
+		consulta = consulta.where(variantes.c.id_tipo_gorra.in_(list(ids_tipo)))
+	return consulta
+
+
+def recalcular(conexion, ids_tipo: Optional[Iterable[int]] = None) -> int:
+	"""
+	Reconstruye los contadores de los tipos indicados (o de todos) a partir
+	de las variantes, dentro de la transacción en curso.
+
+	Returns:
+		int: Filas de contador escritas
+	"""
+	tabla = StockTipoGorra.__table__
+	if ids_tipo is not None:
+		ids_tipo = sorted(set(ids_tipo))
+		if not ids_tipo:
+			return 0
+	borrado = delete(tabla)
+	if ids_tipo is not None:
+		borrado = borrado.where(tabla.c.id_tipo_gorra.in_(ids_tipo))
+	conexion.execute(borrado)
+	filas = [dict(fila._mapping) for fila in conexion.execute(agregado_variantes(ids_tipo))]
+	if filas:
+		conexion.execute(insert(tabla), filas)
+	return len(filas)
+
+
+def _anteriores(target) -> Dict[str, object]:
+	"""Valores de los campos del contador antes de los cambios pendientes."""
+	valores = {}
+	for campo in CAMPOS_VARIANTE:
+		historia = attributes.get_history(target, campo)
+		valores[campo] = historia.deleted[0] if historia.deleted else getattr(target, campo)
+	return valores
+
+
+def _cambio(deltas: Dict[Clave, Tuple[int, int]], valores: Dict[str, object], signo: int):
+	clave = (valores['id_tipo_gorra'], valores['color'], valores['talla'])
+	acumular(deltas, clave, valores['stock'], valores['activo'], signo)
+
+
+def _actuales(target) -> Dict[str, object]:
+	return {campo: getattr(target, campo) for campo in CAMPOS_VARIANTE}
+
+
+def _despues_de_insertar(mapper, connection, target):
+	deltas: Dict[Clave, Tuple[int, int]] = {}
+	_cambio(deltas, _actuales(target), 1)
+	aplicar_deltas(connection, deltas)
+
+
+def _despues_de_actualizar(mapper, connection, target):
+	if not any(attributes.get_history(target, campo).has_changes() for campo in CAMPOS_VARIANTE):
+		return
+	deltas: Dict[Clave, Tuple[int, int]] = {}
+	_cambio(deltas, _anteriores(target), -1)
+	_cambio(deltas, _actuales(target), 1)
+	aplicar_deltas(connection, deltas)
+
+
+def _antes_de_borrar(mapper, connection, target):
+	# Antes del DELETE, para poder cargar los valores si estaban expirados
+	deltas: Dict[Clave, Tuple[int, int]] = {}
+	_cambio(deltas, _anteriores(target), -1)
+	aplicar_deltas(connection, deltas)
+
+
+def _conservar_anterior(target, valor, anterior, iniciador):
+	return valor
+
+
+# Con active_history el ORM carga el valor anterior aunque el atributo
+# estuviera expirado, de modo que el historial siempre permite restar el aporte
+# previo de la variante
+for _campo in CAMPOS_VARIANTE:
+	event.listen(getattr(VarianteGorra, _campo), 'set', _conservar_anterior, active_history=True, retval=True)
+event.listen(VarianteGorra, 'after_insert', _despues_de_insertar)
+event.listen(VarianteGorra, 'after_update', _despues_de_actualizar)
+event.listen(VarianteGorra, 'before_delete', _antes_de_borrar)
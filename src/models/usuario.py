@@ -10,7 +10,7 @@ class Usuario(db.Model):
 	telefono = db.Column(db.String(20), nullable=False)
 	correo = db.Column(db.String(100), unique=True, nullable=False)
 	direccion = db.Column(db.String(200), nullable=False)
-	password_hash = db.Column(db.String(128), nullable=False)
+	password_hash = db.Column(db.String(255), nullable=False)
 	rol = db.Column(db.String(20), nullable=False, default='cliente')
 	fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
 	activo = db.Column(db.Boolean, default=True)
@@ -0,0 +1,3 @@
+"""
+Paquete que contiene las rutas (blueprints) de la aplicación.
+"""
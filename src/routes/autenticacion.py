@@ -0,0 +1,48 @@
+"""
+Rutas de inicio y cierre de sesión.
+
+El token se devuelve en el cuerpo (para clientes de la API, con
+``Authorization: Bearer``) y en una cookie HttpOnly para el navegador.
+"""
+from flask import Blueprint, jsonify, request
+
+from src.services.autenticacion import (CredencialesInvalidasError, ServicioSaturadoError, autenticacion,
+										requiere_sesion)
+
+autenticacion_bp = Blueprint('autenticacion', __name__, url_prefix='/api/auth')
+
+
+@autenticacion_bp.route('/login', methods=['POST'])
+def login():
+	"""Verifica correo y contraseña y emite el token de sesión."""
+	datos = request.get_json(silent=True) or {}
+	correo, password = datos.get('correo'), datos.get('password')
+	if not isinstance(correo, str) or not isinstance(password, str):
+		return jsonify({'error': 'Faltan el correo o la contraseña'}), 400
+	try:
+		sesion = autenticacion.iniciar_sesion(correo, password)
+	except CredencialesInvalidasError as e:
+		return jsonify({'error': str(e)}), 401
+	except ServicioSaturadoError as e:
+		return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+	respuesta = jsonify(sesion)
+	respuesta.set_cookie(autenticacion.cookie, sesion['token'], max_age=autenticacion.token_ttl,
+						 httponly=True, samesite='Lax', secure=request.is_secure)
+	return respuesta
+
+
+@autenticacion_bp.route('/logout', methods=['POST'])
+@requiere_sesion()
+def logout():
+	"""Revoca el token de la petición."""
+	autenticacion.cerrar_sesion(autenticacion.sesion_actual())
+	respuesta = jsonify({'ok': True})
+	respuesta.delete_cookie(autenticacion.cookie)
+	return respuesta
+
+
+@autenticacion_bp.route('/yo', methods=['GET'])
+@requiere_sesion()
+def yo():
+	"""Datos de la sesión actual, leídos del token sin consultar la base de datos."""
+	return jsonify(autenticacion.sesion_actual().to_dict())
@@ -0,0 +1,18 @@
+"""
+Rutas de búsqueda del catálogo.
+"""
+from flask import Blueprint, jsonify, request
+
+from src.services.busqueda import indice_catalogo, FACETAS
+
+busqueda_bp = Blueprint('busqueda', __name__, url_prefix='/api')
+
+
+@busqueda_bp.route('/buscar', methods=['GET'])
+def buscar():
+	"""Busca en el catálogo con relevancia, prefijo y facetas."""
+	consulta = request.args.get('q', '')
+	limite = min(request.args.get('limite', 20, type=int), 100)
+	prefijo = request.args.get('prefijo', '1') not in ('0', 'false')
+	filtros = {faceta: request.args.get(faceta) for faceta in FACETAS if request.args.get(faceta)}
+	return jsonify(indice_catalogo.buscar(consulta, limite=limite, filtros=filtros, prefijo=prefijo))
@@ -0,0 +1,97 @@
+"""
+Rutas del carrito de compra.
+
+El carrito pertenece a la persona del token de sesión (ver
+``src.services.autenticacion``) o, sin sesión iniciada, a un token anónimo
+guardado en la cookie de sesión de Flask; al iniciar sesión el carrito
+anónimo se fusiona con el de la persona. Solo el checkout escribe en la base
+de datos.
+"""
+import secrets
+
+from flask import Blueprint, abort, jsonify, request, session
+
+from src.services.autenticacion import autenticacion, requiere_sesion
+from src.services.carrito import carritos, propietario_anonimo, propietario_usuario
+from src.services.pedidos import StockInsuficienteError
+
+carrito_bp = Blueprint('carrito', __name__, url_prefix='/api/carrito')
+
+
+def _propietario() -> str:
+	sesion = autenticacion.sesion_actual()
+	token = session.get('carrito')
+	if sesion is not None:
+		propietario = propietario_usuario(sesion.id_usuario)
+		if token:
+			carritos.fusionar(propietario_anonimo(session.pop('carrito')), propietario)
+		return propietario
+	if not token:
+		token = session['carrito'] = secrets.token_urlsafe(16)
+	return propietario_anonimo(token)
+
+
+def _datos():
+	datos = request.get_json(silent=True)
+	if not isinstance(datos, dict):
+		abort(400)
+	return datos
+
+
+@carrito_bp.route('', methods=['GET'])
+def ver_carrito():
+	"""Devuelve el carrito con los precios fijados al añadir cada variante."""
+	return jsonify(carritos.obtener(_propietario()))
+
+
+@carrito_bp.route('', methods=['DELETE'])
+def vaciar_carrito():
+	"""Vacía el carrito."""
+	carritos.vaciar(_propietario())
+	return '', 204
+
+
+@carrito_bp.route('/lineas', methods=['POST'])
+def agregar_linea():
+	"""Añade ``cantidad`` unidades (1 por defecto) de la variante ``id_gorra``."""
+	datos = _datos()
+	id_gorra = datos.get('id_gorra')
+	if isinstance(id_gorra, bool) or not isinstance(id_gorra, int):
+		abort(400)
+	try:
+		return jsonify(carritos.agregar(_propietario(), id_gorra, datos.get('cantidad', 1)))
+	except ValueError as e:
+		return jsonify({'error': str(e)}), 400
+
+
+@carrito_bp.route('/lineas/<int:id_gorra>', methods=['PUT'])
+def cambiar_linea(id_gorra):
+	"""Cambia la cantidad de una línea; con 0 la elimina."""
+	try:
+		return jsonify(carritos.fijar_cantidad(_propietario(), id_gorra, _datos().get('cantidad')))
+	except KeyError:
+		abort(404)
+	except ValueError as e:
+		return jsonify({'error': str(e)}), 400
+
+
+@carrito_bp.route('/lineas/<int:id_gorra>', methods=['DELETE'])
+def quitar_linea(id_gorra):
+	"""Quita una variante del carrito."""
+	try:
+		return jsonify(carritos.fijar_cantidad(_propietario(), id_gorra, 0))
+	except KeyError:
+		abort(404)
+
+
+@carrito_bp.route('/confirmar', methods=['POST'])
+@requiere_sesion()
+def confirmar_carrito():
+	"""Crea el pedido a partir del carrito (requiere sesión iniciada)."""
+	try:
+		pedido = carritos.confirmar(_propietario(), autenticacion.sesion_actual().id_usuario)
+	except StockInsuficienteError as e:
+		return jsonify({'error': str(e), 'id_gorra': e.id_gorra}), 409
+	except ValueError as e:
+		return jsonify({'error': str(e)}), 400
+	return jsonify({'id_pedido': pedido.id_pedido, 'total': str(pedido.total), 'estado': pedido.estado}), 201
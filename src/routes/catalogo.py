@@ -0,0 +1,152 @@
+"""
+Rutas del catálogo de gorras.
+
+Los listados y el detalle responden a ``If-None-Match``/``If-Modified-Since``
+con 304 a partir de la versión de la tabla (ver ``src.database.versiones``),
+sin consultar ni serializar las filas. La disponibilidad por tipo de gorra
+se lee de los contadores de ``stock_tipos_gorra`` y las recomendaciones
+"comprados juntos" de ``recomendaciones_variante``.
+"""
+from flask import Blueprint, Response, abort, jsonify, request, stream_with_context
+
+from src.database.versiones import versiones_catalogo
+from src.models.gorra import Gorra
+from src.models.variante_gorra import VarianteGorra
+from src.services.actualizacion_masiva import actualizar_en_bloque
+from src.services.autenticacion import requiere_sesion
+from src.services.disponibilidad import consultar_disponibilidad
+from src.services.exportacion import FORMATOS, TABLAS, exportar
+from src.services.recomendaciones import TOP_K, recomendaciones
+
+catalogo_bp = Blueprint('catalogo', __name__, url_prefix='/api/catalogo')
+
+
+def _condicional(tabla: str, generar):
+	"""
+	Devuelve 304 si el cliente ya tiene la versión actual de ``tabla``; si
+	no, construye la respuesta con ``generar`` y le añade ETag y Last-Modified.
+	"""
+	etag, ultima_modificacion = versiones_catalogo.version(tabla)
+	if request.if_none_match:
+		vigente = request.if_none_match.contains_weak(etag)
+	else:
+		vigente = request.if_modified_since is not None and ultima_modificacion <= request.if_modified_since
+	if vigente:
+		respuesta = Response(status=304)
+	else:
+		respuesta = generar()
+	respuesta.set_etag(etag, weak=True)
+	respuesta.last_modified = ultima_modificacion
+	# El cliente puede guardar la respuesta pero debe revalidarla siempre
+	respuesta.cache_control.no_cache = True
+	return respuesta
+
+
+def _activas():
+	activas = request.args.get('activas', '1')
+	return None if activas == 'todas' else activas in ('1', 'true')
+
+
+@catalogo_bp.route('', methods=['GET'])
+def listar_gorras():
+	"""Lista una página del catálogo (paginación por cursor)."""
+	limite = min(request.args.get('limite', 50, type=int), 200)
+	cursor = request.args.get('cursor')
+	color = request.args.get('color')
+	activas = _activas()
+
+	def generar():
+		try:
+			gorras, siguiente = Gorra.obtener_pagina(limite, cursor, activas, color)
+		except ValueError:
+			abort(400)
+		return jsonify({'gorras': [g.to_dict() for g in gorras], 'siguiente': siguiente})
+
+	return _condicional(Gorra.__tablename__, generar)
+
+
+@catalogo_bp.route('/<int:id_gorra>', methods=['GET'])
+def obtener_gorra(id_gorra):
+	"""Devuelve el detalle de una gorra."""
+	def generar():
+		gorra = Gorra.obtener_por_id(id_gorra)
+		if gorra is None:
+			abort(404)
+		return jsonify(gorra.to_dict())
+
+	return _condicional(Gorra.__tablename__, generar)
+
+
+@catalogo_bp.route('/tipos/disponibilidad', methods=['GET'])
+def disponibilidad_tipos():
+	"""
+	Stock y variantes activas por tipo, color y talla leídos de los contadores;
+	``?tipos=1,2`` limita la respuesta a esos tipos.
+	"""
+	tipos = request.args.get('tipos')
+	try:
+		ids_tipo = [int(t) for t in tipos.split(',') if t.strip()] if tipos else None
+	except ValueError:
+		abort(400)
+	return _condicional(VarianteGorra.__tablename__, lambda: jsonify({
+		'tipos': list(consultar_disponibilidad(ids_tipo).values())
+	}))
+
+
+@catalogo_bp.route('/tipos/<int:id_tipo_gorra>/disponibilidad', methods=['GET'])
+def disponibilidad_tipo(id_tipo_gorra):
+	"""Disponibilidad de un tipo de gorra (stock 0 si no tiene variantes activas)."""
+	def generar():
+		vacia = {'id_tipo_gorra': id_tipo_gorra, 'stock': 0, 'variantes_activas': 0, 'detalle': []}
+		return jsonify(consultar_disponibilidad([id_tipo_gorra]).get(id_tipo_gorra, vacia))
+
+	return _condicional(VarianteGorra.__tablename__, generar)
+
+
+@catalogo_bp.route('/variantes/<int:id_gorra>/recomendaciones', methods=['GET'])
+def recomendaciones_variante(id_gorra):
+	"""Variantes compradas con más frecuencia junto a esta (solo activas y con stock)."""
+	limite = min(request.args.get('limite', 10, type=int), TOP_K)
+	if limite <= 0:
+		abort(400)
+	return jsonify({'id_gorra': id_gorra, 'recomendaciones': recomendaciones(id_gorra, limite)})
+
+
+@catalogo_bp.route('/<any(gorras, variantes):tabla>', methods=['PATCH'])
+@requiere_sesion('administrador')
+def actualizar_catalogo(tabla):
+	"""
+	Actualiza en bloque precio, stock y estado a partir de una lista JSON de
+	``{id, precio?, stock?, activo?}``; devuelve los cambios fallidos por fila.
+	Solo para administradores.
+	"""
+	cambios = request.get_json(silent=True)
+	if isinstance(cambios, dict):
+		cambios = cambios.get('cambios')
+	if not isinstance(cambios, list):
+		abort(400)
+	lote = min(request.args.get('lote', 1000, type=int), 10000)
+	if lote <= 0:
+		abort(400)
+	return jsonify(actualizar_en_bloque(tabla, cambios, tamano_lote=lote).to_dict())
+
+
+@catalogo_bp.route('/export', methods=['GET'])
+def exportar_catalogo():
+	"""Exporta gorras o variantes en NDJSON o CSV, opcionalmente comprimido."""
+	tabla = request.args.get('tabla', 'gorras')
+	formato = request.args.get('formato', 'ndjson')
+	gzip = request.args.get('gzip', '0') in ('1', 'true')
+	if tabla not in TABLAS or formato not in FORMATOS:
+		abort(400)
+
+	activas = request.args.get('activas')
+	if activas is not None:
+		activas = activas in ('1', 'true')
+
+	nombre = f"{tabla}.{formato}" + ('.gz' if gzip else '')
+	return _condicional(TABLAS[tabla].name, lambda: Response(
+		stream_with_context(exportar(tabla, formato, gzip=gzip, activas=activas)),
+		mimetype='application/gzip' if gzip else FORMATOS[formato],
+		headers={'Content-Disposition': f'attachment; filename="{nombre}"'}
+	))
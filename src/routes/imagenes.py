@@ -0,0 +1,42 @@
+"""
+Rutas de las imágenes de las gorras.
+
+Las URL contienen el hash del contenido, así que el original y las
+miniaturas se sirven como inmutables con caché de larga duración. Mientras
+una miniatura se está generando se entrega el original con una caché corta.
+"""
+import os
+
+from flask import Blueprint, abort, current_app, send_file
+
+from src.services.imagenes import analizar_nombre, ruta_archivo
+
+imagenes_bp = Blueprint('imagenes', __name__, url_prefix='/imagenes')
+
+
+def _enviar(ruta: str, max_age: int, inmutable: bool):
+	respuesta = send_file(ruta, max_age=max_age, conditional=True, etag=True)
+	respuesta.cache_control.public = True
+	respuesta.cache_control.immutable = inmutable
+	return respuesta
+
+
+@imagenes_bp.route('/<nombre>', methods=['GET'])
+def servir_imagen(nombre):
+	"""Sirve una imagen original o una de sus miniaturas."""
+	partes = analizar_nombre(nombre)
+	if partes is None:
+		abort(404)
+	ruta = ruta_archivo(nombre)
+	if os.path.exists(ruta):
+		return _enviar(ruta, current_app.config.get('IMAGENES_CACHE_SEGUNDOS', 31536000), True)
+
+	hash_sha256, ancho, _ = partes
+	if ancho is None:
+		abort(404)
+	# Miniatura pendiente (o innecesaria por ser el original más pequeño): se entrega el original
+	for extension in ('jpg', 'png', 'gif', 'webp'):
+		original = ruta_archivo(f"{hash_sha256}.{extension}")
+		if os.path.exists(original):
+			return _enviar(original, 60, False)
+	abort(404)
@@ -0,0 +1,15 @@
+"""
+Ruta de métricas en formato de texto de Prometheus.
+"""
+from flask import Blueprint, Response, current_app
+
+metricas_bp = Blueprint('metricas', __name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metricas_bp.route('/metrics', methods=['GET'])
+def metrics():
+	"""Expone las métricas de peticiones, consultas SQL y pool de conexiones."""
+	metricas = current_app.extensions['metricas']
+	return Response(metricas.exportar_prometheus(), content_type=CONTENT_TYPE)
@@ -0,0 +1,79 @@
+"""
+Rutas de salud y disponibilidad para el balanceador de carga.
+
+``/healthz`` solo comprueba que el proceso responde. ``/readyz`` ejecuta un
+``SELECT 1`` sobre el pool de conexiones existente y guarda el resultado
+durante un intervalo corto para que los sondeos frecuentes no carguen la
+base de datos.
+"""
+import logging
+import threading
+import time
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+
+from src.database.db_connection import estadisticas_pool
+
+logger = logging.getLogger(__name__)
+
+salud_bp = Blueprint('salud', __name__)
+
+_bloqueo = threading.Lock()
+_ultimo_sondeo = {'instante': None, 'listo': False, 'latencia_ms': None, 'error': None}
+
+
+def _sondear_base_datos(engine) -> dict:
+	"""Ejecuta un SELECT 1 con una conexión del pool y mide la latencia."""
+	inicio = time.perf_counter()
+	try:
+		with engine.connect() as conexion:
+			conexion.execute(text('SELECT 1'))
+		error = None
+	except Exception as e:
+		logger.warning(f"Sondeo de disponibilidad fallido: {e}")
+		error = type(e).__name__
+	return {
+		'instante': time.monotonic(),
+		'listo': error is None,
+		'latencia_ms': round((time.perf_counter() - inicio) * 1000, 2),
+		'error': error
+	}
+
+
+def estado_disponibilidad(engine, intervalo: float) -> dict:
+	"""
+	Devuelve el último sondeo si tiene menos de ``intervalo`` segundos o
+	realiza uno nuevo. Solo un hilo sondea a la vez.
+	"""
+	with _bloqueo:
+		instante = _ultimo_sondeo['instante']
+		if instante is None or time.monotonic() - instante >= intervalo:
+			_ultimo_sondeo.update(_sondear_base_datos(engine))
+		return dict(_ultimo_sondeo)
+
+
+@salud_bp.route('/healthz', methods=['GET'])
+def healthz():
+	"""Comprueba únicamente que el proceso está vivo."""
+	return jsonify({'status': 'ok'})
+
+
+@salud_bp.route('/readyz', methods=['GET'])
+def readyz():
+	"""Comprueba que la base de datos responde usando el pool existente."""
+	engine = current_app.extensions['sqlalchemy'].engine
+	intervalo = current_app.config.get('READINESS_CACHE_SEGUNDOS', 2.0)
+	estado = estado_disponibilidad(engine, intervalo)
+
+	respuesta = {
+		'status': 'ready' if estado['listo'] else 'not_ready',
+		'latencia_ms': estado['latencia_ms'],
+		'antiguedad_s': round(time.monotonic() - estado['instante'], 3),
+		'pool': estadisticas_pool(engine)
+	}
+	if 'replicas' in current_app.extensions:
+		respuesta['replicas'] = current_app.extensions['replicas'].estadisticas()
+	if estado['error']:
+		respuesta['error'] = estado['error']
+	return jsonify(respuesta), 200 if estado['listo'] else 503
@@ -0,0 +1,6 @@
+"""
+Paquete que contiene los servicios de la aplicación.
+
+Los servicios agrupan la lógica de negocio que involucra varios modelos
+o que necesita un control explícito de transacciones.
+"""
@@ -0,0 +1,204 @@
+"""
+Servicio de actualización masiva de precios, stock y estado del catálogo.
+
+Recibe una lista de cambios ``{id, precio?, stock?, activo?}`` para
+``gorras`` o ``variantes_gorra``, los valida con las mismas reglas que el
+modelo Gorra y los aplica en lotes: por cada lote se comprueba qué IDs
+existen con una sola consulta y se envía un UPDATE con executemany por cada
+combinación de columnas, todo en una transacción por lote. En las variantes,
+los contadores de disponibilidad por tipo se ajustan en la misma transacción.
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Tuple
+import logging
+import time
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.database.bulk import actualizar_lote, en_lotes
+from src.database.cache import cache_catalogo
+from src.database.versiones import versiones_catalogo
+from src.models.gorra import Gorra, validar_precio, validar_stock
+from src.models.stock_tipo_gorra import CAMPOS_VARIANTE, acumular, aplicar_deltas
+from src.models.variante_gorra import VarianteGorra
+from src.services.busqueda import indice_catalogo
+
+logger = logging.getLogger(__name__)
+
+TABLAS = {
+	'gorras': Gorra.__table__,
+	'variantes': VarianteGorra.__table__,
+}
+CAMPOS = ('precio', 'stock', 'activo')
+
+
+class ResultadoActualizacion:
+	"""Resumen de una actualización masiva."""
+
+	def __init__(self):
+		self.procesadas = 0
+		self.actualizadas = 0
+		# (posición en la lista recibida, id, motivo)
+		self.fallidas: List[Tuple[int, Any, str]] = []
+		self.segundos = 0.0
+
+	@property
+	def filas_por_segundo(self) -> float:
+		return self.procesadas / self.segundos if self.segundos else 0.0
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			'procesadas': self.procesadas,
+			'actualizadas': self.actualizadas,
+			'fallidas': [{'indice': i, 'id': id_, 'error': motivo} for i, id_, motivo in self.fallidas],
+			'segundos': round(self.segundos, 3)
+		}
+
+
+def normalizar_cambio(cambio: Dict[str, Any], tabla: str = 'variantes') -> Dict[str, Any]:
+	"""
+	Valida un cambio y lo convierte en una fila para el UPDATE.
+
+	Args:
+		cambio: Diccionario con ``id`` y al menos uno de precio, stock o activo
+		tabla: 'gorras' o 'variantes'
+
+	Returns:
+		dict: Clave primaria y columnas a actualizar
+
+	Raises:
+		ValueError: Si el cambio no es válido
+	"""
+	if not isinstance(cambio, dict):
+		raise ValueError("Cada cambio debe ser un objeto")
+	desconocidos = set(cambio) - {'id'} - set(CAMPOS)
+	if desconocidos:
+		raise ValueError(f"Campos no permitidos: {', '.join(sorted(desconocidos))}")
+	id_gorra = cambio.get('id')
+	if isinstance(id_gorra, bool) or not isinstance(id_gorra, int) or id_gorra <= 0:
+		raise ValueError(f"ID inválido: {id_gorra}")
+	if not any(c in cambio for c in CAMPOS):
+		raise ValueError("El cambio no incluye precio, stock ni activo")
+
+	fila: Dict[str, Any] = {'id_gorra': id_gorra}
+	if 'precio' in cambio:
+		try:
+			precio = Decimal(str(cambio['precio']).strip())
+		except InvalidOperation:
+			raise ValueError(f"Precio inválido: {cambio['precio']}")
+		if not precio.is_finite():
+			raise ValueError(f"Precio inválido: {cambio['precio']}")
+		validar_precio(precio)
+		fila['precio'] = float(precio) if tabla == 'gorras' else precio
+	if 'stock' in cambio:
+		stock = cambio['stock']
+		if isinstance(stock, bool) or not isinstance(stock, int):
+			raise ValueError(f"Stock inválido: {stock}")
+		fila['stock'] = validar_stock(stock)
+	if 'activo' in cambio:
+		if not isinstance(cambio['activo'], bool):
+			raise ValueError(f"Activo inválido: {cambio['activo']}")
+		fila['activo'] = cambio['activo']
+	return fila
+
+
+def _deltas_stock(anteriores, validas) -> Dict[Tuple[int, str, str], Tuple[int, int]]:
+	"""Cambios en los contadores por tipo que producen las variantes actualizadas."""
+	deltas: Dict[Tuple[int, str, str], Tuple[int, int]] = {}
+	for id_gorra, (_, fila) in validas.items():
+		anterior = anteriores[id_gorra]
+		clave = (anterior.id_tipo_gorra, anterior.color, anterior.talla)
+		acumular(deltas, clave, anterior.stock, anterior.activo, -1)
+		acumular(deltas, clave, fila.get('stock', anterior.stock), fila.get('activo', anterior.activo))
+	return deltas
+
+
+def actualizar_en_bloque(tabla: str, cambios: Iterable[Dict[str, Any]], tamano_lote: int = 1000,
+						 progreso=None) -> ResultadoActualizacion:
+	"""
+	Aplica cambios de precio, stock y estado en lotes.
+
+	Los cambios inválidos, con un ID repetido o que no existe se devuelven
+	como fallidos sin afectar al resto del lote. Un error de base de datos
+	anula solo su lote.
+
+	Args:
+		tabla: 'gorras' o 'variantes'
+		cambios: Cambios a aplicar
+		tamano_lote: Número de cambios por transacción
+		progreso: Función opcional llamada con el resultado tras cada lote
+
+	Returns:
+		ResultadoActualizacion: Filas actualizadas y fallidas
+
+	Raises:
+		ValueError: Si la tabla no es válida
+	"""
+	if tabla not in TABLAS:
+		raise ValueError(f"Tabla desconocida: {tabla}")
+	destino = TABLAS[tabla]
+	resultado = ResultadoActualizacion()
+	vistos = set()
+	actualizadas: List[int] = []
+	# Solo precio y activo se reflejan en el índice de búsqueda; el stock no
+	indexadas: List[int] = []
+	inicio = time.perf_counter()
+
+	for lote in en_lotes(enumerate(cambios), tamano_lote):
+		validas: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+		for indice, cambio in lote:
+			resultado.procesadas += 1
+			try:
+				fila = normalizar_cambio(cambio, tabla)
+			except ValueError as e:
+				resultado.fallidas.append((indice, cambio.get('id') if isinstance(cambio, dict) else None, str(e)))
+				continue
+			if fila['id_gorra'] in vistos:
+				resultado.fallidas.append((indice, fila['id_gorra'], "ID repetido en la solicitud"))
+				continue
+			vistos.add(fila['id_gorra'])
+			validas[fila['id_gorra']] = (indice, fila)
+
+		if not validas:
+			continue
+		try:
+			with db.engine.begin() as conexion:
+				# Bloquea las filas del lote y descarta los IDs que no existen
+				columnas = [destino.c.id_gorra]
+				if destino is VarianteGorra.__table__:
+					columnas += [destino.c[c] for c in CAMPOS_VARIANTE]
+				existentes = {fila.id_gorra: fila for fila in conexion.execute(
+					select(*columnas).where(destino.c.id_gorra.in_(list(validas))).with_for_update()
+				)}
+				for id_gorra in sorted(set(validas) - set(existentes)):
+					resultado.fallidas.append((validas.pop(id_gorra)[0], id_gorra, "No existe"))
+				actualizar_lote(conexion, destino, [fila for _, fila in validas.values()])
+				if destino is VarianteGorra.__table__:
+					aplicar_deltas(conexion, _deltas_stock(existentes, validas))
+			resultado.actualizadas += len(validas)
+			actualizadas.extend(validas)
+			indexadas.extend(id_gorra for id_gorra, (_, fila) in validas.items()
+							 if 'precio' in fila or 'activo' in fila)
+		except Exception as e:
+			logger.error(f"Error al actualizar un lote de {tabla}: {e}")
+			resultado.fallidas.extend((indice, id_gorra, f"Error de base de datos: {e}")
+									  for id_gorra, (indice, _) in validas.items())
+
+		resultado.segundos = time.perf_counter() - inicio
+		if progreso:
+			progreso(resultado)
+
+	if resultado.actualizadas:
+		if tabla == 'gorras':
+			# Las entradas por gorra no dependen de la versión de los listados
+			cache_catalogo.invalidar_gorras(actualizadas)
+		versiones_catalogo.incrementar(destino.name)
+		indice_catalogo.reindexar('gorra' if tabla == 'gorras' else 'variante', indexadas)
+	resultado.fallidas.sort(key=lambda fallida: fallida[0])
+	resultado.segundos = time.perf_counter() - inicio
+	logger.info(
+		f"Actualización masiva de {tabla}: {resultado.actualizadas} filas, "
+		f"{len(resultado.fallidas)} fallidas, {resultado.filas_por_segundo:.0f} filas/s"
+	)
+	return resultado
@@ -0,0 +1,176 @@
+"""
+Archivo de pedidos y ventas antiguos.
+
+``archivar`` mueve a las tablas de ``src.models.archivo`` los pedidos
+entregados o cancelados (y las ventas en estados equivalentes) anteriores a
+una antigüedad, con sus líneas, en transacciones cortas: cada lote se copia
+con INSERT ... SELECT y se borra de las tablas de uso diario en la misma
+transacción. Como las filas movidas dejan de cumplir la condición, un
+archivado interrumpido continúa donde se quedó.
+
+La marca ``archivo_pedidos`` guarda el límite del archivo; el historial y
+los reportes solo leen las tablas archivadas cuando el rango pedido empieza
+antes de ese límite.
+
+En MariaDB no se particionan las tablas de uso diario por mes: InnoDB no
+admite particiones en tablas con claves foráneas (``detalle_pedido`` apunta
+a ``pedidos``), y las tablas de archivo ya están indexadas por cliente y
+fecha.
+"""
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+import logging
+import time
+
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select
+
+from src.database.db_connection import db
+from src.database.bulk import upsert_lote
+from src.models.archivo import (MARCA_ARCHIVO, DetallePedidoArchivado, DetalleVentaArchivada, PedidoArchivado,
+								VentaArchivada, limite_archivo)
+from src.models.detalle_pedido import DetallePedido
+from src.models.detalle_venta import DetalleVenta
+from src.models.marca_agua import MarcaAgua
+from src.models.pedido import Pedido
+from src.models.venta import Venta
+from src.services.consolidacion import ESTADOS_PEDIDO
+
+logger = logging.getLogger(__name__)
+
+ANTIGUEDAD_DIAS = 365
+ESTADOS_ARCHIVABLES = ('entregado', 'cancelado')
+# Estados de venta que no equivalen a un pedido cerrado (ver ``consolidacion.estado_pedido``)
+ESTADOS_VENTA_ABIERTA = tuple(sorted(e for e, p in ESTADOS_PEDIDO.items() if p not in ESTADOS_ARCHIVABLES))
+
+
+class ResultadoArchivo:
+	"""Resumen de una ejecución de ``archivar``."""
+
+	def __init__(self, corte: datetime):
+		self.corte = corte
+		self.pedidos = 0
+		self.detalles_pedido = 0
+		self.ventas = 0
+		self.detalles_venta = 0
+		self.segundos = 0.0
+
+	@property
+	def filas_por_segundo(self) -> float:
+		total = self.pedidos + self.detalles_pedido + self.ventas + self.detalles_venta
+		return total / self.segundos if self.segundos else 0.0
+
+
+class _Movimiento:
+	"""Tabla de cabeceras y de líneas que se mueven juntas a su archivo."""
+
+	def __init__(self, nombre: str, cabecera, lineas, archivo, archivo_lineas, clave: str, fecha: str, condicion):
+		self.nombre = nombre
+		self.cabecera, self.lineas = cabecera, lineas
+		self.archivo, self.archivo_lineas = archivo, archivo_lineas
+		self.clave, self.fecha = cabecera.c[clave], cabecera.c[fecha]
+		self.clave_lineas = lineas.c[clave]
+		self.condicion = condicion
+
+	def conservadas(self, conexion) -> List[int]:
+		"""
+		Cabeceras que nunca se archivan: la de ID más alto y la de la línea
+		de ID más alto. Sin ellas, SQLite podría reutilizar IDs ya archivados.
+		"""
+		ultima = conexion.execute(select(func.max(self.clave))).scalar()
+		ultima_linea = conexion.execute(
+			select(self.clave_lineas).order_by(self.lineas.primary_key.columns[0].desc()).limit(1)).scalar()
+		return [i for i in (ultima, ultima_linea) if i is not None]
+
+	def mover(self, conexion, ids: List[int], fecha_archivo: datetime) -> int:
+		"""
+		Copia las cabeceras y sus líneas al archivo y las borra de las tablas de uso diario.
+
+		Returns:
+			int: Líneas movidas
+		"""
+		columnas = [c.name for c in self.cabecera.columns]
+		conexion.execute(insert(self.archivo).from_select(
+			columnas + ['fecha_archivo'],
+			select(*[self.cabecera.c[c] for c in columnas], literal(fecha_archivo, DateTime))
+			.where(self.clave.in_(ids))))
+		columnas_lineas = [c.name for c in self.lineas.columns]
+		lineas = conexion.execute(insert(self.archivo_lineas).from_select(
+			columnas_lineas, select(*[self.lineas.c[c] for c in columnas_lineas]).where(self.clave_lineas.in_(ids))))
+		conexion.execute(delete(self.lineas).where(self.clave_lineas.in_(ids)))
+		conexion.execute(delete(self.cabecera).where(self.clave.in_(ids)))
+		return lineas.rowcount
+
+
+def _movimientos() -> List[_Movimiento]:
+	pedidos, ventas = Pedido.__table__, Venta.__table__
+	return [
+		_Movimiento('pedidos', pedidos, DetallePedido.__table__, PedidoArchivado.__table__,
+					DetallePedidoArchivado.__table__, 'id_pedido', 'fecha_pedido',
+					pedidos.c.estado.in_(ESTADOS_ARCHIVABLES)),
+		_Movimiento('ventas', ventas, DetalleVenta.__table__, VentaArchivada.__table__,
+					DetalleVentaArchivada.__table__, 'id_venta', 'fecha_venta',
+					or_(ventas.c.estado.is_(None), ventas.c.estado.notin_(ESTADOS_VENTA_ABIERTA)))
+	]
+
+
+def archivar(antiguedad_dias: int = ANTIGUEDAD_DIAS, tamano_lote: int = 500, pausa: float = 0.0,
+			 ahora: Optional[datetime] = None,
+			 progreso: Optional[Callable[[str, ResultadoArchivo], None]] = None) -> ResultadoArchivo:
+	"""
+	Mueve al archivo los pedidos y ventas cerrados anteriores a la antigüedad.
+
+	Args:
+		antiguedad_dias: Días que un pedido cerrado permanece en las tablas de uso diario
+		tamano_lote: Pedidos o ventas movidos por transacción
+		pausa: Segundos de espera entre lotes para ceder la base de datos
+		ahora: Instante de referencia (por defecto, la hora actual en UTC)
+		progreso: Función opcional llamada con la tabla ('pedidos' o
+			'ventas') y el resultado acumulado tras cada lote
+
+	Returns:
+		ResultadoArchivo: Fecha de corte y filas movidas
+	"""
+	if tamano_lote <= 0:
+		raise ValueError("El tamaño de lote debe ser mayor que cero")
+	corte = (ahora or datetime.utcnow()) - timedelta(days=antiguedad_dias)
+	resultado = ResultadoArchivo(corte)
+	inicio = time.perf_counter()
+
+	# La marca se adelanta antes de mover nada: un lector que la vea ya
+	# consultará el archivo aunque el archivado siga en curso
+	with db.engine.begin() as conexion:
+		limite = limite_archivo(conexion)
+		if limite is None or limite < corte:
+			upsert_lote(conexion, MarcaAgua.__table__, [{'nombre': MARCA_ARCHIVO, 'valor': corte,
+														 'fecha_actualizacion': datetime.utcnow()}])
+
+	for movimiento in _movimientos():
+		with db.engine.connect() as conexion:
+			conservadas = movimiento.conservadas(conexion)
+		while True:
+			with db.engine.begin() as conexion:
+				consulta = (select(movimiento.clave)
+							.where(movimiento.fecha < corte, movimiento.condicion)
+							.order_by(movimiento.clave).limit(tamano_lote).with_for_update())
+				if conservadas:
+					consulta = consulta.where(movimiento.clave.notin_(conservadas))
+				ids = conexion.execute(consulta).scalars().all()
+				if not ids:
+					break
+				lineas = movimiento.mover(conexion, ids, datetime.utcnow())
+			if movimiento.nombre == 'pedidos':
+				resultado.pedidos += len(ids)
+				resultado.detalles_pedido += lineas
+			else:
+				resultado.ventas += len(ids)
+				resultado.detalles_venta += lineas
+			resultado.segundos = time.perf_counter() - inicio
+			if progreso:
+				progreso(movimiento.nombre, resultado)
+			if pausa:
+				time.sleep(pausa)
+
+	resultado.segundos = time.perf_counter() - inicio
+	logger.info(f"Archivados {resultado.pedidos} pedidos y {resultado.ventas} ventas anteriores a {corte} "
+				f"en {resultado.segundos:.2f} s")
+	return resultado
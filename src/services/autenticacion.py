@@ -0,0 +1,359 @@
+"""
+Servicio de autenticación de personas.
+
+La verificación de contraseñas (scrypt o PBKDF2 de Werkzeug) se ejecuta en
+un pool de hilos acotado: hashlib libera el GIL durante el cálculo, y el
+número de cálculos simultáneos y en cola está limitado, de modo que un pico
+de inicios de sesión no agota la CPU ni la memoria de los workers; si la cola
+está llena se rechaza con ``ServicioSaturadoError``. Los hashes con un
+método o coste anterior al configurado se recalculan en segundo plano tras
+un inicio de sesión correcto.
+
+Al iniciar sesión se emite un token firmado con ``id_usuario`` e
+``id_rol``; las peticiones autenticadas solo comprueban la firma y una caché
+local de revocaciones de TTL corto, sin consultar ``personas`` ni ``roles``.
+Las revocaciones (cierre de sesión o cambio de contraseña) se guardan en un
+backend compartido de ``src.database.cache``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Dict, Optional
+import logging
+import os
+import secrets
+import threading
+import time
+
+from flask import abort, current_app, g, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import select, update
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from src.database.cache import CacheLRU, _AUSENTE, crear_backend
+from src.database.db_connection import db
+from src.models.persona import Persona
+from src.models.rol import Rol
+
+logger = logging.getLogger(__name__)
+
+METODO_HASH = 'scrypt'
+TOKEN_TTL = 12 * 3600
+REVOCACION_TTL = 5.0
+
+
+class CredencialesInvalidasError(ValueError):
+	"""Correo o contraseña incorrectos, o persona inactiva."""
+
+
+class ServicioSaturadoError(RuntimeError):
+	"""La cola de verificación de contraseñas está llena."""
+
+
+class SesionInvalidaError(ValueError):
+	"""Token ausente, mal firmado, caducado o revocado."""
+
+
+class Sesion:
+	"""Datos de la persona autenticada tal como viajan en el token."""
+
+	__slots__ = ('id_usuario', 'id_rol', 'rol', 'jti', 'emitido')
+
+	def __init__(self, id_usuario: int, id_rol: int, rol: Optional[str], jti: str, emitido: float):
+		self.id_usuario = id_usuario
+		self.id_rol = id_rol
+		self.rol = rol
+		self.jti = jti
+		self.emitido = emitido
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {'id_usuario': self.id_usuario, 'id_rol': self.id_rol, 'rol': self.rol}
+
+
+class ServicioAutenticacion:
+	"""Verificación de contraseñas fuera de la petición y tokens de sesión firmados."""
+
+	PREFIJO = 'auth'
+	SAL_TOKEN = 'gorras-sesion'
+
+	def __init__(self):
+		self.metodo = METODO_HASH
+		self.trabajadores = 2
+		self.max_pendientes = 16
+		self.espera_cola = 1.0
+		self.token_ttl = TOKEN_TTL
+		self.cookie = 'gorras_sesion'
+		self.backend = None
+		self.revocaciones = CacheLRU(max_elementos=10000, ttl=REVOCACION_TTL)
+		self._firmante: Optional[URLSafeTimedSerializer] = None
+		self._prefijo_metodo: Optional[str] = None
+		self._hash_senuelo: Optional[str] = None
+		self._reiniciar_pool()
+
+	def init_app(self, app, backend=None):
+		"""
+		Configura el servicio a partir de las claves ``AUTH_*``.
+
+		Args:
+			app: Instancia de la aplicación Flask
+			backend: Backend compartido opcional para las revocaciones
+		"""
+		self.metodo = app.config.get('AUTH_METODO_HASH', METODO_HASH)
+		self.trabajadores = app.config.get('AUTH_TRABAJADORES', 2)
+		self.max_pendientes = app.config.get('AUTH_MAX_PENDIENTES', 16)
+		self.espera_cola = app.config.get('AUTH_ESPERA_COLA_SEGUNDOS', 1.0)
+		self.token_ttl = app.config.get('AUTH_TOKEN_TTL_SEGUNDOS', TOKEN_TTL)
+		self.cookie = app.config.get('AUTH_COOKIE', 'gorras_sesion')
+		self.backend = backend or crear_backend(app.config.get('AUTH_BACKEND', 'memoria'),
+												app.config.get('AUTH_RUTA'))
+		self.revocaciones = CacheLRU(max_elementos=10000,
+									 ttl=app.config.get('AUTH_REVOCACION_TTL_SEGUNDOS', REVOCACION_TTL))
+		self._firmante = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=self.SAL_TOKEN)
+		self._prefijo_metodo = self._hash_senuelo = None
+		self._reiniciar_pool()
+		app.extensions['autenticacion'] = self
+
+	# Pool de verificación
+	def _reiniciar_pool(self):
+		# El pool se crea con el primer inicio de sesión, ya en el proceso que lo atiende
+		self._ejecutor: Optional[ThreadPoolExecutor] = None
+		self._plazas = threading.BoundedSemaphore(self.max_pendientes)
+		self._lock = threading.Lock()
+
+	def _enviar(self, funcion, *args, esperar: bool = True):
+		"""
+		Ejecuta ``funcion`` en el pool si hay plaza en la cola.
+
+		Raises:
+			ServicioSaturadoError: Si no queda plaza tras ``espera_cola`` segundos
+		"""
+		if not self._plazas.acquire(timeout=self.espera_cola if esperar else 0):
+			raise ServicioSaturadoError("Demasiados inicios de sesión simultáneos")
+		with self._lock:
+			if self._ejecutor is None:
+				self._ejecutor = ThreadPoolExecutor(max_workers=self.trabajadores, thread_name_prefix='auth')
+			ejecutor = self._ejecutor
+		try:
+			futuro = ejecutor.submit(funcion, *args)
+		except Exception:
+			self._plazas.release()
+			raise
+		futuro.add_done_callback(lambda _: self._plazas.release())
+		return futuro
+
+	def esperar_tareas(self):
+		"""Espera a que terminen las verificaciones y los rehashes en curso."""
+		with self._lock:
+			ejecutor, self._ejecutor = self._ejecutor, None
+		if ejecutor is not None:
+			ejecutor.shutdown(wait=True)
+
+	# Hashes
+	def generar_hash(self, password: str) -> str:
+		return generate_password_hash(password, method=self.metodo)
+
+	def _prefijo(self) -> str:
+		# Método y parámetros del hash actual, p. ej. 'scrypt:32768:8:1'
+		if self._prefijo_metodo is None:
+			self._prefijo_metodo = self.generar_hash(secrets.token_hex(4)).split('$', 1)[0]
+		return self._prefijo_metodo
+
+	def necesita_rehash(self, password_hash: str) -> bool:
+		"""True si el hash no usa el método y coste configurados."""
+		return password_hash.split('$', 1)[0] != self._prefijo()
+
+	@staticmethod
+	def _comprobar(password_hash: Optional[str], password: str) -> bool:
+		try:
+			return bool(password_hash) and check_password_hash(password_hash, password)
+		except (ValueError, TypeError):
+			# Valores que no son un hash de Werkzeug (p. ej. datos de prueba)
+			return False
+
+	def _senuelo(self) -> str:
+		if self._hash_senuelo is None:
+			self._hash_senuelo = self.generar_hash(secrets.token_hex(8))
+		return self._hash_senuelo
+
+	def verificar_password(self, password_hash: Optional[str], password: str) -> bool:
+		"""
+		Comprueba una contraseña en el pool y espera el resultado.
+
+		Raises:
+			ServicioSaturadoError: Si la cola está llena
+		"""
+		return self._enviar(self._comprobar, password_hash, password).result()
+
+	# Inicio de sesión
+	def iniciar_sesion(self, correo: str, password: str) -> Dict[str, Any]:
+		"""
+		Verifica las credenciales de una persona y emite su token.
+
+		Returns:
+			dict: Token, datos de la sesión y segundos de validez
+
+		Raises:
+			CredencialesInvalidasError: Si las credenciales no son válidas
+			ServicioSaturadoError: Si la cola de verificación está llena
+		"""
+		p, r = Persona.__table__, Rol.__table__
+		fila = db.session.execute(
+			select(p.c.id_usuario, p.c.password_hash, p.c.activo, p.c.id_rol, r.c.nombre)
+			.join(r, r.c.id_rol == p.c.id_rol)
+			.where(p.c.correo == (correo or '').strip())
+		).first()
+		db.session.commit()  # No retener la conexión mientras se calcula el hash
+
+		# Sin persona se verifica contra un hash señuelo para no revelar por el
+		# tiempo de respuesta qué correos existen
+		valida = self.verificar_password(fila.password_hash if fila else self._senuelo(), password or '')
+		if fila is None or not valida or fila.activo is False:
+			raise CredencialesInvalidasError("Correo o contraseña incorrectos")
+
+		if self.necesita_rehash(fila.password_hash):
+			self._programar_rehash(fila.id_usuario, fila.password_hash, password)
+		return self.emitir_token(fila.id_usuario, fila.id_rol, fila.nombre)
+
+	def _programar_rehash(self, id_usuario: int, anterior: str, password: str):
+		app = current_app._get_current_object()
+
+		def rehash():
+			nuevo = self.generar_hash(password)
+			with app.app_context():
+				p = Persona.__table__
+				# Si la contraseña ha cambiado mientras tanto no se toca
+				db.session.execute(update(p).where(p.c.id_usuario == id_usuario, p.c.password_hash == anterior)
+								   .values(password_hash=nuevo))
+				db.session.commit()
+			logger.info(f"Hash de contraseña actualizado a {self.metodo} para la persona {id_usuario}")
+
+		try:
+			self._enviar(rehash, esperar=False)
+		except ServicioSaturadoError:
+			# Se reintentará en el próximo inicio de sesión
+			pass
+
+	def establecer_password(self, id_usuario: int, password: str):
+		"""
+		Cambia la contraseña de una persona y revoca sus tokens anteriores.
+
+		Raises:
+			ValueError: Si la contraseña es demasiado corta o la persona no existe
+		"""
+		if len(password or '') < 8:
+			raise ValueError("La contraseña debe tener al menos 8 caracteres")
+		nuevo = self._enviar(self.generar_hash, password).result()
+		p = Persona.__table__
+		resultado = db.session.execute(update(p).where(p.c.id_usuario == id_usuario).values(password_hash=nuevo))
+		if resultado.rowcount != 1:
+			db.session.rollback()
+			raise ValueError(f"No existe la persona {id_usuario}")
+		db.session.commit()
+		self.revocar_usuario(id_usuario)
+
+	# Tokens
+	def emitir_token(self, id_usuario: int, id_rol: int, rol: Optional[str] = None) -> Dict[str, Any]:
+		# 't' da al instante de emisión más resolución que la marca de itsdangerous
+		token = self._firmante.dumps({'u': id_usuario, 'r': id_rol, 'n': rol, 'j': secrets.token_urlsafe(12),
+									  't': round(time.time(), 3)})
+		return {'token': token, 'id_usuario': id_usuario, 'id_rol': id_rol, 'rol': rol, 'expira_en': self.token_ttl}
+
+	def validar_token(self, token: Optional[str]) -> Sesion:
+		"""
+		Comprueba la firma, la caducidad y las revocaciones de un token.
+
+		Raises:
+			SesionInvalidaError: Si el token no es válido
+		"""
+		if not token:
+			raise SesionInvalidaError("Falta el token de sesión")
+		try:
+			datos = self._firmante.loads(token, max_age=self.token_ttl)
+		except SignatureExpired:
+			raise SesionInvalidaError("La sesión ha caducado")
+		except BadSignature:
+			raise SesionInvalidaError("Token de sesión inválido")
+		sesion = Sesion(datos['u'], datos['r'], datos.get('n'), datos['j'], datos['t'])
+		if self._revocado(f'token:{sesion.jti}'):
+			raise SesionInvalidaError("La sesión se ha cerrado")
+		revocado_desde = self._revocado(f'usuario:{sesion.id_usuario}')
+		if revocado_desde and sesion.emitido < revocado_desde:
+			raise SesionInvalidaError("La sesión se ha cerrado")
+		return sesion
+
+	# Revocaciones
+	def _clave(self, sufijo: str) -> str:
+		return f'{self.PREFIJO}:revocado:{sufijo}'
+
+	def _revocado(self, sufijo: str):
+		clave = self._clave(sufijo)
+		valor = self.revocaciones.obtener(clave)
+		if valor is _AUSENTE:
+			try:
+				valor = self.backend.get(clave) if self.backend is not None else None
+			except Exception as e:
+				logger.warning(f"No se pudo consultar la revocación {clave}: {e}")
+				return None
+			self.revocaciones.guardar(clave, valor)
+		return valor
+
+	def _revocar(self, sufijo: str, valor):
+		clave = self._clave(sufijo)
+		self.revocaciones.guardar(clave, valor, ttl=self.token_ttl)
+		if self.backend is not None:
+			self.backend.set(clave, valor, self.token_ttl)
+
+	def cerrar_sesion(self, sesion: Sesion):
+		"""Revoca un token concreto."""
+		self._revocar(f'token:{sesion.jti}', time.time())
+
+	def revocar_usuario(self, id_usuario: int):
+		"""Revoca todos los tokens emitidos hasta ahora para una persona."""
+		self._revocar(f'usuario:{id_usuario}', round(time.time(), 3))
+
+	# Petición actual
+	def token_peticion(self) -> Optional[str]:
+		cabecera = request.headers.get('Authorization', '')
+		if cabecera.startswith('Bearer '):
+			return cabecera[7:].strip()
+		return request.cookies.get(self.cookie)
+
+	def sesion_actual(self) -> Optional[Sesion]:
+		"""Sesión de la petición en curso (se valida una vez por petición) o None."""
+		if 'sesion_auth' not in g:
+			try:
+				g.sesion_auth = self.validar_token(self.token_peticion())
+			except SesionInvalidaError:
+				g.sesion_auth = None
+		return g.sesion_auth
+
+
+# Instancia global, análoga a ``cache_catalogo``
+autenticacion = ServicioAutenticacion()
+
+
+def requiere_sesion(*roles: str):
+	"""
+	Exige un token válido (401) y, si se indican, uno de los roles (403).
+
+	La sesión queda disponible con ``autenticacion.sesion_actual()``.
+	"""
+	def decorador(funcion):
+		@wraps(funcion)
+		def envoltura(*args, **kwargs):
+			sesion = autenticacion.sesion_actual()
+			if sesion is None:
+				abort(401)
+			if roles and sesion.rol not in roles:
+				abort(403)
+			return funcion(*args, **kwargs)
+		return envoltura
+	return decorador
+
+
+def _reiniciar_tras_fork():
+	# Los hilos del pool no sobreviven al fork; el hijo crea el suyo
+	autenticacion._reiniciar_pool()
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=_reiniciar_tras_fork)
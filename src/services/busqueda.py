@@ -0,0 +1,598 @@
+"""
+Servicio de búsqueda del catálogo con un índice invertido en proceso.
+
+Indexa las gorras (nombre, descripción y color) y las variantes (tipo,
+color y talla), ordena por relevancia con BM25, permite búsqueda por
+prefijo para autocompletar y devuelve conteos por faceta (color, talla y
+tipo de gorra). El índice se carga una vez desde la base de datos y se
+mantiene al día con eventos del ORM tras cada commit. Solo los cambios en
+campos indexados cuentan: cada commit que los toca incrementa el contador
+``indice_busqueda`` de ``versiones_catalogo``, de modo que los cambios de
+stock (pedidos, reconciliación) no afectan al índice. Los cambios confirmados
+en otros procesos (p. ej. otros workers de gunicorn) se detectan comparando
+ese contador con el de la última carga, y en ese caso el índice se
+reconstruye en segundo plano respecto a las búsquedas, que siguen usando el
+índice anterior hasta que el nuevo está completo.
+"""
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, attributes
+
+from src.database.bulk import en_lotes
+from src.database.db_connection import db
+from src.database.versiones import versiones_catalogo
+from src.models.gorra import Gorra
+from src.models.tipo_gorra import TipoGorra
+from src.models.variante_gorra import VarianteGorra
+
+logger = logging.getLogger(__name__)
+
+PALABRAS_VACIAS = frozenset(('de', 'del', 'la', 'las', 'el', 'los', 'y', 'en', 'con', 'para', 'un', 'una', 'por'))
+FACETAS = ('color', 'talla', 'tipo')
+# Peso de cada campo: un término en el nombre cuenta más que en la descripción
+PESOS = {'nombre': 3, 'tipo': 2, 'color': 2, 'talla': 1, 'descripcion': 1}
+# Columnas que se reflejan en el índice; cambiar otras (p. ej. el stock) no lo modifica
+CAMPOS_INDEXADOS = {
+	'gorra': ('nombre', 'descripcion', 'color', 'precio', 'activo'),
+	'variante': ('id_tipo_gorra', 'color', 'talla', 'precio', 'activo'),
+	'tipo': ('nombre', 'descripcion'),
+}
+# Contador de ``versiones_catalogo`` con los cambios que afectan al índice
+VERSION_INDICE = 'indice_busqueda'
+MAX_EXPANSIONES_PREFIJO = 50
+FACTOR_PREFIJO = 0.8
+K1, B = 1.2, 0.75
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenizar(texto: Optional[str]) -> List[str]:
+	"""Normaliza (minúsculas, sin tildes) y divide un texto en términos."""
+	if not texto:
+		return []
+	texto = unicodedata.normalize('NFKD', texto.lower())
+	texto = ''.join(c for c in texto if not unicodedata.combining(c))
+	return [t for t in _TOKEN.findall(texto) if t not in PALABRAS_VACIAS]
+
+
+class IndiceBusqueda:
+	"""
+	Índice invertido en memoria, seguro para varios hilos.
+
+	Los documentos con exactamente los mismos términos y facetas (p. ej.
+	variantes del mismo tipo, color y talla que solo difieren en precio o
+	stock) comparten una clase: las listas de postings, las puntuaciones y
+	las facetas se calculan por clase y no por documento, lo que mantiene la
+	latencia estable con catálogos grandes. Las puntuaciones por término y
+	los resultados se guardan en caché hasta la siguiente escritura.
+
+	Con ``versiones`` (ver ``src.database.versiones``) y un backend
+	compartido, cada ``intervalo_version`` segundos como mucho se comprueba
+	antes de buscar si otro proceso ha modificado campos indexados desde la
+	última carga; si es así, el índice se reconstruye. La reconstrucción llena
+	un índice nuevo sin bloquear las búsquedas y lo sustituye al terminar,
+	aplicando de nuevo los cambios recibidos mientras tanto.
+	"""
+
+	# Atributos con el contenido del índice, que se sustituyen al reconstruir
+	_ESTADO = ('_documentos', '_clase_de', '_clases', '_postings', '_frecuencia_doc', '_terminos',
+			   '_terminos_obsoletos', '_longitud_total', '_tipos', '_puntuaciones', '_consultas')
+
+	def __init__(self, max_consultas_cache: int = 512, versiones=None, intervalo_version: float = 1.0):
+		self._bloqueo = threading.RLock()
+		self._bloqueo_carga = threading.Lock()
+		self.cargado = False
+		self.cargas = 0
+		self.max_consultas_cache = max_consultas_cache
+		self.versiones = versiones
+		self.intervalo_version = intervalo_version
+		self._contadores: Dict[str, Tuple[int, int]] = {}
+		self._proxima_comprobacion = 0.0
+		self._invalidaciones = 0
+		self._cambios_durante_carga: Optional[list] = None
+		self._vaciar()
+
+	def _vaciar(self):
+		self._documentos: Dict[Tuple[str, int], Dict[str, Any]] = {}
+		self._clase_de: Dict[Tuple[str, int], tuple] = {}
+		self._clases: Dict[tuple, Dict[str, Any]] = {}
+		self._postings: Dict[str, Dict[tuple, int]] = defaultdict(dict)
+		self._frecuencia_doc: Counter = Counter()
+		self._terminos: List[str] = []
+		self._terminos_obsoletos = False
+		self._longitud_total = 0
+		self._tipos: Dict[int, Tuple[str, Optional[str]]] = {}
+		self._puntuaciones: Dict[str, Dict[tuple, float]] = {}
+		self._consultas: OrderedDict = OrderedDict()
+
+	def _invalidar_caches(self):
+		self._puntuaciones.clear()
+		self._consultas.clear()
+
+	def __len__(self):
+		return len(self._documentos)
+
+	# Escritura
+	def agregar(self, clave: Tuple[str, int], campos: Dict[str, Optional[str]], facetas: Dict[str, Any],
+				datos: Optional[Dict[str, Any]] = None):
+		"""
+		Añade o reemplaza un documento.
+
+		Args:
+			clave: ('gorra' | 'variante', id)
+			campos: Textos por campo (ver PESOS)
+			facetas: Valores de color, talla y tipo
+			datos: Datos a devolver con cada resultado
+		"""
+		frecuencias = Counter()
+		for campo, texto in campos.items():
+			for termino in tokenizar(texto):
+				frecuencias[termino] += PESOS.get(campo, 1)
+		firma = (tuple(sorted(frecuencias.items())), tuple(sorted(facetas.items(), key=lambda i: i[0])))
+
+		with self._bloqueo:
+			self._eliminar_sin_bloqueo(clave)
+			clase = self._clases.get(firma)
+			if clase is None:
+				clase = self._clases[firma] = {
+					'longitud': sum(frecuencias.values()),
+					'facetas': dict(facetas),
+					'documentos': set()
+				}
+				for termino, tf in frecuencias.items():
+					if not self._postings[termino]:
+						self._terminos_obsoletos = True
+					self._postings[termino][firma] = tf
+			clase['documentos'].add(clave)
+			self._frecuencia_doc.update(frecuencias.keys())
+			self._longitud_total += clase['longitud']
+			self._clase_de[clave] = firma
+			self._documentos[clave] = datos or {}
+			self._invalidar_caches()
+
+	def eliminar(self, clave: Tuple[str, int]):
+		"""Elimina un documento si está indexado."""
+		with self._bloqueo:
+			self._eliminar_sin_bloqueo(clave)
+			self._invalidar_caches()
+
+	def _eliminar_sin_bloqueo(self, clave):
+		firma = self._clase_de.pop(clave, None)
+		if firma is None:
+			return
+		del self._documentos[clave]
+		clase = self._clases[firma]
+		clase['documentos'].discard(clave)
+		self._longitud_total -= clase['longitud']
+		terminos = [termino for termino, _ in firma[0]]
+		self._frecuencia_doc.subtract(terminos)
+		if clase['documentos']:
+			return
+		del self._clases[firma]
+		for termino in terminos:
+			postings = self._postings.get(termino)
+			if postings is not None:
+				postings.pop(firma, None)
+				if not postings:
+					del self._postings[termino]
+					del self._frecuencia_doc[termino]
+					self._terminos_obsoletos = True
+
+	# Documentos del catálogo
+	def indexar_gorra(self, fila: Dict[str, Any]):
+		clave = ('gorra', fila['id_gorra'])
+		if fila.get('activo') is False:
+			self.eliminar(clave)
+			return
+		self.agregar(
+			clave,
+			{'nombre': fila['nombre'], 'descripcion': fila['descripcion'], 'color': fila['color']},
+			{'color': fila['color'], 'talla': None, 'tipo': None},
+			{'nombre': fila['nombre'], 'color': fila['color'], 'precio': float(fila['precio'])}
+		)
+
+	def indexar_variante(self, fila: Dict[str, Any]):
+		clave = ('variante', fila['id_gorra'])
+		if fila.get('activo') is False:
+			self.eliminar(clave)
+			return
+		nombre_tipo, descripcion_tipo = self._tipos.get(fila['id_tipo_gorra'], (None, None))
+		self.agregar(
+			clave,
+			{'tipo': nombre_tipo, 'descripcion': descripcion_tipo, 'color': fila['color'], 'talla': fila['talla']},
+			{'color': fila['color'], 'talla': fila['talla'], 'tipo': nombre_tipo},
+			{'id_tipo_gorra': fila['id_tipo_gorra'], 'tipo': nombre_tipo, 'color': fila['color'],
+			 'talla': fila['talla'], 'precio': float(fila['precio'])}
+		)
+
+	def registrar_tipo(self, id_tipo_gorra: int, nombre: str, descripcion: Optional[str]):
+		"""Registra o renombra un tipo y reindexa sus variantes ya indexadas."""
+		with self._bloqueo:
+			anterior = self._tipos.get(id_tipo_gorra)
+			self._tipos[id_tipo_gorra] = (nombre, descripcion)
+			if anterior is None or anterior == (nombre, descripcion):
+				return
+			variantes = [
+				(clave, datos) for clave, datos in self._documentos.items()
+				if clave[0] == 'variante' and datos.get('id_tipo_gorra') == id_tipo_gorra
+			]
+			for clave, datos in variantes:
+				self.indexar_variante(dict(datos, id_gorra=clave[1], activo=True))
+
+	def aplicar(self, tipo_documento: str, fila: Dict[str, Any]):
+		"""
+		Aplica un cambio confirmado: ``fila`` con las columnas del documento o
+		``{'eliminar': id}``. Durante una reconstrucción también se guarda para
+		repetirlo sobre el índice nuevo.
+
+		Args:
+			tipo_documento: 'gorra', 'variante' o 'tipo'
+			fila: Columnas del documento o ``{'eliminar': id}``
+		"""
+		with self._bloqueo:
+			if self._cambios_durante_carga is not None:
+				self._cambios_durante_carga.append((tipo_documento, fila))
+			if not self.cargado:
+				return
+			if tipo_documento == 'tipo':
+				if 'eliminar' not in fila:
+					self.registrar_tipo(fila['id_tipo_gorra'], fila['nombre'], fila['descripcion'])
+			elif 'eliminar' in fila:
+				self.eliminar((tipo_documento, fila['eliminar']))
+			elif tipo_documento == 'gorra':
+				self.indexar_gorra(fila)
+			else:
+				self.indexar_variante(fila)
+
+	def reindexar(self, tipo_documento: str, ids: Iterable[int], tamano_lote: int = 1000):
+		"""
+		Vuelve a indexar desde la base de datos las gorras o variantes
+		indicadas tras una escritura con sentencias Core (p. ej. la
+		actualización masiva) y publica el cambio para los demás procesos.
+
+		Args:
+			tipo_documento: 'gorra' o 'variante'
+			ids: IDs de los documentos modificados
+			tamano_lote: IDs por consulta
+		"""
+		ids = list(ids)
+		if not ids:
+			return
+		if self.cargado or self._cambios_durante_carga is not None:
+			tabla = Gorra.__table__ if tipo_documento == 'gorra' else VarianteGorra.__table__
+			with db.engine.connect() as conexion:
+				for lote in en_lotes(ids, tamano_lote):
+					filas = {fila['id_gorra']: dict(fila) for fila in conexion.execute(
+						select(tabla).where(tabla.c.id_gorra.in_(lote))).mappings()}
+					for id_gorra in lote:
+						self.aplicar(tipo_documento, filas.get(id_gorra, {'eliminar': id_gorra}))
+		self.publicar_cambio()
+
+	def publicar_cambio(self):
+		"""Cuenta un cambio confirmado en campos indexados, para que los demás procesos recarguen."""
+		if self.versiones is not None:
+			self.versiones.incrementar(VERSION_INDICE)
+
+	def reconstruir(self, tamano_lote: int = 5000, carga_vista: Optional[int] = None):
+		"""
+		Carga el índice completo desde la base de datos en lotes.
+
+		Las búsquedas siguen usando el índice actual hasta que el nuevo está
+		completo; solo se hace una carga a la vez.
+
+		Args:
+			tamano_lote: Filas leídas por lote
+			carga_vista: Número de cargas que vio quien pide la reconstrucción;
+				si otro hilo ha cargado desde entonces, no se repite
+		"""
+		g, v, t = Gorra.__table__, VarianteGorra.__table__, TipoGorra.__table__
+		with self._bloqueo_carga:
+			if carga_vista is not None and self.cargas != carga_vista:
+				return
+			with self._bloqueo:
+				self._cambios_durante_carga = []
+				invalidaciones = self._invalidaciones
+			nuevo = IndiceBusqueda(self.max_consultas_cache)
+			try:
+				# Antes de leer: un cambio durante la carga provoca otra reconstrucción
+				contadores = self._leer_contadores()
+				with db.engine.connect() as conexion:
+					for id_tipo, nombre, descripcion in conexion.execute(
+							select(t.c.id_tipo_gorra, t.c.nombre, t.c.descripcion)):
+						nuevo._tipos[id_tipo] = (nombre, descripcion)
+					opciones = {'stream_results': True, 'yield_per': tamano_lote}
+					for fila in conexion.execution_options(**opciones).execute(
+							select(g).where(g.c.activo.is_not(False))).mappings():
+						nuevo.indexar_gorra(fila)
+					for fila in conexion.execution_options(**opciones).execute(
+							select(v).where(v.c.activo.is_not(False))).mappings():
+						nuevo.indexar_variante(fila)
+			except Exception:
+				with self._bloqueo:
+					self._cambios_durante_carga = None
+				raise
+
+			with self._bloqueo:
+				cambios, self._cambios_durante_carga = self._cambios_durante_carga, None
+				for nombre in self._ESTADO:
+					setattr(self, nombre, getattr(nuevo, nombre))
+				self._contadores = contadores
+				self.cargado = True
+				# Los cambios confirmados durante la carga pueden no estar en lo leído
+				for tipo_documento, fila in cambios:
+					self.aplicar(tipo_documento, fila)
+				# Una invalidación durante la carga exige leer de nuevo
+				self.cargado = invalidaciones == self._invalidaciones
+				self.cargas += 1
+		logger.info(f"Índice de búsqueda reconstruido: {len(self)} documentos")
+
+	def invalidar(self):
+		"""
+		Marca el índice para recargarse en la próxima búsqueda (tras cargas
+		masivas) y publica el cambio para que también recarguen los demás
+		procesos.
+		"""
+		with self._bloqueo:
+			self._invalidaciones += 1
+			self.cargado = False
+		self.publicar_cambio()
+
+	def _leer_contadores(self) -> Dict[str, Tuple[int, int]]:
+		return self.versiones.contadores((VERSION_INDICE,)) if self.versiones is not None else {}
+
+	def _desfasado(self) -> bool:
+		"""
+		Indica si otro proceso ha cambiado campos indexados desde la última
+		carga: el contador compartido ha avanzado más que el de este proceso,
+		cuyos cambios ya se aplican con los eventos del ORM.
+		"""
+		if self.versiones is None or self.versiones.backend is None:
+			return False
+		ahora = time.monotonic()
+		if ahora < self._proxima_comprobacion:
+			return False
+		self._proxima_comprobacion = ahora + self.intervalo_version
+		for tabla, (compartido, local) in self._leer_contadores().items():
+			compartido_carga, local_carga = self._contadores.get(tabla, (0, 0))
+			if compartido - compartido_carga != local - local_carga:
+				logger.info("Índice de búsqueda desfasado por cambios de otro proceso")
+				return True
+		return False
+
+	# Lectura
+	def _expandir_prefijo(self, prefijo: str) -> List[str]:
+		if self._terminos_obsoletos:
+			self._terminos = sorted(self._postings)
+			self._terminos_obsoletos = False
+		terminos = self._terminos
+		posicion = bisect.bisect_left(terminos, prefijo)
+		expansiones = []
+		while (posicion < len(terminos) and len(expansiones) < MAX_EXPANSIONES_PREFIJO
+			   and terminos[posicion].startswith(prefijo)):
+			expansiones.append(terminos[posicion])
+			posicion += 1
+		return expansiones
+
+	def _puntuar(self, termino: str) -> Dict[tuple, float]:
+		"""Devuelve (en caché) la puntuación BM25 de cada clase que contiene el término."""
+		puntuaciones = self._puntuaciones.get(termino)
+		if puntuaciones is not None:
+			return puntuaciones
+		postings = self._postings.get(termino) or {}
+		total_docs = len(self._documentos) or 1
+		media = self._longitud_total / total_docs or 1
+		df = self._frecuencia_doc.get(termino, 0)
+		idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+		clases = self._clases
+		puntuaciones = {
+			firma: idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * clases[firma]['longitud'] / media))
+			for firma, tf in postings.items()
+		}
+		self._puntuaciones[termino] = puntuaciones
+		return puntuaciones
+
+	def _puntuar_prefijo(self, prefijo: str) -> Dict[tuple, float]:
+		"""
+		Puntúa el término exacto y sus expansiones por prefijo (penalizadas
+		con FACTOR_PREFIJO), quedándose con la mejor puntuación por clase.
+		"""
+		clave_cache = '*' + prefijo
+		puntuaciones = self._puntuaciones.get(clave_cache)
+		if puntuaciones is not None:
+			return puntuaciones
+		puntuaciones = dict(self._puntuar(prefijo))
+		for termino in self._expandir_prefijo(prefijo):
+			if termino == prefijo:
+				continue
+			for firma, valor in self._puntuar(termino).items():
+				valor *= FACTOR_PREFIJO
+				if valor > puntuaciones.get(firma, 0.0):
+					puntuaciones[firma] = valor
+		self._puntuaciones[clave_cache] = puntuaciones
+		return puntuaciones
+
+	def buscar(self, consulta: str, limite: int = 20, filtros: Optional[Dict[str, str]] = None,
+			   prefijo: bool = True) -> Dict[str, Any]:
+		"""
+		Busca en el catálogo.
+
+		Todos los términos deben aparecer; con ``prefijo`` el último término
+		se completa como prefijo (autocompletado).
+
+		Args:
+			consulta: Texto de búsqueda
+			limite: Número máximo de resultados
+			filtros: Valores exactos de faceta (color, talla, tipo)
+			prefijo: Si es True, el último término se trata como prefijo
+
+		Returns:
+			dict: 'total', 'resultados' (ordenados por relevancia) y
+			'facetas' con los conteos sobre todos los documentos encontrados
+		"""
+		if not self.cargado or self._desfasado():
+			self.reconstruir(carga_vista=self.cargas)
+
+		terminos = tokenizar(consulta)
+		filtros = {f: v for f, v in (filtros or {}).items() if v}
+		clave_cache = (tuple(terminos), tuple(sorted(filtros.items())), limite, prefijo)
+		with self._bloqueo:
+			resultado = self._consultas.get(clave_cache)
+			if resultado is not None:
+				self._consultas.move_to_end(clave_cache)
+				return resultado
+
+			resultado = self._buscar_sin_cache(terminos, limite, filtros, prefijo)
+			self._consultas[clave_cache] = resultado
+			if len(self._consultas) > self.max_consultas_cache:
+				self._consultas.popitem(last=False)
+			return resultado
+
+	def _buscar_sin_cache(self, terminos: List[str], limite: int, filtros: Dict[str, str],
+						  prefijo: bool) -> Dict[str, Any]:
+		facetas = {f: Counter() for f in FACETAS}
+		if not terminos:
+			return {'total': 0, 'resultados': [], 'facetas': {f: {} for f in FACETAS}}
+
+		parciales = [
+			self._puntuar_prefijo(t) if prefijo and i == len(terminos) - 1 else self._puntuar(t)
+			for i, t in enumerate(terminos)
+		]
+		parciales.sort(key=len)
+		clases = self._clases
+		puntuaciones = {}
+		for firma, valor in parciales[0].items():
+			for parcial in parciales[1:]:
+				otro = parcial.get(firma)
+				if otro is None:
+					break
+				valor += otro
+			else:
+				facetas_clase = clases[firma]['facetas']
+				if all(facetas_clase.get(f) == v for f, v in filtros.items()):
+					puntuaciones[firma] = valor
+
+		total = 0
+		for firma in puntuaciones:
+			clase = clases[firma]
+			tamano = len(clase['documentos'])
+			total += tamano
+			for faceta, valor in clase['facetas'].items():
+				if valor is not None:
+					facetas[faceta][valor] += tamano
+
+		resultados = []
+		documentos = self._documentos
+		for firma in sorted(puntuaciones, key=puntuaciones.__getitem__, reverse=True):
+			faltan = limite - len(resultados)
+			if faltan <= 0:
+				break
+			for clave in heapq.nsmallest(faltan, clases[firma]['documentos']):
+				resultados.append(dict(documentos[clave], tipo_documento=clave[0], id=clave[1],
+									   puntuacion=round(puntuaciones[firma], 4)))
+		return {
+			'total': total,
+			'resultados': resultados,
+			'facetas': {f: dict(c.most_common()) for f, c in facetas.items()}
+		}
+
+
+# Instancia global del índice del catálogo
+indice_catalogo = IndiceBusqueda(versiones=versiones_catalogo)
+
+
+# Mantenimiento incremental: los cambios se acumulan durante el flush, con el
+# savepoint en que se hicieron, y se aplican al índice solo cuando la
+# transacción se confirma
+def _pendientes(session) -> list:
+	return session.info.setdefault('busqueda_pendientes', [])
+
+
+def _columnas(objeto) -> Dict[str, Any]:
+	return {attr.key: getattr(objeto, attr.key) for attr in objeto.__mapper__.column_attrs}
+
+
+def _al_guardar(tipo_documento, solo_indexados: bool = False):
+	def _listener(mapper, connection, target):
+		session = Session.object_session(target)
+		if session is None:
+			return
+		# En un UPDATE solo cuentan los campos indexados (no el stock)
+		if solo_indexados and not any(attributes.get_history(target, campo).has_changes()
+									  for campo in CAMPOS_INDEXADOS[tipo_documento]):
+			return
+		_pendientes(session).append((session.get_nested_transaction(), tipo_documento, _columnas(target)))
+	return _listener
+
+
+def _al_eliminar(tipo_documento):
+	def _listener(mapper, connection, target):
+		session = Session.object_session(target)
+		if session is not None:
+			clave = target.id_tipo_gorra if tipo_documento == 'tipo' else target.id_gorra
+			_pendientes(session).append((session.get_nested_transaction(), tipo_documento, {'eliminar': clave}))
+	return _listener
+
+
+_LISTENERS = {
+	tipo: {'after_insert': _al_guardar(tipo), 'after_update': _al_guardar(tipo, solo_indexados=True),
+		   'after_delete': _al_eliminar(tipo)}
+	for tipo in CAMPOS_INDEXADOS
+}
+
+
+def _aplicar_pendientes(session):
+	pendientes = session.info.pop('busqueda_pendientes', None)
+	if not pendientes:
+		return
+	indice_catalogo.publicar_cambio()
+	for _, tipo_documento, fila in pendientes:
+		try:
+			indice_catalogo.aplicar(tipo_documento, fila)
+		except Exception as e:
+			logger.error(f"Error al actualizar el índice de búsqueda: {e}")
+			indice_catalogo.invalidar()
+
+
+def _dentro_de(transaccion, savepoint) -> bool:
+	while transaccion is not None:
+		if transaccion is savepoint:
+			return True
+		transaccion = transaccion.parent
+	return False
+
+
+def _descartar_pendientes(session, transaccion_anterior):
+	"""Descarta los cambios deshechos: todos si es la transacción externa y, si no, solo los del savepoint."""
+	if not transaccion_anterior.nested:
+		session.info.pop('busqueda_pendientes', None)
+		return
+	pendientes = session.info.get('busqueda_pendientes')
+	if pendientes:
+		session.info['busqueda_pendientes'] = [p for p in pendientes if not _dentro_de(p[0], transaccion_anterior)]
+
+
+def registrar_eventos():
+	"""Registra los eventos del ORM que mantienen el índice al día (idempotente)."""
+	for modelo, tipo_documento in ((Gorra, 'gorra'), (VarianteGorra, 'variante'), (TipoGorra, 'tipo')):
+		for evento, listener in _LISTENERS[tipo_documento].items():
+			if not event.contains(modelo, evento, listener):
+				event.listen(modelo, evento, listener)
+	if not event.contains(Session, 'after_commit', _aplicar_pendientes):
+		event.listen(Session, 'after_commit', _aplicar_pendientes)
+		event.listen(Session, 'after_soft_rollback', _descartar_pendientes)
+
+
+
+def init_app(app):
+	"""Activa el mantenimiento incremental del índice para la aplicación."""
+	registrar_eventos()
+	app.extensions['indice_catalogo'] = indice_catalogo
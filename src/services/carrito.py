@@ -0,0 +1,249 @@
+"""
+Servicio del carrito de compra.
+
+El carrito no toca la base de datos hasta el checkout: se guarda como JSON en
+un almacén clave-valor (los backends de ``src.database.cache``: en memoria o
+sobre un archivo SQLite compartido por los workers) con un TTL que se renueva
+en cada cambio. La clave es el ID de la persona o un token anónimo de la
+sesión. Al añadir una variante se fija su precio; ``confirmar`` convierte el
+carrito en un Pedido con ``crear_pedido``, que reserva el stock e inserta
+todos los detalles con un único INSERT de varias filas.
+"""
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import threading
+import time
+import zlib
+
+from sqlalchemy import select
+
+from src.database.cache import BackendMemoriaCompartida, crear_backend
+from src.database.db_connection import db
+from src.database.replicas import solo_lectura
+from src.models.variante_gorra import VarianteGorra
+
+logger = logging.getLogger(__name__)
+
+TTL = 7 * 24 * 3600
+MAX_LINEAS = 50
+MAX_CANTIDAD = 99
+
+
+def propietario_usuario(id_usuario: int) -> str:
+	return f'usuario:{int(id_usuario)}'
+
+
+def propietario_anonimo(token: str) -> str:
+	return f'anonimo:{token}'
+
+
+@solo_lectura
+def _variante(id_gorra: int):
+	"""Datos de la variante que se fijan en la línea del carrito."""
+	tabla = VarianteGorra.__table__
+	return db.session.execute(
+		select(tabla.c.id_gorra, tabla.c.id_tipo_gorra, tabla.c.color, tabla.c.talla, tabla.c.precio,
+			   tabla.c.activo).where(tabla.c.id_gorra == id_gorra)
+	).first()
+
+
+def _cantidad(valor) -> int:
+	if isinstance(valor, bool) or not isinstance(valor, int) or valor < 0 or valor > MAX_CANTIDAD:
+		raise ValueError(f"Cantidad inválida: {valor}")
+	return valor
+
+
+class ServicioCarrito:
+	"""
+	Carritos en un almacén clave-valor con expiración.
+
+	Los cambios de un mismo carrito se serializan con un cerrojo del proceso;
+	entre procesos gana la última escritura, que basta para un carrito que
+	solo modifica su dueño.
+	"""
+
+	PREFIJO = 'carrito'
+
+	def __init__(self, backend=None, ttl: float = TTL, max_lineas: int = MAX_LINEAS):
+		self.backend = backend or BackendMemoriaCompartida()
+		self.ttl = ttl
+		self.max_lineas = max_lineas
+		self._locks = [threading.Lock() for _ in range(64)]
+
+	def init_app(self, app, backend=None):
+		"""
+		Configura el almacén a partir de ``CARRITO_BACKEND`` ('memoria' o
+		'sqlite' con ``CARRITO_RUTA``), salvo que se pase un backend.
+
+		Args:
+			app: Instancia de la aplicación Flask
+			backend: Backend con la interfaz get/set/delete opcional
+		"""
+		if backend is None:
+			backend = crear_backend(app.config.get('CARRITO_BACKEND', 'memoria'), app.config.get('CARRITO_RUTA'))
+		self.backend = backend
+		self.ttl = app.config.get('CARRITO_TTL_SEGUNDOS', TTL)
+		self.max_lineas = app.config.get('CARRITO_MAX_LINEAS', MAX_LINEAS)
+		app.extensions['carritos'] = self
+
+	def _clave(self, propietario: str) -> str:
+		return f'{self.PREFIJO}:{propietario}'
+
+	def _bloqueo(self, propietario: str) -> threading.Lock:
+		return self._locks[zlib.crc32(propietario.encode()) % len(self._locks)]
+
+	def _leer(self, propietario: str) -> Dict[str, Any]:
+		datos = self.backend.get(self._clave(propietario))
+		if isinstance(datos, str):
+			datos = json.loads(datos)
+		return datos or {'lineas': [], 'actualizado': None}
+
+	def _guardar(self, propietario: str, carrito: Dict[str, Any]):
+		if not carrito['lineas']:
+			self.backend.delete(self._clave(propietario))
+			return
+		carrito['actualizado'] = time.time()
+		# Se guarda como texto para que ningún backend comparta el objeto mutable
+		self.backend.set(self._clave(propietario), json.dumps(carrito), self.ttl)
+
+	# Lectura
+	def obtener(self, propietario: str) -> Dict[str, Any]:
+		"""
+		Devuelve el carrito con sus líneas y el total a los precios fijados.
+
+		Returns:
+			dict: Líneas, número de unidades, total y fecha del último cambio
+		"""
+		carrito = self._leer(propietario)
+		total = sum((Decimal(l['precio_unitario']) * l['cantidad'] for l in carrito['lineas']), Decimal('0'))
+		return {
+			'lineas': carrito['lineas'],
+			'unidades': sum(l['cantidad'] for l in carrito['lineas']),
+			'total': str(total),
+			'actualizado': carrito['actualizado']
+		}
+
+	# Cambios
+	def agregar(self, propietario: str, id_gorra: int, cantidad: int = 1) -> Dict[str, Any]:
+		"""
+		Añade unidades de una variante, fijando su precio actual si es nueva
+		en el carrito.
+
+		Raises:
+			ValueError: Si la variante no existe, no está activa, la cantidad
+				no es válida o el carrito está lleno
+		"""
+		if _cantidad(cantidad) == 0:
+			raise ValueError("La cantidad debe ser mayor que cero")
+		with self._bloqueo(propietario):
+			carrito = self._leer(propietario)
+			linea = next((l for l in carrito['lineas'] if l['id_gorra'] == id_gorra), None)
+			if linea is not None:
+				linea['cantidad'] = _cantidad(linea['cantidad'] + cantidad)
+			else:
+				if len(carrito['lineas']) >= self.max_lineas:
+					raise ValueError(f"El carrito admite como máximo {self.max_lineas} variantes")
+				variante = _variante(id_gorra)
+				if variante is None or variante.activo is False:
+					raise ValueError(f"La variante {id_gorra} no está disponible")
+				carrito['lineas'].append({
+					'id_gorra': variante.id_gorra,
+					'id_tipo_gorra': variante.id_tipo_gorra,
+					'color': variante.color,
+					'talla': variante.talla,
+					'cantidad': cantidad,
+					'precio_unitario': str(variante.precio)
+				})
+			self._guardar(propietario, carrito)
+		return self.obtener(propietario)
+
+	def fijar_cantidad(self, propietario: str, id_gorra: int, cantidad: int) -> Dict[str, Any]:
+		"""
+		Cambia la cantidad de una línea; con 0 la elimina.
+
+		Raises:
+			ValueError: Si la cantidad no es válida
+			KeyError: Si la variante no está en el carrito
+		"""
+		cantidad = _cantidad(cantidad)
+		with self._bloqueo(propietario):
+			carrito = self._leer(propietario)
+			linea = next((l for l in carrito['lineas'] if l['id_gorra'] == id_gorra), None)
+			if linea is None:
+				raise KeyError(id_gorra)
+			if cantidad:
+				linea['cantidad'] = cantidad
+			else:
+				carrito['lineas'].remove(linea)
+			self._guardar(propietario, carrito)
+		return self.obtener(propietario)
+
+	def vaciar(self, propietario: str):
+		"""Elimina el carrito."""
+		self.backend.delete(self._clave(propietario))
+
+	def fusionar(self, origen: str, destino: str) -> Dict[str, Any]:
+		"""
+		Pasa las líneas de un carrito (p. ej. el anónimo al iniciar sesión) a
+		otro; si una variante está en ambos se suman las unidades y se
+		conserva el precio del destino.
+		"""
+		if origen == destino:
+			return self.obtener(destino)
+		with self._bloqueo(destino):
+			anterior = self._leer(origen)
+			if not anterior['lineas']:
+				return self.obtener(destino)
+			carrito = self._leer(destino)
+			por_id = {l['id_gorra']: l for l in carrito['lineas']}
+			for linea in anterior['lineas']:
+				if linea['id_gorra'] in por_id:
+					actual = por_id[linea['id_gorra']]
+					actual['cantidad'] = min(actual['cantidad'] + linea['cantidad'], MAX_CANTIDAD)
+				elif len(carrito['lineas']) < self.max_lineas:
+					carrito['lineas'].append(linea)
+			self._guardar(destino, carrito)
+			self.vaciar(origen)
+		return self.obtener(destino)
+
+	def confirmar(self, propietario: str, id_usuario: int):
+		"""
+		Convierte el carrito en un pedido a los precios fijados y lo vacía.
+
+		Returns:
+			Pedido: El pedido creado
+
+		Raises:
+			ValueError: Si el carrito está vacío
+			StockInsuficienteError: Si alguna línea no tiene stock; el
+				carrito se conserva
+		"""
+		from src.services.pedidos import crear_pedido
+
+		with self._bloqueo(propietario):
+			lineas: List[Dict[str, Any]] = [{
+				'id_gorra': l['id_gorra'],
+				'cantidad': l['cantidad'],
+				'precio_unitario': Decimal(l['precio_unitario'])
+			} for l in self._leer(propietario)['lineas']]
+			if not lineas:
+				raise ValueError("El carrito está vacío")
+			pedido = crear_pedido(id_usuario, lineas)
+			self.vaciar(propietario)
+		logger.info(f"Carrito {propietario} confirmado como pedido {pedido.id_pedido}")
+		return pedido
+
+
+# Instancia global, análoga a ``cache_catalogo``
+carritos = ServicioCarrito()
+
+
+def carrito_de(id_usuario: Optional[int] = None, token: Optional[str] = None) -> str:
+	"""Propietario del carrito: la persona si hay sesión iniciada o el token anónimo."""
+	if id_usuario is not None:
+		return propietario_usuario(id_usuario)
+	if not token:
+		raise ValueError("Se necesita un usuario o un token de sesión")
+	return propietario_anonimo(token)
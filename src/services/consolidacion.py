@@ -0,0 +1,688 @@
+"""
+Consolidación de usuarios y ventas en personas y pedidos.
+
+El esquema mantiene dos modelos paralelos de clientes y compras
+(``Usuario``/``Venta``/``DetalleVenta`` y ``Persona``/``Pedido``/
+``DetallePedido``). ``consolidar`` copia los primeros en los segundos
+recorriendo cada tabla de origen por su clave primaria en tramos cortos; cada
+tramo se escribe en una transacción junto con su punto de avance en
+``marcas_agua``, de modo que una ejecución interrumpida continúa donde se
+quedó. Las filas copiadas guardan su origen (``personas.id_usuario_origen``,
+``pedidos.id_venta_origen``), lo que hace la copia idempotente y permite a
+los reportes no contar dos veces una venta ya consolidada.
+
+Las líneas de venta apuntan a ``gorras`` y las de pedido a ``variantes_gorra``,
+tablas con secuencias de IDs independientes y sin clave que las relacione:
+la variante de cada gorra se indica con ``EquivalenciasVariante`` (una tabla,
+una función o, si el catálogo se importó conservando los IDs, la regla de
+igual ID pedida expresamente).
+
+Con ``CONSOLIDACION_DOBLE_ESCRITURA`` activo, los eventos del ORM replican
+también las altas y cambios de usuarios y ventas hechos durante la
+transición. ``verificar`` compara recuentos e importes de ambos lados y que
+cada línea copiada esté en la variante que le corresponde.
+"""
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+import csv
+import logging
+import time
+
+from sqlalchemy import case, delete, event, exists, func, select, update
+
+from src.database.db_connection import db
+from src.database.bulk import en_lotes, insertar_lote, upsert_lote
+from src.models.archivo import DetallePedidoArchivado, DetalleVentaArchivada, PedidoArchivado, VentaArchivada
+from src.models.detalle_pedido import DetallePedido
+from src.models.detalle_venta import DetalleVenta
+from src.models.gorra import Gorra
+from src.models.marca_agua import MarcaAgua
+from src.models.pedido import Pedido
+from src.models.persona import Persona
+from src.models.rol import Rol
+from src.models.tipo_documento import TipoDocumento
+from src.models.usuario import Usuario
+from src.models.variante_gorra import VarianteGorra
+from src.models.venta import Venta
+from src.services.reportes import ESTADOS_VENTA_ANULADA
+
+logger = logging.getLogger(__name__)
+
+MARCA_USUARIOS = 'consolidacion_usuarios'
+MARCA_VENTAS = 'consolidacion_ventas'
+TIPO_DOCUMENTO = 'Cédula de ciudadanía'
+# Nombres de rol de usuarios que no coinciden con los de roles
+ROLES_USUARIO = {'admin': 'administrador'}
+# Estado del pedido para cada estado de venta; el resto (p. ej. 'pagada') pasa a 'entregado'
+ESTADOS_PEDIDO = dict({'pendiente': 'pendiente', 'enviada': 'enviado', 'entregada': 'entregado'},
+					  **{estado: 'cancelado' for estado in ESTADOS_VENTA_ANULADA})
+ESTADO_PEDIDO_DEFECTO = 'entregado'
+CENTIMO = Decimal('0.01')
+# Variante de destino de una gorra, o None si no tiene
+FuncionEquivalencia = Callable[[int], Optional[int]]
+
+
+class EquivalenciasVariante:
+	"""
+	Variante a la que pasa cada gorra de las líneas de venta.
+
+	Se construye con una sola de estas fuentes:
+
+	- ``tabla``: mapa id_gorra -> id de la variante
+	- ``funcion``: función que devuelve la variante de una gorra (o None)
+	- ``mismo_id``: la variante con el mismo ID que la gorra; solo es
+	  correcto si el catálogo se importó conservando los IDs
+
+	Raises:
+		ValueError: Si no se indica ninguna fuente o se indica más de una
+	"""
+
+	def __init__(self, tabla: Optional[Mapping[int, int]] = None, funcion: Optional[FuncionEquivalencia] = None,
+				 mismo_id: bool = False):
+		if sum((tabla is not None, funcion is not None, mismo_id)) != 1:
+			raise ValueError("Indica una única equivalencia gorra -> variante: una tabla, una función o "
+							 "la regla de igual ID")
+		self.tabla = tabla
+		self.funcion = funcion
+		self.mismo_id = mismo_id
+
+	@classmethod
+	def crear(cls, equivalencias: Union['EquivalenciasVariante', Mapping[int, int], FuncionEquivalencia, None] = None,
+			  mismo_id: bool = False) -> 'EquivalenciasVariante':
+		"""Equivalencias a partir de una instancia, una tabla o una función, o de la regla de igual ID."""
+		if isinstance(equivalencias, cls) and not mismo_id:
+			return equivalencias
+		if callable(equivalencias):
+			return cls(funcion=equivalencias, mismo_id=mismo_id)
+		return cls(tabla=equivalencias, mismo_id=mismo_id)
+
+	def destino(self, id_gorra: int) -> Optional[int]:
+		"""ID de la variante que corresponde a la gorra, sin comprobar que exista."""
+		if self.mismo_id:
+			return id_gorra
+		if self.funcion is not None:
+			return self.funcion(id_gorra)
+		return self.tabla.get(id_gorra)
+
+	def resolver(self, conexion, ids_gorra: Iterable[int]) -> Dict[int, int]:
+		"""Mapa id_gorra -> id de la variante para las gorras cuya variante existe."""
+		destinos = {}
+		for id_gorra in set(ids_gorra):
+			id_variante = self.destino(id_gorra)
+			if id_variante is not None:
+				destinos[id_gorra] = id_variante
+		if not destinos:
+			return {}
+		variantes = VarianteGorra.__table__
+		existentes = set(conexion.execute(
+			select(variantes.c.id_gorra).where(variantes.c.id_gorra.in_(set(destinos.values())))).scalars())
+		return {g: v for g, v in destinos.items() if v in existentes}
+
+
+def leer_equivalencias(ruta: str) -> Dict[int, int]:
+	"""Tabla de equivalencias de un CSV con las columnas ``id_gorra`` e ``id_variante``."""
+	with open(ruta, newline='', encoding='utf-8') as archivo:
+		return {int(fila['id_gorra']): int(fila['id_variante']) for fila in csv.DictReader(archivo)}
+
+
+def equivalencias_config(config: Mapping[str, Any]) -> Optional[EquivalenciasVariante]:
+	"""
+	Equivalencias de ``CONSOLIDACION_EQUIVALENCIAS`` (ruta del CSV) o de
+	``CONSOLIDACION_MISMO_ID``; None si no hay ninguna.
+	"""
+	ruta = config.get('CONSOLIDACION_EQUIVALENCIAS')
+	if ruta or config.get('CONSOLIDACION_MISMO_ID'):
+		return EquivalenciasVariante.crear(leer_equivalencias(ruta) if ruta else None,
+										   mismo_id=bool(config.get('CONSOLIDACION_MISMO_ID')))
+	return None
+
+
+class ResultadoConsolidacion:
+	"""Resumen de una ejecución de ``consolidar``."""
+
+	def __init__(self):
+		self.procesadas = 0
+		self.personas = 0
+		self.pedidos = 0
+		self.detalles = 0
+		self.omitidas: List[Tuple[str, int, str]] = []
+		self.segundos = 0.0
+
+	@property
+	def filas_por_segundo(self) -> float:
+		return self.procesadas / self.segundos if self.segundos else 0.0
+
+
+def estado_pedido(estado_venta: Optional[str]) -> str:
+	"""Estado del pedido equivalente al de una venta."""
+	return ESTADOS_PEDIDO.get(estado_venta or '', ESTADO_PEDIDO_DEFECTO)
+
+
+def dividir_nombre(nombre: str) -> Dict[str, Optional[str]]:
+	"""
+	Reparte el nombre completo de un usuario en nombres y apellidos.
+
+	Con tres palabras se entiende nombre y dos apellidos; con cuatro o más,
+	las dos últimas son los apellidos.
+	"""
+	partes = [p[:50] for p in (nombre or '').split()]
+	if len(partes) <= 2:
+		return {'primer_nombre': partes[0] if partes else '', 'segundo_nombre': None,
+				'primer_apellido': partes[1] if len(partes) > 1 else '', 'segundo_apellido': None}
+	if len(partes) == 3:
+		return {'primer_nombre': partes[0], 'segundo_nombre': None,
+				'primer_apellido': partes[1], 'segundo_apellido': partes[2]}
+	return {'primer_nombre': partes[0], 'segundo_nombre': ' '.join(partes[1:-2])[:50] or None,
+			'primer_apellido': partes[-2], 'segundo_apellido': partes[-1]}
+
+
+class _Catalogos:
+	"""IDs de roles y del tipo de documento, creados si faltan."""
+
+	def __init__(self):
+		self.roles: Dict[str, int] = {}
+		self.tipo_documento: Optional[int] = None
+
+	def _asegurar(self, conexion, tabla, columna_id, nombre: str) -> int:
+		consulta = select(columna_id).where(tabla.c.nombre == nombre).order_by(columna_id).limit(1)
+		id_fila = conexion.execute(consulta).scalar()
+		if id_fila is None:
+			insertar_lote(conexion, tabla, [{'nombre': nombre}])
+			id_fila = conexion.execute(consulta).scalar()
+		return id_fila
+
+	def rol(self, conexion, rol_usuario: Optional[str]) -> int:
+		nombre = ROLES_USUARIO.get(rol_usuario or 'cliente', rol_usuario or 'cliente')
+		if nombre not in self.roles:
+			tabla = Rol.__table__
+			self.roles[nombre] = self._asegurar(conexion, tabla, tabla.c.id_rol, nombre)
+		return self.roles[nombre]
+
+	def documento(self, conexion) -> int:
+		if self.tipo_documento is None:
+			tabla = TipoDocumento.__table__
+			self.tipo_documento = self._asegurar(conexion, tabla, tabla.c.id_tipo_documento, TIPO_DOCUMENTO)
+		return self.tipo_documento
+
+
+def _datos_persona(conexion, usuario, catalogos: _Catalogos) -> Dict[str, Any]:
+	"""Columnas de la persona equivalente a un usuario."""
+	return dict(dividir_nombre(usuario['nombre']), **{
+		'id_tipo_documento': catalogos.documento(conexion),
+		'documento': usuario['cedula'],
+		'telefono': usuario['telefono'],
+		'correo': usuario['correo'],
+		'direccion': usuario['direccion'],
+		'password_hash': usuario['password_hash'],
+		'activo': True if usuario['activo'] is None else usuario['activo'],
+		'fecha_registro': usuario['fecha_registro'] or datetime.utcnow(),
+		'id_rol': catalogos.rol(conexion, usuario['rol'])
+	})
+
+
+def _datos_pedido(venta, id_persona: int) -> Dict[str, Any]:
+	"""Columnas del pedido equivalente a una venta."""
+	return {
+		'id_usuario': id_persona,
+		'fecha_pedido': venta['fecha_venta'] or datetime.utcnow(),
+		'estado': estado_pedido(venta['estado']),
+		'total': Decimal(str(venta['total'])).quantize(CENTIMO),
+		'metodo_pago': venta['metodo_pago'],
+		'comprobante_url': venta['comprobante_url'],
+		'id_venta_origen': venta['id_venta']
+	}
+
+
+def _personas_de(conexion, ids_usuario: Iterable[int]) -> Dict[int, int]:
+	"""Mapa id_usuario -> id de la persona ya consolidada."""
+	personas = Persona.__table__
+	ids_usuario = list(ids_usuario)
+	if not ids_usuario:
+		return {}
+	return dict(conexion.execute(
+		select(personas.c.id_usuario_origen, personas.c.id_usuario)
+		.where(personas.c.id_usuario_origen.in_(ids_usuario))
+	).all())
+
+
+def _copiar_usuarios(conexion, usuarios: List[Any], catalogos: _Catalogos,
+					 resultado: Optional[ResultadoConsolidacion] = None) -> Dict[int, int]:
+	"""
+	Copia en personas los usuarios que aún no lo estén.
+
+	Si ya existe una persona con el mismo correo se reutiliza y solo se
+	anota su usuario de origen.
+
+	Returns:
+		dict: id_usuario -> id de la persona para todos los usuarios copiados
+	"""
+	personas = Persona.__table__
+	mapa = _personas_de(conexion, (u['id_usuario'] for u in usuarios))
+	pendientes = [u for u in usuarios if u['id_usuario'] not in mapa]
+	if not pendientes:
+		return mapa
+
+	por_correo = {fila.correo: fila for fila in conexion.execute(
+		select(personas.c.correo, personas.c.id_usuario, personas.c.id_usuario_origen)
+		.where(personas.c.correo.in_([u['correo'] for u in pendientes]))
+	)}
+	nuevas, enlazadas = [], []
+	for usuario in pendientes:
+		existente = por_correo.get(usuario['correo'])
+		if existente is None:
+			nuevas.append(dict(_datos_persona(conexion, usuario, catalogos), id_usuario_origen=usuario['id_usuario']))
+		elif existente.id_usuario_origen is None:
+			enlazadas.append((existente.id_usuario, usuario['id_usuario']))
+		elif resultado is not None:
+			resultado.omitidas.append((Usuario.__tablename__, usuario['id_usuario'],
+									   f"el correo ya pertenece a la persona {existente.id_usuario}"))
+
+	for id_persona, id_usuario in enlazadas:
+		conexion.execute(update(personas).where(personas.c.id_usuario == id_persona)
+						 .values(id_usuario_origen=id_usuario))
+	insertar_lote(conexion, personas, nuevas)
+	mapa.update(_personas_de(conexion, (u['id_usuario'] for u in pendientes)))
+	if resultado is not None:
+		resultado.personas += len(nuevas) + len(enlazadas)
+	return mapa
+
+
+def _copiar_ventas(conexion, ventas: List[Any], catalogos: _Catalogos,
+				   resultado: ResultadoConsolidacion, equivalencias: EquivalenciasVariante):
+	"""
+	Copia en pedidos (con sus detalles) las ventas que aún no lo estén.
+
+	Cada línea pasa a la variante que indican las equivalencias; una venta
+	con alguna gorra sin variante se omite entera para que su total siga
+	cuadrando.
+	"""
+	pedidos, detalles_pedido = Pedido.__table__, DetallePedido.__table__
+	detalles_venta = DetalleVenta.__table__
+	copiadas = set()
+	for tabla in (pedidos, PedidoArchivado.__table__):
+		copiadas.update(conexion.execute(
+			select(tabla.c.id_venta_origen).where(tabla.c.id_venta_origen.in_([v['id_venta'] for v in ventas]))
+		).scalars())
+	pendientes = [v for v in ventas if v['id_venta'] not in copiadas]
+	if not pendientes:
+		return
+
+	lineas: Dict[int, List[Any]] = {}
+	for linea in conexion.execute(
+		select(detalles_venta).where(detalles_venta.c.id_venta.in_([v['id_venta'] for v in pendientes]))
+		.order_by(detalles_venta.c.id_detalle)
+	):
+		lineas.setdefault(linea.id_venta, []).append(linea)
+	destinos = equivalencias.resolver(conexion, (l.id_gorra for grupo in lineas.values() for l in grupo))
+
+	ids_usuario = {v['id_usuario'] for v in pendientes}
+	personas = _personas_de(conexion, ids_usuario)
+	if len(personas) < len(ids_usuario):
+		# Usuarios dados de alta después de su fase: se copian ahora
+		usuarios = Usuario.__table__
+		faltan = conexion.execute(
+			select(usuarios).where(usuarios.c.id_usuario.in_(list(ids_usuario - set(personas))))).mappings().all()
+		personas.update(_copiar_usuarios(conexion, faltan, catalogos, resultado))
+
+	nuevos = []
+	for venta in pendientes:
+		sin_variante = sorted({l.id_gorra for l in lineas.get(venta['id_venta'], ())} - set(destinos))
+		if sin_variante:
+			resultado.omitidas.append((Venta.__tablename__, venta['id_venta'],
+									   f"gorras sin variante equivalente: {sin_variante}"))
+		elif venta['id_usuario'] not in personas:
+			resultado.omitidas.append((Venta.__tablename__, venta['id_venta'],
+									   f"usuario {venta['id_usuario']} sin persona"))
+		else:
+			nuevos.append(_datos_pedido(venta, personas[venta['id_usuario']]))
+	if not nuevos:
+		return
+
+	insertar_lote(conexion, pedidos, nuevos)
+	ids_pedido = dict(conexion.execute(
+		select(pedidos.c.id_venta_origen, pedidos.c.id_pedido)
+		.where(pedidos.c.id_venta_origen.in_([p['id_venta_origen'] for p in nuevos]))
+	).all())
+	detalles = [{
+		'id_pedido': ids_pedido[p['id_venta_origen']],
+		'id_gorra': destinos[l.id_gorra],
+		'cantidad': l.cantidad,
+		'precio_unitario': Decimal(str(l.precio_unitario)).quantize(CENTIMO)
+	} for p in nuevos for l in lineas.get(p['id_venta_origen'], ())]
+	for lote in en_lotes(detalles, 1000):
+		insertar_lote(conexion, detalles_pedido, lote)
+	resultado.pedidos += len(nuevos)
+	resultado.detalles += len(detalles)
+
+
+def _regular(inicio: float, procesadas: int, pausa: float, max_filas_segundo: Optional[float]):
+	"""Espera entre tramos: la pausa fija y lo necesario para no superar el ritmo máximo."""
+	espera = pausa
+	if max_filas_segundo:
+		espera = max(espera, procesadas / max_filas_segundo - (time.perf_counter() - inicio))
+	if espera > 0:
+		time.sleep(espera)
+
+
+def consolidar(equivalencias: Union[EquivalenciasVariante, Mapping[int, int], FuncionEquivalencia, None] = None,
+			   mismo_id: bool = False, tamano_lote: int = 500, pausa: float = 0.0,
+			   max_filas_segundo: Optional[float] = None, reiniciar: bool = False,
+			   progreso: Optional[Callable[[str, ResultadoConsolidacion], None]] = None) -> ResultadoConsolidacion:
+	"""
+	Copia usuarios en personas y ventas en pedidos por tramos reanudables.
+
+	Cada tramo lee las siguientes ``tamano_lote`` filas de origen por clave
+	primaria a partir de su marca de agua y las escribe, junto con la marca,
+	en una transacción corta. Las filas ya copiadas se saltan, por lo que
+	repetir o reiniciar la consolidación no duplica datos.
+
+	Args:
+		equivalencias: Variante de cada gorra: tabla id_gorra -> id de la
+			variante, función o ``EquivalenciasVariante``
+		mismo_id: Usa la variante con el mismo ID que la gorra en lugar de
+			``equivalencias``
+		tamano_lote: Filas de origen por transacción
+		pausa: Segundos de espera entre tramos para ceder la base de datos
+		max_filas_segundo: Ritmo máximo de filas de origen por segundo
+		reiniciar: Si es True, vuelve a recorrer las tablas desde el principio
+		progreso: Función opcional llamada con la fase ('usuarios' o
+			'ventas') y el resultado acumulado tras cada tramo
+
+	Returns:
+		ResultadoConsolidacion: Filas procesadas, copiadas y omitidas
+
+	Raises:
+		ValueError: Si el tamaño de lote no es positivo o no se indica una
+			única equivalencia gorra -> variante
+	"""
+	if tamano_lote <= 0:
+		raise ValueError("El tamaño de lote debe ser mayor que cero")
+	equivalencias = EquivalenciasVariante.crear(equivalencias, mismo_id)
+	marcas = MarcaAgua.__table__
+	if reiniciar:
+		with db.engine.begin() as conexion:
+			conexion.execute(delete(marcas).where(marcas.c.nombre.in_([MARCA_USUARIOS, MARCA_VENTAS])))
+
+	resultado = ResultadoConsolidacion()
+	catalogos = _Catalogos()
+	inicio = time.perf_counter()
+	fases = (
+		('usuarios', MARCA_USUARIOS, Usuario.__table__, Usuario.__table__.c.id_usuario, _copiar_usuarios),
+		('ventas', MARCA_VENTAS, Venta.__table__, Venta.__table__.c.id_venta,
+		 partial(_copiar_ventas, equivalencias=equivalencias))
+	)
+	for fase, nombre_marca, tabla, clave, copiar in fases:
+		while True:
+			with db.engine.begin() as conexion:
+				ultimo = conexion.execute(select(marcas.c.ultimo_id).where(marcas.c.nombre == nombre_marca)).scalar()
+				consulta = select(tabla).order_by(clave).limit(tamano_lote)
+				if ultimo is not None:
+					consulta = consulta.where(clave > ultimo)
+				filas = conexion.execute(consulta).mappings().all()
+				if not filas:
+					break
+				copiar(conexion, filas, catalogos, resultado)
+				upsert_lote(conexion, marcas, [{'nombre': nombre_marca, 'ultimo_id': filas[-1][clave.name],
+												'fecha_actualizacion': datetime.utcnow()}])
+			resultado.procesadas += len(filas)
+			resultado.segundos = time.perf_counter() - inicio
+			if progreso:
+				progreso(fase, resultado)
+			_regular(inicio, resultado.procesadas, pausa, max_filas_segundo)
+
+	resultado.segundos = time.perf_counter() - inicio
+	logger.info(f"Consolidación terminada: {resultado.personas} personas, {resultado.pedidos} pedidos, "
+				f"{len(resultado.omitidas)} filas omitidas ({resultado.filas_por_segundo:.0f} filas/s)")
+	return resultado
+
+
+def _lineas_distintas(conexion, origen, copia, equivalencias: Optional[EquivalenciasVariante],
+					  tamano_lote: int = 1000) -> List[int]:
+	"""
+	IDs de las ventas consolidadas cuyas líneas no están en la variante que
+	les corresponde.
+
+	Compara por venta el multiconjunto de líneas (variante, color, cantidad):
+	el color de la variante debe ser el de la gorra de origen y, si se dan
+	equivalencias, la variante la que indican para esa gorra. Recorre los
+	pedidos consolidados por tramos de ``tamano_lote`` ventas.
+	"""
+	gorras, variantes = Gorra.__table__, VarianteGorra.__table__
+	distintas = []
+	for pedidos, _ in copia:
+		ultimo = None
+		while True:
+			consulta = (select(pedidos.c.id_venta_origen).where(pedidos.c.id_venta_origen.isnot(None))
+						.order_by(pedidos.c.id_venta_origen).limit(tamano_lote))
+			if ultimo is not None:
+				consulta = consulta.where(pedidos.c.id_venta_origen > ultimo)
+			ids_venta = conexion.execute(consulta).scalars().all()
+			if not ids_venta:
+				break
+			ultimo = ids_venta[-1]
+
+			fuente = [fila for _, dv in origen for fila in conexion.execute(
+				select(dv.c.id_venta, dv.c.id_gorra, dv.c.cantidad, gorras.c.color)
+				.select_from(dv.outerjoin(gorras, gorras.c.id_gorra == dv.c.id_gorra))
+				.where(dv.c.id_venta.in_(ids_venta)))]
+			destinos = equivalencias.resolver(conexion, (f.id_gorra for f in fuente)) if equivalencias else {}
+			esperadas: Dict[int, Counter] = {}
+			for fila in fuente:
+				variante = destinos.get(fila.id_gorra) if equivalencias else None
+				esperadas.setdefault(fila.id_venta, Counter())[(variante, fila.color, fila.cantidad)] += 1
+
+			copiadas: Dict[int, Counter] = {}
+			for p, dp in copia:
+				for fila in conexion.execute(
+					select(p.c.id_venta_origen, dp.c.id_gorra, dp.c.cantidad, variantes.c.color)
+					.select_from(dp.join(p, p.c.id_pedido == dp.c.id_pedido)
+								 .outerjoin(variantes, variantes.c.id_gorra == dp.c.id_gorra))
+					.where(p.c.id_venta_origen.in_(ids_venta))
+				):
+					variante = fila.id_gorra if equivalencias else None
+					copiadas.setdefault(fila.id_venta_origen, Counter())[(variante, fila.color, fila.cantidad)] += 1
+			distintas.extend(i for i in ids_venta if esperadas.get(i, Counter()) != copiadas.get(i, Counter()))
+	return sorted(distintas)
+
+
+def verificar(muestra: int = 20,
+			  equivalencias: Union[EquivalenciasVariante, Mapping[int, int], FuncionEquivalencia, None] = None,
+			  mismo_id: bool = False) -> Dict[str, Any]:
+	"""
+	Compara los datos de origen con los consolidados, sumando en ambos lados
+	las tablas de archivo (ver ``src.services.archivo``).
+
+	Args:
+		muestra: Número máximo de IDs pendientes o distintos a devolver
+		equivalencias: Variante esperada de cada gorra, como en
+			``consolidar``; sin ellas (ni ``mismo_id``) las líneas solo se
+			comparan por color
+		mismo_id: Espera la variante con el mismo ID que la gorra
+
+	Returns:
+		dict: Pares (origen, consolidado) de recuentos e importes, ventas
+		cuyo pedido tiene otro total o estado, ventas con líneas en otra
+		variante, IDs sin copiar y si todo coincide
+	"""
+	if equivalencias is not None or mismo_id:
+		equivalencias = EquivalenciasVariante.crear(equivalencias, mismo_id)
+	usuarios, personas = Usuario.__table__, Persona.__table__
+	origen = ((Venta.__table__, DetalleVenta.__table__), (VentaArchivada.__table__, DetalleVentaArchivada.__table__))
+	copia = ((Pedido.__table__, DetallePedido.__table__), (PedidoArchivado.__table__, DetallePedidoArchivado.__table__))
+
+	with db.engine.connect() as conexion:
+		def suma(consultas) -> Any:
+			return sum((conexion.execute(c).scalar() or 0 for c in consultas), 0)
+
+		def importe(valor) -> Decimal:
+			return Decimal(str(valor or 0)).quantize(CENTIMO)
+
+		def lineas(cabecera, detalle, clave):
+			return detalle.join(cabecera, cabecera.c[clave] == detalle.c[clave])
+
+		consolidado = [p.c.id_venta_origen.isnot(None) for p, _ in copia]
+		comparacion = {
+			'usuarios': (suma([select(func.count()).select_from(usuarios)]),
+						 suma([select(func.count()).where(personas.c.id_usuario_origen.isnot(None))])),
+			'ventas': (suma(select(func.count()).select_from(v) for v, _ in origen),
+					   suma(select(func.count()).where(c) for c in consolidado)),
+			'detalles': (suma(select(func.count()).select_from(dv) for _, dv in origen),
+						 suma(select(func.count()).select_from(lineas(p, dp, 'id_pedido')).where(c)
+							  for (p, dp), c in zip(copia, consolidado))),
+			'total': (importe(suma(select(func.sum(v.c.total)) for v, _ in origen)),
+					  importe(suma(select(func.sum(p.c.total)).where(c) for (p, _), c in zip(copia, consolidado)))),
+			'importe_lineas': (
+				importe(suma(select(func.sum(dv.c.cantidad * dv.c.precio_unitario)) for _, dv in origen)),
+				importe(suma(select(func.sum(dp.c.cantidad * dp.c.precio_unitario))
+							 .select_from(lineas(p, dp, 'id_pedido')).where(c)
+							 for (p, dp), c in zip(copia, consolidado))))
+		}
+		distintas = []
+		for v, _ in origen:
+			estado_equivalente = case(ESTADOS_PEDIDO, value=v.c.estado, else_=ESTADO_PEDIDO_DEFECTO)
+			for p, _ in copia:
+				distintas.extend(conexion.execute(
+					select(v.c.id_venta)
+					.select_from(v.join(p, p.c.id_venta_origen == v.c.id_venta))
+					.where((func.abs(p.c.total - v.c.total) >= 0.005) | (p.c.estado != estado_equivalente))
+				).scalars())
+		distintas.sort()
+		lineas_distintas = _lineas_distintas(conexion, origen, copia, equivalencias)
+		ventas = Venta.__table__
+		ventas_pendientes = conexion.execute(
+			select(ventas.c.id_venta)
+			.where(*[~exists().where(p.c.id_venta_origen == ventas.c.id_venta) for p, _ in copia])
+			.order_by(ventas.c.id_venta).limit(muestra)
+		).scalars().all()
+		usuarios_pendientes = conexion.execute(
+			select(usuarios.c.id_usuario)
+			.where(~exists().where(personas.c.id_usuario_origen == usuarios.c.id_usuario))
+			.order_by(usuarios.c.id_usuario).limit(muestra)
+		).scalars().all()
+
+	return {
+		'comparacion': comparacion,
+		'ventas_distintas': len(distintas),
+		'muestra_distintas': distintas[:muestra],
+		'lineas_distintas': len(lineas_distintas),
+		'muestra_lineas_distintas': lineas_distintas[:muestra],
+		'ventas_pendientes': ventas_pendientes,
+		'usuarios_pendientes': usuarios_pendientes,
+		'coincide': all(a == b for a, b in comparacion.values()) and not distintas and not lineas_distintas
+	}
+
+
+# Doble escritura durante la transición
+_equivalencias: Optional[EquivalenciasVariante] = None
+
+
+def _fila(objeto, tabla) -> Dict[str, Any]:
+	return {columna.name: getattr(objeto, columna.key) for columna in tabla.columns}
+
+
+def _usuario_insertado(mapper, connection, target):
+	_copiar_usuarios(connection, [_fila(target, Usuario.__table__)], _Catalogos())
+
+
+def _usuario_actualizado(mapper, connection, target):
+	personas = Persona.__table__
+	datos = _datos_persona(connection, _fila(target, Usuario.__table__), _Catalogos())
+	connection.execute(update(personas).where(personas.c.id_usuario_origen == target.id_usuario).values(**datos))
+
+
+def _venta_insertada(mapper, connection, target):
+	resultado = ResultadoConsolidacion()
+	_copiar_ventas(connection, [_fila(target, Venta.__table__)], _Catalogos(), resultado, _equivalencias)
+	for _, id_venta, motivo in resultado.omitidas:
+		logger.warning(f"Venta {id_venta} sin copiar en pedidos: {motivo}")
+
+
+def _venta_actualizada(mapper, connection, target):
+	pedidos = Pedido.__table__
+	datos = _fila(target, Venta.__table__)
+	connection.execute(update(pedidos).where(pedidos.c.id_venta_origen == target.id_venta).values(
+		fecha_pedido=datos['fecha_venta'], estado=estado_pedido(datos['estado']),
+		total=Decimal(str(datos['total'])).quantize(CENTIMO), metodo_pago=datos['metodo_pago'],
+		comprobante_url=datos['comprobante_url']))
+
+
+def _venta_eliminada(mapper, connection, target):
+	pedidos, detalles = Pedido.__table__, DetallePedido.__table__
+	id_pedido = select(pedidos.c.id_pedido).where(pedidos.c.id_venta_origen == target.id_venta).scalar_subquery()
+	connection.execute(delete(detalles).where(detalles.c.id_pedido == id_pedido))
+	connection.execute(delete(pedidos).where(pedidos.c.id_venta_origen == target.id_venta))
+
+
+def _detalle_insertado(mapper, connection, target):
+	pedidos = Pedido.__table__
+	id_pedido = connection.execute(
+		select(pedidos.c.id_pedido).where(pedidos.c.id_venta_origen == target.id_venta)).scalar()
+	if id_pedido is None:
+		return
+	id_variante = _equivalencias.resolver(connection, [target.id_gorra]).get(target.id_gorra)
+	if id_variante is None:
+		logger.warning(f"Línea {target.id_detalle} de la venta {target.id_venta} sin variante equivalente: "
+					   f"el pedido {id_pedido} queda incompleto")
+		return
+	insertar_lote(connection, DetallePedido.__table__, [{
+		'id_pedido': id_pedido,
+		'id_gorra': id_variante,
+		'cantidad': target.cantidad,
+		'precio_unitario': Decimal(str(target.precio_unitario)).quantize(CENTIMO)
+	}])
+
+
+_EVENTOS = (
+	(Usuario, 'after_insert', _usuario_insertado),
+	(Usuario, 'after_update', _usuario_actualizado),
+	(Venta, 'after_insert', _venta_insertada),
+	(Venta, 'after_update', _venta_actualizada),
+	(Venta, 'before_delete', _venta_eliminada),
+	(DetalleVenta, 'after_insert', _detalle_insertado)
+)
+
+
+def registrar_doble_escritura(equivalencias: Union[EquivalenciasVariante, Mapping[int, int],
+												   FuncionEquivalencia, None] = None, mismo_id: bool = False):
+	"""
+	Replica en personas y pedidos las escrituras de usuarios y ventas (idempotente).
+
+	Args:
+		equivalencias: Variante de cada gorra, como en ``consolidar``
+		mismo_id: Usa la variante con el mismo ID que la gorra
+
+	Raises:
+		ValueError: Si no se indica una única equivalencia gorra -> variante
+	"""
+	global _equivalencias
+	_equivalencias = EquivalenciasVariante.crear(equivalencias, mismo_id)
+	for modelo, evento, funcion in _EVENTOS:
+		if not event.contains(modelo, evento, funcion):
+			event.listen(modelo, evento, funcion)
+
+
+def quitar_doble_escritura():
+	"""Deja de replicar las escrituras de usuarios y ventas."""
+	global _equivalencias
+	for modelo, evento, funcion in _EVENTOS:
+		if event.contains(modelo, evento, funcion):
+			event.remove(modelo, evento, funcion)
+	_equivalencias = None
+
+
+def init_app(app):
+	"""
+	Activa la doble escritura si ``CONSOLIDACION_DOBLE_ESCRITURA`` está activo.
+
+	Raises:
+		RuntimeError: Si está activa sin ``CONSOLIDACION_EQUIVALENCIAS`` ni ``CONSOLIDACION_MISMO_ID``
+	"""
+	if app.config.get('CONSOLIDACION_DOBLE_ESCRITURA'):
+		equivalencias = equivalencias_config(app.config)
+		if equivalencias is None:
+			raise RuntimeError("La doble escritura necesita la variante de cada gorra de las ventas "
+							   "(CONSOLIDACION_EQUIVALENCIAS o CONSOLIDACION_MISMO_ID)")
+		registrar_doble_escritura(equivalencias)
@@ -0,0 +1,124 @@
+"""
+Servicio de disponibilidad del catálogo por tipo de gorra.
+
+``consultar_disponibilidad`` responde con el stock y las variantes activas
+por tipo, color y talla leyendo solo los contadores de ``stock_tipos_gorra``
+(ver ``src.models.stock_tipo_gorra``), sin agregar ``variantes_gorra``.
+``reconciliar`` compara los contadores con el agregado real y corrige las
+desviaciones; se ejecuta con ``flask reconcile-stock``.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.database.bulk import en_lotes
+from src.database.replicas import solo_lectura
+from src.database.versiones import versiones_catalogo
+from src.models.stock_tipo_gorra import StockTipoGorra, agregado_variantes, aplicar_deltas
+from src.models.tipo_gorra import TipoGorra
+from src.models.variante_gorra import VarianteGorra
+
+logger = logging.getLogger(__name__)
+
+
+@solo_lectura
+def consultar_disponibilidad(ids_tipo: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+	"""
+	Disponibilidad por tipo de gorra a partir de los contadores.
+
+	Args:
+		ids_tipo: Tipos a consultar; por defecto todos los que tienen contadores
+
+	Returns:
+		dict: id_tipo_gorra -> stock total, variantes activas y detalle por
+		color y talla (solo combinaciones con variantes activas)
+	"""
+	consulta = (
+		db.session.query(StockTipoGorra)
+		.filter(StockTipoGorra.variantes_activas > 0)
+		.order_by(StockTipoGorra.id_tipo_gorra, StockTipoGorra.color, StockTipoGorra.talla)
+	)
+	if ids_tipo is not None:
+		consulta = consulta.filter(StockTipoGorra.id_tipo_gorra.in_(list(ids_tipo)))
+
+	resultado: Dict[int, Dict[str, Any]] = {}
+	for fila in consulta:
+		tipo = resultado.setdefault(fila.id_tipo_gorra, {
+			'id_tipo_gorra': fila.id_tipo_gorra, 'stock': 0, 'variantes_activas': 0, 'detalle': []
+		})
+		tipo['stock'] += fila.stock
+		tipo['variantes_activas'] += fila.variantes_activas
+		tipo['detalle'].append({
+			'color': fila.color,
+			'talla': fila.talla,
+			'stock': fila.stock,
+			'variantes_activas': fila.variantes_activas
+		})
+	return resultado
+
+
+def reconciliar(reparar: bool = True, tamano_lote: int = 500,
+				progreso: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
+	"""
+	Detecta (y opcionalmente corrige) contadores que no coinciden con las variantes.
+
+	Los tipos se revisan por tramos, cada uno en su transacción: primero se
+	bloquean los contadores del tramo y después se agregan las variantes, de
+	modo que un pedido concurrente o se ve en el agregado o aplica su
+	incremento sobre la fila ya corregida.
+
+	Args:
+		reparar: Si es False solo informa de las desviaciones
+		tamano_lote: Tipos de gorra por transacción
+		progreso: Función opcional llamada con el número de tipos revisados
+
+	Returns:
+		List[dict]: Una entrada por combinación desviada con los valores
+		esperados y los guardados
+	"""
+	contadores = StockTipoGorra.__table__
+	variantes = VarianteGorra.__table__
+	with db.engine.connect() as conexion:
+		ids_tipo = sorted(set(conexion.execute(select(TipoGorra.__table__.c.id_tipo_gorra)).scalars())
+						  | set(conexion.execute(select(contadores.c.id_tipo_gorra).distinct()).scalars())
+						  | set(conexion.execute(select(variantes.c.id_tipo_gorra).distinct()).scalars()))
+
+	desviaciones: List[Dict[str, Any]] = []
+	revisados = 0
+	for tramo in en_lotes(ids_tipo, tamano_lote):
+		with db.engine.begin() as conexion:
+			guardados: Dict[Tuple[int, str, str], Tuple[int, int]] = {
+				(f.id_tipo_gorra, f.color, f.talla): (f.stock, f.variantes_activas)
+				for f in conexion.execute(
+					select(contadores).where(contadores.c.id_tipo_gorra.in_(tramo)).with_for_update())
+			}
+			esperados = {
+				(f.id_tipo_gorra, f.color, f.talla): (int(f.stock), int(f.variantes_activas))
+				for f in conexion.execute(agregado_variantes(tramo))
+			}
+			deltas = {}
+			for clave in sorted(set(guardados) | set(esperados)):
+				esperado, guardado = esperados.get(clave, (0, 0)), guardados.get(clave, (0, 0))
+				if esperado == guardado:
+					continue
+				deltas[clave] = (esperado[0] - guardado[0], esperado[1] - guardado[1])
+				desviaciones.append({
+					'id_tipo_gorra': clave[0], 'color': clave[1], 'talla': clave[2],
+					'stock_esperado': esperado[0], 'stock_guardado': guardado[0],
+					'activas_esperadas': esperado[1], 'activas_guardadas': guardado[1],
+					'falta_fila': clave not in guardados
+				})
+			if reparar:
+				aplicar_deltas(conexion, deltas)
+		revisados += len(tramo)
+		if progreso:
+			progreso(revisados)
+
+	if desviaciones:
+		logger.warning(f"{len(desviaciones)} contadores de stock desviados"
+					   f"{' y corregidos' if reparar else ''}")
+		if reparar:
+			versiones_catalogo.incrementar(VarianteGorra.__tablename__)
+	return desviaciones
@@ -0,0 +1,127 @@
+"""
+Servicio de exportación del catálogo en streaming.
+
+Lee ``gorras`` o ``variantes_gorra`` con cursores del lado del servidor en
+bloques y serializa directamente las tuplas de cada fila a NDJSON o CSV,
+con compresión gzip opcional, sin construir objetos del ORM. La memoria
+usada depende del tamaño de bloque, no del tamaño del catálogo.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Sequence
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.models.gorra import Gorra
+from src.models.variante_gorra import VarianteGorra
+
+TABLAS = {
+	'gorras': Gorra.__table__,
+	'variantes': VarianteGorra.__table__,
+}
+FORMATOS = {
+	'ndjson': 'application/x-ndjson',
+	'csv': 'text/csv',
+}
+
+
+def _valor_json(valor):
+	if isinstance(valor, Decimal):
+		return float(valor)
+	if isinstance(valor, (datetime, date)):
+		return valor.isoformat()
+	raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def leer_bloques(tabla: str, tamano_bloque: int = 2000,
+				 activas: Optional[bool] = None) -> Iterator[Sequence[tuple]]:
+	"""
+	Recorre una tabla del catálogo en bloques de tuplas.
+
+	Args:
+		tabla: 'gorras' o 'variantes'
+		tamano_bloque: Filas por bloque (y por viaje al servidor)
+		activas: Filtra por el campo activo si se indica
+
+	Returns:
+		Iterator[Sequence[tuple]]: Bloques de filas en orden de clave primaria
+	"""
+	objeto_tabla = TABLAS[tabla]
+	consulta = select(*objeto_tabla.c).order_by(*objeto_tabla.primary_key.columns)
+	if activas is not None:
+		consulta = consulta.where(objeto_tabla.c.activo == activas)
+
+	with db.engine.connect() as conexion:
+		resultado = conexion.execution_options(stream_results=True, yield_per=tamano_bloque).execute(consulta)
+		for bloque in resultado.partitions():
+			yield bloque
+
+
+def columnas(tabla: str) -> List[str]:
+	"""Nombres de las columnas exportadas de una tabla."""
+	return [c.name for c in TABLAS[tabla].c]
+
+
+def serializar_ndjson(nombres: List[str], bloques: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+	"""Serializa cada bloque de tuplas como líneas JSON, un bloque por fragmento."""
+	codificador = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_valor_json)
+	for bloque in bloques:
+		lineas = [codificador.encode(dict(zip(nombres, fila))) for fila in bloque]
+		yield ('\n'.join(lineas) + '\n').encode('utf-8')
+
+
+def serializar_csv(nombres: List[str], bloques: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+	"""Serializa la cabecera y cada bloque de tuplas como CSV."""
+	buffer = io.StringIO()
+	escritor = csv.writer(buffer)
+	escritor.writerow(nombres)
+	for bloque in bloques:
+		escritor.writerows(bloque)
+		yield buffer.getvalue().encode('utf-8')
+		buffer.seek(0)
+		buffer.truncate()
+	if buffer.tell():
+		yield buffer.getvalue().encode('utf-8')
+
+
+def comprimir_gzip(fragmentos: Iterable[bytes], nivel: int = 6) -> Iterator[bytes]:
+	"""Comprime un flujo de fragmentos en formato gzip sin acumularlo en memoria."""
+	compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+	for fragmento in fragmentos:
+		comprimido = compresor.compress(fragmento)
+		if comprimido:
+			yield comprimido
+	yield compresor.flush()
+
+
+def exportar(tabla: str = 'gorras', formato: str = 'ndjson', gzip: bool = False,
+			 tamano_bloque: int = 2000, activas: Optional[bool] = None) -> Iterator[bytes]:
+	"""
+	Genera la exportación de una tabla del catálogo como flujo de bytes.
+
+	Args:
+		tabla: 'gorras' o 'variantes'
+		formato: 'ndjson' o 'csv'
+		gzip: Si es True, comprime la salida en gzip
+		tamano_bloque: Filas leídas y serializadas por bloque
+		activas: Filtra por el campo activo si se indica
+
+	Returns:
+		Iterator[bytes]: Fragmentos listos para escribir o enviar
+
+	Raises:
+		ValueError: Si la tabla o el formato no son válidos
+	"""
+	if tabla not in TABLAS:
+		raise ValueError(f"Tabla no exportable: {tabla}")
+	if formato not in FORMATOS:
+		raise ValueError(f"Formato de exportación no soportado: {formato}")
+
+	serializar = serializar_ndjson if formato == 'ndjson' else serializar_csv
+	flujo = serializar(columnas(tabla), leer_bloques(tabla, tamano_bloque, activas))
+	return comprimir_gzip(flujo) if gzip else flujo
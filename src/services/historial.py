@@ -0,0 +1,142 @@
+"""
+Servicio de lectura del historial de pedidos de un cliente.
+
+Las relaciones de los modelos están declaradas con ``lazy=True``, así que
+recorrerlas genera una consulta por pedido, por línea y por variante. Aquí
+cada caso de uso elige sus opciones de carga para que el número de
+consultas sea constante, y cualquier otra relación queda bloqueada con
+``raiseload`` para detectar accesos no previstos.
+
+Los pedidos antiguos ya cerrados pasan a ``pedidos_archivados`` (ver
+``src.services.archivo``); solo se consultan si se pide con
+``incluir_archivo`` un rango que empieza antes del límite del archivo.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import configure_mappers, joinedload, raiseload, selectinload
+
+from src.database.db_connection import db
+from src.models.archivo import PedidoArchivado, incluye_archivo
+from src.models.pedido import Pedido
+from src.models.detalle_pedido import DetallePedido
+from src.models.variante_gorra import VarianteGorra
+
+# Perfiles de carga disponibles y número de consultas que emiten (el doble, más
+# la lectura del límite, si se incluye el archivo)
+PERFILES = {
+	'resumen': 1,    # solo pedidos
+	'lineas': 2,     # pedidos + líneas
+	'completo': 2,   # pedidos + líneas con variante y tipo (JOIN)
+}
+
+
+def opciones_carga(perfil: str, modelo=Pedido) -> list:
+	"""
+	Devuelve las opciones de carga de un perfil.
+
+	Args:
+		perfil: 'resumen', 'lineas' o 'completo'
+		modelo: Pedido o PedidoArchivado
+
+	Returns:
+		list: Opciones para ``Query.options``
+	"""
+	if perfil not in PERFILES:
+		raise ValueError(f"Perfil de carga desconocido: {perfil}")
+
+	# Las relaciones con backref solo existen tras configurar los mappers
+	configure_mappers()
+	if perfil == 'resumen':
+		return [raiseload('*')]
+	if perfil == 'lineas':
+		return [selectinload(modelo.detalles).raiseload('*'), raiseload('*')]
+	detalle = modelo.detalles.property.mapper.class_
+	return [
+		selectinload(modelo.detalles)
+		.joinedload(detalle.variante_gorra)
+		.joinedload(VarianteGorra.tipo_gorra)
+		.raiseload('*'),
+		raiseload('*')
+	]
+
+
+def obtener_historial(id_usuario: int, perfil: str = 'completo', desde: Optional[datetime] = None,
+					  hasta: Optional[datetime] = None, limite: Optional[int] = None,
+					  incluir_archivo: bool = False) -> List[Pedido]:
+	"""
+	Obtiene los pedidos de un cliente, del más reciente al más antiguo.
+
+	Args:
+		id_usuario: ID de la persona
+		perfil: Perfil de carga (ver PERFILES)
+		desde: Fecha mínima del pedido (incluida)
+		hasta: Fecha máxima del pedido (excluida)
+		limite: Número máximo de pedidos
+		incluir_archivo: Si es True y el rango empieza antes del límite del
+			archivo, añade los pedidos archivados
+
+	Returns:
+		List[Pedido]: Pedidos (o PedidoArchivado) con las relaciones del
+		perfil ya cargadas
+	"""
+	modelos = [Pedido]
+	if incluir_archivo and incluye_archivo(db.session.connection(), desde):
+		modelos.append(PedidoArchivado)
+
+	pedidos = []
+	for modelo in modelos:
+		query = modelo.query.filter(modelo.id_usuario == id_usuario).options(*opciones_carga(perfil, modelo))
+		if desde is not None:
+			query = query.filter(modelo.fecha_pedido >= desde)
+		if hasta is not None:
+			query = query.filter(modelo.fecha_pedido < hasta)
+		query = query.order_by(modelo.fecha_pedido.desc(), modelo.id_pedido.desc())
+		if limite is not None:
+			query = query.limit(limite)
+		pedidos.extend(query.all())
+	if len(modelos) > 1:
+		pedidos.sort(key=lambda p: (p.fecha_pedido or datetime.min, p.id_pedido), reverse=True)
+		if limite is not None:
+			pedidos = pedidos[:limite]
+	return pedidos
+
+
+def serializar_pedido(pedido: Pedido, perfil: str = 'completo') -> Dict[str, Any]:
+	"""
+	Convierte un pedido cargado con ``obtener_historial`` a diccionario.
+
+	Args:
+		pedido: Pedido a serializar
+		perfil: Perfil con el que se cargó el pedido
+
+	Returns:
+		dict: Datos del pedido y, según el perfil, sus líneas
+	"""
+	datos = {
+		'id_pedido': pedido.id_pedido,
+		'fecha_pedido': pedido.fecha_pedido.isoformat() if pedido.fecha_pedido else None,
+		'estado': pedido.estado,
+		'total': float(pedido.total),
+		'archivado': isinstance(pedido, PedidoArchivado)
+	}
+	if perfil == 'resumen':
+		return datos
+
+	lineas = []
+	for detalle in pedido.detalles:
+		linea = {
+			'id_gorra': detalle.id_gorra,
+			'cantidad': detalle.cantidad,
+			'precio_unitario': float(detalle.precio_unitario)
+		}
+		if perfil == 'completo':
+			variante = detalle.variante_gorra
+			linea.update({
+				'color': variante.color,
+				'talla': variante.talla,
+				'tipo': variante.tipo_gorra.nombre
+			})
+		lineas.append(linea)
+	datos['detalles'] = lineas
+	return datos
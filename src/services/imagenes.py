@@ -0,0 +1,403 @@
+"""
+Servicio de imágenes de las gorras.
+
+Las subidas se copian a disco por bloques mientras se calcula su SHA-256 y
+se guardan como ``<hash>.<ext>``, de modo que un archivo repetido se
+almacena una sola vez. Cada imagen lleva un contador de referencias (modelo
+Imagen) que se suma con un único upsert, de modo que dos subidas simultáneas
+del mismo contenido no chocan, y sus archivos se borran cuando la última
+gorra la libera y la transacción se confirma. Como otra transacción puede
+reutilizar el archivo mientras tanto, el borrado comprueba antes que la fila
+sigue sin existir y una subida que reutiliza un archivo conserva su copia
+temporal hasta confirmar, para reponerlo si otra lo acaba de borrar. Las
+miniaturas y sus versiones WebP se generan en segundo plano con un pool de
+hilos; como las URL incluyen el hash, se sirven como inmutables (ver
+``src.routes.imagenes``).
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from sqlalchemy import delete, event, exists, select
+from sqlalchemy.orm import Session
+
+from src.database.bulk import upsert_lote
+from src.database.db_connection import db
+from src.models.imagen import Imagen
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_URL = '/imagenes/'
+EXTENSIONES = {'jpg': 'jpg', 'jpeg': 'jpg', 'png': 'png', 'gif': 'gif', 'webp': 'webp'}
+TAMANOS = (160, 480, 1024)
+TAMANO_BLOQUE = 64 * 1024
+MAX_BYTES = 10 * 1024 * 1024
+
+# <hash>.<ext> para el original y <hash>_<ancho>.<ext> para las miniaturas
+_RE_NOMBRE = re.compile(r'^([0-9a-f]{64})(?:_(\d+))?\.(jpg|png|gif|webp)$')
+
+_config = {'carpeta': None, 'tamanos': TAMANOS, 'max_bytes': MAX_BYTES, 'trabajadores': 2}
+_ejecutor: Optional[ThreadPoolExecutor] = None
+# Originales con miniaturas en cola, para no procesar dos veces la misma subida
+_en_curso: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def carpeta_imagenes() -> str:
+	"""Carpeta raíz de las imágenes subidas."""
+	if _config['carpeta']:
+		return _config['carpeta']
+	from flask import current_app
+	return current_app.config.get('UPLOAD_FOLDER') or os.path.join(current_app.root_path, '..', 'static', 'uploads')
+
+
+def analizar_nombre(nombre: str) -> Optional[Tuple[str, Optional[int], str]]:
+	"""
+	Descompone un nombre de archivo de imagen.
+
+	Returns:
+		Optional[tuple]: (hash, ancho o None para el original, extensión), o
+		None si el nombre no corresponde a una imagen direccionada por hash
+	"""
+	coincidencia = _RE_NOMBRE.match(nombre)
+	if coincidencia is None:
+		return None
+	hash_sha256, ancho, extension = coincidencia.groups()
+	return hash_sha256, int(ancho) if ancho else None, extension
+
+
+def ruta_archivo(nombre: str) -> str:
+	"""Ruta en disco de un archivo de imagen, repartida por los dos primeros caracteres del hash."""
+	return os.path.join(carpeta_imagenes(), nombre[:2], nombre)
+
+
+def _nombre(hash_sha256: str, extension: str, ancho: Optional[int] = None) -> str:
+	return f"{hash_sha256}_{ancho}.{extension}" if ancho else f"{hash_sha256}.{extension}"
+
+
+def _hash_de_url(imagen_url: Optional[str]) -> Optional[Tuple[str, str]]:
+	if not imagen_url or not imagen_url.startswith(PREFIJO_URL):
+		return None
+	partes = analizar_nombre(imagen_url[len(PREFIJO_URL):])
+	if partes is None or partes[1] is not None:
+		return None
+	return partes[0], partes[2]
+
+
+# Subida
+def guardar_imagen(archivo) -> str:
+	"""
+	Guarda una imagen subida y suma una referencia en la sesión actual.
+
+	El archivo se escribe por bloques en un temporal mientras se calcula su
+	hash; si ya existía una imagen con el mismo contenido, el temporal se
+	descarta al confirmar la transacción (o sustituye al archivo si otra
+	transacción lo borró entretanto). La referencia se suma con un upsert y
+	se confirma junto con la transacción del llamador.
+
+	Args:
+		archivo: Objeto FileStorage de Flask
+
+	Returns:
+		str: URL inmutable de la imagen original
+
+	Raises:
+		ValueError: Si la extensión no está permitida o el archivo es demasiado grande
+	"""
+	extension = EXTENSIONES.get(os.path.splitext(archivo.filename or '')[1].lstrip('.').lower())
+	if extension is None:
+		raise ValueError(f"Formato de imagen no permitido: {archivo.filename}")
+
+	carpeta = carpeta_imagenes()
+	os.makedirs(carpeta, exist_ok=True)
+	resumen = hashlib.sha256()
+	tamano = 0
+	descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix='.subida_')
+	try:
+		with os.fdopen(descriptor, 'wb') as destino:
+			while True:
+				bloque = archivo.stream.read(TAMANO_BLOQUE)
+				if not bloque:
+					break
+				tamano += len(bloque)
+				if tamano > _config['max_bytes']:
+					raise ValueError("La imagen supera el tamaño máximo permitido")
+				resumen.update(bloque)
+				destino.write(bloque)
+
+		hash_sha256 = resumen.hexdigest()
+		ruta = ruta_archivo(_nombre(hash_sha256, extension))
+		nueva = not os.path.exists(ruta)
+		if nueva:
+			os.makedirs(os.path.dirname(ruta), exist_ok=True)
+			os.replace(temporal, ruta)
+		else:
+			db.session.info.setdefault('imagenes_reutilizadas', []).append((temporal, ruta))
+	except BaseException:
+		if os.path.exists(temporal):
+			os.remove(temporal)
+		raise
+
+	upsert_lote(db.session.connection(), Imagen.__table__, [{
+		'hash_sha256': hash_sha256, 'extension': extension, 'tamano': tamano, 'referencias': 1,
+		'fecha_creacion': datetime.utcnow()
+	}], columnas_actualizar=(), columnas_sumar=('referencias',))
+
+	# Las de un archivo reutilizado se completan al confirmar, ya con el archivo asegurado
+	if nueva:
+		programar_variantes(ruta)
+	return PREFIJO_URL + _nombre(hash_sha256, extension)
+
+
+def liberar_imagen(imagen_url: Optional[str]) -> bool:
+	"""
+	Resta una referencia a una imagen en la sesión actual. Si no quedan
+	referencias, la fila se elimina y sus archivos se borran cuando la
+	transacción se confirma.
+
+	Args:
+		imagen_url: URL devuelta por guardar_imagen
+
+	Returns:
+		bool: False si la URL no es de una imagen direccionada por hash
+	"""
+	partes = _hash_de_url(imagen_url)
+	if partes is None:
+		return False
+	tabla = Imagen.__table__
+	conexion = db.session.connection()
+	referencias = conexion.execute(
+		select(tabla.c.referencias).where(tabla.c.hash_sha256 == partes[0]).with_for_update()
+	).scalar()
+	if referencias is None:
+		return True
+	if referencias > 1:
+		conexion.execute(tabla.update().where(tabla.c.hash_sha256 == partes[0])
+						 .values(referencias=tabla.c.referencias - 1))
+	else:
+		conexion.execute(delete(tabla).where(tabla.c.hash_sha256 == partes[0]))
+		db.session.info.setdefault('imagenes_por_borrar', []).append(partes)
+	return True
+
+
+def _en_uso(session, hash_sha256: str) -> bool:
+	"""Lee la fila confirmada en una conexión aparte (la de la sesión ya no admite SQL tras el commit)."""
+	tabla = Imagen.__table__
+	with session.get_bind(mapper=Imagen.__mapper__).connect() as conexion:
+		return conexion.execute(select(exists().where(tabla.c.hash_sha256 == hash_sha256))).scalar()
+
+
+def _borrar_archivos(session, hash_sha256: str, extension: str):
+	original = ruta_archivo(_nombre(hash_sha256, extension))
+	# El original se aparta antes de comprobar la fila: si otra transacción
+	# acaba de reutilizarlo se restaura, y si no, la subida que lo reutilice
+	# después lo repone con su copia temporal (ver ``_reponer_reutilizadas``)
+	apartado = f"{original}.{threading.get_ident()}.borrando"
+	try:
+		os.replace(original, apartado)
+	except FileNotFoundError:
+		apartado = None
+	if _en_uso(session, hash_sha256):
+		if apartado is not None and not os.path.exists(original):
+			os.replace(apartado, original)
+		elif apartado is not None:
+			os.remove(apartado)
+		return
+
+	rutas = [apartado] if apartado is not None else []
+	for ancho in _config['tamanos']:
+		rutas.append(ruta_archivo(_nombre(hash_sha256, extension, ancho)))
+		rutas.append(ruta_archivo(_nombre(hash_sha256, 'webp', ancho)))
+	for ruta in rutas:
+		try:
+			os.remove(ruta)
+		except FileNotFoundError:
+			pass
+		except OSError as e:
+			logger.error(f"Error al eliminar la imagen {ruta}: {e}")
+
+
+def _reponer_reutilizadas(session):
+	for temporal, ruta in session.info.pop('imagenes_reutilizadas', ()):
+		try:
+			if os.path.exists(ruta):
+				os.remove(temporal)
+			else:
+				logger.info(f"Imagen {ruta} borrada por otra transacción; se repone con la subida")
+				os.replace(temporal, ruta)
+			hash_sha256, _, extension = analizar_nombre(os.path.basename(ruta))
+			if not _variantes_completas(hash_sha256, extension):
+				programar_variantes(ruta)
+		except OSError as e:
+			logger.error(f"Error al reponer la imagen {ruta}: {e}")
+
+
+def _aplicar_borrados(session):
+	_reponer_reutilizadas(session)
+	for hash_sha256, extension in session.info.pop('imagenes_por_borrar', ()):
+		try:
+			_borrar_archivos(session, hash_sha256, extension)
+		except Exception as e:
+			logger.error(f"Error al eliminar los archivos de la imagen {hash_sha256}: {e}")
+
+
+def _descartar_borrados(session, transaccion_anterior):
+	# Tras deshacer solo un savepoint se mantienen: el borrado vuelve a comprobar la fila
+	if transaccion_anterior.nested:
+		return
+	session.info.pop('imagenes_por_borrar', None)
+	for temporal, _ in session.info.pop('imagenes_reutilizadas', ()):
+		try:
+			os.remove(temporal)
+		except OSError:
+			pass
+
+
+# Variantes
+def _variantes_completas(hash_sha256: str, extension: str) -> bool:
+	return all(os.path.exists(ruta_archivo(_nombre(hash_sha256, formato, ancho)))
+			   for ancho in _config['tamanos'] for formato in {extension, 'webp'})
+
+
+def generar_variantes(ruta: str, tamanos=TAMANOS) -> List[str]:
+	"""
+	Genera las miniaturas de una imagen en su formato y en WebP.
+
+	Solo se generan los anchos menores que el original. Requiere Pillow; sin
+	él la imagen se sirve únicamente en su tamaño original.
+
+	Args:
+		ruta: Ruta del archivo original
+		tamanos: Anchos de las miniaturas
+
+	Returns:
+		List[str]: Rutas de los archivos generados
+	"""
+	try:
+		from PIL import Image
+	except ImportError:
+		logger.warning("Pillow no está instalado; no se generan miniaturas")
+		return []
+
+	hash_sha256, _, extension = analizar_nombre(os.path.basename(ruta))
+	generadas = []
+	with Image.open(ruta) as original:
+		original.load()
+		for ancho in sorted(tamanos):
+			if ancho >= original.width:
+				break
+			alto = max(1, round(original.height * ancho / original.width))
+			miniatura = original.resize((ancho, alto), Image.LANCZOS)
+			for formato in (extension, 'webp'):
+				destino = ruta_archivo(_nombre(hash_sha256, formato, ancho))
+				if os.path.exists(destino):
+					continue
+				imagen = miniatura
+				opciones = {'quality': 80 if formato == 'webp' else 85}
+				if formato == 'jpg':
+					imagen = miniatura.convert('RGB')
+					opciones['optimize'] = True
+				elif formato in ('png', 'gif'):
+					opciones = {'optimize': True}
+				temporal = f"{destino}.{threading.get_ident()}.tmp"
+				imagen.save(temporal, format={'jpg': 'JPEG'}.get(formato, formato.upper()), **opciones)
+				os.replace(temporal, destino)
+				generadas.append(destino)
+	return generadas
+
+
+def _al_terminar(ruta: str, futuro: Future):
+	with _lock:
+		_en_curso.pop(ruta, None)
+	error = futuro.exception()
+	if error is not None:
+		logger.error(f"Error al generar las miniaturas de {ruta}: {error}")
+
+
+def programar_variantes(ruta: str) -> Future:
+	"""Encola la generación de miniaturas de una imagen en el pool de trabajadores."""
+	global _ejecutor
+	with _lock:
+		if ruta in _en_curso:
+			return _en_curso[ruta]
+		if _ejecutor is None:
+			_ejecutor = ThreadPoolExecutor(max_workers=_config['trabajadores'], thread_name_prefix='imagenes')
+		futuro = _en_curso[ruta] = _ejecutor.submit(generar_variantes, ruta, _config['tamanos'])
+	futuro.add_done_callback(lambda f: _al_terminar(ruta, f))
+	return futuro
+
+
+def esperar_variantes():
+	"""Espera a que terminen las miniaturas encoladas (útil en comandos y pruebas)."""
+	global _ejecutor
+	if _ejecutor is not None:
+		_ejecutor.shutdown(wait=True)
+		_ejecutor = None
+
+
+# URLs
+def urls_imagen(imagen_url: Optional[str]) -> Optional[Dict[str, object]]:
+	"""
+	URLs del original y de las miniaturas de una imagen.
+
+	Returns:
+		Optional[dict]: ``{'original': url, 'variantes': {ancho: {formato: url}}}``;
+		las imágenes antiguas sin hash solo tienen original
+	"""
+	if not imagen_url:
+		return None
+	partes = _hash_de_url(imagen_url)
+	if partes is None:
+		return {'original': imagen_url, 'variantes': {}}
+	hash_sha256, extension = partes
+	return {
+		'original': imagen_url,
+		'variantes': {
+			ancho: {formato: PREFIJO_URL + _nombre(hash_sha256, formato, ancho) for formato in (extension, 'webp')}
+			for ancho in _config['tamanos']
+		}
+	}
+
+
+def _reiniciar_tras_fork():
+	# Los hilos del pool no sobreviven al fork; el hijo crea el suyo al encolar
+	global _ejecutor, _lock
+	_ejecutor = None
+	_en_curso.clear()
+	_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def registrar_eventos():
+	"""Registra los eventos que borran los archivos al confirmar la transacción (idempotente)."""
+	if not event.contains(Session, 'after_commit', _aplicar_borrados):
+		event.listen(Session, 'after_commit', _aplicar_borrados)
+		event.listen(Session, 'after_soft_rollback', _descartar_borrados)
+
+
+def init_app(app):
+	"""
+	Configura el servicio de imágenes para la aplicación.
+
+	Args:
+		app: Instancia de la aplicación Flask
+	"""
+	_config.update(
+		carpeta=app.config.get('UPLOAD_FOLDER'),
+		tamanos=tuple(app.config.get('IMAGENES_TAMANOS', TAMANOS)),
+		max_bytes=app.config.get('IMAGENES_MAX_BYTES', MAX_BYTES),
+		trabajadores=app.config.get('IMAGENES_TRABAJADORES', 2)
+	)
+	# El pool de hilos se crea con la primera subida, ya en el proceso que la atiende
+	esperar_variantes()
+	registrar_eventos()
+	app.extensions['imagenes'] = _config
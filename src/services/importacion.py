@@ -0,0 +1,277 @@
+"""
+Servicio de importación masiva del catálogo.
+
+Lee un archivo CSV o JSONL de forma incremental y carga ``tipos_gorra``,
+``variantes_gorra`` y ``gorras`` en lotes, con una transacción por lote.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from decimal import Decimal, InvalidOperation
+import csv
+import json
+import logging
+import time
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.database.bulk import en_lotes, insertar_lote, upsert_lote
+from src.database.cache import cache_catalogo
+from src.database.versiones import TABLAS_CATALOGO, versiones_catalogo
+from src.models.gorra import Gorra, validar_precio, validar_stock
+from src.models.stock_tipo_gorra import CAMPOS_VARIANTE, acumular, aplicar_deltas
+from src.models.tipo_gorra import TipoGorra
+from src.models.variante_gorra import VarianteGorra
+from src.services.busqueda import indice_catalogo
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_OBLIGATORIOS = ('tipo', 'color', 'talla', 'precio', 'stock')
+VALORES_VERDADEROS = ('1', 'true', 'si', 'sí', 'yes', 'y')
+
+
+class ResultadoImportacion:
+	"""Resumen de una importación."""
+
+	def __init__(self):
+		self.procesadas = 0
+		self.importadas = 0
+		self.rechazadas: List[Tuple[int, str]] = []
+		self.segundos = 0.0
+
+	@property
+	def filas_por_segundo(self) -> float:
+		return self.procesadas / self.segundos if self.segundos else 0.0
+
+
+def leer_filas(ruta: str, formato: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+	"""
+	Lee un archivo de catálogo fila a fila sin cargarlo entero en memoria.
+
+	Args:
+		ruta: Ruta del archivo
+		formato: 'csv' o 'jsonl'; si se omite se deduce de la extensión
+
+	Returns:
+		Iterator[Tuple[int, dict]]: Número de línea y datos de cada fila
+	"""
+	formato = (formato or ruta.rsplit('.', 1)[-1]).lower()
+	with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+		if formato == 'csv':
+			lector = csv.DictReader(archivo)
+			for fila in lector:
+				yield lector.line_num, fila
+		elif formato in ('jsonl', 'ndjson'):
+			for numero, linea in enumerate(archivo, start=1):
+				if not linea.strip():
+					continue
+				try:
+					yield numero, json.loads(linea)
+				except json.JSONDecodeError as e:
+					yield numero, {'_error': f"JSON inválido: {e.msg}"}
+		else:
+			raise ValueError(f"Formato de archivo no soportado: {formato}")
+
+
+def _texto(valor) -> Optional[str]:
+	if valor is None:
+		return None
+	valor = str(valor).strip()
+	return valor or None
+
+
+def normalizar_fila(fila: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Convierte y valida una fila del archivo con las mismas reglas que el
+	modelo Gorra, sin instanciar objetos del ORM.
+
+	Args:
+		fila: Datos crudos de la fila
+
+	Returns:
+		dict: Datos normalizados
+
+	Raises:
+		ValueError: Si la fila no es válida
+	"""
+	if not isinstance(fila, dict):
+		raise ValueError("Cada fila debe ser un objeto")
+	if '_error' in fila:
+		raise ValueError(fila['_error'])
+	faltantes = [c for c in CAMPOS_OBLIGATORIOS if _texto(fila.get(c)) is None]
+	if faltantes:
+		raise ValueError(f"Faltan campos obligatorios: {', '.join(faltantes)}")
+
+	try:
+		precio = Decimal(str(fila['precio']).strip())
+	except InvalidOperation:
+		raise ValueError(f"Precio inválido: {fila['precio']}")
+	if not precio.is_finite():
+		raise ValueError(f"Precio inválido: {fila['precio']}")
+	try:
+		stock = int(str(fila['stock']).strip())
+	except ValueError:
+		raise ValueError(f"Stock inválido: {fila['stock']}")
+	validar_precio(precio)
+	validar_stock(stock)
+
+	id_gorra = _texto(fila.get('id_gorra'))
+	activo = fila.get('activo', True)
+	if not isinstance(activo, bool):
+		activo = str(activo).strip().lower() in VALORES_VERDADEROS if _texto(activo) else True
+
+	return {
+		'id_gorra': int(id_gorra) if id_gorra else None,
+		'tipo': _texto(fila['tipo']),
+		'descripcion_tipo': _texto(fila.get('descripcion_tipo')),
+		'nombre': _texto(fila.get('nombre')),
+		'descripcion': _texto(fila.get('descripcion')) or '',
+		'imagen_url': _texto(fila.get('imagen_url')),
+		'color': _texto(fila['color']),
+		'talla': _texto(fila['talla']),
+		'precio': precio,
+		'stock': stock,
+		'activo': activo
+	}
+
+
+def _resolver_tipos(conexion, filas: List[Dict[str, Any]], tipos: Dict[str, int]):
+	"""Crea los tipos de gorra que falten y completa el mapa nombre -> id."""
+	tabla = TipoGorra.__table__
+	pendientes = {}
+	for fila in filas:
+		if fila['tipo'] not in tipos:
+			pendientes.setdefault(fila['tipo'], fila['descripcion_tipo'])
+	if not pendientes:
+		return
+
+	consulta = select(tabla.c.id_tipo_gorra, tabla.c.nombre).where(tabla.c.nombre.in_(list(pendientes)))
+	for id_tipo, nombre in conexion.execute(consulta):
+		tipos[nombre] = id_tipo
+		pendientes.pop(nombre, None)
+
+	if pendientes:
+		insertar_lote(conexion, tabla, [
+			{'nombre': nombre, 'descripcion': descripcion}
+			for nombre, descripcion in pendientes.items()
+		])
+		consulta = select(tabla.c.id_tipo_gorra, tabla.c.nombre).where(tabla.c.nombre.in_(list(pendientes)))
+		for id_tipo, nombre in conexion.execute(consulta):
+			tipos[nombre] = id_tipo
+
+
+def _escribir_lote(conexion, filas: List[Dict[str, Any]], tipos: Dict[str, int]):
+	"""Escribe un lote ya validado en las tres tablas del catálogo."""
+	_resolver_tipos(conexion, filas, tipos)
+
+	variantes_nuevas, variantes_existentes = [], []
+	gorras_nuevas, gorras_existentes = [], []
+	for fila in filas:
+		variante = {
+			'id_tipo_gorra': tipos[fila['tipo']],
+			'color': fila['color'],
+			'talla': fila['talla'],
+			'precio': fila['precio'],
+			'stock': fila['stock'],
+			'activo': fila['activo']
+		}
+		if fila['id_gorra'] is None:
+			variantes_nuevas.append(variante)
+		else:
+			variantes_existentes.append(dict(variante, id_gorra=fila['id_gorra']))
+
+		if fila['nombre']:
+			gorra = {
+				'nombre': fila['nombre'],
+				'descripcion': fila['descripcion'],
+				'color': fila['color'],
+				'precio': float(fila['precio']),
+				'stock': fila['stock'],
+				'imagen_url': fila['imagen_url'],
+				'activo': fila['activo']
+			}
+			if fila['id_gorra'] is None:
+				gorras_nuevas.append(gorra)
+			else:
+				gorras_existentes.append(dict(gorra, id_gorra=fila['id_gorra']))
+
+	# Contadores de disponibilidad: se resta el aporte anterior de las
+	# variantes que se sobrescriben y se suma el de todas las escritas
+	tabla = VarianteGorra.__table__
+	deltas: Dict[Tuple[int, str, str], Tuple[int, int]] = {}
+	if variantes_existentes:
+		for anterior in conexion.execute(
+			select(*[tabla.c[c] for c in CAMPOS_VARIANTE])
+			.where(tabla.c.id_gorra.in_(list({v['id_gorra'] for v in variantes_existentes})))
+			.with_for_update()
+		):
+			acumular(deltas, (anterior.id_tipo_gorra, anterior.color, anterior.talla),
+					 anterior.stock, anterior.activo, -1)
+	# Si un ID se repite en el lote, el upsert deja la última fila
+	sobrescritas = {v['id_gorra']: v for v in variantes_existentes}
+	for variante in variantes_nuevas + list(sobrescritas.values()):
+		acumular(deltas, (variante['id_tipo_gorra'], variante['color'], variante['talla']),
+				 variante['stock'], variante['activo'])
+
+	insertar_lote(conexion, tabla, variantes_nuevas)
+	upsert_lote(conexion, tabla, variantes_existentes)
+	aplicar_deltas(conexion, deltas)
+	insertar_lote(conexion, Gorra.__table__, gorras_nuevas)
+	upsert_lote(conexion, Gorra.__table__, gorras_existentes)
+
+
+def importar_catalogo(ruta: str, formato: Optional[str] = None, tamano_lote: int = 1000,
+					  progreso=None) -> ResultadoImportacion:
+	"""
+	Importa un archivo de catálogo en lotes.
+
+	Cada fila representa una variante: se crea su tipo si no existe, se
+	inserta (o actualiza si trae ``id_gorra``) en ``variantes_gorra`` y, si
+	incluye ``nombre``, también se registra en ``gorras``.
+
+	Args:
+		ruta: Ruta del archivo CSV o JSONL
+		formato: 'csv' o 'jsonl'; por defecto se deduce de la extensión
+		tamano_lote: Número de filas por transacción
+		progreso: Función opcional llamada con el resultado tras cada lote
+
+	Returns:
+		ResultadoImportacion: Resumen con filas importadas y rechazadas
+	"""
+	resultado = ResultadoImportacion()
+	tipos: Dict[str, int] = {}
+	inicio = time.perf_counter()
+
+	for lote in en_lotes(leer_filas(ruta, formato), tamano_lote):
+		validas, lineas = [], []
+		for linea, fila in lote:
+			resultado.procesadas += 1
+			try:
+				validas.append(normalizar_fila(fila))
+				lineas.append(linea)
+			except ValueError as e:
+				resultado.rechazadas.append((linea, str(e)))
+
+		if validas:
+			try:
+				with db.engine.begin() as conexion:
+					_escribir_lote(conexion, validas, tipos)
+				resultado.importadas += len(validas)
+			except Exception as e:
+				# Un error de base de datos invalida el lote completo
+				logger.error(f"Error al importar lote (líneas {lineas[0]}-{lineas[-1]}): {e}")
+				resultado.rechazadas.extend((linea, f"Error de base de datos: {e}") for linea in lineas)
+				tipos.clear()
+
+		resultado.segundos = time.perf_counter() - inicio
+		if progreso:
+			progreso(resultado)
+
+	cache_catalogo.limpiar()
+	indice_catalogo.invalidar()
+	versiones_catalogo.incrementar(*TABLAS_CATALOGO)
+	resultado.segundos = time.perf_counter() - inicio
+	logger.info(
+		f"Importación completada: {resultado.importadas} filas, "
+		f"{len(resultado.rechazadas)} rechazadas, {resultado.filas_por_segundo:.0f} filas/s"
+	)
+	return resultado
@@ -0,0 +1,161 @@
+"""
+Servicio de creación de pedidos con reserva de stock segura ante concurrencia.
+
+El stock se descuenta con sentencias UPDATE condicionales
+(``stock = stock - n WHERE stock >= n``) en lugar de leer, modificar y
+guardar el atributo del ORM, de modo que dos compras simultáneas no pueden
+vender la misma unidad.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Tuple
+import logging
+
+from sqlalchemy import select, update
+
+from src.database.db_connection import db
+from src.database.bulk import insertar_lote
+from src.database.versiones import versiones_catalogo
+from src.models.pedido import Pedido
+from src.models.stock_tipo_gorra import aplicar_deltas
+from src.models.detalle_pedido import DetallePedido
+from src.models.variante_gorra import VarianteGorra
+
+logger = logging.getLogger(__name__)
+
+
+class StockInsuficienteError(ValueError):
+	"""Se lanza cuando una variante no tiene stock suficiente o no está activa."""
+
+	def __init__(self, id_gorra: int, cantidad: int):
+		self.id_gorra = id_gorra
+		self.cantidad = cantidad
+		super().__init__(f"Stock insuficiente para la variante {id_gorra} (solicitado: {cantidad})")
+
+
+def agrupar_lineas(lineas: Iterable[Dict[str, Any]]) -> "OrderedDict[int, Dict[str, Any]]":
+	"""
+	Agrupa las líneas por variante y las ordena por ``id_gorra``.
+
+	El orden determinista hace que todas las transacciones bloqueen las
+	filas de ``variantes_gorra`` en la misma secuencia, evitando interbloqueos.
+
+	Args:
+		lineas: Diccionarios con ``id_gorra``, ``cantidad`` y, opcionalmente,
+			``precio_unitario`` (precio fijado previamente, p. ej. en un carrito)
+
+	Returns:
+		OrderedDict: id_gorra -> {'cantidad', 'precio_unitario'}
+
+	Raises:
+		ValueError: Si no hay líneas o alguna cantidad no es positiva
+	"""
+	agrupadas: Dict[int, Dict[str, Any]] = {}
+	for linea in lineas:
+		id_gorra = int(linea['id_gorra'])
+		cantidad = int(linea['cantidad'])
+		if cantidad <= 0:
+			raise ValueError("La cantidad debe ser mayor que cero")
+		actual = agrupadas.setdefault(id_gorra, {'cantidad': 0, 'precio_unitario': None})
+		actual['cantidad'] += cantidad
+		if linea.get('precio_unitario') is not None:
+			actual['precio_unitario'] = Decimal(str(linea['precio_unitario']))
+	if not agrupadas:
+		raise ValueError("El pedido debe tener al menos una línea")
+	return OrderedDict(sorted(agrupadas.items()))
+
+
+def reservar_stock(conexion, lineas: "OrderedDict[int, Dict[str, Any]]"):
+	"""
+	Descuenta el stock de cada variante con un UPDATE condicional.
+
+	Args:
+		conexion: Conexión dentro de la transacción del pedido
+		lineas: Resultado de agrupar_lineas
+
+	Raises:
+		StockInsuficienteError: Si alguna variante no puede cubrir la cantidad
+	"""
+	tabla = VarianteGorra.__table__
+	for id_gorra, linea in lineas.items():
+		cantidad = linea['cantidad']
+		resultado = conexion.execute(
+			update(tabla)
+			.where(tabla.c.id_gorra == id_gorra)
+			.where(tabla.c.stock >= cantidad)
+			.where(tabla.c.activo.is_not(False))
+			.values(stock=tabla.c.stock - cantidad)
+		)
+		if resultado.rowcount != 1:
+			raise StockInsuficienteError(id_gorra, cantidad)
+
+
+def crear_pedido(id_usuario: int, lineas: Iterable[Dict[str, Any]]) -> Pedido:
+	"""
+	Crea un pedido con sus detalles y reserva el stock en una sola transacción.
+
+	Args:
+		id_usuario: ID de la persona que realiza el pedido
+		lineas: Líneas del pedido (ver agrupar_lineas)
+
+	Returns:
+		Pedido: El pedido creado
+
+	Raises:
+		StockInsuficienteError: Si alguna línea no tiene stock; no se
+			modifica nada en ese caso
+		ValueError: Si las líneas no son válidas
+	"""
+	agrupadas = agrupar_lineas(lineas)
+	tabla = VarianteGorra.__table__
+
+	try:
+		conexion = db.session.connection()
+		reservar_stock(conexion, agrupadas)
+
+		# Las filas ya están bloqueadas por el UPDATE, el precio no puede cambiar
+		filas = conexion.execute(
+			select(tabla.c.id_gorra, tabla.c.precio, tabla.c.id_tipo_gorra, tabla.c.color, tabla.c.talla)
+			.where(tabla.c.id_gorra.in_(list(agrupadas)))
+		).all()
+		precios = {fila.id_gorra: fila.precio for fila in filas}
+		# Los contadores por tipo se descuentan en la misma transacción
+		deltas: Dict[Tuple[int, str, str], Tuple[int, int]] = {}
+		for fila in filas:
+			clave = (fila.id_tipo_gorra, fila.color, fila.talla)
+			deltas[clave] = (deltas.get(clave, (0, 0))[0] - agrupadas[fila.id_gorra]['cantidad'], 0)
+		aplicar_deltas(conexion, deltas)
+		detalles: List[Dict[str, Any]] = []
+		total = Decimal('0')
+		for id_gorra, linea in agrupadas.items():
+			precio = linea['precio_unitario']
+			if precio is None:
+				precio = Decimal(str(precios[id_gorra]))
+			total += precio * linea['cantidad']
+			detalles.append({
+				'id_gorra': id_gorra,
+				'cantidad': linea['cantidad'],
+				'precio_unitario': precio
+			})
+
+		pedido = Pedido(id_usuario=id_usuario, total=total, estado='pendiente')
+		db.session.add(pedido)
+		db.session.flush()
+
+		for detalle in detalles:
+			detalle['id_pedido'] = pedido.id_pedido
+		insertar_lote(conexion, DetallePedido.__table__, detalles)
+
+		db.session.commit()
+		# La reserva de stock es un UPDATE Core que los eventos del ORM no ven
+		versiones_catalogo.incrementar('variantes_gorra')
+		logger.info(f"Pedido creado: {pedido.id_pedido} ({len(detalles)} líneas)")
+		return pedido
+	except StockInsuficienteError as e:
+		db.session.rollback()
+		logger.info(f"Pedido rechazado para el usuario {id_usuario}: {e}")
+		raise
+	except Exception as e:
+		db.session.rollback()
+		logger.error(f"Error al crear pedido para el usuario {id_usuario}: {str(e)}")
+		raise
@@ -0,0 +1,315 @@
+"""
+Recomendaciones "comprados juntos" a partir de la co-ocurrencia de variantes en pedidos.
+
+Cada tramo de pedidos se convierte en una matriz dispersa pedidos x variantes
+(SciPy) cuyo producto ``Xᵀ·X`` da de una vez en cuántos pedidos coincide cada
+par de variantes. ``actualizar`` solo lee los pedidos con ID posterior a la
+marca ``recomendaciones``, suma su matriz a los pares ya guardados de las
+variantes afectadas y recalcula sus K vecinas; sin marca (o con
+``completo=True``) reconstruye ``coocurrencias_variante`` y
+``recomendaciones_variante`` a partir de todos los pedidos, incluidos los
+archivados. Se ejecuta con ``flask refresh-recommendations``.
+
+Los pedidos cancelados no cuentan. Un pedido cancelado después de
+procesarse, o confirmado con un ID anterior a la marca, no se refleja hasta
+la siguiente reconstrucción completa.
+
+``recomendaciones`` solo lee ``recomendaciones_variante`` y no necesita
+NumPy ni SciPy.
+"""
+from datetime import datetime
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import time
+
+from sqlalchemy import delete, func, or_, select
+
+from src.database.db_connection import db
+from src.database.bulk import en_lotes, insertar_lote, upsert_lote
+from src.database.replicas import solo_lectura
+from src.models.archivo import DetallePedidoArchivado, PedidoArchivado
+from src.models.detalle_pedido import DetallePedido
+from src.models.marca_agua import MarcaAgua
+from src.models.pedido import Pedido
+from src.models.recomendacion import CoocurrenciaVariante, RecomendacionVariante
+from src.models.variante_gorra import VarianteGorra
+
+logger = logging.getLogger(__name__)
+
+MARCA_RECOMENDACIONES = 'recomendaciones'
+TOP_K = 20
+TAMANO_LOTE = 50000
+
+
+class ResultadoRecomendaciones:
+	"""Resumen de una ejecución de ``actualizar``."""
+
+	def __init__(self, completo: bool):
+		self.completo = completo
+		self.pedidos = 0
+		self.lineas = 0
+		self.pares = 0
+		self.variantes = 0
+		self.segundos_calculo = 0.0
+		self.segundos = 0.0
+
+	@property
+	def pedidos_por_segundo(self) -> float:
+		return self.pedidos / self.segundos if self.segundos else 0.0
+
+
+def _dependencias():
+	"""Importa NumPy y SciPy, necesarios solo para calcular las co-ocurrencias."""
+	try:
+		import numpy
+		from scipy import sparse
+	except ImportError as e:
+		raise RuntimeError("El cálculo de recomendaciones necesita numpy y scipy (ver requirements.txt)") from e
+	return numpy, sparse
+
+
+class _Matriz:
+	"""Matrices variantes x variantes indexadas por la posición de cada ID en ``ids``."""
+
+	def __init__(self, ids):
+		self.np, self.sparse = _dependencias()
+		self.ids = self.np.asarray(ids, dtype=self.np.int64)
+
+	def vacia(self):
+		return self.sparse.csr_matrix((len(self.ids), len(self.ids)), dtype=self.np.int64)
+
+	def indices(self, id_gorras):
+		"""Posición de cada ID y máscara de los que existen (las variantes borradas se descartan)."""
+		posiciones = self.np.searchsorted(self.ids, id_gorras)
+		validas = posiciones < len(self.ids)
+		validas[validas] = self.ids[posiciones[validas]] == id_gorras[validas]
+		return posiciones, validas
+
+	def coocurrencias(self, lineas):
+		"""
+		Co-ocurrencias de un tramo de líneas ``(id_pedido, id_gorra)``.
+
+		Returns:
+			tuple: Matriz simétrica (la diagonal cuenta los pedidos de cada
+			variante) y número de pedidos del tramo
+		"""
+		np = self.np
+		# fromiter evita que NumPy inspeccione cada Row como secuencia
+		lineas = np.fromiter(chain.from_iterable(lineas), dtype=np.int64, count=2 * len(lineas)).reshape(-1, 2)
+		columnas, validas = self.indices(lineas[:, 1])
+		pedidos, filas = np.unique(lineas[validas, 0], return_inverse=True)
+		x = self.sparse.csr_matrix((np.ones(len(filas), dtype=np.int64), (filas, columnas[validas])),
+								   shape=(len(pedidos), len(self.ids)))
+		# Una variante repetida en varias líneas del mismo pedido cuenta una vez
+		x.data[:] = 1
+		return (x.T @ x).tocsr(), len(pedidos)
+
+	def desde_pares(self, pares):
+		"""Matriz simétrica a partir de filas ``(id_gorra, id_relacionada, pedidos)`` guardadas."""
+		np = self.np
+		pares = np.array(pares, dtype=np.int64).reshape(-1, 3)
+		filas, validas_filas = self.indices(pares[:, 0])
+		columnas, validas_columnas = self.indices(pares[:, 1])
+		validas = validas_filas & validas_columnas
+		filas, columnas, valores = filas[validas], columnas[validas], pares[validas, 2]
+		fuera = filas != columnas
+		return self.sparse.csr_matrix(
+			(np.concatenate([valores, valores[fuera]]),
+			 (np.concatenate([filas, columnas[fuera]]), np.concatenate([columnas, filas[fuera]]))),
+			shape=(len(self.ids), len(self.ids)))
+
+	def pares(self, matriz, posiciones=None) -> List[Dict[str, int]]:
+		"""
+		Filas de ``coocurrencias_variante`` (``id_gorra <= id_relacionada``) de
+		``matriz``; con ``posiciones``, solo las no nulas de esa otra matriz.
+		"""
+		referencia = self.sparse.triu(matriz if posiciones is None else posiciones).tocoo()
+		filas, columnas = referencia.row, referencia.col
+		valores = referencia.data if posiciones is None else self.np.asarray(matriz[filas, columnas]).ravel()
+		return [{'id_gorra': a, 'id_relacionada': b, 'pedidos': c}
+				for a, b, c in zip(self.ids[filas].tolist(), self.ids[columnas].tolist(), valores.tolist())]
+
+	def vecinas(self, matriz, k: int, filas=None) -> List[Dict[str, Any]]:
+		"""
+		Las ``k`` variantes con más pedidos en común con cada fila (o solo con
+		las ``filas`` indicadas); los empates se resuelven por ID.
+		"""
+		np = self.np
+		coo = matriz.tocoo()
+		fuera = coo.row != coo.col
+		if filas is not None:
+			fuera &= np.isin(coo.row, filas)
+		fila, columna, pedidos = coo.row[fuera], coo.col[fuera], coo.data[fuera]
+		orden = np.lexsort((columna, -pedidos, fila))
+		fila, columna, pedidos = fila[orden], columna[orden], pedidos[orden]
+		posicion = np.arange(len(fila)) - np.searchsorted(fila, fila)
+		tomar = posicion < k
+		fila, columna, pedidos, posicion = fila[tomar], columna[tomar], pedidos[tomar], posicion[tomar]
+		confianza = pedidos / matriz.diagonal()[fila]
+		return [{'id_gorra': a, 'posicion': p, 'id_relacionada': b, 'pedidos': c, 'confianza': round(f, 6)}
+				for a, p, b, c, f in zip(self.ids[fila].tolist(), posicion.tolist(), self.ids[columna].tolist(),
+										 pedidos.tolist(), confianza.tolist())]
+
+
+def _tablas():
+	return [(Pedido.__table__, DetallePedido.__table__),
+			(PedidoArchivado.__table__, DetallePedidoArchivado.__table__)]
+
+
+def _tramos(conexion, cabecera, lineas, desde: Optional[int], hasta: int, tamano_lote: int):
+	"""Líneas ``(id_pedido, id_gorra)`` de los pedidos no cancelados con ID en (desde, hasta], por tramos de pedidos."""
+	clave = cabecera.c.id_pedido
+	no_cancelado = or_(cabecera.c.estado.is_(None), cabecera.c.estado != 'cancelado')
+	while True:
+		siguiente = select(clave).where(clave <= hasta).order_by(clave).offset(tamano_lote - 1).limit(1)
+		if desde is not None:
+			siguiente = siguiente.where(clave > desde)
+		fin = conexion.execute(siguiente).scalar()
+		consulta = (select(lineas.c.id_pedido, lineas.c.id_gorra)
+					.select_from(lineas.join(cabecera, clave == lineas.c.id_pedido))
+					.where(no_cancelado, lineas.c.id_pedido <= (hasta if fin is None else fin)))
+		if desde is not None:
+			consulta = consulta.where(lineas.c.id_pedido > desde)
+		yield conexion.execute(consulta).all()
+		if fin is None:
+			return
+		desde = fin
+
+
+def _reescribir(conexion, matriz: _Matriz, suma, top_k: int, resultado: ResultadoRecomendaciones):
+	"""Sustituye todos los pares y recomendaciones."""
+	coocurrencias, recomendaciones = CoocurrenciaVariante.__table__, RecomendacionVariante.__table__
+	conexion.execute(delete(coocurrencias))
+	conexion.execute(delete(recomendaciones))
+	for lote in en_lotes(matriz.pares(suma), 5000):
+		resultado.pares += insertar_lote(conexion, coocurrencias, lote)
+	vecinas = matriz.vecinas(suma, top_k)
+	for lote in en_lotes(vecinas, 5000):
+		insertar_lote(conexion, recomendaciones, lote)
+	resultado.variantes = len({fila['id_gorra'] for fila in vecinas})
+
+
+def _combinar(conexion, matriz: _Matriz, suma, top_k: int, resultado: ResultadoRecomendaciones):
+	"""Suma los pedidos nuevos a los pares guardados y recalcula las vecinas de las variantes afectadas."""
+	coocurrencias, recomendaciones = CoocurrenciaVariante.__table__, RecomendacionVariante.__table__
+	tocadas = matriz.np.flatnonzero(matriz.np.diff(suma.indptr))
+	if not len(tocadas):
+		return
+	ids_tocadas = matriz.ids[tocadas].tolist()
+
+	# Todos los pares guardados de las variantes afectadas, para tener sus filas completas
+	guardados = set()
+	for lote in en_lotes(ids_tocadas, 500):
+		guardados.update(tuple(fila) for fila in conexion.execute(
+			select(coocurrencias.c.id_gorra, coocurrencias.c.id_relacionada, coocurrencias.c.pedidos)
+			.where(or_(coocurrencias.c.id_gorra.in_(lote), coocurrencias.c.id_relacionada.in_(lote)))))
+	nueva = matriz.desde_pares(sorted(guardados)) + suma
+
+	for lote in en_lotes(matriz.pares(nueva, posiciones=suma), 1000):
+		resultado.pares += upsert_lote(conexion, coocurrencias, lote)
+	for lote in en_lotes(ids_tocadas, 500):
+		conexion.execute(delete(recomendaciones).where(recomendaciones.c.id_gorra.in_(lote)))
+	for lote in en_lotes(matriz.vecinas(nueva, top_k, filas=tocadas), 5000):
+		insertar_lote(conexion, recomendaciones, lote)
+	resultado.variantes = len(ids_tocadas)
+
+
+def actualizar(completo: bool = False, top_k: int = TOP_K, tamano_lote: int = TAMANO_LOTE,
+			   progreso: Optional[Callable[[ResultadoRecomendaciones], None]] = None) -> ResultadoRecomendaciones:
+	"""
+	Actualiza las co-ocurrencias y las recomendaciones con los pedidos nuevos.
+
+	Todo se escribe en una transacción junto con la marca, de modo que los
+	lectores ven las recomendaciones anteriores hasta que termina.
+
+	Args:
+		completo: Si es True (o si nunca se han calculado), reconstruye todo
+			a partir de los pedidos de uso diario y archivados
+		top_k: Recomendaciones guardadas por variante
+		tamano_lote: Pedidos leídos y multiplicados por tramo
+		progreso: Función opcional llamada con el resultado acumulado tras cada tramo
+
+	Returns:
+		ResultadoRecomendaciones: Pedidos leídos, pares escritos y variantes recalculadas
+	"""
+	if tamano_lote <= 0 or top_k <= 0:
+		raise ValueError("El tamaño de lote y el número de recomendaciones deben ser mayores que cero")
+	marcas = MarcaAgua.__table__
+	inicio = time.perf_counter()
+	with db.engine.begin() as conexion:
+		# El bloqueo de la marca impide que dos actualizaciones sumen los mismos pedidos
+		desde = conexion.execute(select(marcas.c.ultimo_id).where(marcas.c.nombre == MARCA_RECOMENDACIONES)
+								 .with_for_update()).scalar()
+		if completo:
+			desde = None
+		resultado = ResultadoRecomendaciones(completo=desde is None)
+		hasta = max((conexion.execute(select(func.max(cabecera.c.id_pedido))).scalar() or 0
+					 for cabecera, _ in _tablas()), default=0)
+		matriz = _Matriz(conexion.execute(select(VarianteGorra.id_gorra).order_by(VarianteGorra.id_gorra))
+						 .scalars().all())
+
+		suma = matriz.vacia()
+		for cabecera, lineas in _tablas():
+			for filas in _tramos(conexion, cabecera, lineas, desde, hasta, tamano_lote):
+				if not filas:
+					continue
+				tramo, pedidos = matriz.coocurrencias(filas)
+				suma = suma + tramo
+				resultado.pedidos += pedidos
+				resultado.lineas += len(filas)
+				resultado.segundos = time.perf_counter() - inicio
+				if progreso:
+					progreso(resultado)
+		resultado.segundos_calculo = time.perf_counter() - inicio
+
+		if resultado.completo:
+			_reescribir(conexion, matriz, suma, top_k, resultado)
+		else:
+			_combinar(conexion, matriz, suma, top_k, resultado)
+		upsert_lote(conexion, marcas, [{'nombre': MARCA_RECOMENDACIONES, 'ultimo_id': max(hasta, desde or 0),
+										'fecha_actualizacion': datetime.utcnow()}])
+
+	resultado.segundos = time.perf_counter() - inicio
+	logger.info(f"Recomendaciones {'reconstruidas' if resultado.completo else 'actualizadas'}: "
+				f"{resultado.pedidos} pedidos, {resultado.pares} pares, {resultado.variantes} variantes "
+				f"en {resultado.segundos:.2f} s")
+	return resultado
+
+
+@solo_lectura
+def recomendaciones(id_gorra: int, limite: int = 10) -> List[Dict[str, Any]]:
+	"""
+	Variantes compradas con más frecuencia junto a ``id_gorra``, en una sola
+	lectura por clave primaria de ``recomendaciones_variante``.
+
+	Se omiten las variantes inactivas o sin stock, por lo que pueden
+	devolverse menos de ``limite``.
+
+	Args:
+		id_gorra: ID de la variante de gorra
+		limite: Máximo de recomendaciones (como mucho las guardadas, ``TOP_K``)
+
+	Returns:
+		List[dict]: Variantes recomendadas con los pedidos en común y la
+		confianza (fracción de los pedidos de ``id_gorra`` que las incluyen)
+	"""
+	r, v = RecomendacionVariante.__table__, VarianteGorra.__table__
+	consulta = (
+		select(r.c.id_relacionada, r.c.pedidos, r.c.confianza, v.c.id_tipo_gorra, v.c.color, v.c.talla,
+			   v.c.precio, v.c.stock)
+		.select_from(r.join(v, v.c.id_gorra == r.c.id_relacionada))
+		.where(r.c.id_gorra == id_gorra, v.c.activo.is_not(False), v.c.stock > 0)
+		.order_by(r.c.posicion)
+		.limit(limite)
+	)
+	return [{
+		'id_gorra': fila.id_relacionada,
+		'id_tipo_gorra': fila.id_tipo_gorra,
+		'color': fila.color,
+		'talla': fila.talla,
+		'precio': float(fila.precio),
+		'stock': fila.stock,
+		'pedidos_en_comun': fila.pedidos,
+		'confianza': fila.confianza
+	} for fila in db.session.execute(consulta)]
@@ -0,0 +1,428 @@
+"""
+Servicio de reportes de ventas basado en tablas de resumen.
+
+``refrescar_resumenes`` actualiza de forma incremental los resúmenes por
+hora y por día a partir de una marca de agua sobre ``fecha_pedido`` y
+``fecha_venta``, junto con los pedidos distintos por tipo de gorra y en
+total (que no se pueden obtener sumando variantes); ``consultar_ventas`` responde a los rangos del panel leyendo
+solo los resúmenes, sin tocar las tablas de pedidos. Las tablas de archivo
+(ver ``src.services.archivo``) solo se leen al recalcular horas anteriores al
+límite del archivo.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import case, delete, distinct, exists, func, select
+
+from src.database.db_connection import db
+from src.database.bulk import en_lotes, insertar_lote
+from src.database.replicas import solo_lectura
+from src.models.pedido import Pedido
+from src.models.detalle_pedido import DetallePedido
+from src.models.variante_gorra import VarianteGorra
+from src.models.venta import Venta
+from src.models.detalle_venta import DetalleVenta
+from src.models.marca_agua import MarcaAgua
+from src.models.archivo import (DetallePedidoArchivado, DetalleVentaArchivada, PedidoArchivado, VentaArchivada,
+								incluye_archivo)
+from src.models.resumen_venta import (ResumenPedidoTipoDia, ResumenPedidoTipoHora, ResumenVentaHora, ResumenVentaDia,
+									  ResumenVentaPendiente)
+
+logger = logging.getLogger(__name__)
+
+MARCA_RESUMENES = 'resumen_ventas'
+ESTADOS_VENTA_ANULADA = ('anulada', 'cancelada', 'reembolsada')
+VENTANA_TARDIA = timedelta(hours=48)
+
+
+def _truncar_hora(columna, dialecto: str):
+	"""Expresión que trunca una fecha a la hora como texto 'YYYY-MM-DD HH'."""
+	if dialecto in ('mysql', 'mariadb'):
+		return func.date_format(columna, '%Y-%m-%d %H')
+	if dialecto == 'postgresql':
+		return func.to_char(columna, 'YYYY-MM-DD HH24')
+	return func.strftime('%Y-%m-%d %H', columna)
+
+
+def _a_hora(valor) -> datetime:
+	if isinstance(valor, datetime):
+		return valor.replace(minute=0, second=0, microsecond=0)
+	return datetime.strptime(valor, '%Y-%m-%d %H')
+
+
+def _hora(fecha: datetime) -> datetime:
+	return fecha.replace(minute=0, second=0, microsecond=0)
+
+
+def _tablas(conexion, desde: Optional[datetime], cabecera, lineas, archivo, archivo_lineas) -> List[Tuple[Any, Any]]:
+	"""Tablas de uso diario y, si el rango alcanza el archivo, también las archivadas."""
+	tablas = [(cabecera, lineas)]
+	if incluye_archivo(conexion, desde):
+		tablas.append((archivo, archivo_lineas))
+	return tablas
+
+
+def _sumar(filas: List[Dict[str, Any]], claves: Tuple[str, ...] = ('periodo', 'origen', 'id_gorra'),
+		   campos: Tuple[str, ...] = ('num_pedidos', 'num_cancelados', 'unidades', 'ingresos')) -> List[Dict[str, Any]]:
+	"""Suma las filas con la misma hora, origen y variante (p. ej. de una tabla y su archivo)."""
+	sumadas: Dict[Tuple, Dict[str, Any]] = {}
+	for fila in filas:
+		clave = tuple(fila[c] for c in claves)
+		if clave not in sumadas:
+			sumadas[clave] = fila
+			continue
+		actual = sumadas[clave]
+		for campo in campos:
+			actual[campo] += fila[campo]
+	return list(sumadas.values())
+
+
+def _agregar_pedidos(conexion, desde: Optional[datetime], hasta: datetime) -> List[Dict[str, Any]]:
+	"""Agrega pedidos/detalle_pedido (y su archivo) por hora y variante en el rango [desde, hasta)."""
+	filas = []
+	for p, d in _tablas(conexion, desde, Pedido.__table__, DetallePedido.__table__,
+						PedidoArchivado.__table__, DetallePedidoArchivado.__table__):
+		filas.extend(_agregar_pedidos_de(conexion, p, d, desde, hasta))
+	return _sumar(filas)
+
+
+def _agregar_pedidos_de(conexion, p, d, desde: Optional[datetime], hasta: datetime) -> List[Dict[str, Any]]:
+	v = VarianteGorra.__table__
+	hora = _truncar_hora(p.c.fecha_pedido, conexion.dialect.name).label('hora')
+	cancelado = p.c.estado == 'cancelado'
+	consulta = (
+		select(
+			hora,
+			d.c.id_gorra,
+			v.c.id_tipo_gorra,
+			func.count(distinct(case((~cancelado, p.c.id_pedido)))),
+			func.count(distinct(case((cancelado, p.c.id_pedido)))),
+			func.sum(case((~cancelado, d.c.cantidad), else_=0)),
+			func.sum(case((~cancelado, d.c.cantidad * d.c.precio_unitario), else_=0))
+		)
+		.select_from(p.join(d, d.c.id_pedido == p.c.id_pedido).join(v, v.c.id_gorra == d.c.id_gorra))
+		.where(p.c.fecha_pedido < hasta)
+		.group_by(hora, d.c.id_gorra, v.c.id_tipo_gorra)
+	)
+	if desde is not None:
+		consulta = consulta.where(p.c.fecha_pedido >= desde)
+
+	return [{
+		'periodo': _a_hora(fila[0]),
+		'origen': 'pedido',
+		'id_gorra': fila[1],
+		'id_tipo_gorra': fila[2],
+		'num_pedidos': fila[3],
+		'num_cancelados': fila[4],
+		'unidades': int(fila[5] or 0),
+		'ingresos': Decimal(str(fila[6] or 0)).quantize(Decimal('0.01'))
+	} for fila in conexion.execute(consulta)]
+
+
+def _contar_pedidos(conexion, desde: Optional[datetime], hasta: datetime) -> List[Dict[str, Any]]:
+	"""Cuenta los pedidos distintos (y su archivo) por hora y tipo de gorra, y en total con el tipo 0."""
+	filas = []
+	for p, d in _tablas(conexion, desde, Pedido.__table__, DetallePedido.__table__,
+						PedidoArchivado.__table__, DetallePedidoArchivado.__table__):
+		filas.extend(_contar_pedidos_de(conexion, p, d, desde, hasta))
+	return _sumar(filas, ('periodo', 'id_tipo_gorra'), ('num_pedidos', 'num_cancelados'))
+
+
+def _contar_pedidos_de(conexion, p, d, desde: Optional[datetime], hasta: datetime) -> List[Dict[str, Any]]:
+	v = VarianteGorra.__table__
+	hora = _truncar_hora(p.c.fecha_pedido, conexion.dialect.name).label('hora')
+	cancelado = p.c.estado == 'cancelado'
+	rango = [p.c.fecha_pedido < hasta]
+	if desde is not None:
+		rango.append(p.c.fecha_pedido >= desde)
+
+	filas = []
+	for tipo in (v.c.id_tipo_gorra, None):
+		agrupacion = [hora] if tipo is None else [hora, tipo]
+		consulta = (
+			select(
+				*agrupacion,
+				func.count(distinct(case((~cancelado, p.c.id_pedido)))),
+				func.count(distinct(case((cancelado, p.c.id_pedido))))
+			)
+			.select_from(p.join(d, d.c.id_pedido == p.c.id_pedido).join(v, v.c.id_gorra == d.c.id_gorra))
+			.where(*rango)
+			.group_by(*agrupacion)
+		)
+		filas.extend({
+			'periodo': _a_hora(fila[0]),
+			'id_tipo_gorra': 0 if tipo is None else fila[1],
+			'num_pedidos': fila[-2],
+			'num_cancelados': fila[-1]
+		} for fila in conexion.execute(consulta))
+	return filas
+
+
+def _agregar_ventas(conexion, desde: Optional[datetime], hasta: datetime) -> List[Dict[str, Any]]:
+	"""
+	Agrega ventas (y su archivo) por hora en el rango [desde, hasta), sin
+	las ya copiadas en pedidos (ver ``src.services.consolidacion``).
+	"""
+	filas = []
+	for ve, dv in _tablas(conexion, desde, Venta.__table__, DetalleVenta.__table__,
+						  VentaArchivada.__table__, DetalleVentaArchivada.__table__):
+		filas.extend(_agregar_ventas_de(conexion, ve, dv, desde, hasta))
+	return _sumar(filas)
+
+
+def _agregar_ventas_de(conexion, ve, dv, desde: Optional[datetime], hasta: datetime) -> List[Dict[str, Any]]:
+	dialecto = conexion.dialect.name
+	anulada = ve.c.estado.in_(ESTADOS_VENTA_ANULADA)
+	rango = [ve.c.fecha_venta < hasta]
+	for p in (Pedido.__table__, PedidoArchivado.__table__):
+		rango.append(~exists().where(p.c.id_venta_origen == ve.c.id_venta))
+	if desde is not None:
+		rango.append(ve.c.fecha_venta >= desde)
+
+	hora = _truncar_hora(ve.c.fecha_venta, dialecto).label('hora')
+	totales = conexion.execute(
+		select(
+			hora,
+			func.count(case((~anulada, ve.c.id_venta))),
+			func.count(case((anulada, ve.c.id_venta))),
+			func.sum(case((~anulada, ve.c.total), else_=0))
+		).where(*rango).group_by(hora)
+	).all()
+	unidades = dict(conexion.execute(
+		select(hora, func.sum(dv.c.cantidad))
+		.select_from(ve.join(dv, dv.c.id_venta == ve.c.id_venta))
+		.where(*rango, ~anulada)
+		.group_by(hora)
+	).all())
+
+	return [{
+		'periodo': _a_hora(fila[0]),
+		'origen': 'venta',
+		'id_gorra': 0,
+		'id_tipo_gorra': 0,
+		'num_pedidos': fila[1],
+		'num_cancelados': fila[2],
+		'unidades': int(unidades.get(fila[0]) or 0),
+		'ingresos': Decimal(str(fila[3] or 0)).quantize(Decimal('0.01'))
+	} for fila in totales]
+
+
+def _recalcular_horas(conexion, desde: Optional[datetime], hasta: datetime) -> Set[date]:
+	"""Sustituye los resúmenes por hora de [desde, hasta) y devuelve los días afectados."""
+	tabla, pedidos_tabla = ResumenVentaHora.__table__, ResumenPedidoTipoHora.__table__
+	for t in (tabla, pedidos_tabla):
+		borrado = delete(t).where(t.c.periodo < hasta)
+		if desde is not None:
+			borrado = borrado.where(t.c.periodo >= desde)
+		conexion.execute(borrado)
+
+	filas = _agregar_pedidos(conexion, desde, hasta) + _agregar_ventas(conexion, desde, hasta)
+	for lote in en_lotes(filas, 1000):
+		insertar_lote(conexion, tabla, lote)
+	for lote in en_lotes(_contar_pedidos(conexion, desde, hasta), 1000):
+		insertar_lote(conexion, pedidos_tabla, lote)
+
+	dias = {fila['periodo'].date() for fila in filas}
+	if desde is not None:
+		# También los días que se quedaron sin filas (p. ej. todo cancelado)
+		dia = desde.date()
+		while dia <= (hasta - timedelta(microseconds=1)).date():
+			dias.add(dia)
+			dia += timedelta(days=1)
+	return dias
+
+
+def _recalcular_dias(conexion, dias: Iterable[date]):
+	"""Reconstruye los resúmenes diarios de los días indicados a partir de los horarios."""
+	hora, dia_tabla = ResumenVentaHora.__table__, ResumenVentaDia.__table__
+	for dia in sorted(dias):
+		inicio = datetime.combine(dia, datetime.min.time())
+		fin = inicio + timedelta(days=1)
+		conexion.execute(delete(dia_tabla).where(dia_tabla.c.periodo == dia))
+
+		acumulado: Dict[Tuple[str, int], Dict[str, Any]] = {}
+		consulta = select(hora).where(hora.c.periodo >= inicio, hora.c.periodo < fin)
+		for fila in conexion.execute(consulta).mappings():
+			clave = (fila['origen'], fila['id_gorra'])
+			actual = acumulado.setdefault(clave, {
+				'periodo': dia,
+				'origen': fila['origen'],
+				'id_gorra': fila['id_gorra'],
+				'id_tipo_gorra': fila['id_tipo_gorra'],
+				'num_pedidos': 0,
+				'num_cancelados': 0,
+				'unidades': 0,
+				'ingresos': Decimal('0')
+			})
+			for campo in ('num_pedidos', 'num_cancelados', 'unidades'):
+				actual[campo] += fila[campo]
+			actual['ingresos'] += Decimal(str(fila['ingresos']))
+		insertar_lote(conexion, dia_tabla, list(acumulado.values()))
+		_recalcular_dia_pedidos(conexion, dia, inicio, fin)
+
+
+def _recalcular_dia_pedidos(conexion, dia: date, inicio: datetime, fin: datetime):
+	"""Reconstruye los pedidos distintos de un día (cada pedido está en una sola hora)."""
+	hora, dia_tabla = ResumenPedidoTipoHora.__table__, ResumenPedidoTipoDia.__table__
+	conexion.execute(delete(dia_tabla).where(dia_tabla.c.periodo == dia))
+	consulta = (
+		select(hora.c.id_tipo_gorra, func.sum(hora.c.num_pedidos), func.sum(hora.c.num_cancelados))
+		.where(hora.c.periodo >= inicio, hora.c.periodo < fin)
+		.group_by(hora.c.id_tipo_gorra)
+	)
+	insertar_lote(conexion, dia_tabla, [{
+		'periodo': dia,
+		'id_tipo_gorra': id_tipo_gorra,
+		'num_pedidos': int(num_pedidos or 0),
+		'num_cancelados': int(num_cancelados or 0)
+	} for id_tipo_gorra, num_pedidos, num_cancelados in conexion.execute(consulta)])
+
+
+def refrescar_resumenes(ventana_tardia: timedelta = VENTANA_TARDIA, completo: bool = False,
+						ahora: Optional[datetime] = None) -> Dict[str, Any]:
+	"""
+	Actualiza los resúmenes de ventas de forma incremental.
+
+	Se recalculan las horas desde la marca de agua menos ``ventana_tardia``
+	(para recoger pedidos confirmados o cancelados poco después) y, además,
+	las horas registradas en ``resumen_ventas_pendientes`` por cambios de
+	estado más antiguos.
+
+	Args:
+		ventana_tardia: Margen hacia atrás que se recalcula en cada ejecución
+		completo: Si es True, reconstruye todos los resúmenes desde cero
+		ahora: Instante de corte (por defecto, la hora actual en UTC)
+
+	Returns:
+		dict: Rango recalculado y número de horas y días afectados
+	"""
+	ahora = ahora or datetime.utcnow()
+	hasta = _hora(ahora) + timedelta(hours=1)
+	pendientes_tabla = ResumenVentaPendiente.__table__
+
+	try:
+		marca = MarcaAgua.obtener(MARCA_RESUMENES)
+		desde = None if completo or marca.valor is None else _hora(marca.valor - ventana_tardia)
+		conexion = db.session.connection()
+
+		if desde is None:
+			conexion.execute(delete(ResumenVentaDia.__table__))
+			conexion.execute(delete(ResumenPedidoTipoDia.__table__))
+		dias = _recalcular_horas(conexion, desde, hasta)
+
+		pendientes = conexion.execute(select(pendientes_tabla.c.id, pendientes_tabla.c.periodo)).all()
+		horas_pendientes = {_hora(periodo) for _, periodo in pendientes}
+		if desde is not None:
+			horas_pendientes = {h for h in horas_pendientes if h < desde}
+		else:
+			horas_pendientes = set()
+		for hora in sorted(horas_pendientes):
+			dias |= _recalcular_horas(conexion, hora, hora + timedelta(hours=1))
+		if pendientes:
+			conexion.execute(delete(pendientes_tabla).where(
+				pendientes_tabla.c.id.in_([id_pendiente for id_pendiente, _ in pendientes])
+			))
+
+		_recalcular_dias(conexion, dias)
+		marca.valor = ahora
+		db.session.commit()
+	except Exception as e:
+		db.session.rollback()
+		logger.error(f"Error al refrescar los resúmenes de ventas: {e}")
+		raise
+
+	logger.info(f"Resúmenes de ventas actualizados desde {desde} hasta {hasta}")
+	return {
+		'desde': desde,
+		'hasta': hasta,
+		'horas_tardias': len(horas_pendientes),
+		'dias': len(dias)
+	}
+
+
+@solo_lectura
+def consultar_ventas(desde: date, hasta: date, granularidad: str = 'dia', agrupar_por: str = 'tipo',
+					 origen: Optional[str] = None) -> List[Dict[str, Any]]:
+	"""
+	Consulta las ventas de un rango usando solo las tablas de resumen.
+
+	Args:
+		desde: Inicio del rango (incluido)
+		hasta: Fin del rango (excluido)
+		granularidad: 'dia' u 'hora'
+		agrupar_por: 'tipo', 'variante' o 'total'
+		origen: 'pedido', 'venta' o None para ambos
+
+	Returns:
+		List[dict]: Filas con periodo, clave de agrupación, pedidos,
+		cancelados, unidades e ingresos
+	"""
+	if granularidad not in ('dia', 'hora'):
+		raise ValueError("La granularidad debe ser 'dia' u 'hora'")
+	modelo = ResumenVentaDia if granularidad == 'dia' else ResumenVentaHora
+	pedidos = ResumenPedidoTipoDia if granularidad == 'dia' else ResumenPedidoTipoHora
+	if granularidad == 'hora':
+		desde = datetime.combine(desde, datetime.min.time()) if not isinstance(desde, datetime) else desde
+		hasta = datetime.combine(hasta, datetime.min.time()) if not isinstance(hasta, datetime) else hasta
+
+	claves = {
+		'tipo': [modelo.id_tipo_gorra],
+		'variante': [modelo.id_gorra, modelo.id_tipo_gorra],
+		'total': []
+	}
+	if agrupar_por not in claves:
+		raise ValueError("agrupar_por debe ser 'tipo', 'variante' o 'total'")
+
+	columnas = [modelo.periodo] + claves[agrupar_por]
+	# Por tipo o en total, los pedidos de origen 'pedido' salen de su propio resumen:
+	# sumar las filas por variante contaría varias veces un pedido con varias variantes
+	contar_aparte = agrupar_por != 'variante' and origen != 'venta'
+	num_pedidos, num_cancelados = modelo.num_pedidos, modelo.num_cancelados
+	if contar_aparte:
+		num_pedidos = case((modelo.origen == 'venta', num_pedidos), else_=0)
+		num_cancelados = case((modelo.origen == 'venta', num_cancelados), else_=0)
+	consulta = (
+		db.session.query(
+			*columnas,
+			func.sum(num_pedidos),
+			func.sum(num_cancelados),
+			func.sum(modelo.unidades),
+			func.sum(modelo.ingresos)
+		)
+		.filter(modelo.periodo >= desde, modelo.periodo < hasta)
+		.group_by(*columnas)
+		.order_by(*columnas)
+	)
+	if origen is not None:
+		consulta = consulta.filter(modelo.origen == origen)
+
+	filas = {tuple(fila[:len(columnas)]): list(fila[len(columnas):]) for fila in consulta}
+	if contar_aparte:
+		consulta_pedidos = db.session.query(
+			pedidos.periodo, pedidos.id_tipo_gorra, pedidos.num_pedidos, pedidos.num_cancelados
+		).filter(pedidos.periodo >= desde, pedidos.periodo < hasta)
+		if agrupar_por == 'tipo':
+			consulta_pedidos = consulta_pedidos.filter(pedidos.id_tipo_gorra != 0)
+		else:
+			consulta_pedidos = consulta_pedidos.filter(pedidos.id_tipo_gorra == 0)
+		for periodo, id_tipo_gorra, num_pedidos, num_cancelados in consulta_pedidos:
+			clave = (periodo, id_tipo_gorra) if agrupar_por == 'tipo' else (periodo,)
+			fila = filas.setdefault(clave, [0, 0, 0, 0])
+			fila[0] = (fila[0] or 0) + num_pedidos
+			fila[1] = (fila[1] or 0) + num_cancelados
+
+	resultado = []
+	for clave in sorted(filas):
+		datos = dict(zip([c.key for c in columnas], clave))
+		datos['periodo'] = datos['periodo'].isoformat()
+		num_pedidos, num_cancelados, unidades, ingresos = filas[clave]
+		datos.update({
+			'num_pedidos': int(num_pedidos or 0),
+			'num_cancelados': int(num_cancelados or 0),
+			'unidades': int(unidades or 0),
+			'ingresos': float(ingresos or 0)
+		})
+		resultado.append(datos)
+	return resultado
@@ -0,0 +1,6 @@
+"""
+Paquete de utilidades de prueba y rendimiento.
+
+Contiene el entorno de SQLite usado como sustituto de MariaDB y los
+scripts de estrés y benchmark que se ejecutan con ``python -m``.
+"""
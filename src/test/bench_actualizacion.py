@@ -0,0 +1,106 @@
+"""
+Benchmark de la actualización masiva de precios y stock.
+
+Compara, sobre una base SQLite temporal, la ruta por objeto
+(``Gorra.actualizar``: una carga del ORM y un commit por gorra) con
+``actualizar_en_bloque`` (UPDATE con executemany y una transacción por
+lote). Uso:
+
+	python -m src.test.bench_actualizacion --filas 20000 --lote 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba
+
+
+def generar_cambios(ids, semilla: int):
+	aleatorio = random.Random(semilla)
+	return [{'id': id_gorra, 'precio': aleatorio.randint(20, 120) * 1000, 'stock': aleatorio.randint(0, 200)}
+			for id_gorra in ids]
+
+
+def ejecutar(filas: int, lote: int, filas_por_objeto: int, semilla: int = 42) -> dict:
+	"""
+	Mide ambas rutas y devuelve filas por segundo y sentencias SQL por fila.
+
+	La ruta por objeto se mide sobre ``filas_por_objeto`` filas y se
+	extrapola, porque con miles de commits tarda demasiado.
+	"""
+	from src.database.cache import cache_catalogo
+	from src.models import Gorra
+	from src.services.actualizacion_masiva import actualizar_en_bloque
+
+	with tempfile.TemporaryDirectory(prefix='bench_actualizacion_') as directorio:
+		app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+		cache_catalogo.init_app(app)
+		with app.app_context():
+			db.create_all()
+			with db.engine.begin() as conexion:
+				conexion.execute(Gorra.__table__.insert(), [
+					{'nombre': f'Gorra {i:06d}', 'descripcion': 'Benchmark', 'color': 'negro',
+					 'precio': 50000, 'stock': 10, 'activo': True}
+					for i in range(filas)
+				])
+			ids = [fila[0] for fila in db.session.execute(db.select(Gorra.id_gorra)).all()]
+			cambios = generar_cambios(ids, semilla)
+
+			muestra = cambios[:filas_por_objeto]
+			with ContadorSQL(db.engine) as contador:
+				inicio = time.perf_counter()
+				for cambio in muestra:
+					gorra = db.session.get(Gorra, cambio['id'])
+					gorra.actualizar({'precio': cambio['precio'], 'stock': cambio['stock']})
+				segundos_objeto = time.perf_counter() - inicio
+			sentencias_objeto = contador.total
+			db.session.remove()
+
+			with ContadorSQL(db.engine) as contador:
+				resultado = actualizar_en_bloque('gorras', cambios, tamano_lote=lote)
+			sentencias_bloque = contador.total
+
+	return {
+		'por_objeto': {
+			'filas': len(muestra),
+			'filas_s': round(len(muestra) / segundos_objeto, 1),
+			'sentencias_por_fila': round(sentencias_objeto / len(muestra), 2),
+			'segundos_estimados': round(segundos_objeto / len(muestra) * filas, 2)
+		},
+		'en_bloque': {
+			'filas': resultado.actualizadas,
+			'filas_s': round(resultado.filas_por_segundo, 1),
+			'sentencias_por_fila': round(sentencias_bloque / filas, 4),
+			'segundos': round(resultado.segundos, 2),
+			'fallidas': len(resultado.fallidas)
+		}
+	}
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--filas', type=int, default=20000, help='Gorras a actualizar')
+	parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción en la ruta en bloque')
+	parser.add_argument('--filas-por-objeto', type=int, default=1000,
+						help='Filas medidas en la ruta por objeto (el resto se extrapola)')
+	parser.add_argument('--semilla', type=int, default=42)
+	args = parser.parse_args()
+
+	resultados = ejecutar(args.filas, args.lote, min(args.filas_por_objeto, args.filas), args.semilla)
+	objeto, bloque = resultados['por_objeto'], resultados['en_bloque']
+	print(f"Por objeto: {objeto['filas_s']:>10.1f} filas/s  {objeto['sentencias_por_fila']:>6.2f} sentencias/fila  "
+		  f"~{objeto['segundos_estimados']:.2f} s para {args.filas} filas")
+	print(f"En bloque:  {bloque['filas_s']:>10.1f} filas/s  {bloque['sentencias_por_fila']:>6.4f} sentencias/fila  "
+		  f"{bloque['segundos']:.2f} s para {bloque['filas']} filas ({bloque['fallidas']} fallidas)")
+	if objeto['filas_s']:
+		print(f"Aceleración: x{bloque['filas_s'] / objeto['filas_s']:.1f}")
+	return 0 if bloque['fallidas'] == 0 else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Benchmark de las consultas sobre las tablas de pedidos antes y después de archivar.
+
+Puebla una base SQLite temporal con varios años de pedidos, mide el
+historial de clientes, los pedidos abiertos y los pedidos del último mes,
+archiva los pedidos cerrados más antiguos que ``--dias`` y repite las
+mediciones. Uso:
+
+	python -m src.test.bench_archivo --escala 20 --anios 3 --dias 365
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+
+from src.database.db_connection import db
+from src.test.benchmarks import medir
+from src.test.entorno import crear_app_prueba
+
+HASTA = datetime(2026, 1, 1)
+
+
+def _casos(ids_persona, iteraciones: int, semilla: int) -> dict:
+	from src.models import Pedido
+	from src.services.historial import obtener_historial, serializar_pedido
+
+	aleatorio = random.Random(semilla)
+	mes = HASTA - timedelta(days=30)
+
+	def historial(i):
+		[serializar_pedido(p) for p in obtener_historial(aleatorio.choice(ids_persona), perfil='completo')]
+
+	def abiertos(i):
+		db.session.scalar(select(func.count()).where(Pedido.estado.in_(('pendiente', 'enviado'))))
+
+	def ultimo_mes(i):
+		db.session.execute(select(Pedido.estado, func.count(), func.sum(Pedido.total))
+						   .where(Pedido.fecha_pedido >= mes).group_by(Pedido.estado)).all()
+
+	return {
+		'historial_cliente': medir(historial, iteraciones),
+		'pedidos_abiertos': medir(abiertos, max(5, iteraciones // 10)),
+		'pedidos_ultimo_mes': medir(ultimo_mes, max(5, iteraciones // 10))
+	}
+
+
+def ejecutar(escala: int, anios: int, dias: int, iteraciones: int, semilla: int = 42) -> dict:
+	"""
+	Mide las consultas antes y después de archivar.
+
+	Returns:
+		dict: Filas de cada tabla, resultado del archivado y métricas de
+		cada caso en ambas fases
+	"""
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import DetallePedido, Pedido, Persona
+	from src.services.archivo import archivar
+
+	with tempfile.TemporaryDirectory(prefix='bench_archivo_') as directorio:
+		app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+		with app.app_context():
+			db.create_all()
+			generar_datos(ParametrosGeneracion(escala=escala, semilla=semilla, dias=anios * 365, hasta=HASTA))
+			ids_persona = db.session.scalars(select(Persona.id_usuario)).all()
+			db.session.remove()
+
+			def filas():
+				return {'pedidos': db.session.scalar(select(func.count()).select_from(Pedido)),
+						'detalle_pedido': db.session.scalar(select(func.count()).select_from(DetallePedido))}
+
+			resultados = {'antes': {'filas': filas(), 'casos': _casos(ids_persona, iteraciones, semilla)}}
+			archivado = archivar(antiguedad_dias=dias, tamano_lote=1000, ahora=HASTA)
+			resultados['archivo'] = {'pedidos': archivado.pedidos, 'segundos': round(archivado.segundos, 2),
+									 'filas_s': round(archivado.filas_por_segundo, 1)}
+			resultados['despues'] = {'filas': filas(), 'casos': _casos(ids_persona, iteraciones, semilla)}
+			db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--escala', type=int, default=20, help='Escala de seed-db (1000 pedidos por unidad)')
+	parser.add_argument('--anios', type=int, default=3, help='Años de pedidos generados')
+	parser.add_argument('--dias', type=int, default=365, help='Antigüedad a partir de la que se archiva')
+	parser.add_argument('--iteraciones', type=int, default=200)
+	parser.add_argument('--semilla', type=int, default=42)
+	args = parser.parse_args()
+
+	resultados = ejecutar(args.escala, args.anios, args.dias, args.iteraciones, args.semilla)
+	archivo = resultados['archivo']
+	print(f"Archivados {archivo['pedidos']} pedidos en {archivo['segundos']:.2f} s ({archivo['filas_s']:.0f} filas/s)")
+	for fase in ('antes', 'despues'):
+		filas = resultados[fase]['filas']
+		print(f"{fase.capitalize()}: {filas['pedidos']} pedidos, {filas['detalle_pedido']} líneas")
+		for caso, m in resultados[fase]['casos'].items():
+			print(f"  {caso:<20} p50 {m['p50_ms']:>8.3f} ms  p95 {m['p95_ms']:>8.3f} ms  {m['ops_s']:>9.1f} op/s")
+	for caso, antes in resultados['antes']['casos'].items():
+		despues = resultados['despues']['casos'][caso]
+		if despues['p50_ms']:
+			print(f"{caso:<20} x{antes['p50_ms'] / despues['p50_ms']:.1f} más rápido (p50)")
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
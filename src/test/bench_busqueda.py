@@ -0,0 +1,209 @@
+"""
+Benchmark del índice de búsqueda del catálogo.
+
+Construye un índice sintético en memoria y mide la latencia de una mezcla de
+consultas (términos completos, prefijos y filtros por faceta). Con
+``--con-pedidos`` carga el catálogo en una base SQLite temporal con un backend
+de versiones compartido, como varios workers de gunicorn, y mide las
+búsquedas durante ``--segundos`` mientras otro proceso crea pedidos; también
+cuenta las reconstrucciones del índice que provocan. Uso:
+
+	python -m src.test.bench_busqueda --variantes 100000 --consultas 2000
+	python -m src.test.bench_busqueda --variantes 20000 --con-pedidos --segundos 10
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from src.services.busqueda import IndiceBusqueda
+
+COLORES = ['negro', 'blanco', 'rojo', 'azul', 'verde', 'gris', 'beige', 'morado', 'naranja', 'amarillo',
+		   'rosa', 'vinotinto', 'camuflado', 'café', 'azul marino']
+TALLAS = ['S', 'M', 'L', 'XL', 'Única']
+TIPOS = ['Snapback', 'Trucker', 'Dad hat', 'Bucket', 'Beanie', 'Visera', 'Fitted', 'Five panel',
+		 'Gorra béisbol', 'Gorra plana', 'Pescador', 'Boina']
+PALABRAS = ['algodón', 'malla', 'bordada', 'ajustable', 'clásica', 'deportiva', 'urbana', 'premium',
+			'vintage', 'lona', 'pana', 'lana', 'impermeable', 'reciclada', 'estampada', 'lisa']
+
+
+def catalogo_sintetico(variantes: int, semilla: int):
+	"""Devuelve los tipos ``(id, nombre, descripción)`` y las filas de variantes."""
+	aleatorio = random.Random(semilla)
+	tipos = [(id_tipo, tipo, ' '.join(aleatorio.sample(PALABRAS, 4)) + f' colección {id_tipo}')
+			 for id_tipo, tipo in enumerate(TIPOS, start=1)]
+	filas = [{
+		'id_gorra': id_gorra,
+		'id_tipo_gorra': aleatorio.randint(1, len(TIPOS)),
+		'color': aleatorio.choice(COLORES),
+		'talla': aleatorio.choice(TALLAS),
+		'precio': aleatorio.randint(20, 120) * 1000,
+		'stock': 1000,
+		'activo': True
+	} for id_gorra in range(1, variantes + 1)]
+	return tipos, filas
+
+
+def construir_indice(variantes: int, semilla: int) -> IndiceBusqueda:
+	tipos, filas = catalogo_sintetico(variantes, semilla)
+	indice = IndiceBusqueda()
+	for id_tipo, tipo, descripcion in tipos:
+		indice.registrar_tipo(id_tipo, tipo, descripcion)
+	for fila in filas:
+		indice.indexar_variante(fila)
+	indice.cargado = True
+	return indice
+
+
+def generar_consultas(cantidad: int, semilla: int):
+	aleatorio = random.Random(semilla + 1)
+	consultas = []
+	for _ in range(cantidad):
+		tipo = aleatorio.random()
+		if tipo < 0.4:
+			texto = f"{aleatorio.choice(TIPOS)} {aleatorio.choice(COLORES)}"
+		elif tipo < 0.7:
+			palabra = aleatorio.choice(TIPOS + COLORES + PALABRAS)
+			texto = palabra[:aleatorio.randint(1, max(1, len(palabra)))]
+		else:
+			texto = aleatorio.choice(PALABRAS)
+		filtros = {'talla': aleatorio.choice(TALLAS)} if aleatorio.random() < 0.3 else None
+		consultas.append((texto, filtros))
+	return consultas
+
+
+def percentil(valores, p: float) -> float:
+	ordenados = sorted(valores)
+	return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _crear_pedidos(app, ids_variante, id_usuario: int, segundos: float, semilla: int) -> int:
+	"""Crea pedidos de una línea durante ``segundos``; devuelve cuántos se han creado."""
+	from src.database.db_connection import db
+	from src.services.pedidos import crear_pedido
+
+	aleatorio = random.Random(semilla)
+	creados = 0
+	fin = time.monotonic() + segundos
+	with app.app_context():
+		# Conexiones propias: las del proceso padre no se comparten tras el fork
+		db.engine.dispose()
+		while time.monotonic() < fin:
+			crear_pedido(id_usuario, [{'id_gorra': aleatorio.choice(ids_variante), 'cantidad': 1}])
+			creados += 1
+	return creados
+
+
+def medir_con_pedidos(args) -> list:
+	"""
+	Mide las búsquedas del índice global mientras un proceso hijo crea
+	pedidos contra la misma base y el mismo backend de versiones.
+
+	Returns:
+		list: Latencias en ms
+	"""
+	from src.database.bulk import insertar_lote
+	from src.database.cache import BackendSQLite
+	from src.database.db_connection import db
+	from src.database.versiones import versiones_catalogo
+	from src.models import TipoGorra, VarianteGorra
+	from src.services import busqueda
+	from src.services.busqueda import indice_catalogo
+	from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+	directorio = tempfile.mkdtemp(prefix='bench_busqueda_')
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'catalogo.db')}")
+	tipos, filas = catalogo_sintetico(args.variantes, args.semilla)
+	with app.app_context():
+		db.create_all()
+		versiones_catalogo.init_app(app, backend=BackendSQLite(os.path.join(directorio, 'versiones.sqlite3')))
+		busqueda.init_app(app)
+		id_usuario = crear_persona_prueba().id_usuario
+		with db.engine.begin() as conexion:
+			insertar_lote(conexion, TipoGorra.__table__,
+						  [{'id_tipo_gorra': i, 'nombre': n, 'descripcion': d} for i, n, d in tipos])
+			insertar_lote(conexion, VarianteGorra.__table__, filas)
+		inicio = time.perf_counter()
+		indice_catalogo.reconstruir()
+		print(f"Índice cargado: {len(indice_catalogo)} documentos en {time.perf_counter() - inicio:.2f} s")
+		db.engine.dispose()
+
+	lectura, escritura = os.pipe()
+	pid = os.fork()
+	if pid == 0:
+		os.close(lectura)
+		creados = 0
+		try:
+			creados = _crear_pedidos(app, [f['id_gorra'] for f in filas], id_usuario, args.segundos, args.semilla)
+		finally:
+			os.write(escritura, str(creados).encode())
+			os._exit(0)
+	os.close(escritura)
+
+	latencias = []
+	cargas = indice_catalogo.cargas
+	consultas = generar_consultas(args.consultas, args.semilla)
+	with app.app_context():
+		fin = time.monotonic() + args.segundos
+		while time.monotonic() < fin:
+			texto, filtros = consultas[len(latencias) % len(consultas)]
+			inicio = time.perf_counter()
+			indice_catalogo.buscar(texto, limite=20, filtros=filtros)
+			latencias.append((time.perf_counter() - inicio) * 1000)
+	os.waitpid(pid, 0)
+	with os.fdopen(lectura) as canal:
+		pedidos = canal.read() or '0'
+	shutil.rmtree(directorio, ignore_errors=True)
+	print(f"Pedidos creados por el otro proceso: {pedidos} en {args.segundos:.0f} s")
+	print(f"Reconstrucciones del índice: {indice_catalogo.cargas - cargas}")
+	return latencias
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+	parser.add_argument('--variantes', type=int, default=100000)
+	parser.add_argument('--consultas', type=int, default=2000)
+	parser.add_argument('--semilla', type=int, default=7)
+	parser.add_argument('--objetivo-p95-ms', type=float, default=20.0)
+	parser.add_argument('--en-frio', action='store_true',
+						help='Vaciar las cachés del índice antes de cada consulta')
+	parser.add_argument('--con-pedidos', action='store_true',
+						help='Buscar mientras otro proceso crea pedidos sobre una base SQLite')
+	parser.add_argument('--segundos', type=float, default=10.0,
+						help='Duración de la medición con --con-pedidos')
+	args = parser.parse_args(argv)
+
+	if args.con_pedidos:
+		if not hasattr(os, 'fork'):
+			print('--con-pedidos necesita os.fork')
+			return 1
+		latencias = medir_con_pedidos(args)
+	else:
+		inicio = time.perf_counter()
+		indice = construir_indice(args.variantes, args.semilla)
+		print(f"Índice construido: {len(indice)} documentos en {time.perf_counter() - inicio:.2f} s")
+
+		latencias = []
+		for texto, filtros in generar_consultas(args.consultas, args.semilla):
+			if args.en_frio:
+				indice._invalidar_caches()
+			inicio = time.perf_counter()
+			indice.buscar(texto, limite=20, filtros=filtros)
+			latencias.append((time.perf_counter() - inicio) * 1000)
+
+	p95 = percentil(latencias, 95)
+	print(f"Consultas: {len(latencias)}")
+	print(f"p50: {percentil(latencias, 50):.2f} ms  p95: {p95:.2f} ms  "
+		  f"p99: {percentil(latencias, 99):.2f} ms  máx: {max(latencias):.2f} ms")
+	if p95 > args.objetivo_p95_ms:
+		print(f"ERROR: p95 supera el objetivo de {args.objetivo_p95_ms} ms")
+		return 1
+	print("OK")
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
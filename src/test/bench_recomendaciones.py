@@ -0,0 +1,101 @@
+"""
+Benchmark de la reconstrucción y consulta de las recomendaciones "comprados juntos".
+
+Puebla una base SQLite temporal con el generador de seed-db (1000 pedidos
+por unidad de escala; la escala 1000 son 1M de pedidos), mide la
+reconstrucción completa de las co-ocurrencias (lectura y multiplicación de
+matrices por separado de la escritura), una actualización incremental tras
+``--nuevos`` pedidos y la latencia de la consulta de una variante. Uso:
+
+	python -m src.test.bench_recomendaciones --escala 1000
+"""
+from datetime import datetime
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.test.benchmarks import medir
+from src.test.entorno import crear_app_prueba
+
+HASTA = datetime(2026, 1, 1)
+
+
+def _resumen(resultado) -> dict:
+	return {
+		'pedidos': resultado.pedidos,
+		'lineas': resultado.lineas,
+		'pares': resultado.pares,
+		'variantes': resultado.variantes,
+		'calculo_s': round(resultado.segundos_calculo, 2),
+		'total_s': round(resultado.segundos, 2),
+		'pedidos_s': round(resultado.pedidos_por_segundo, 1)
+	}
+
+
+def ejecutar(escala: int, nuevos: int, iteraciones: int, semilla: int = 42) -> dict:
+	"""
+	Mide la reconstrucción, la actualización incremental y la consulta.
+
+	Returns:
+		dict: Segundos de generación de datos, resumen de cada ejecución y
+		métricas de la consulta
+	"""
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import Persona, VarianteGorra
+	from src.services.pedidos import crear_pedido
+	from src.services.recomendaciones import actualizar, recomendaciones
+
+	aleatorio = random.Random(semilla)
+	with tempfile.TemporaryDirectory(prefix='bench_recomendaciones_') as directorio:
+		app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+		with app.app_context():
+			db.create_all()
+			inicio = time.perf_counter()
+			generar_datos(ParametrosGeneracion(escala=escala, semilla=semilla, hasta=HASTA))
+			resultados = {'generacion_s': round(time.perf_counter() - inicio, 2)}
+
+			resultados['reconstruccion'] = _resumen(actualizar(completo=True))
+
+			ids_variante = db.session.scalars(select(VarianteGorra.id_gorra).where(
+				VarianteGorra.stock > 10, VarianteGorra.activo.is_not(False))).all()
+			ids_persona = db.session.scalars(select(Persona.id_usuario)).all()
+			for _ in range(nuevos):
+				crear_pedido(aleatorio.choice(ids_persona), [{'id_gorra': g, 'cantidad': 1}
+															 for g in aleatorio.sample(ids_variante, aleatorio.randint(1, 3))])
+			resultados['incremental'] = _resumen(actualizar())
+
+			db.session.remove()
+			resultados['consulta'] = medir(lambda i: recomendaciones(aleatorio.choice(ids_variante)), iteraciones)
+			db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--escala', type=int, default=1000, help='Escala de seed-db (1000 pedidos por unidad)')
+	parser.add_argument('--nuevos', type=int, default=1000, help='Pedidos nuevos antes de la actualización incremental')
+	parser.add_argument('--iteraciones', type=int, default=1000)
+	parser.add_argument('--semilla', type=int, default=42)
+	args = parser.parse_args()
+
+	resultados = ejecutar(args.escala, args.nuevos, args.iteraciones, args.semilla)
+	print(f"Datos generados en {resultados['generacion_s']:.2f} s")
+	for fase in ('reconstruccion', 'incremental'):
+		r = resultados[fase]
+		print(f"{fase.capitalize():<15} {r['pedidos']:>9} pedidos {r['lineas']:>9} líneas {r['pares']:>9} pares "
+			  f"{r['variantes']:>7} variantes  cálculo {r['calculo_s']:>7.2f} s  total {r['total_s']:>7.2f} s "
+			  f"({r['pedidos_s']:.0f} pedidos/s)")
+	m = resultados['consulta']
+	print(f"Consulta        p50 {m['p50_ms']:.3f} ms  p95 {m['p95_ms']:.3f} ms  p99 {m['p99_ms']:.3f} ms  "
+		  f"{m['ops_s']:.1f} op/s  {m['sentencias']:.1f} sentencias/op")
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
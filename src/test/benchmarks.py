@@ -0,0 +1,200 @@
+"""
+Suite de benchmarks de rendimiento sobre SQLite.
+
+Puebla una base en memoria a varias escalas con el generador de seed-db y
+mide las operaciones principales del catálogo y de los pedidos: latencia
+(p50/p95/p99), rendimiento (op/s) y sentencias SQL por operación. Los
+resultados se comparan con una línea base en JSON para detectar regresiones.
+Uso:
+
+	python -m src.test.benchmarks --escalas 1,5
+	python -m src.test.benchmarks --escalas 1,5 --guardar-baseline
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba
+
+BASELINE = Path(__file__).with_name('baseline_benchmarks.json')
+FECHA_DATOS = datetime(2026, 1, 1)
+
+
+def percentil(valores: List[float], p: float) -> float:
+	ordenados = sorted(valores)
+	return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir(operacion: Callable[[int], None], iteraciones: int) -> Dict[str, float]:
+	"""
+	Ejecuta ``operacion(i)`` varias veces midiendo latencia y sentencias SQL.
+
+	Returns:
+		dict: p50/p95/p99 en ms, operaciones por segundo y sentencias por operación
+	"""
+	latencias = []
+	# Como timeit, se desactiva el recolector para reducir el ruido en los percentiles
+	gc.collect()
+	gc.disable()
+	try:
+		with ContadorSQL(db.engine) as contador:
+			inicio_total = time.perf_counter()
+			for i in range(iteraciones):
+				inicio = time.perf_counter()
+				operacion(i)
+				latencias.append((time.perf_counter() - inicio) * 1000)
+				db.session.remove()
+			segundos = time.perf_counter() - inicio_total
+	finally:
+		gc.enable()
+	return {
+		'p50_ms': round(percentil(latencias, 50), 3),
+		'p95_ms': round(percentil(latencias, 95), 3),
+		'p99_ms': round(percentil(latencias, 99), 3),
+		'ops_s': round(iteraciones / segundos, 1),
+		'sentencias': round(contador.total / iteraciones, 2),
+		'iteraciones': iteraciones
+	}
+
+
+def ejecutar_escala(escala: int, iteraciones: int, semilla: int = 42) -> Dict[str, Dict[str, float]]:
+	"""Puebla una base en memoria a la escala dada y ejecuta todos los casos."""
+	from src.database.cache import cache_catalogo
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import Gorra, Persona, VarianteGorra
+	from src.services.historial import obtener_historial, serializar_pedido
+	from src.services.pedidos import crear_pedido, StockInsuficienteError
+
+	app = crear_app_prueba()
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		generar_datos(ParametrosGeneracion(escala=escala, semilla=semilla, hasta=FECHA_DATOS))
+		aleatorio = random.Random(semilla)
+		# Ordenados: sin ORDER BY el orden depende del índice que elija SQLite y
+		# cambiaría la muestra (y las sentencias medidas) al añadir un índice
+		ids_gorra = [g for (g,) in db.session.query(Gorra.id_gorra).order_by(Gorra.id_gorra)]
+		ids_variante = [v for (v,) in db.session.query(VarianteGorra.id_gorra).filter(VarianteGorra.activo.is_(True))
+						.order_by(VarianteGorra.id_gorra)]
+		ids_persona = [p for (p,) in db.session.query(Persona.id_usuario).order_by(Persona.id_usuario)]
+		db.session.remove()
+
+		# Los casos de lectura miden la base de datos, no la caché
+		cache_catalogo.activa = False
+
+		resultados['gorra_obtener_todas'] = medir(lambda i: Gorra.obtener_todas(), max(5, iteraciones // 10))
+		resultados['gorra_obtener_por_id'] = medir(
+			lambda i: Gorra.obtener_por_id(aleatorio.choice(ids_gorra)), iteraciones)
+		resultados['gorra_obtener_pagina'] = medir(
+			lambda i: Gorra.obtener_pagina(limite=20, color='negro'), iteraciones)
+
+		def crear(i):
+			Gorra.crear({'nombre': f'Bench {i}', 'descripcion': 'benchmark', 'color': 'negro',
+						 'precio': 50000.0, 'stock': 10})
+		resultados['gorra_crear'] = medir(crear, iteraciones)
+
+		def actualizar(i):
+			# Un stock fuera del rango generado garantiza que siempre haya UPDATE
+			Gorra.obtener_por_id(aleatorio.choice(ids_gorra)).actualizar({'stock': 1000 + i})
+		resultados['gorra_actualizar'] = medir(actualizar, iteraciones)
+
+		def pedido(i):
+			lineas = [{'id_gorra': v, 'cantidad': 1} for v in aleatorio.sample(ids_variante, 3)]
+			try:
+				crear_pedido(aleatorio.choice(ids_persona), lineas)
+			except StockInsuficienteError:
+				pass
+		resultados['pedido_crear'] = medir(pedido, iteraciones)
+
+		def historial(i):
+			pedidos = obtener_historial(aleatorio.choice(ids_persona), perfil='completo')
+			[serializar_pedido(p) for p in pedidos]
+		resultados['pedido_historial'] = medir(historial, iteraciones)
+
+		cache_catalogo.activa = True
+		for id_gorra in ids_gorra[:10]:
+			Gorra.obtener_por_id(id_gorra)
+		db.session.remove()
+		resultados['gorra_obtener_por_id_cache'] = medir(
+			lambda i: Gorra.obtener_por_id(ids_gorra[i % 10]), iteraciones)
+		db.engine.dispose()
+	return resultados
+
+
+def comparar(actual: Dict, baseline: Dict, tolerancia: float, margen_ms: float = 0.5) -> List[str]:
+	"""
+	Compara los resultados con la línea base.
+
+	Una regresión es un p95 mayor que el de la línea base por encima de la
+	tolerancia relativa y del margen absoluto (para no marcar el ruido de las
+	operaciones de menos de un milisegundo), o un aumento del número de
+	sentencias SQL por operación. Las sentencias solo se comparan si ambas
+	ejecuciones usaron el mismo número de iteraciones.
+
+	Returns:
+		List[str]: Descripción de cada regresión encontrada
+	"""
+	regresiones = []
+	for escala, casos in actual.items():
+		for caso, metricas in casos.items():
+			base = baseline.get(escala, {}).get(caso)
+			if not base:
+				continue
+			if metricas['p95_ms'] > max(base['p95_ms'] * (1 + tolerancia), base['p95_ms'] + margen_ms):
+				regresiones.append(
+					f"escala {escala} / {caso}: p95 {metricas['p95_ms']} ms > {base['p95_ms']} ms")
+			if metricas['iteraciones'] == base.get('iteraciones') and metricas['sentencias'] > base['sentencias']:
+				regresiones.append(
+					f"escala {escala} / {caso}: {metricas['sentencias']} sentencias > {base['sentencias']}")
+	return regresiones
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+	parser.add_argument('--escalas', default='1,5', help='Escalas separadas por comas')
+	parser.add_argument('--iteraciones', type=int, default=200)
+	parser.add_argument('--semilla', type=int, default=42)
+	parser.add_argument('--baseline', type=Path, default=BASELINE)
+	parser.add_argument('--tolerancia', type=float, default=1.0,
+						help='Aumento relativo de p95 permitido antes de considerarlo regresión')
+	parser.add_argument('--margen-ms', type=float, default=0.5,
+						help='Aumento absoluto de p95 ignorado como ruido')
+	parser.add_argument('--guardar-baseline', action='store_true', help='Guardar los resultados como línea base')
+	args = parser.parse_args(argv)
+
+	resultados = {}
+	for escala in [int(e) for e in args.escalas.split(',') if e.strip()]:
+		print(f"Escala {escala}")
+		resultados[str(escala)] = ejecutar_escala(escala, args.iteraciones, args.semilla)
+		for caso, m in resultados[str(escala)].items():
+			print(f"  {caso:<28} p50 {m['p50_ms']:>8.3f} ms  p95 {m['p95_ms']:>8.3f} ms  "
+				  f"p99 {m['p99_ms']:>8.3f} ms  {m['ops_s']:>9.1f} op/s  {m['sentencias']:>5} SQL/op")
+
+	if args.guardar_baseline:
+		args.baseline.write_text(json.dumps(resultados, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+		print(f"Línea base guardada en {args.baseline}")
+		return 0
+
+	if not args.baseline.exists():
+		print("No hay línea base; use --guardar-baseline para crearla")
+		return 0
+	regresiones = comparar(resultados, json.loads(args.baseline.read_text(encoding='utf-8')), args.tolerancia,
+						   args.margen_ms)
+	for regresion in regresiones:
+		print(f"REGRESIÓN: {regresion}")
+	if regresiones:
+		return 1
+	print("OK: sin regresiones respecto a la línea base")
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
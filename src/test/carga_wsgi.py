@@ -0,0 +1,149 @@
+"""
+Prueba de carga del punto de entrada WSGI de producción.
+
+Arranca gunicorn (``gunicorn.conf.py`` + ``wsgi:application``) contra una base
+SQLite temporal con distinto número de workers y mide, con varios procesos
+cliente, las peticiones por segundo y la latencia de los endpoints del
+catálogo. La escala con los workers depende de los núcleos disponibles. Uso:
+
+	python -m src.test.carga_wsgi --workers 1,2,4 --hilos 4 --segundos 10
+"""
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba
+
+RAIZ = Path(__file__).resolve().parents[2]
+
+
+def preparar_base(uri: str, gorras: int) -> List[int]:
+	"""Crea las tablas y el catálogo de prueba; devuelve los IDs de las gorras."""
+	from src.models import Gorra
+
+	app = crear_app_prueba(uri)
+	with app.app_context():
+		db.create_all()
+		db.session.add_all([
+			Gorra(nombre=f'Gorra {i:05d}', descripcion='Prueba de carga', color=random.choice(['negro', 'rojo']),
+				  precio=10 + i % 50, stock=100, activo=True)
+			for i in range(gorras)
+		])
+		db.session.commit()
+		ids = [g.id_gorra for g in Gorra.query.all()]
+		db.engine.dispose()
+	return ids
+
+
+def _puerto_libre() -> int:
+	with socket.socket() as s:
+		s.bind(('127.0.0.1', 0))
+		return s.getsockname()[1]
+
+
+def arrancar_servidor(uri: str, workers: int, hilos: int) -> Tuple[subprocess.Popen, int]:
+	"""Arranca gunicorn y espera a que /healthz responda."""
+	puerto = _puerto_libre()
+	entorno = dict(os.environ, FLASK_ENV='production', DATABASE_URL=uri, GUNICORN_WORKERS=str(workers),
+				   GUNICORN_THREADS=str(hilos), GUNICORN_BIND=f'127.0.0.1:{puerto}',
+				   METRICAS_ACTIVAS='false')
+	proceso = subprocess.Popen(
+		[sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+		cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+	)
+	limite = time.monotonic() + 30
+	while time.monotonic() < limite:
+		try:
+			conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=1)
+			conexion.request('GET', '/healthz')
+			if conexion.getresponse().status == 200:
+				return proceso, puerto
+		except OSError:
+			time.sleep(0.2)
+	proceso.terminate()
+	raise RuntimeError('gunicorn no respondió en 30 s')
+
+
+def _cliente(argumentos) -> Dict[str, object]:
+	puerto, ids, segundos, semilla = argumentos
+	aleatorio = random.Random(semilla)
+	conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=10)
+	latencias, errores = [], 0
+	fin = time.monotonic() + segundos
+	while time.monotonic() < fin:
+		ruta = f'/api/catalogo/{aleatorio.choice(ids)}' if aleatorio.random() < 0.8 else '/api/catalogo?limite=20'
+		inicio = time.perf_counter()
+		try:
+			conexion.request('GET', ruta)
+			respuesta = conexion.getresponse()
+			respuesta.read()
+			if respuesta.status != 200:
+				errores += 1
+		except (OSError, http.client.HTTPException):
+			errores += 1
+			conexion.close()
+			conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=10)
+			continue
+		latencias.append((time.perf_counter() - inicio) * 1000)
+	return {'latencias': latencias, 'errores': errores}
+
+
+def medir(puerto: int, ids: List[int], clientes: int, segundos: float) -> Dict[str, float]:
+	"""Lanza ``clientes`` procesos con conexiones keep-alive durante ``segundos``."""
+	with Pool(clientes) as pool:
+		resultados = pool.map(_cliente, [(puerto, ids, segundos, i) for i in range(clientes)])
+	latencias = sorted(l for r in resultados for l in r['latencias'])
+
+	def percentil(p):
+		return latencias[min(len(latencias) - 1, int(round(p / 100 * (len(latencias) - 1))))] if latencias else 0.0
+
+	return {
+		'peticiones_s': round(len(latencias) / segundos, 1),
+		'p50_ms': round(percentil(50), 2),
+		'p99_ms': round(percentil(99), 2),
+		'errores': sum(r['errores'] for r in resultados)
+	}
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--workers', default='1,2,4', help='Números de workers a comparar, separados por comas')
+	parser.add_argument('--hilos', type=int, default=4, help='Hilos por worker')
+	parser.add_argument('--clientes', type=int, default=None, help='Procesos cliente (por defecto 2 x núcleos)')
+	parser.add_argument('--segundos', type=float, default=10.0, help='Duración de cada medición')
+	parser.add_argument('--gorras', type=int, default=2000, help='Gorras del catálogo de prueba')
+	args = parser.parse_args()
+
+	clientes = args.clientes or 2 * (os.cpu_count() or 1)
+	with tempfile.TemporaryDirectory(prefix='carga_wsgi_') as directorio:
+		uri = f"sqlite:///{os.path.join(directorio, 'carga.db')}"
+		ids = preparar_base(uri, args.gorras)
+		print(f"{os.cpu_count()} núcleos, {clientes} clientes, {args.hilos} hilos por worker")
+		base = None
+		for workers in [int(w) for w in args.workers.split(',')]:
+			proceso, puerto = arrancar_servidor(uri, workers, args.hilos)
+			try:
+				medir(puerto, ids, clientes, min(2.0, args.segundos))  # calentamiento
+				resultado = medir(puerto, ids, clientes, args.segundos)
+			finally:
+				proceso.terminate()
+				proceso.wait(timeout=30)
+			base = base or resultado['peticiones_s'] or 1.0
+			print(f"workers={workers:<3} {resultado['peticiones_s']:>9.1f} pet/s  "
+				  f"x{resultado['peticiones_s'] / base:.2f}  p50 {resultado['p50_ms']:.2f} ms  "
+				  f"p99 {resultado['p99_ms']:.2f} ms  errores {resultado['errores']}")
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
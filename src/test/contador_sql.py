@@ -0,0 +1,71 @@
+"""
+Utilidades para contar las sentencias SQL que emite un fragmento de código.
+
+Uso:
+
+	with assert_num_sentencias(2):
+		obtener_historial(id_usuario)
+"""
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+
+from src.database.db_connection import db
+
+
+class ContadorSQL:
+	"""Registra las sentencias ejecutadas sobre un engine mientras está activo."""
+
+	def __init__(self, engine=None):
+		self.engine = engine
+		self.sentencias: List[str] = []
+
+	def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+		self.sentencias.append(statement)
+
+	def __enter__(self) -> 'ContadorSQL':
+		if self.engine is None:
+			self.engine = db.engine
+		event.listen(self.engine, 'before_cursor_execute', self._registrar)
+		return self
+
+	def __exit__(self, *exc):
+		event.remove(self.engine, 'before_cursor_execute', self._registrar)
+		return False
+
+	@property
+	def total(self) -> int:
+		return len(self.sentencias)
+
+
+def contar_sentencias(engine=None) -> ContadorSQL:
+	"""
+	Devuelve un contexto que cuenta las sentencias SQL ejecutadas.
+
+	Args:
+		engine: Engine a observar; por defecto ``db.engine``
+
+	Returns:
+		ContadorSQL: Usar con ``with``; ``total`` tiene el número de sentencias
+	"""
+	return ContadorSQL(engine)
+
+
+@contextmanager
+def assert_num_sentencias(esperado: int, engine=None, exacto: bool = True):
+	"""
+	Verifica que el bloque emita ``esperado`` sentencias SQL (o como mucho
+	``esperado`` si ``exacto`` es False).
+
+	Raises:
+		AssertionError: Con el listado de sentencias si no se cumple
+	"""
+	with ContadorSQL(engine) as contador:
+		yield contador
+	if contador.total != esperado if exacto else contador.total > esperado:
+		detalle = '\n'.join(f'  {i}. {s}' for i, s in enumerate(contador.sentencias, start=1))
+		objetivo = str(esperado) if exacto else f'como máximo {esperado}'
+		raise AssertionError(
+			f"Se esperaban {objetivo} sentencias SQL y se ejecutaron {contador.total}:\n{detalle}"
+		)
@@ -0,0 +1,74 @@
+"""
+Entorno de pruebas sobre SQLite.
+
+Crea una aplicación Flask mínima ligada a la instancia ``db`` del proyecto
+para poder ejecutar servicios y scripts de rendimiento sin MariaDB.
+"""
+from typing import Optional
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+from src.database.db_connection import db
+
+
+def crear_app_prueba(uri: Optional[str] = None, **config) -> Flask:
+	"""
+	Crea una aplicación Flask conectada a SQLite.
+
+	Args:
+		uri: URI de la base de datos; por defecto SQLite en memoria
+		**config: Claves de configuración adicionales
+
+	Returns:
+		Flask: Aplicación lista para usar dentro de ``app.app_context()``
+	"""
+	import src.models  # noqa: F401  Registra todos los modelos
+
+	uri = uri or 'sqlite://'
+	app = Flask('gorras_pruebas')
+	app.config['SQLALCHEMY_DATABASE_URI'] = uri
+	app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+	app.config['TESTING'] = True
+	if uri in ('sqlite://', 'sqlite:///:memory:'):
+		# Una única conexión compartida para que todos los hilos vean los mismos datos
+		app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+			'poolclass': StaticPool,
+			'connect_args': {'check_same_thread': False}
+		}
+	elif uri.startswith('sqlite'):
+		app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+	app.config.update(config)
+	db.init_app(app)
+	return app
+
+
+def crear_persona_prueba(numero: int = 1):
+	"""
+	Crea (si no existen) un rol, un tipo de documento y una persona de prueba.
+
+	Args:
+		numero: Sufijo para generar datos únicos
+
+	Returns:
+		Persona: La persona creada
+	"""
+	from src.models import Persona, Rol, TipoDocumento
+
+	rol = Rol.query.filter_by(nombre='cliente').first() or Rol(nombre='cliente')
+	tipo = TipoDocumento.query.filter_by(nombre='Cédula').first() or TipoDocumento(nombre='Cédula')
+	db.session.add_all([rol, tipo])
+	db.session.flush()
+	persona = Persona(
+		primer_nombre='Cliente',
+		primer_apellido=f'Prueba{numero}',
+		id_tipo_documento=tipo.id_tipo_documento,
+		documento=str(numero).zfill(10),
+		telefono='3000000000',
+		correo=f'cliente{numero}@example.com',
+		direccion='Calle 1',
+		password_hash='x',
+		id_rol=rol.id_rol
+	)
+	db.session.add(persona)
+	db.session.commit()
+	return persona
@@ -0,0 +1,98 @@
+"""
+Prueba de la actualización masiva del catálogo.
+
+Sobre una base SQLite temporal comprueba que ``PATCH /api/catalogo/gorras``
+exige una sesión (401) de administrador (403) y que, tras un cambio de
+precio en bloque, ``Gorra.obtener_por_id`` devuelve el precio nuevo y no el
+de la caché, con la caché solo local y con un backend compartido. Uso:
+
+	python -m src.test.prueba_actualizacion_masiva
+"""
+import os
+import sys
+import tempfile
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+
+def _token(numero: int, rol: str) -> str:
+	from src.models import Rol
+	from src.services.autenticacion import autenticacion
+
+	persona = crear_persona_prueba(numero)
+	rol = Rol.query.filter_by(nombre=rol).first() or Rol(nombre=rol)
+	db.session.add(rol)
+	db.session.flush()
+	persona.id_rol = rol.id_rol
+	db.session.commit()
+	autenticacion.establecer_password(persona.id_usuario, 'clave-prueba-123')
+	return autenticacion.iniciar_sesion(persona.correo, 'clave-prueba-123')['token']
+
+
+def _precio_tras_cambio(id_gorra: int, precio: float) -> float:
+	from src.models import Gorra
+	from src.services.actualizacion_masiva import actualizar_en_bloque
+
+	Gorra.obtener_por_id(id_gorra)  # Deja la gorra en caché
+	actualizar_en_bloque('gorras', [{'id': id_gorra, 'precio': precio}])
+	db.session.remove()
+	return float(Gorra.obtener_por_id(id_gorra).precio)
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.cache import BackendSQLite, cache_catalogo
+	from src.models import Gorra
+	from src.routes.catalogo import catalogo_bp
+	from src.services.autenticacion import autenticacion
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'actualizacion.db')}", SECRET_KEY='prueba')
+	app.register_blueprint(catalogo_bp)
+	autenticacion.init_app(app)
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		cache_catalogo.init_app(app)
+		gorra = Gorra(nombre='Gorra trucker', descripcion='-', color='negro', precio=10.0, stock=5)
+		db.session.add(gorra)
+		db.session.commit()
+		id_gorra = gorra.id_gorra
+
+		cliente = _token(1, 'cliente')
+		administrador = _token(2, 'administrador')
+
+	# Fuera del contexto de la aplicación: cada petición tiene su propio ``g``
+	cambios = [{'id': id_gorra, 'activo': True}]
+	http = app.test_client()
+	resultados['sin_sesion_401'] = http.patch('/api/catalogo/gorras', json=cambios).status_code == 401
+	resultados['cliente_403'] = http.patch('/api/catalogo/gorras', json=cambios,
+										   headers={'Authorization': f'Bearer {cliente}'}).status_code == 403
+	respuesta = http.patch('/api/catalogo/gorras', json=cambios, headers={'Authorization': f'Bearer {administrador}'})
+	resultados['administrador_200'] = respuesta.status_code == 200 and respuesta.get_json()['actualizadas'] == 1
+
+	with app.app_context():
+		resultados['cache_local_por_gorra'] = _precio_tras_cambio(id_gorra, 99.0) == 99.0
+		cache_catalogo.init_app(app, backend=BackendSQLite(os.path.join(directorio, 'cache.sqlite3')))
+		resultados['cache_compartida_por_gorra'] = _precio_tras_cambio(id_gorra, 55.0) == 55.0
+		cache_catalogo.init_app(app)
+		autenticacion.esperar_tareas()
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_actualizacion_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Prueba del archivo de pedidos y ventas antiguos.
+
+Sobre una base SQLite temporal con dos años de pedidos interrumpe el
+archivado a mitad y comprueba que se reanuda, que solo se mueven los pedidos
+cerrados anteriores al corte (con sus líneas), que el historial lee el
+archivo solo cuando se pide un rango anterior al límite, que los resúmenes
+de ventas no cambian al reconstruirse y que los pedidos nuevos no reutilizan
+IDs archivados. Uso:
+
+	python -m src.test.prueba_archivo
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba
+
+HASTA = datetime(2026, 1, 1)
+
+
+class _Interrupcion(Exception):
+	pass
+
+
+def _ingresos() -> float:
+	from src.models import ResumenVentaDia
+	return float(db.session.query(func.coalesce(func.sum(ResumenVentaDia.ingresos), 0)).scalar())
+
+
+def _contar(modelo, *condiciones) -> int:
+	return db.session.scalar(select(func.count()).select_from(modelo).where(*condiciones))
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import (DetallePedido, DetallePedidoArchivado, Pedido, PedidoArchivado, Persona, VarianteGorra,
+							Venta, VentaArchivada)
+	from src.services.archivo import ESTADOS_ARCHIVABLES, archivar
+	from src.services.historial import obtener_historial, serializar_pedido
+	from src.services.pedidos import crear_pedido
+	from src.services.reportes import refrescar_resumenes
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'archivo.db')}")
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		generar_datos(ParametrosGeneracion(escala=1, dias=730, hasta=HASTA))
+		id_usuario = db.session.scalar(select(Pedido.id_usuario).group_by(Pedido.id_usuario)
+									   .order_by(func.count().desc()).limit(1))
+		for dias, estado in ((600, 'pagada'), (600, 'pendiente'), (30, 'pagada')):
+			db.session.add(Venta(id_usuario=id_usuario, fecha_venta=HASTA - timedelta(days=dias), total=1000.0,
+								 metodo_pago='efectivo', estado=estado))
+		db.session.commit()
+
+		corte = HASTA - timedelta(days=365)
+		antiguos = Pedido.fecha_pedido < corte
+		# El último pedido (y el de la última línea) nunca se archiva
+		conservados = {db.session.scalar(select(func.max(Pedido.id_pedido))),
+					   db.session.scalar(select(DetallePedido.id_pedido).order_by(DetallePedido.id_detalle.desc()).limit(1))}
+		esperados = _contar(Pedido, antiguos, Pedido.estado.in_(ESTADOS_ARCHIVABLES), Pedido.id_pedido.notin_(conservados))
+		quedan = _contar(Pedido, antiguos) - esperados
+		lineas = _contar(DetallePedido)
+		pedidos_usuario = len(obtener_historial(id_usuario, perfil='resumen'))
+		refrescar_resumenes(completo=True, ahora=HASTA)
+		ingresos = _ingresos()
+
+		lotes = []
+
+		def interrumpir(tabla, resultado):
+			lotes.append(resultado.pedidos)
+			if len(lotes) == 2:
+				raise _Interrupcion()
+
+		try:
+			archivar(antiguedad_dias=365, tamano_lote=50, ahora=HASTA, progreso=interrumpir)
+		except _Interrupcion:
+			pass
+		resultado = archivar(antiguedad_dias=365, tamano_lote=50, ahora=HASTA)
+		resultados['reanudacion'] = (lotes == [50, 100] and resultado.pedidos + 100 == esperados
+									 and _contar(PedidoArchivado) == esperados)
+		resultados['solo_cerrados_antiguos'] = (
+			_contar(Pedido, antiguos) == quedan
+			and _contar(PedidoArchivado, PedidoArchivado.fecha_pedido >= corte) == 0
+			and _contar(DetallePedido) + _contar(DetallePedidoArchivado) == lineas
+			and _contar(DetallePedidoArchivado, DetallePedidoArchivado.id_pedido.notin_(
+				select(PedidoArchivado.id_pedido))) == 0)
+		resultados['ventas'] = _contar(VentaArchivada) == 1 and _contar(Venta) == 2
+
+		recientes = obtener_historial(id_usuario, perfil='completo')
+		with ContadorSQL(db.engine) as contador:
+			obtener_historial(id_usuario, perfil='completo', desde=corte, incluir_archivo=True)
+		sin_archivo = not any('pedidos_archivados' in s for s in contador.sentencias)
+		db.session.remove()
+		completo = obtener_historial(id_usuario, perfil='completo', incluir_archivo=True)
+		serializados = [serializar_pedido(p) for p in completo]
+		resultados['historial'] = (
+			sin_archivo and len(completo) == pedidos_usuario and len(recientes) < pedidos_usuario
+			and all(p['detalles'] and p['detalles'][0]['tipo'] for p in serializados)
+			and any(p['archivado'] for p in serializados)
+			and [p['fecha_pedido'] for p in serializados] == sorted((p['fecha_pedido'] for p in serializados),
+																	reverse=True))
+
+		refrescar_resumenes(completo=True, ahora=HASTA)
+		resultados['reportes_sin_cambios'] = abs(_ingresos() - ingresos) < 0.01
+
+		id_gorra = db.session.scalar(select(VarianteGorra.id_gorra).where(VarianteGorra.stock > 0).limit(1))
+		db.session.execute(Pedido.__table__.update().values(
+			estado='entregado', fecha_pedido=corte - timedelta(days=1)))
+		db.session.commit()
+		archivar(antiguedad_dias=365, ahora=HASTA)
+		ids_archivados = set(db.session.scalars(select(PedidoArchivado.id_pedido)))
+		nuevo = crear_pedido(db.session.scalar(select(Persona.id_usuario).limit(1)), [{'id_gorra': id_gorra, 'cantidad': 1}])
+		resultados['ids_no_reutilizados'] = _contar(Pedido) == len(conservados) + 1 and nuevo.id_pedido not in ids_archivados
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_archivo_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
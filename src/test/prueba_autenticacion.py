@@ -0,0 +1,109 @@
+"""
+Prueba del servicio de autenticación.
+
+Sobre SQLite comprueba el inicio de sesión, que validar un token no emite
+ninguna consulta, la actualización en segundo plano de un hash PBKDF2 a
+scrypt, las revocaciones (cierre de sesión y cambio de contraseña) y que la
+cola acotada rechaza los inicios de sesión que no caben. Uso:
+
+	python -m src.test.prueba_autenticacion
+"""
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
+
+from werkzeug.security import generate_password_hash
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+
+def ejecutar() -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.models import Persona
+	from src.services.autenticacion import (CredencialesInvalidasError, ServicioAutenticacion,
+											ServicioSaturadoError, SesionInvalidaError)
+
+	app = crear_app_prueba(SECRET_KEY='prueba', AUTH_TRABAJADORES=2, AUTH_MAX_PENDIENTES=2,
+						   AUTH_ESPERA_COLA_SEGUNDOS=0)
+	servicio = ServicioAutenticacion()
+	servicio.init_app(app)
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		persona = crear_persona_prueba()
+		correo, id_usuario = persona.correo, persona.id_usuario
+
+		# Hash antiguo: se acepta y se sustituye por scrypt sin bloquear la respuesta
+		persona.password_hash = generate_password_hash('clave-antigua', method='pbkdf2:sha256:1000')
+		db.session.commit()
+		sesion = servicio.iniciar_sesion(correo, 'clave-antigua')
+		servicio.esperar_tareas()
+		db.session.expire_all()
+		resultados['rehash_a_scrypt'] = db.session.get(Persona, id_usuario).password_hash.startswith('scrypt:')
+		resultados['login_tras_rehash'] = servicio.iniciar_sesion(correo, 'clave-antigua')['id_usuario'] == id_usuario
+
+		with ContadorSQL(db.engine) as contador:
+			validada = servicio.validar_token(sesion['token'])
+		resultados['token_sin_consultas'] = contador.total == 0 and validada.id_usuario == id_usuario
+
+		try:
+			servicio.iniciar_sesion(correo, 'incorrecta')
+			resultados['password_incorrecta'] = False
+		except CredencialesInvalidasError:
+			resultados['password_incorrecta'] = True
+		try:
+			servicio.iniciar_sesion('nadie@example.com', 'incorrecta')
+			resultados['correo_inexistente'] = False
+		except CredencialesInvalidasError:
+			resultados['correo_inexistente'] = True
+
+		def invalido(token) -> bool:
+			try:
+				servicio.validar_token(token)
+				return False
+			except SesionInvalidaError:
+				return True
+
+		servicio.cerrar_sesion(validada)
+		resultados['logout_revoca'] = invalido(sesion['token'])
+
+		otra = servicio.iniciar_sesion(correo, 'clave-antigua')['token']
+		time.sleep(0.01)
+		servicio.establecer_password(id_usuario, 'clave-nueva-123')
+		nueva = servicio.iniciar_sesion(correo, 'clave-nueva-123')['token']
+		resultados['cambio_password_revoca'] = invalido(otra) and not invalido(nueva)
+		resultados['token_manipulado'] = invalido(nueva[:-2] + ('AA' if not nueva.endswith('AA') else 'BB'))
+
+	# Con 2 plazas y sin espera, la mayoría de 12 inicios simultáneos se rechazan
+	def intento(_):
+		with app.app_context():
+			try:
+				servicio.iniciar_sesion(correo, 'clave-nueva-123')
+				return 'ok'
+			except ServicioSaturadoError:
+				return 'saturado'
+
+	with ThreadPoolExecutor(max_workers=12) as hilos:
+		respuestas = list(hilos.map(intento, range(12)))
+	resultados['contrapresion'] = 'saturado' in respuestas and 'ok' in respuestas
+	with app.app_context():
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	resultados = ejecutar()
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
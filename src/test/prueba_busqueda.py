@@ -0,0 +1,176 @@
+"""
+Prueba del mantenimiento del índice de búsqueda.
+
+Sobre una base SQLite temporal y un backend de versiones compartido
+comprueba que el índice del proceso que escribe se actualiza con los eventos
+del ORM sin reconstruirse, que el índice de otro proceso (simulado con otra
+instancia y sus propios contadores locales) detecta el cambio y se
+reconstruye antes de buscar, que deshacer un savepoint solo descarta los
+cambios hechos dentro de él, que los cambios de stock (pedidos, actualización
+masiva) no provocan reconstrucciones, que un cambio de precio en bloque se
+aplica sin reconstruir en el proceso que escribe y que durante una
+reconstrucción se sigue buscando en el índice anterior sin perder los
+cambios recibidos mientras tanto. Uso:
+
+	python -m src.test.prueba_busqueda
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba
+
+
+def _ids(indice, consulta: str) -> set:
+	return {(r['tipo_documento'], r['id']) for r in indice.buscar(consulta, prefijo=False)['resultados']}
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.cache import BackendSQLite
+	from src.database.versiones import VersionesCatalogo, versiones_catalogo
+	from src.models import Gorra, TipoGorra, VarianteGorra
+	from src.services import busqueda
+	from src.services.actualizacion_masiva import actualizar_en_bloque
+	from src.services.busqueda import IndiceBusqueda, indice_catalogo
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'busqueda.db')}")
+	backend = BackendSQLite(os.path.join(directorio, 'versiones.sqlite3'))
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		versiones_catalogo.init_app(app, backend=backend)
+		busqueda.init_app(app)
+		db.session.add_all([Gorra(nombre=f'Gorra {nombre}', descripcion='Algodón', color='negro', precio=50000.0,
+								  stock=10) for nombre in ('trucker', 'snapback', 'bucket')])
+		tipo = TipoGorra(nombre='Fitted', descripcion='Cerrada')
+		db.session.add(tipo)
+		db.session.flush()
+		variante = VarianteGorra(id_tipo_gorra=tipo.id_tipo_gorra, color='rojo', talla='M', precio=40000, stock=5)
+		db.session.add(variante)
+		db.session.commit()
+		id_variante = variante.id_gorra
+
+		otro = IndiceBusqueda(versiones=VersionesCatalogo(backend=backend), intervalo_version=0)
+		indice_catalogo.intervalo_version = 0
+		indice_catalogo.reconstruir()
+		otro.reconstruir()
+		reconstrucciones = []
+		original = IndiceBusqueda.reconstruir
+
+		def contar(indice, *args, **kwargs):
+			reconstrucciones.append(indice)
+			return original(indice, *args, **kwargs)
+
+		IndiceBusqueda.reconstruir = contar
+		try:
+			gorra = db.session.query(Gorra).filter_by(nombre='Gorra trucker').one()
+			gorra.nombre = 'Gorra visera'
+			db.session.commit()
+			resultados['proceso_que_escribe'] = (_ids(indice_catalogo, 'visera') == {('gorra', gorra.id_gorra)}
+												 and indice_catalogo not in reconstrucciones)
+			resultados['otro_proceso'] = (_ids(otro, 'visera') == {('gorra', gorra.id_gorra)}
+										  and not _ids(otro, 'trucker') and reconstrucciones.count(otro) == 1)
+			_ids(otro, 'visera')
+			resultados['otro_proceso_sin_cambios'] = reconstrucciones.count(otro) == 1
+
+			snapback = db.session.query(Gorra).filter_by(nombre='Gorra snapback').one()
+			bucket = db.session.query(Gorra).filter_by(nombre='Gorra bucket').one()
+			snapback.nombre = 'Gorra fitted'
+			db.session.flush()
+			savepoint = db.session.begin_nested()
+			bucket.nombre = 'Gorra boina'
+			db.session.flush()
+			savepoint.rollback()
+			db.session.commit()
+			resultados['savepoint_deshecho'] = (_ids(indice_catalogo, 'fitted') == {('gorra', snapback.id_gorra),
+																					('variante', id_variante)}
+												and _ids(indice_catalogo, 'bucket') == {('gorra', bucket.id_gorra)}
+												and not _ids(indice_catalogo, 'boina')
+												and indice_catalogo not in reconstrucciones)
+
+			db.session.query(Gorra).filter_by(id_gorra=bucket.id_gorra).one().nombre = 'Gorra pescador'
+			db.session.flush()
+			db.session.rollback()
+			resultados['transaccion_deshecha'] = (not _ids(indice_catalogo, 'pescador')
+												  and indice_catalogo not in reconstrucciones)
+
+			# El stock no está indexado: ni el pedido (UPDATE del ORM y versión de
+			# variantes_gorra) ni la actualización masiva de stock reconstruyen
+			_ids(otro, 'rojo')
+			antes = len(reconstrucciones)
+			db.session.get(VarianteGorra, id_variante).stock -= 1
+			db.session.commit()
+			versiones_catalogo.incrementar('variantes_gorra')
+			actualizar_en_bloque('variantes', [{'id': id_variante, 'stock': 50}])
+			resultados['stock_sin_reconstruir'] = (_ids(otro, 'rojo') == {('variante', id_variante)}
+												   and _ids(indice_catalogo, 'rojo') == {('variante', id_variante)}
+												   and len(reconstrucciones) == antes)
+
+			antes = reconstrucciones.count(otro)
+			actualizar_en_bloque('gorras', [{'id': gorra.id_gorra, 'precio': 12345.0}])
+			precios = [r['precio'] for r in indice_catalogo.buscar('visera', prefijo=False)['resultados']]
+			resultados['precio_en_bloque_incremental'] = (precios == [12345.0]
+														  and indice_catalogo not in reconstrucciones)
+			precios = [r['precio'] for r in otro.buscar('visera', prefijo=False)['resultados']]
+			resultados['precio_en_bloque_otro_proceso'] = (precios == [12345.0]
+														   and reconstrucciones.count(otro) == antes + 1)
+		finally:
+			IndiceBusqueda.reconstruir = original
+
+		# Una reconstrucción lenta: mientras lee, las búsquedas usan el índice
+		# anterior y los cambios confirmados se repiten sobre el índice nuevo
+		leyendo, seguir = threading.Event(), threading.Event()
+		indexar_gorra = IndiceBusqueda.indexar_gorra
+
+		def lento(indice, fila):
+			if indice is not indice_catalogo and not leyendo.is_set():
+				leyendo.set()
+				seguir.wait(10)
+			return indexar_gorra(indice, fila)
+
+		def recargar():
+			with app.app_context():
+				indice_catalogo.reconstruir()
+
+		IndiceBusqueda.indexar_gorra = lento
+		hilo = threading.Thread(target=recargar)
+		try:
+			hilo.start()
+			leyendo.wait(10)
+			inicio = time.monotonic()
+			resultados['busqueda_durante_reconstruccion'] = (
+				_ids(indice_catalogo, 'visera') == {('gorra', gorra.id_gorra)} and time.monotonic() - inicio < 1)
+			# Lo que hace el after_commit de otra sesión que renombra la gorra
+			indice_catalogo.aplicar('gorra', {'id_gorra': snapback.id_gorra, 'nombre': 'Gorra gorrita',
+											  'descripcion': 'Algodón', 'color': 'negro', 'precio': 50000.0,
+											  'activo': True})
+		finally:
+			seguir.set()
+			hilo.join()
+			IndiceBusqueda.indexar_gorra = indexar_gorra
+		resultados['cambio_durante_reconstruccion'] = (
+			_ids(indice_catalogo, 'gorrita') == {('gorra', snapback.id_gorra)}
+			and _ids(indice_catalogo, 'fitted') == {('variante', id_variante)})
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_busqueda_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
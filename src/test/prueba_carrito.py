@@ -0,0 +1,93 @@
+"""
+Prueba del carrito de compra.
+
+Con los dos backends (memoria y archivo SQLite) comprueba que añadir,
+cambiar y fusionar carritos no escribe en la base de datos, que el precio
+queda fijado al añadir, que los carritos caducan y que el checkout crea el
+pedido con un único INSERT de detalles. Uso:
+
+	python -m src.test.prueba_carrito
+"""
+import os
+import sys
+import tempfile
+import time
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+
+def _escrituras(contador: ContadorSQL) -> int:
+	return sum(1 for s in contador.sentencias if s.lstrip().split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE'))
+
+
+def ejecutar(directorio: str, backend: str) -> dict:
+	"""
+	Ejecuta las comprobaciones con un backend y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.models import DetallePedido, TipoGorra, VarianteGorra
+	from src.services.carrito import ServicioCarrito, propietario_anonimo, propietario_usuario
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, f'carrito_{backend}.db')}",
+						   CARRITO_BACKEND=backend, CARRITO_RUTA=os.path.join(directorio, 'kv', 'carritos.sqlite3'))
+	servicio = ServicioCarrito()
+	servicio.init_app(app)
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		id_usuario = crear_persona_prueba().id_usuario
+		tipo = TipoGorra(nombre='Dad hat')
+		db.session.add(tipo)
+		db.session.flush()
+		variantes = [VarianteGorra(id_tipo_gorra=tipo.id_tipo_gorra, color='negro', talla=t, precio=p, stock=5)
+					 for t, p in (('S', 20000), ('M', 25000), ('L', 30000))]
+		db.session.add_all(variantes)
+		db.session.commit()
+		ids = [v.id_gorra for v in variantes]
+
+		anonimo, usuario = propietario_anonimo('token-prueba'), propietario_usuario(id_usuario)
+		with ContadorSQL(db.engine) as contador:
+			servicio.agregar(anonimo, ids[0], 2)
+			servicio.agregar(anonimo, ids[1])
+			servicio.agregar(usuario, ids[1], 1)
+			servicio.fijar_cantidad(anonimo, ids[0], 1)
+			carrito = servicio.fusionar(anonimo, usuario)
+		resultados['sin_escrituras_antes_del_checkout'] = _escrituras(contador) == 0
+		resultados['fusion'] = ({l['id_gorra']: l['cantidad'] for l in carrito['lineas']} == {ids[0]: 1, ids[1]: 2}
+								and servicio.obtener(anonimo)['lineas'] == [])
+
+		variantes[0].precio = 99000
+		db.session.commit()
+		resultados['precio_fijado'] = servicio.obtener(usuario)['total'] == '70000.00'
+
+		with ContadorSQL(db.engine) as contador:
+			pedido = servicio.confirmar(usuario, id_usuario)
+		inserciones_detalle = [s for s in contador.sentencias if s.lstrip().upper().startswith('INSERT INTO DETALLE')]
+		detalles = DetallePedido.query.filter_by(id_pedido=pedido.id_pedido).count()
+		resultados['checkout'] = (float(pedido.total) == 70000 and detalles == 2 and len(inserciones_detalle) == 1
+								  and servicio.obtener(usuario)['lineas'] == [])
+
+		servicio.ttl = 0.2
+		servicio.agregar(anonimo, ids[2])
+		time.sleep(0.4)
+		resultados['caducidad'] = servicio.obtener(anonimo)['lineas'] == []
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	correcto = True
+	with tempfile.TemporaryDirectory(prefix='prueba_carrito_') as directorio:
+		for backend in ('memoria', 'sqlite'):
+			for nombre, ok in ejecutar(directorio, backend).items():
+				correcto = correcto and ok
+				print(f"{'OK ' if ok else 'ERR'} {backend:<8} {nombre}")
+	return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
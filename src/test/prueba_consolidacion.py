@@ -0,0 +1,219 @@
+"""
+Prueba de la consolidación de usuarios y ventas en personas y pedidos.
+
+Sobre una base SQLite temporal comprueba que sin equivalencia gorra ->
+variante no se copia nada, interrumpe la copia a mitad y comprueba que se
+reanuda sin duplicar filas, que una venta sin variante equivalente se omite
+y se recupera al reiniciar, que la verificación cuadra, que los resúmenes de
+ventas no cuentan dos veces lo consolidado, que la doble escritura replica
+altas y cambios, que el ritmo máximo se respeta y que la verificación
+detecta líneas en otra variante que la de las equivalencias o de otro color
+que su gorra. Uso:
+
+	python -m src.test.prueba_consolidacion
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+NOMBRES = ('Ana Gómez', 'Luis Pérez Torres', 'María José López García', 'Carlos')
+
+
+class _Interrupcion(Exception):
+	pass
+
+
+def _ingresos() -> float:
+	from src.models import ResumenVentaDia
+	return float(db.session.query(func.coalesce(func.sum(ResumenVentaDia.ingresos), 0)).scalar())
+
+
+def _crear_datos(correo_existente: str):
+	"""Gorras 1-4 (la 4 sin variante), 30 usuarios y 60 ventas con sus líneas."""
+	from src.models import DetalleVenta, Gorra, TipoGorra, Usuario, VarianteGorra, Venta
+
+	tipo = TipoGorra(nombre='Snapback')
+	db.session.add(tipo)
+	db.session.flush()
+	for id_gorra in range(1, 5):
+		db.session.add(Gorra(id_gorra=id_gorra, nombre=f'Gorra {id_gorra}', descripcion='-', color='negro',
+							 precio=1000.0 * id_gorra, stock=100))
+		if id_gorra < 4:
+			db.session.add(VarianteGorra(id_gorra=id_gorra, id_tipo_gorra=tipo.id_tipo_gorra, color='negro',
+										 talla='M', precio=1000 * id_gorra, stock=100))
+	usuarios = [Usuario(nombre=NOMBRES[i % len(NOMBRES)], cedula=f'C{i:05d}', telefono='3000000000',
+						correo=correo_existente if i == 3 else f'usuario{i}@example.com', direccion='Carrera 7 # 1-1',
+						password_hash='hash', rol='admin' if i == 0 else 'cliente')
+				for i in range(30)]
+	db.session.add_all(usuarios)
+	db.session.flush()
+	inicio = datetime(2024, 1, 1, 10)
+	for i in range(60):
+		lineas = [(1 + i % 3, 1 + i % 2)] + ([(4 if i == 17 else 1 + (i + 1) % 3, 2)] if i % 2 else [])
+		venta = Venta(id_usuario=usuarios[i % 30].id_usuario, fecha_venta=inicio + timedelta(hours=i),
+					  total=sum(1000.0 * g * c for g, c in lineas), metodo_pago='efectivo',
+					  estado='anulada' if i % 10 == 0 else 'pagada')
+		db.session.add(venta)
+		db.session.flush()
+		db.session.add_all([DetalleVenta(id_venta=venta.id_venta, id_gorra=g, cantidad=c, precio_unitario=1000.0 * g)
+							for g, c in lineas])
+	db.session.commit()
+
+
+def _venta_gorra(id_usuario: int, id_gorra: int) -> int:
+	"""Venta de una unidad de la gorra; devuelve su ID."""
+	from src.models import DetalleVenta, Venta
+
+	venta = Venta(id_usuario=id_usuario, total=5000.0, metodo_pago='efectivo', estado='pagada')
+	db.session.add(venta)
+	db.session.flush()
+	db.session.add(DetalleVenta(id_venta=venta.id_venta, id_gorra=id_gorra, cantidad=1, precio_unitario=5000.0))
+	db.session.commit()
+	return venta.id_venta
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.models import (DetallePedido, DetalleVenta, Gorra, Pedido, Persona, Rol, TipoGorra, Usuario,
+							VarianteGorra, Venta)
+	from src.services import consolidacion
+	from src.services.reportes import refrescar_resumenes
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'consolidacion.db')}")
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		existente = crear_persona_prueba()
+		_crear_datos(existente.correo)
+		refrescar_resumenes(completo=True, ahora=datetime(2024, 2, 1))
+		ingresos_antes = _ingresos()
+
+		try:
+			consolidacion.consolidar()
+			resultados['sin_equivalencias_error'] = False
+		except ValueError:
+			resultados['sin_equivalencias_error'] = db.session.query(Pedido).count() == 0
+
+		tramos = []
+
+		def interrumpir(fase, resultado):
+			tramos.append((fase, resultado.procesadas))
+			if len(tramos) == 6:
+				raise _Interrupcion()
+
+		try:
+			consolidacion.consolidar(mismo_id=True, tamano_lote=7, progreso=interrumpir)
+		except _Interrupcion:
+			pass
+		parcial = db.session.query(Pedido).filter(Pedido.id_venta_origen.isnot(None)).count()
+		leidas = tramos[-1][1]
+		resultado = consolidacion.consolidar(mismo_id=True, tamano_lote=7, progreso=lambda fase, r: tramos.append((fase, r.procesadas)))
+		pedidos = db.session.query(Pedido).filter(Pedido.id_venta_origen.isnot(None)).count()
+		resultados['reanudacion'] = (0 < parcial < pedidos and resultado.procesadas == 90 - leidas
+									 and pedidos == 59 and resultado.filas_por_segundo > 0)
+		resultados['venta_sin_variante_omitida'] = [o[:2] for o in resultado.omitidas] == [('ventas', 18)]
+
+		reutilizada = db.session.get(Persona, existente.id_usuario)
+		admin = db.session.query(Persona).join(Rol).filter(Persona.id_usuario_origen == 1).one()
+		compuesta = db.session.query(Persona).filter_by(id_usuario_origen=3).one()
+		resultados['personas'] = (reutilizada.id_usuario_origen == 4 and admin.rol.nombre == 'administrador'
+								  and (compuesta.primer_nombre, compuesta.segundo_nombre, compuesta.primer_apellido,
+									   compuesta.segundo_apellido) == ('María', 'José', 'López', 'García')
+								  and db.session.query(Persona).count() == 30)
+
+		verificacion = consolidacion.verificar(mismo_id=True)
+		resultados['verificacion_detecta_pendiente'] = (not verificacion['coincide']
+														and verificacion['ventas_pendientes'] == [18])
+
+		tipo = db.session.query(TipoGorra).first()
+		db.session.add(VarianteGorra(id_gorra=4, id_tipo_gorra=tipo.id_tipo_gorra, color='negro', talla='M',
+									 precio=4000, stock=100))
+		db.session.commit()
+		inicio = time.perf_counter()
+		equivalencias = {id_gorra: id_gorra for id_gorra in range(1, 5)}
+		resultado = consolidacion.consolidar(equivalencias, tamano_lote=10, reiniciar=True, max_filas_segundo=150)
+		segundos = time.perf_counter() - inicio
+		verificacion = consolidacion.verificar(equivalencias=equivalencias)
+		resultados['reinicio_sin_duplicados'] = (resultado.pedidos == 1 and resultado.personas == 0
+												 and verificacion['coincide'])
+		resultados['ritmo_maximo'] = segundos >= 90 / 150 * 0.9
+
+		refrescar_resumenes(completo=True, ahora=datetime(2024, 2, 1))
+		resultados['reportes_sin_doble_conteo'] = abs(_ingresos() - ingresos_antes) < 0.01
+
+		consolidacion.registrar_doble_escritura(mismo_id=True)
+		try:
+			usuario = Usuario(nombre='Nueva Clienta', cedula='C99999', telefono='3100000000',
+							  correo='nueva@example.com', direccion='Calle 2', password_hash='hash')
+			db.session.add(usuario)
+			db.session.flush()
+			venta = Venta(id_usuario=usuario.id_usuario, total=5000.0, metodo_pago='tarjeta')
+			db.session.add(venta)
+			db.session.flush()
+			db.session.add_all([DetalleVenta(id_venta=venta.id_venta, id_gorra=1, cantidad=1, precio_unitario=1000.0),
+								DetalleVenta(id_venta=venta.id_venta, id_gorra=2, cantidad=2, precio_unitario=2000.0)])
+			db.session.commit()
+			venta.estado = 'reembolsada'
+			usuario.telefono = '3200000000'
+			db.session.commit()
+			pedido = db.session.query(Pedido).filter_by(id_venta_origen=venta.id_venta).one()
+			lineas = db.session.scalar(select(func.count()).where(DetallePedido.id_pedido == pedido.id_pedido))
+			persona = db.session.query(Persona).filter_by(id_usuario_origen=usuario.id_usuario).one()
+			resultados['doble_escritura'] = (pedido.estado == 'cancelado' and lineas == 2
+											 and pedido.metodo_pago == 'tarjeta' and persona.telefono == '3200000000'
+											 and consolidacion.verificar(mismo_id=True)['coincide'])
+		finally:
+			consolidacion.quitar_doble_escritura()
+
+		# Gorra 5 azul con variante 5 roja y 6 azul: la regla de igual ID la
+		# llevaría a la variante roja
+		db.session.add(Gorra(id_gorra=5, nombre='Gorra 5', descripcion='-', color='azul', precio=5000.0, stock=10))
+		for id_variante, color in ((5, 'rojo'), (6, 'azul')):
+			db.session.add(VarianteGorra(id_gorra=id_variante, id_tipo_gorra=tipo.id_tipo_gorra, color=color,
+										 talla='M', precio=5000, stock=10))
+		db.session.commit()
+
+		def por_color(id_gorra):
+			return 6 if id_gorra == 5 else id_gorra
+
+		bien = _venta_gorra(usuario.id_usuario, 5)
+		consolidacion.consolidar(por_color)
+		pedido = db.session.query(Pedido).filter_by(id_venta_origen=bien).one()
+		resultados['equivalencia_funcion'] = (
+			[d.id_gorra for d in db.session.query(DetallePedido).filter_by(id_pedido=pedido.id_pedido)] == [6]
+			and consolidacion.verificar(equivalencias=por_color)['coincide'])
+		verificacion = consolidacion.verificar(mismo_id=True)
+		resultados['verificacion_detecta_otra_variante'] = (not verificacion['coincide']
+															and verificacion['muestra_lineas_distintas'] == [bien])
+
+		mal = _venta_gorra(usuario.id_usuario, 5)
+		consolidacion.consolidar(mismo_id=True)
+		verificacion = consolidacion.verificar()
+		resultados['verificacion_detecta_color'] = (not verificacion['coincide']
+													and verificacion['muestra_lineas_distintas'] == [mal])
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_consolidacion_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Prueba de los contadores de disponibilidad por tipo de gorra.
+
+Sobre una base SQLite temporal recorre todas las vías de escritura de
+``variantes_gorra`` (ORM, pedidos, actualización masiva e importación) y
+comprueba tras cada una que los contadores coinciden con el agregado real,
+que la consulta de disponibilidad no lee las variantes y que
+``reconciliar`` detecta y corrige una desviación. Uso:
+
+	python -m src.test.prueba_disponibilidad
+"""
+import json
+import os
+import sys
+import tempfile
+
+from sqlalchemy import update
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+
+def _coinciden() -> bool:
+	from src.services.disponibilidad import reconciliar
+	return reconciliar(reparar=False) == []
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.models import StockTipoGorra, TipoGorra, VarianteGorra
+	from src.services.actualizacion_masiva import actualizar_en_bloque
+	from src.services.disponibilidad import consultar_disponibilidad, reconciliar
+	from src.services.importacion import importar_catalogo
+	from src.services.pedidos import crear_pedido
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'disponibilidad.db')}")
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		id_usuario = crear_persona_prueba().id_usuario
+		tipo = TipoGorra(nombre='Trucker')
+		db.session.add(tipo)
+		db.session.flush()
+		variantes = [
+			VarianteGorra(id_tipo_gorra=tipo.id_tipo_gorra, color=color, talla=talla, precio=10, stock=stock)
+			for color, talla, stock in (('negro', 'M', 10), ('negro', 'M', 5), ('negro', 'L', 7), ('rojo', 'M', 3))
+		]
+		db.session.add_all(variantes)
+		db.session.commit()
+		id_tipo = tipo.id_tipo_gorra
+		resultados['alta_orm'] = _coinciden() and consultar_disponibilidad()[id_tipo]['stock'] == 25
+
+		variantes[0].stock = 4
+		variantes[2].activo = False
+		variantes[3].color = 'azul'
+		db.session.commit()
+		db.session.delete(variantes[1])
+		db.session.commit()
+		disponibilidad = consultar_disponibilidad([id_tipo])[id_tipo]
+		resultados['cambios_orm'] = (_coinciden() and disponibilidad['stock'] == 7
+									 and disponibilidad['variantes_activas'] == 2)
+
+		crear_pedido(id_usuario, [{'id_gorra': variantes[0].id_gorra, 'cantidad': 3},
+								  {'id_gorra': variantes[3].id_gorra, 'cantidad': 1}])
+		resultados['pedido'] = _coinciden() and consultar_disponibilidad()[id_tipo]['stock'] == 3
+
+		masiva = actualizar_en_bloque('variantes', [
+			{'id': variantes[0].id_gorra, 'stock': 50},
+			{'id': variantes[2].id_gorra, 'activo': True},
+			{'id': variantes[3].id_gorra, 'activo': False}
+		])
+		resultados['actualizacion_masiva'] = (masiva.actualizadas == 3 and _coinciden()
+											  and consultar_disponibilidad()[id_tipo]['stock'] == 57)
+
+		ruta = os.path.join(directorio, 'catalogo.jsonl')
+		with open(ruta, 'w', encoding='utf-8') as archivo:
+			for fila in ({'tipo': 'Trucker', 'color': 'verde', 'talla': 'S', 'precio': 12, 'stock': 9},
+						 {'tipo': 'Snapback', 'color': 'negro', 'talla': 'M', 'precio': 15, 'stock': 4},
+						 {'id_gorra': variantes[0].id_gorra, 'tipo': 'Snapback', 'color': 'negro', 'talla': 'M',
+						  'precio': 15, 'stock': 6}):
+				archivo.write(json.dumps(fila) + '\n')
+		importacion = importar_catalogo(ruta)
+		resultados['importacion'] = importacion.importadas == 3 and _coinciden()
+
+		with ContadorSQL(db.engine) as contador:
+			consultar_disponibilidad()
+		resultados['lectura_sin_agregar'] = not any('variantes_gorra' in s for s in contador.sentencias)
+
+		# Una escritura que se salta los contadores se detecta y se corrige
+		with db.engine.begin() as conexion:
+			conexion.execute(update(VarianteGorra.__table__)
+							 .where(VarianteGorra.id_gorra == variantes[2].id_gorra).values(stock=100))
+			conexion.execute(StockTipoGorra.__table__.delete().where(StockTipoGorra.color == 'verde'))
+		desviaciones = reconciliar(reparar=True)
+		resultados['reconciliacion'] = len(desviaciones) == 2 and _coinciden()
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_disponibilidad_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Prueba del número de consultas del historial de pedidos.
+
+Sobre una base SQLite temporal comprueba con ``assert_num_sentencias`` que
+cargar y serializar el historial de un cliente emite exactamente las
+consultas de su perfil (ver ``historial.PERFILES``), sin depender del número
+de pedidos ni de líneas, también cuando se incluyen los pedidos archivados,
+y que una relación no prevista por el perfil falla en lugar de consultar.
+Uso:
+
+	python -m src.test.prueba_historial
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import InvalidRequestError
+
+from src.database.db_connection import db
+from src.test.contador_sql import assert_num_sentencias
+from src.test.entorno import crear_app_prueba
+
+HASTA = datetime(2026, 1, 1)
+
+
+def _comprobar(esperado: int, cargar) -> bool:
+	db.session.remove()
+	try:
+		with assert_num_sentencias(esperado):
+			cargar()
+	except AssertionError as e:
+		print(e)
+		return False
+	return True
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import Pedido
+	from src.services.archivo import archivar
+	from src.services.historial import PERFILES, obtener_historial, serializar_pedido
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'historial.db')}")
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		generar_datos(ParametrosGeneracion(escala=1, dias=730, hasta=HASTA))
+		# El cliente con más pedidos y uno con uno solo: las consultas no dependen del tamaño
+		por_cliente = select(Pedido.id_usuario, func.count().label('n')).group_by(Pedido.id_usuario).subquery()
+		mayor = db.session.scalar(select(por_cliente.c.id_usuario).order_by(por_cliente.c.n.desc()).limit(1))
+		menor = db.session.scalar(select(por_cliente.c.id_usuario).order_by(por_cliente.c.n).limit(1))
+
+		for perfil, consultas in PERFILES.items():
+			resultados[f'{perfil}_en_{consultas}_consultas'] = all(
+				_comprobar(consultas, lambda: [serializar_pedido(p, perfil)
+											   for p in obtener_historial(id_usuario, perfil=perfil)])
+				for id_usuario in (mayor, menor))
+
+		db.session.remove()
+		pedido = obtener_historial(mayor, perfil='resumen')[0]
+		try:
+			pedido.detalles
+			resultados['relacion_no_prevista_falla'] = False
+		except InvalidRequestError:
+			resultados['relacion_no_prevista_falla'] = True
+
+		archivar(antiguedad_dias=365, ahora=HASTA)
+		consultas = PERFILES['completo']
+		# Lectura del límite del archivo, más el perfil en cada tabla si el rango lo alcanza
+		resultados['archivo_incluido'] = _comprobar(2 * consultas + 1, lambda: [
+			serializar_pedido(p) for p in obtener_historial(mayor, incluir_archivo=True)])
+		resultados['archivo_fuera_de_rango'] = _comprobar(consultas + 1, lambda: [
+			serializar_pedido(p) for p in obtener_historial(mayor, desde=HASTA - timedelta(days=30),
+															incluir_archivo=True)])
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_historial_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Prueba de las imágenes direccionadas por contenido.
+
+Sobre una base SQLite temporal comprueba el contador de referencias al
+crear gorras con imagen, al compartir una imagen entre gorras, al
+reemplazarla y al eliminar gorras (los archivos se borran con la última
+referencia), que dos subidas simultáneas del mismo contenido nuevo suman
+dos referencias sin chocar y que una subida que reutiliza un archivo
+mientras otra transacción libera su última referencia lo conserva. Uso:
+
+	python -m src.test.prueba_imagenes
+"""
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.datastructures import FileStorage
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba
+
+TAMANOS = (16, 32)
+
+
+def _png(color: tuple) -> bytes:
+	from PIL import Image
+	salida = io.BytesIO()
+	Image.new('RGB', (64, 48), color).save(salida, format='PNG')
+	return salida.getvalue()
+
+
+def _archivo(contenido: bytes) -> FileStorage:
+	return FileStorage(stream=io.BytesIO(contenido), filename='gorra.png')
+
+
+def _gorra(nombre: str, contenido: bytes):
+	from src.models import Gorra
+	return Gorra.crear({'nombre': nombre, 'descripcion': '-', 'color': 'negro', 'precio': 10.0, 'stock': 1,
+						'imagen': _archivo(contenido)})
+
+
+def _referencias(url: str):
+	from src.models import Imagen
+	from src.services.imagenes import analizar_nombre, PREFIJO_URL
+	db.session.expire_all()
+	imagen = db.session.get(Imagen, analizar_nombre(url[len(PREFIJO_URL):])[0])
+	return None if imagen is None else imagen.referencias
+
+
+def _existe(url: str) -> bool:
+	from src.services.imagenes import PREFIJO_URL, ruta_archivo
+	return os.path.exists(ruta_archivo(url[len(PREFIJO_URL):]))
+
+
+def _en_paralelo(app, primera, segunda) -> list:
+	"""
+	Ejecuta ``primera`` y, cuando ha escrito pero antes de confirmar, ``segunda``
+	en otro hilo; cada una en su propia sesión. Devuelve los errores.
+	"""
+	errores, escrito = [], threading.Event()
+
+	def hilo(funcion, esperar):
+		with app.app_context():
+			try:
+				if esperar:
+					escrito.wait(10)
+				funcion()
+				if not esperar:
+					escrito.set()
+					# La segunda queda bloqueada en el upsert hasta este commit
+					time.sleep(0.3)
+				db.session.commit()
+			except Exception as e:
+				db.session.rollback()
+				errores.append(e)
+			finally:
+				escrito.set()
+
+	hilos = [threading.Thread(target=hilo, args=(primera, False)), threading.Thread(target=hilo, args=(segunda, True))]
+	for h in hilos:
+		h.start()
+	for h in hilos:
+		h.join()
+	return errores
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.models import Gorra
+	from src.services import imagenes
+	from src.services.imagenes import PREFIJO_URL, esperar_variantes, guardar_imagen, liberar_imagen, ruta_archivo
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'imagenes.db')}",
+						   UPLOAD_FOLDER=os.path.join(directorio, 'uploads'), IMAGENES_TAMANOS=TAMANOS)
+	imagenes.init_app(app)
+	roja, azul, verde = _png((200, 0, 0)), _png((0, 0, 200)), _png((0, 200, 0))
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+
+		primera = _gorra('Primera', roja)
+		esperar_variantes()
+		url = primera.imagen_url
+		miniaturas = [ruta_archivo(f"{url[len(PREFIJO_URL):-4]}_{ancho}.{formato}")
+					  for ancho in TAMANOS for formato in ('png', 'webp')]
+		resultados['crear'] = (url.startswith(PREFIJO_URL) and _existe(url) and _referencias(url) == 1
+							   and all(os.path.exists(m) for m in miniaturas))
+
+		segunda = _gorra('Segunda', roja)
+		resultados['compartida'] = segunda.imagen_url == url and _referencias(url) == 2
+
+		segunda.actualizar({'imagen': _archivo(azul)})
+		url_azul = segunda.imagen_url
+		resultados['reemplazar'] = (url_azul != url and _referencias(url) == 1 and _referencias(url_azul) == 1
+									and _existe(url) and _existe(url_azul))
+
+		primera.eliminar()
+		resultados['eliminar_ultima_referencia'] = (_referencias(url) is None and not _existe(url)
+													and not any(os.path.exists(m) for m in miniaturas))
+		id_segunda = segunda.id_gorra
+
+	urls = []
+	errores = _en_paralelo(app, lambda: urls.append(guardar_imagen(_archivo(verde))),
+						   lambda: urls.append(guardar_imagen(_archivo(verde))))
+	with app.app_context():
+		resultados['subidas_simultaneas'] = (not errores and len(set(urls)) == 1 and _referencias(urls[0]) == 2
+											 and _existe(urls[0]))
+
+	errores = _en_paralelo(app, lambda: liberar_imagen(url_azul), lambda: guardar_imagen(_archivo(azul)))
+	with app.app_context():
+		resultados['reutilizada_mientras_se_borra'] = (not errores and _referencias(url_azul) == 1
+													   and _existe(url_azul))
+		esperar_variantes()
+		db.session.get(Gorra, id_segunda).eliminar()
+		resultados['sin_temporales'] = not [n for n in os.listdir(os.path.join(directorio, 'uploads'))
+											if n.startswith('.subida_')]
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_imagenes_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
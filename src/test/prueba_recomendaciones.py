@@ -0,0 +1,137 @@
+"""
+Prueba de las recomendaciones "comprados juntos".
+
+Sobre una base SQLite temporal comprueba que la reconstrucción cuenta los
+mismos pares que un recuento directo de los pedidos no cancelados, que las
+K vecinas de cada variante son las de más pedidos en común, que la
+actualización incremental con pedidos nuevos deja las mismas tablas que una
+reconstrucción completa, que los pedidos archivados siguen contando y que la
+consulta de una variante es una sola sentencia. Uso:
+
+	python -m src.test.prueba_recomendaciones
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import combinations
+import os
+import random
+import sys
+import tempfile
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.test.contador_sql import ContadorSQL
+from src.test.entorno import crear_app_prueba
+
+HASTA = datetime(2026, 1, 1)
+TOP_K = 5
+
+
+def _recuento_directo() -> dict:
+	"""Pares (id_gorra <= id_relacionada) -> pedidos, contados pedido a pedido."""
+	from src.models import DetallePedido, DetallePedidoArchivado, Pedido, PedidoArchivado
+
+	pedidos = defaultdict(set)
+	for cabecera, lineas in ((Pedido, DetallePedido), (PedidoArchivado, DetallePedidoArchivado)):
+		consulta = (select(lineas.id_pedido, lineas.id_gorra).join(cabecera, cabecera.id_pedido == lineas.id_pedido)
+					.where(cabecera.estado != 'cancelado'))
+		for id_pedido, id_gorra in db.session.execute(consulta):
+			pedidos[(cabecera.__tablename__, id_pedido)].add(id_gorra)
+	cuenta = Counter()
+	for variantes in pedidos.values():
+		cuenta.update((v, v) for v in variantes)
+		cuenta.update(combinations(sorted(variantes), 2))
+	return dict(cuenta)
+
+
+def _vecinas_esperadas(pares: dict) -> dict:
+	vecinas = defaultdict(list)
+	for (a, b), pedidos in pares.items():
+		if a != b:
+			vecinas[a].append((-pedidos, b))
+			vecinas[b].append((-pedidos, a))
+	return {v: [(b, -p) for p, b in sorted(lista)[:TOP_K]] for v, lista in vecinas.items()}
+
+
+def _tablas() -> tuple:
+	from src.models import CoocurrenciaVariante, RecomendacionVariante
+
+	pares = {(f.id_gorra, f.id_relacionada): f.pedidos for f in db.session.execute(select(CoocurrenciaVariante.__table__))}
+	vecinas = defaultdict(list)
+	for f in db.session.execute(select(RecomendacionVariante.__table__).order_by(RecomendacionVariante.id_gorra,
+																				  RecomendacionVariante.posicion)):
+		vecinas[f.id_gorra].append((f.id_relacionada, f.pedidos))
+	return pares, dict(vecinas)
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import Persona, VarianteGorra
+	from src.services.archivo import archivar
+	from src.services.pedidos import crear_pedido
+	from src.services.recomendaciones import actualizar, recomendaciones
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'recomendaciones.db')}")
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		generar_datos(ParametrosGeneracion(escala=1, dias=730, hasta=HASTA))
+
+		primera = actualizar(top_k=TOP_K, tamano_lote=97)
+		pares, vecinas = _tablas()
+		esperados = _recuento_directo()
+		resultados['reconstruccion'] = primera.completo and pares == esperados
+		resultados['vecinas'] = vecinas == _vecinas_esperadas(esperados)
+
+		aleatorio = random.Random(7)
+		ids_variante = db.session.scalars(select(VarianteGorra.id_gorra).where(
+			VarianteGorra.stock > 20, VarianteGorra.activo.is_not(False))).all()
+		ids_persona = db.session.scalars(select(Persona.id_usuario)).all()
+		for _ in range(40):
+			crear_pedido(aleatorio.choice(ids_persona), [{'id_gorra': g, 'cantidad': 1}
+														 for g in aleatorio.sample(ids_variante, aleatorio.randint(1, 4))])
+		incremental = actualizar(top_k=TOP_K, tamano_lote=7)
+		tras_incremental = _tablas()
+		completa = actualizar(completo=True, top_k=TOP_K)
+		resultados['incremental_igual_a_completo'] = (not incremental.completo and incremental.pedidos == 40
+													  and 0 < incremental.variantes < completa.variantes
+													  and tras_incremental == _tablas()
+													  and tras_incremental[0] == _recuento_directo())
+		repetida = actualizar(top_k=TOP_K)
+		resultados['sin_pedidos_nuevos'] = repetida.pedidos == 0 and repetida.pares == 0
+
+		archivar(antiguedad_dias=365, ahora=HASTA)
+		actualizar(completo=True, top_k=TOP_K)
+		resultados['archivo_incluido'] = _tablas() == tras_incremental
+
+		id_gorra, _ = max(((v, len(lista)) for v, lista in tras_incremental[1].items()), key=lambda x: x[1])
+		excluida = tras_incremental[1][id_gorra][0][0]
+		db.session.get(VarianteGorra, excluida).activo = False
+		db.session.commit()
+		db.session.remove()
+		with ContadorSQL(db.engine) as contador:
+			lista = recomendaciones(id_gorra, limite=TOP_K)
+		esperadas = [b for b, _ in tras_incremental[1][id_gorra] if b != excluida]
+		resultados['consulta_una_sentencia'] = (contador.total == 1
+												and [r['id_gorra'] for r in lista] == esperadas)
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_recomendaciones_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
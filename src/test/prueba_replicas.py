@@ -0,0 +1,95 @@
+"""
+Prueba del enrutamiento de lecturas a réplicas.
+
+Usa dos archivos SQLite como primaria y réplica con datos distintos para
+comprobar a dónde va cada consulta: lecturas marcadas, lectura tras
+escritura, ``primaria()``, llenado de la caché tras una invalidación (que no
+debe leer de la réplica retrasada) y expulsión de una réplica caída. Uso:
+
+	python -m src.test.prueba_replicas
+"""
+import os
+import sys
+import tempfile
+
+from sqlalchemy import select
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.models import Gorra
+	from src.database.cache import cache_catalogo
+	from src.database.replicas import replicas, primaria
+
+	uri_primaria = f"sqlite:///{os.path.join(directorio, 'primaria.db')}"
+	uri_replica = f"sqlite:///{os.path.join(directorio, 'replica.db')}"
+	app = crear_app_prueba(uri_primaria, SQLALCHEMY_BINDS={'replica_1': uri_replica},
+						   CACHE_CATALOGO_ACTIVA=False, REPLICAS_EXPULSION_SEGUNDOS=60)
+	cache_catalogo.init_app(app)
+	replicas.init_app(app)
+
+	with app.app_context():
+		engines = db.engines
+		for clave, nombre in ((None, 'primaria'), ('replica_1', 'replica')):
+			db.metadata.create_all(engines[clave])
+			with engines[clave].begin() as conexion:
+				conexion.execute(Gorra.__table__.insert(), [{
+					'id_gorra': 1, 'nombre': nombre, 'descripcion': nombre, 'color': 'negro',
+					'precio': 10, 'stock': 5, 'activo': True
+				}])
+
+	resultados = {}
+	with app.app_context():
+		resultados['lectura_en_replica'] = Gorra.obtener_todas()[0].nombre == 'replica'
+		with primaria():
+			resultados['primaria_forzada'] = Gorra.obtener_todas()[0].nombre == 'primaria'
+		gorra = Gorra(nombre='nueva', descripcion='nueva', color='rojo', precio=5, stock=1)
+		db.session.add(gorra)
+		db.session.commit()
+		resultados['leer_lo_escrito'] = 'nueva' in [g.nombre for g in Gorra.obtener_todas()]
+		with db.engines['replica_1'].connect() as conexion:
+			en_replica = conexion.execute(select(Gorra.nombre)).scalars().all()
+		resultados['escritura_en_primaria'] = 'nueva' not in en_replica
+
+	# Tras invalidar una gorra, la caché se llena desde la primaria aunque la réplica vaya retrasada
+	cache_catalogo.activa = True
+	with app.app_context():
+		resultados['cache_desde_replica'] = Gorra.obtener_por_id(1).nombre == 'replica'
+		db.session.get(Gorra, 1).actualizar({'nombre': 'actualizada'})
+	with app.app_context():
+		resultados['cache_tras_cambio_desde_primaria'] = Gorra.obtener_por_id(1).nombre == 'actualizada'
+		db.session.get(Gorra, 1).actualizar({'nombre': 'primaria'})
+	cache_catalogo.activa = False
+
+	# Una réplica sin tablas falla, se expulsa y la lectura se repite en la primaria
+	with app.app_context():
+		db.metadata.drop_all(db.engines['replica_1'])
+		nombres = [g.nombre for g in Gorra.obtener_todas()]
+		resultados['reintento_en_primaria'] = 'primaria' in nombres
+		resultados['replica_expulsada'] = replicas.sanas() == []
+	with app.app_context():
+		resultados['lectura_tras_expulsion'] = 'primaria' in [g.nombre for g in Gorra.obtener_todas()]
+		resultados['estadisticas'] = replicas.estadisticas()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_replicas_') as directorio:
+		resultados = ejecutar(directorio)
+	estadisticas = resultados.pop('estadisticas')
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	print(f"Réplicas: {estadisticas}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
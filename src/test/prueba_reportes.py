@@ -0,0 +1,107 @@
+"""
+Prueba de los recuentos de pedidos de los resúmenes de ventas.
+
+Sobre una base SQLite temporal comprueba que ``consultar_ventas`` cuenta
+cada pedido una sola vez por tipo de gorra y en total (también un pedido con
+varias variantes del mismo tipo), por día y por hora, tras una
+reconstrucción completa y tras refrescos incrementales con un pedido nuevo
+y su cancelación. Uso:
+
+	python -m src.test.prueba_reportes
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import os
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba
+
+HASTA = datetime(2026, 1, 1)
+
+
+def _recuento_directo(granularidad: str, agrupar_por: str) -> dict:
+	"""(periodo, [tipo]) -> [pedidos, cancelados], contados pedido a pedido."""
+	from src.models import DetallePedido, Pedido, VarianteGorra
+
+	consulta = (select(Pedido.id_pedido, Pedido.fecha_pedido, Pedido.estado, VarianteGorra.id_tipo_gorra)
+				.join(DetallePedido, DetallePedido.id_pedido == Pedido.id_pedido)
+				.join(VarianteGorra, VarianteGorra.id_gorra == DetallePedido.id_gorra))
+	pedidos = defaultdict(set)
+	for id_pedido, fecha, estado, id_tipo_gorra in db.session.execute(consulta):
+		periodo = fecha.date() if granularidad == 'dia' else fecha.replace(minute=0, second=0, microsecond=0)
+		clave = (periodo.isoformat(),) + ((id_tipo_gorra,) if agrupar_por == 'tipo' else ())
+		pedidos[clave].add((id_pedido, estado == 'cancelado'))
+	return {clave: [sum(not c for _, c in ids), sum(c for _, c in ids)] for clave, ids in pedidos.items()}
+
+
+def _consultado(granularidad: str, agrupar_por: str) -> dict:
+	from src.services.reportes import consultar_ventas
+
+	filas = consultar_ventas(date(2000, 1, 1), date(2100, 1, 1), granularidad=granularidad,
+							 agrupar_por=agrupar_por, origen='pedido')
+	return {(f['periodo'],) + ((f['id_tipo_gorra'],) if agrupar_por == 'tipo' else ()):
+			[f['num_pedidos'], f['num_cancelados']] for f in filas}
+
+
+def _coinciden() -> bool:
+	return all(_consultado(g, a) == _recuento_directo(g, a) for g in ('dia', 'hora') for a in ('tipo', 'total'))
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.seed import ParametrosGeneracion, generar_datos
+	from src.models import Pedido, Persona, VarianteGorra
+	from src.services.pedidos import crear_pedido
+	from src.services.reportes import refrescar_resumenes
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'reportes.db')}")
+	resultados = {}
+	with app.app_context():
+		db.create_all()
+		generar_datos(ParametrosGeneracion(escala=1, dias=90, hasta=HASTA))
+		refrescar_resumenes(completo=True, ahora=HASTA)
+		resultados['reconstruccion'] = _coinciden()
+
+		# Tres variantes del mismo tipo en un único pedido
+		id_tipo_gorra = db.session.scalar(
+			select(VarianteGorra.id_tipo_gorra).where(VarianteGorra.stock > 5, VarianteGorra.activo.is_not(False))
+			.group_by(VarianteGorra.id_tipo_gorra).having(func.count() >= 3).limit(1))
+		variantes = db.session.scalars(select(VarianteGorra.id_gorra).where(
+			VarianteGorra.id_tipo_gorra == id_tipo_gorra, VarianteGorra.stock > 5,
+			VarianteGorra.activo.is_not(False)).limit(3)).all()
+		pedido = crear_pedido(db.session.scalar(select(Persona.id_usuario).limit(1)),
+							  [{'id_gorra': g, 'cantidad': 1} for g in variantes])
+		ahora = datetime.utcnow()
+		refrescar_resumenes(ahora=ahora)
+		clave = (pedido.fecha_pedido.date().isoformat(),)
+		resultados['pedido_varias_variantes'] = (
+			_consultado('dia', 'tipo')[clave + (id_tipo_gorra,)] == [1, 0]
+			and _consultado('dia', 'total')[clave] == [1, 0] and _coinciden())
+
+		db.session.get(Pedido, pedido.id_pedido).estado = 'cancelado'
+		db.session.commit()
+		refrescar_resumenes(ahora=ahora)
+		resultados['cancelacion'] = _consultado('dia', 'total')[clave] == [0, 1] and _coinciden()
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	with tempfile.TemporaryDirectory(prefix='prueba_reportes_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
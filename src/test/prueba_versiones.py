@@ -0,0 +1,99 @@
+"""
+Prueba de las versiones del catálogo con varios procesos.
+
+Comprueba que un proceso hijo creado con fork (gunicorn con ``preload_app``)
+no repite la marca ni los contadores del padre, que dos instancias sobre el
+mismo backend compartido dan el mismo ETag y Last-Modified tras un cambio en
+cualquiera de ellas, que ``VERSIONES_EXIGIR_BACKEND`` impide arrancar sin
+backend y que deshacer un savepoint no pierde el incremento de lo confirmado
+fuera de él. Uso:
+
+	python -m src.test.prueba_versiones
+"""
+import os
+import sys
+import tempfile
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba
+
+
+def _version_en_hijo(versiones, incrementar: bool) -> str:
+	"""ETag de ``gorras`` calculado en un proceso hijo (tras incrementar, si se pide)."""
+	lectura, escritura = os.pipe()
+	pid = os.fork()
+	if pid == 0:
+		os.close(lectura)
+		if incrementar:
+			versiones.incrementar('gorras')
+		os.write(escritura, versiones.version('gorras')[0].encode())
+		os._exit(0)
+	os.close(escritura)
+	with os.fdopen(lectura) as entrada:
+		etag = entrada.read()
+	os.waitpid(pid, 0)
+	return etag
+
+
+def ejecutar(directorio: str) -> dict:
+	"""
+	Ejecuta las comprobaciones y devuelve su resultado.
+
+	Returns:
+		dict: Nombre de cada comprobación y si se ha cumplido
+	"""
+	from src.database.cache import BackendSQLite
+	from src.database.versiones import VersionesCatalogo, versiones_catalogo
+	from src.models import Gorra
+
+	resultados = {}
+	local = VersionesCatalogo()
+	padre = local.version('gorras')[0]
+	hijos = {_version_en_hijo(local, False), _version_en_hijo(local, False)}
+	resultados['fork_renueva_marca'] = padre not in hijos and len(hijos) == 2
+
+	backend = BackendSQLite(os.path.join(directorio, 'versiones.sqlite3'))
+	compartida, otra = VersionesCatalogo(backend), VersionesCatalogo(backend)
+	antes = otra.version('gorras')
+	tras_hijo = _version_en_hijo(compartida, True)
+	resultados['backend_compartido'] = (compartida.version('gorras') == otra.version('gorras')
+										and otra.version('gorras')[0] == tras_hijo != antes[0])
+
+	app = crear_app_prueba(f"sqlite:///{os.path.join(directorio, 'versiones.db')}", VERSIONES_EXIGIR_BACKEND=True)
+	try:
+		VersionesCatalogo().init_app(app)
+		resultados['exige_backend'] = False
+	except RuntimeError:
+		resultados['exige_backend'] = True
+	app.config.update(VERSIONES_BACKEND='sqlite', VERSIONES_RUTA=os.path.join(directorio, 'app.sqlite3'))
+	versiones_catalogo.init_app(app)
+	resultados['backend_desde_configuracion'] = isinstance(versiones_catalogo.backend, BackendSQLite)
+
+	with app.app_context():
+		db.create_all()
+		antes = versiones_catalogo.version('gorras')[0]
+		db.session.add(Gorra(nombre='Gorra', descripcion='-', color='negro', precio=10.0, stock=1))
+		db.session.flush()
+		savepoint = db.session.begin_nested()
+		db.session.add(Gorra(nombre='Deshecha', descripcion='-', color='rojo', precio=10.0, stock=1))
+		db.session.flush()
+		savepoint.rollback()
+		db.session.commit()
+		resultados['savepoint_deshecho'] = versiones_catalogo.version('gorras')[0] != antes
+		db.engine.dispose()
+	return resultados
+
+
+def main() -> int:
+	if not hasattr(os, 'fork'):
+		print('Esta prueba necesita os.fork')
+		return 0
+	with tempfile.TemporaryDirectory(prefix='prueba_versiones_') as directorio:
+		resultados = ejecutar(directorio)
+	for nombre, correcto in resultados.items():
+		print(f"{'OK ' if correcto else 'ERR'} {nombre}")
+	return 0 if all(resultados.values()) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Prueba de estrés de la creación de pedidos.
+
+Lanza varios hilos que compran las mismas variantes a la vez y comprueba
+que no se vende más stock del disponible. Por defecto usa una base SQLite
+temporal; con ``--uri`` borra y recrea todas las tablas de esa base, por lo
+que exige ``--destruir``. Uso:
+
+	python -m src.test.stress_pedidos --hilos 8 --pedidos 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func
+
+from src.database.db_connection import db
+from src.test.entorno import crear_app_prueba, crear_persona_prueba
+
+
+def ejecutar(hilos: int, pedidos_por_hilo: int, variantes: int, stock_inicial: int,
+			 semilla: int = 42, uri: str = None, destruir: bool = False) -> dict:
+	"""
+	Ejecuta la prueba de estrés y devuelve sus métricas.
+
+	Args:
+		uri: Base de datos a usar en lugar de una SQLite temporal
+		destruir: Confirma que se pueden borrar todas las tablas de ``uri``
+
+	Returns:
+		dict: Pedidos creados/rechazados, pedidos por segundo y resultado
+			de la verificación de sobreventa
+
+	Raises:
+		ValueError: Si se indica ``uri`` sin ``destruir``
+	"""
+	if uri is not None and not destruir:
+		raise ValueError("La prueba borra todas las tablas de la base indicada; confírmalo con destruir=True")
+	from src.models import TipoGorra, VarianteGorra, DetallePedido, StockTipoGorra
+	from src.services.pedidos import crear_pedido, StockInsuficienteError
+
+	directorio = None
+	if uri is None:
+		directorio = tempfile.mkdtemp(prefix='stress_pedidos_')
+		uri = f"sqlite:///{os.path.join(directorio, 'stress.db')}"
+	app = crear_app_prueba(uri)
+
+	with app.app_context():
+		db.drop_all()
+		db.create_all()
+		id_usuario = crear_persona_prueba().id_usuario
+		tipo = TipoGorra(nombre='Stress')
+		db.session.add(tipo)
+		db.session.flush()
+		db.session.add_all([
+			VarianteGorra(id_tipo_gorra=tipo.id_tipo_gorra, color='negro', talla='M',
+						  precio=10, stock=stock_inicial)
+			for _ in range(variantes)
+		])
+		db.session.commit()
+		ids = [v.id_gorra for v in VarianteGorra.query.all()]
+
+	contadores = {'creados': 0, 'rechazados': 0, 'errores': 0}
+	bloqueo = threading.Lock()
+
+	def trabajador(numero: int):
+		aleatorio = random.Random(semilla + numero)
+		with app.app_context():
+			for _ in range(pedidos_por_hilo):
+				lineas = [
+					{'id_gorra': id_gorra, 'cantidad': aleatorio.randint(1, 3)}
+					for id_gorra in aleatorio.sample(ids, aleatorio.randint(1, min(3, len(ids))))
+				]
+				try:
+					crear_pedido(id_usuario, lineas)
+					clave = 'creados'
+				except StockInsuficienteError:
+					clave = 'rechazados'
+				except Exception:
+					clave = 'errores'
+				with bloqueo:
+					contadores[clave] += 1
+
+	inicio = time.perf_counter()
+	trabajadores = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+	for t in trabajadores:
+		t.start()
+	for t in trabajadores:
+		t.join()
+	segundos = time.perf_counter() - inicio
+
+	with app.app_context():
+		stock_restante = db.session.query(func.sum(VarianteGorra.stock)).scalar() or 0
+		vendido = db.session.query(func.sum(DetallePedido.cantidad)).scalar() or 0
+		negativos = VarianteGorra.query.filter(VarianteGorra.stock < 0).count()
+		contador = db.session.query(func.sum(StockTipoGorra.stock)).scalar() or 0
+		db.engine.dispose()
+
+	return dict(
+		contadores,
+		segundos=segundos,
+		pedidos_por_segundo=contadores['creados'] / segundos if segundos else 0.0,
+		stock_inicial=stock_inicial * variantes,
+		stock_restante=stock_restante,
+		unidades_vendidas=vendido,
+		sin_sobreventa=(negativos == 0 and stock_restante + vendido == stock_inicial * variantes),
+		contadores_consistentes=contador == stock_restante
+	)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+	parser.add_argument('--hilos', type=int, default=8)
+	parser.add_argument('--pedidos', type=int, default=200, help='Pedidos por hilo')
+	parser.add_argument('--variantes', type=int, default=5)
+	parser.add_argument('--stock', type=int, default=300, help='Stock inicial por variante')
+	parser.add_argument('--semilla', type=int, default=42)
+	parser.add_argument('--uri', default=None, help='URI de la base de datos (por defecto SQLite temporal)')
+	parser.add_argument('--destruir', action='store_true',
+						help='Confirmar que se borran todas las tablas de la base de --uri')
+	args = parser.parse_args(argv)
+	if args.uri is not None and not args.destruir:
+		parser.error('--uri borra todas las tablas de esa base de datos; añade --destruir para confirmarlo')
+
+	resultado = ejecutar(args.hilos, args.pedidos, args.variantes, args.stock, args.semilla, args.uri,
+						 destruir=args.destruir)
+	print(f"Pedidos creados:    {resultado['creados']}")
+	print(f"Pedidos rechazados: {resultado['rechazados']} (sin stock)")
+	print(f"Errores:            {resultado['errores']}")
+	print(f"Stock inicial:      {resultado['stock_inicial']}")
+	print(f"Unidades vendidas:  {resultado['unidades_vendidas']}")
+	print(f"Stock restante:     {resultado['stock_restante']}")
+	print(f"Pedidos/s:          {resultado['pedidos_por_segundo']:.1f}")
+	if not resultado['sin_sobreventa']:
+		print("ERROR: se detectó sobreventa")
+		return 1
+	print("OK: sin sobreventa")
+	if not resultado['contadores_consistentes']:
+		print("ERROR: los contadores de stock por tipo no coinciden con las variantes")
+		return 1
+	print("OK: contadores de stock por tipo consistentes")
+	if resultado['errores']:
+		print(f"ERROR: {resultado['errores']} pedidos fallaron con un error inesperado")
+		return 1
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
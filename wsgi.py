@@ -0,0 +1,12 @@
+"""
+Punto de entrada WSGI para producción.
+
+	gunicorn -c gunicorn.conf.py wsgi:application
+
+La aplicación se importa una sola vez en el proceso maestro (preload) y los
+workers la heredan al hacer fork; ``src.database.pool`` descarta en cada hijo
+las conexiones heredadas para que no se compartan entre procesos.
+"""
+from app import app as application
+
+__all__ = ['application']